@@ -0,0 +1,263 @@
+# executar.py
+
+"""
+Benchmarks do leitor, do filtro, das regras em lote e da gravação, sobre um arquivo EFD
+sintético (benchmarks.gerador_efd) ou um arquivo real.
+
+Cada etapa roda em um processo próprio, para que o pico de memória (RSS) medido seja só o
+dela. Cada etapa é repetida e o melhor tempo é o registrado. O resultado é gravado em JSON
+e pode ser comparado com o de uma execução anterior:
+
+    python -m benchmarks.executar --linhas 2000000 --saida base.json
+    ... (alteração no código) ...
+    python -m benchmarks.executar --linhas 2000000 --saida atual.json --comparar base.json
+
+Etapas (ETAPAS):
+    parse              parse_efd_file (lista de RegistroEFD)
+    carregar           carregar_registro_store (buffer + offsets, usado pelo GUI)
+    carregar_mapeado   carregar_registro_store(mapear=True)
+    filtro             filtrar_registros com os textos de TEXTOS_FILTRO, em sequência
+    regras             aplicar_regras_em_lote com todas as regras de regras_disponiveis
+    gravacao           generate_efd_file do store depois das regras (grava os editados)
+    inicializacao      importação a frio (interpretador novo) dos módulos do core que a janela
+                       carrega ao abrir; falha se importar o core inteiro carregar o PyQt6
+A vazão em MB/s é sempre relativa ao tamanho do arquivo (ou à fração dele processada, nas
+regras); a de registros/s, aos registros processados pela etapa.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from core.efd_parser import parse_efd_file, carregar_registro_store
+from core.efd_generator import generate_efd_file
+from core.efd_filtro import filtrar_registros
+from core.efd_record_automations import regras_disponiveis, aplicar_regras_em_lote
+from .gerador_efd import gerar_arquivo_efd, interpretar_mistura, MISTURA_PADRAO
+
+FORMATO_RESULTADO = 1 # Versão do JSON de resultados
+ETAPAS = ("parse", "carregar", "carregar_mapeado", "filtro", "regras", "gravacao", "inicializacao")
+TEXTOS_FILTRO = ("C", "C1", "C17", "C170", "F", "M", "M2", "M21", "") # Digitação típica no campo de filtro
+# Módulos do core importados pela janela principal antes de abrir um arquivo (gui.main_window)
+MODULOS_INICIALIZACAO = ("core.efd_structures", "core.efd_journal", "core.efd_filtro", "core.efd_instrumentacao")
+TOLERANCIA_PADRAO = 0.10 # Acima de 10% mais lento que a base conta como regressão
+
+def pico_rss_mb() -> float | None:
+    """Pico de memória residente do processo atual, em MB (None se não for possível medir)."""
+    try:
+        import resource
+    except ImportError: # Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / 1048576
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1048576 if sys.platform == "darwin" else pico / 1024 # bytes no macOS, KB no Linux
+
+def _medir(funcao, repeticoes: int) -> tuple[float, object]:
+    """Executa 'funcao' 'repeticoes' vezes; retorna o melhor tempo e o último resultado."""
+    melhor = float("inf")
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+_ROTEIRO_INICIALIZACAO = """
+import importlib, json, pkgutil, sys, time
+inicio = time.perf_counter()
+for modulo in {modulos!r}:
+    importlib.import_module(modulo)
+segundos = time.perf_counter() - inicio
+import core
+for informacao in pkgutil.iter_modules(core.__path__):
+    importlib.import_module("core." + informacao.name)
+print(json.dumps({{"segundos": segundos, "modulos": len([m for m in sys.modules if m.startswith("core.")]),
+                  "pyqt": "PyQt6" in sys.modules}}))
+"""
+
+def _medir_inicializacao(repeticoes: int) -> tuple[float, int]:
+    """Importa os módulos de MODULOS_INICIALIZACAO em interpretadores novos; retorna o melhor tempo e os módulos do core."""
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    roteiro = _ROTEIRO_INICIALIZACAO.format(modulos=MODULOS_INICIALIZACAO)
+    melhor = float("inf")
+    medidas = {}
+    for _ in range(repeticoes):
+        saida = subprocess.run([sys.executable, "-c", roteiro], capture_output=True, text=True, cwd=raiz, check=True).stdout
+        medidas = json.loads(saida)
+        if medidas["pyqt"]:
+            raise RuntimeError("Importar o core carregou o PyQt6: o core deve funcionar sem interface gráfica.")
+        melhor = min(melhor, medidas["segundos"])
+    return melhor, medidas["modulos"]
+
+def _regras_do_store(store) -> list[dict]:
+    return [regra for tipo_registro, regras_do_tipo in regras_disponiveis.items() if store.indice.posicoes(tipo_registro)
+            for regra in regras_do_tipo]
+
+def _executar_etapa(etapa: str, caminho: str, repeticoes: int) -> dict:
+    """Roda a etapa no processo atual (um processo trabalhador por etapa) e devolve as medidas."""
+    tamanho = os.path.getsize(caminho)
+    fracao_bytes = 1.0 # Fração do arquivo processada por repetição
+    if etapa == "inicializacao": # Não lê o arquivo: 'registros' são os módulos do core importados
+        segundos, registros = _medir_inicializacao(repeticoes)
+        fracao_bytes = 0.0
+    elif etapa == "parse":
+        segundos, registros = _medir(lambda: len(parse_efd_file(caminho)), repeticoes)
+    elif etapa in ("carregar", "carregar_mapeado"):
+        mapear = etapa == "carregar_mapeado"
+        segundos, registros = _medir(lambda: len(carregar_registro_store(caminho, mapear=mapear)), repeticoes)
+    else:
+        store = carregar_registro_store(caminho, mapear=True) # Como o GUI abre os arquivos
+        if etapa == "filtro":
+            def filtrar():
+                anterior = None
+                for texto in TEXTOS_FILTRO:
+                    anterior = filtrar_registros(store, texto, anterior)
+                return len(store) * len(TEXTOS_FILTRO)
+            segundos, registros = _medir(filtrar, repeticoes)
+            fracao_bytes = len(TEXTOS_FILTRO)
+        elif etapa == "regras":
+            segundos, registros = _medir(lambda: aplicar_regras_em_lote(store, _regras_do_store(store))["processados"], repeticoes)
+            fracao_bytes = registros / len(store) if len(store) else 0.0
+        elif etapa == "gravacao":
+            aplicar_regras_em_lote(store, _regras_do_store(store))
+            with tempfile.TemporaryDirectory() as diretorio:
+                destino = os.path.join(diretorio, "saida.txt")
+                segundos, _ = _medir(lambda: generate_efd_file(destino, store), repeticoes)
+            registros = len(store)
+        else:
+            raise ValueError(f"Etapa desconhecida: '{etapa}'")
+        store.fechar()
+    return {
+        "segundos": segundos,
+        "registros": registros,
+        "mb_por_segundo": tamanho * fracao_bytes / 1048576 / segundos if segundos else None,
+        "registros_por_segundo": registros / segundos if segundos else None,
+        "pico_rss_mb": pico_rss_mb(),
+    }
+
+def _commit_atual() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def executar_benchmarks(caminho: str, etapas: list[str], repeticoes: int = 3, origem: dict | None = None) -> dict:
+    """Roda as etapas (cada uma em um processo novo) e monta o resultado no formato JSON."""
+    resultado = {
+        "formato": FORMATO_RESULTADO,
+        "quando": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_atual(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "processadores": os.cpu_count(),
+        "arquivo": {"caminho": caminho, "bytes": os.path.getsize(caminho), "gerado": origem},
+        "repeticoes": repeticoes,
+        "etapas": {},
+    }
+    contexto = multiprocessing.get_context("spawn") # Processo limpo: o RSS de uma etapa não herda o das outras
+    for etapa in etapas:
+        with contexto.Pool(1) as pool:
+            medidas = pool.apply(_executar_etapa, (etapa, caminho, repeticoes))
+        resultado["etapas"][etapa] = medidas
+        print(_formatar_etapa(etapa, medidas), flush=True)
+    return resultado
+
+def _formatar_etapa(etapa: str, medidas: dict) -> str:
+    rss = f"{medidas['pico_rss_mb']:8.0f} MB" if medidas["pico_rss_mb"] is not None else "       - MB"
+    return (f"{etapa:<18} {medidas['segundos']:8.3f} s {medidas['mb_por_segundo'] or 0:9.1f} MB/s "
+            f"{medidas['registros_por_segundo'] or 0:12,.0f} reg/s  pico {rss}").replace(",", ".")
+
+def comparar_resultados(atual: dict, base: dict, tolerancia: float = TOLERANCIA_PADRAO) -> list[str]:
+    """Imprime a variação de tempo de cada etapa em relação à base; retorna as etapas que regrediram."""
+    regressoes = []
+    if atual["arquivo"]["bytes"] != base["arquivo"]["bytes"]:
+        print("Aviso: os arquivos medidos têm tamanhos diferentes; a comparação de tempos pode não fazer sentido.")
+    for etapa, medidas in atual["etapas"].items():
+        medidas_base = base.get("etapas", {}).get(etapa)
+        if not medidas_base or not medidas_base["segundos"]:
+            continue
+        razao = medidas["segundos"] / medidas_base["segundos"]
+        marca = ""
+        if razao > 1 + tolerancia:
+            marca = "  <-- REGRESSÃO"
+            regressoes.append(etapa)
+        elif razao < 1 - tolerancia:
+            marca = "  (mais rápido)"
+        print(f"{etapa:<18} {medidas_base['segundos']:8.3f} s -> {medidas['segundos']:8.3f} s  ({(razao - 1) * 100:+6.1f}%){marca}")
+    return regressoes
+
+def _arquivo_sintetico(args: argparse.Namespace) -> tuple[str, dict]:
+    """Gera (ou reaproveita, já que o gerador é determinístico) o arquivo sintético dos parâmetros."""
+    mistura = interpretar_mistura(args.mistura) if args.mistura else dict(MISTURA_PADRAO)
+    assinatura = f"{args.linhas}_{args.semente}_" + "_".join(f"{tipo}-{peso:g}" for tipo, peso in sorted(mistura.items()))
+    os.makedirs(args.diretorio, exist_ok=True)
+    caminho = os.path.join(args.diretorio, f"efd_sintetico_{assinatura}.txt")
+    origem = {"linhas": args.linhas, "semente": args.semente, "mistura": mistura}
+    if not os.path.isfile(caminho):
+        print(f"Gerando {caminho}...", flush=True)
+        resumo = gerar_arquivo_efd(caminho + ".parcial", args.linhas, mistura, args.semente)
+        os.replace(caminho + ".parcial", caminho)
+        print(f"  {resumo['linhas']:,} linhas, {resumo['bytes'] / 1048576:.1f} MB ({resumo['segundos']:.1f} s)".replace(",", "."))
+    return caminho, origem
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.executar", description="Benchmarks do Retificador EFD.")
+    parser.add_argument("--arquivo", help="Mede um arquivo EFD existente em vez de gerar um sintético.")
+    parser.add_argument("--linhas", type=int, default=1_000_000, help="Registros de detalhe do arquivo sintético.")
+    parser.add_argument("--mistura", default="", help="Pesos por tipo do arquivo sintético, ex: C100=0.1,C170=0.8,F100=0.1.")
+    parser.add_argument("--semente", type=int, default=1914)
+    parser.add_argument("--diretorio", default=os.path.join(tempfile.gettempdir(), "efd_benchmarks"),
+                        help="Onde os arquivos sintéticos são gerados e reaproveitados.")
+    parser.add_argument("--etapas", default=",".join(ETAPAS), help=f"Etapas separadas por vírgula (padrão: todas: {','.join(ETAPAS)}).")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Execuções de cada etapa (vale o melhor tempo).")
+    parser.add_argument("--saida", help="Arquivo JSON onde o resultado é gravado.")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior, para comparar os tempos.")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_PADRAO,
+                        help="Fração de aumento de tempo tolerada antes de acusar regressão (padrão: 0.10).")
+    args = parser.parse_args(argv)
+
+    etapas = [etapa.strip() for etapa in args.etapas.split(",") if etapa.strip()]
+    desconhecidas = [etapa for etapa in etapas if etapa not in ETAPAS]
+    if desconhecidas:
+        print(f"Erro: etapa(s) desconhecida(s): {', '.join(desconhecidas)}", file=sys.stderr)
+        return 2
+    base = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            base = json.load(arquivo)
+
+    if args.arquivo:
+        if not os.path.isfile(args.arquivo):
+            print(f"Erro: Arquivo não encontrado em '{args.arquivo}'", file=sys.stderr)
+            return 2
+        caminho, origem = args.arquivo, None
+    else:
+        try:
+            caminho, origem = _arquivo_sintetico(args)
+        except ValueError as e:
+            print(f"Erro: {e}", file=sys.stderr)
+            return 2
+
+    resultado = executar_benchmarks(caminho, etapas, args.repeticoes, origem)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+        print(f"Resultado gravado em {args.saida}")
+    if base is not None:
+        print(f"\nComparação com {args.comparar} (commit {base.get('commit') or '?'}):")
+        if comparar_resultados(resultado, base, args.tolerancia):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
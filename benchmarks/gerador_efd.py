@@ -0,0 +1,309 @@
+# gerador_efd.py
+
+"""
+Gerador determinístico de arquivos EFD Contribuições sintéticos, para os benchmarks.
+
+Os registros descritos em efd_layout (0000, 0150, 0200, C170, C175, F100, M210, 1100, ...)
+têm os campos preenchidos conforme o schema compilado (core.efd_schema): números com as casas
+decimais do campo, datas dentro do período, códigos de tabelas plausíveis. Os registros de
+estrutura (aberturas e encerramentos de bloco, C010, C100, bloco 9) seguem a hierarquia de
+HIERARQUIA_EFD, com os totalizadores x990/9900/9999 corretos.
+
+A mesma semente e os mesmos parâmetros produzem sempre o mesmo arquivo, byte a byte. Para
+gerar dezenas de milhões de linhas em poucos minutos, cada tipo de detalhe é montado a partir
+de um conjunto fixo de variantes sorteadas uma vez (VARIANTES_POR_TIPO); só os campos que
+identificam o registro (número do item, do documento...) mudam a cada linha. Nada é acumulado
+em memória: as linhas vão direto para o arquivo.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.gerador_efd saida.txt --linhas 10000000 --mistura C170=0.8,F100=0.2
+"""
+import argparse
+import random
+import sys
+import time
+from collections import Counter
+from collections.abc import Callable
+
+from core.efd_schema import SCHEMA_EFD, CampoSchema, TIPO_NUMERICO, TIPO_DATA, TIPO_PERIODO
+
+# Peso de cada tipo de registro de detalhe nas linhas geradas (normalizado pela soma)
+MISTURA_PADRAO: dict[str, float] = {
+    "C100": 0.07, "C170": 0.70, "C175": 0.05, "F100": 0.15,
+    "M210": 0.01, "M610": 0.01, "1100": 0.005, "1500": 0.005,
+}
+TIPOS_MISTURA = tuple(MISTURA_PADRAO) # Tipos aceitos na mistura
+VARIANTES_POR_TIPO = 4096 # Registros distintos sorteados por tipo de detalhe
+LOTE_LINHAS = 8192 # Linhas montadas antes de cada escrita no arquivo
+
+ANO, MES = 2023, 1
+CNPJ_EMPRESA = "12345678000199"
+COD_MUN = "3550308"
+
+def _numero(rng: random.Random, casas: int, maximo: float = 100_000.0) -> str:
+    valor = rng.uniform(0, maximo)
+    return f"{valor:.{casas}f}".replace(".", ",") if casas else str(int(valor))
+
+def _cnpj(rng: random.Random) -> str:
+    return f"{rng.randrange(10**12):012d}0001"[:14]
+
+# Valores dos campos de texto (C) pelo nome do campo; os demais campos de texto ficam vazios
+_TEXTO_POR_NOME: dict[str, Callable[[random.Random], str]] = {
+    "CNPJ": _cnpj, "CNPJ_SUC": lambda rng: "",
+    "CPF": lambda rng: "", "UF": lambda rng: "SP", "COD_MUN": lambda rng: COD_MUN, "COD_PAIS": lambda rng: "01058",
+    "NOME": lambda rng: f"EMPRESA {rng.randrange(100000)} LTDA", "IE": lambda rng: str(rng.randrange(10**11, 10**12)),
+    "END": lambda rng: f"RUA {rng.randrange(1000)}", "NUM": lambda rng: str(rng.randrange(1, 5000)),
+    "BAIRRO": lambda rng: "CENTRO", "DESCR_ITEM": lambda rng: f"PRODUTO {rng.randrange(100000)}",
+    "DESCR_COMPL": lambda rng: rng.choice(("", "ITEM DE REVENDA", "MATERIA-PRIMA")),
+    "UNID": lambda rng: rng.choice(("UN", "KG", "CX", "L")), "UNID_INV": lambda rng: "UN",
+    "TIPO_ITEM": lambda rng: rng.choice(("00", "01", "04")), "COD_NCM": lambda rng: f"{rng.randrange(10**7, 10**8)}",
+    "IND_MOV": lambda rng: "0", "IND_OPER": lambda rng: rng.choice(("0", "1", "2")),
+    "CST_ICMS": lambda rng: rng.choice(("000", "060", "090")), "CFOP": lambda rng: rng.choice(("1102", "5102", "6102", "5405")),
+    "CST_IPI": lambda rng: rng.choice(("", "50", "99")), "IND_APUR": lambda rng: "0",
+    "CST_PIS": lambda rng: rng.choice(("01", "50", "06", "73")), "CST_COFINS": lambda rng: rng.choice(("01", "50", "06", "73")),
+    "NAT_BC_CRED": lambda rng: rng.choice(("01", "02", "13")), "IND_ORIG_CRED": lambda rng: "0",
+    "COD_CTA": lambda rng: f"3.1.{rng.randrange(1, 99):02d}", "COD_CONT": lambda rng: rng.choice(("01", "02", "51", "52")),
+    "COD_CRED": lambda rng: rng.choice(("101", "102", "201")), "ORIG_CRED": lambda rng: "01",
+    "IND_CRED_ORI": lambda rng: "0", "IND_DESC_CRED": lambda rng: "0",
+    "COD_VER": lambda rng: "006", "TIPO_ESCRIT": lambda rng: "0", "IND_NAT_PJ": lambda rng: "00", "IND_ATIV": lambda rng: "1",
+    "COD_INC_TRIB": lambda rng: "1", "IND_APRO_CRED": lambda rng: "1", "COD_TIPO_CONT": lambda rng: "1",
+    "COD_EST": lambda rng: "1", "COD_MOD": lambda rng: "55", "SER": lambda rng: "1", "COD_SIT": lambda rng: "00",
+}
+
+def _valor_campo(campo: CampoSchema, rng: random.Random) -> str:
+    """Valor plausível para o campo, conforme o tipo do schema e o nome."""
+    if campo.tipo == TIPO_NUMERICO:
+        if campo.nome.startswith("ALIQ"):
+            return _numero(rng, campo.casas, 20.0)
+        return _numero(rng, campo.casas)
+    if campo.tipo == TIPO_DATA:
+        return f"{rng.randrange(1, 29):02d}{MES:02d}{ANO}"
+    if campo.tipo == TIPO_PERIODO:
+        return f"{rng.randrange(1, 13):02d}{ANO - 1}"
+    gerador = _TEXTO_POR_NOME.get(campo.nome)
+    return gerador(rng) if gerador is not None else ""
+
+def registro_do_layout(tipo_registro: str, rng: random.Random, **fixos: str) -> list[str]:
+    """Campos de um registro de 'tipo_registro' do efd_layout; 'fixos' sobrescreve campos pelo nome."""
+    schema = SCHEMA_EFD[tipo_registro]
+    campos = [tipo_registro]
+    for campo in schema.campos[1:]:
+        if campo is None:
+            campos.append("")
+        elif campo.nome in fixos:
+            campos.append(fixos[campo.nome])
+        else:
+            campos.append(_valor_campo(campo, rng))
+    return campos
+
+def _linha(campos: list[str]) -> str:
+    return f"|{'|'.join(campos)}|\n"
+
+def interpretar_mistura(texto: str) -> dict[str, float]:
+    """Converte "C170=0.8,F100=0.2" em {"C170": 0.8, "F100": 0.2}. Levanta ValueError se inválido."""
+    mistura: dict[str, float] = {}
+    for parte in texto.split(","):
+        if not parte.strip():
+            continue
+        tipo, separador, peso = parte.partition("=")
+        tipo = tipo.strip().upper()
+        if not separador or tipo not in TIPOS_MISTURA:
+            raise ValueError(f"Item de mistura inválido: '{parte.strip()}'. Use TIPO=peso com TIPO entre {', '.join(TIPOS_MISTURA)}.")
+        try:
+            mistura[tipo] = float(peso)
+        except ValueError:
+            raise ValueError(f"Peso inválido para {tipo}: '{peso}'") from None
+        if mistura[tipo] < 0:
+            raise ValueError(f"Peso negativo para {tipo}.")
+    if not any(mistura.values()):
+        raise ValueError("A mistura precisa de pelo menos um tipo com peso maior que zero.")
+    return mistura
+
+
+class _EscritorEFD:
+    """Grava as linhas em lotes e conta os registros por tipo e por bloco (para x990 e bloco 9)."""
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self.pendentes: list[str] = []
+        self.por_tipo: Counter = Counter()
+        self.linhas_bloco = 0
+        self.total = 0
+        self.bytes = 0
+
+    def escrever(self, tipo_registro: str, linha: str, quantidade: int = 1):
+        self.pendentes.append(linha)
+        self.por_tipo[tipo_registro] += quantidade
+        self.linhas_bloco += quantidade
+        self.total += quantidade
+        if len(self.pendentes) >= LOTE_LINHAS:
+            self.descarregar()
+
+    def campos(self, campos: list[str]):
+        self.escrever(campos[0], _linha(campos))
+
+    def abrir_bloco(self, letra: str, com_dados: bool):
+        self.linhas_bloco = 0
+        self.campos([f"{letra}001", "0" if com_dados else "1"])
+
+    def fechar_bloco(self, letra: str):
+        self.campos([f"{letra}990", str(self.linhas_bloco + 1)])
+
+    def descarregar(self):
+        texto = "".join(self.pendentes)
+        self.bytes += len(texto.encode("latin-1"))
+        self.arquivo.write(texto)
+        self.pendentes.clear()
+
+
+def _quantidades(linhas: int, mistura: dict[str, float]) -> dict[str, int]:
+    soma = sum(mistura.values())
+    quantidades = {tipo: round(linhas * peso / soma) for tipo, peso in mistura.items()}
+    if quantidades.get("C175", 0) + quantidades.get("C170", 0) and not quantidades.get("C100"):
+        quantidades["C100"] = 1 # Itens precisam de um documento
+    return quantidades
+
+def _variantes(tipo_registro: str, rng: random.Random, quantidade: int, **fixos: str) -> list[str]:
+    """Restos de linha ('campo2|campo3|...') de registros sorteados, sem o tipo e o primeiro campo."""
+    return ["|".join(registro_do_layout(tipo_registro, rng, **fixos)[2:]) for _ in range(quantidade)]
+
+def gerar_arquivo_efd(caminho: str, linhas: int = 1_000_000, mistura: dict[str, float] | None = None,
+                      semente: int = 1914, participantes: int = 1000, itens: int = 5000,
+                      progresso: Callable[[int, int], None] | None = None) -> dict:
+    """
+    Gera um arquivo EFD sintético com aproximadamente 'linhas' registros de detalhe, na
+    proporção de 'mistura' (ver MISTURA_PADRAO), mais os registros de estrutura, os
+    'participantes' (0150) e os 'itens' (0200).
+
+    Returns:
+        dict: "caminho", "linhas", "bytes", "semente", "mistura", "por_tipo" e "segundos".
+    """
+    inicio = time.perf_counter()
+    mistura = dict(MISTURA_PADRAO if mistura is None else mistura)
+    quantidades = _quantidades(linhas, mistura)
+    rng = random.Random(semente)
+    cods_part = [f"P{i:06d}" for i in range(participantes)]
+    cods_item = [f"I{i:07d}" for i in range(itens)]
+
+    with open(caminho, "w", encoding="latin-1", newline="\n") as arquivo:
+        escritor = _EscritorEFD(arquivo)
+
+        # --- Bloco 0 ---
+        escritor.campos(registro_do_layout("0000", rng, DT_INI=f"01{MES:02d}{ANO}", DT_FIN=f"31{MES:02d}{ANO}",
+                                           CNPJ=CNPJ_EMPRESA, NOME="EMPRESA SINTETICA LTDA", SUFRAMA="",
+                                           IND_SIT_ESP="", NUM_REC_ANTERIOR=""))
+        escritor.linhas_bloco = 1
+        escritor.campos(["0001", "0"])
+        escritor.campos(registro_do_layout("0100", rng, CNPJ="", CPF="12345678909", CRC="SP123456"))
+        escritor.campos(registro_do_layout("0110", rng))
+        escritor.campos(registro_do_layout("0140", rng, CNPJ=CNPJ_EMPRESA))
+        for cod_part in cods_part:
+            escritor.campos(registro_do_layout("0150", rng, COD_PART=cod_part))
+        for cod_item in cods_item:
+            escritor.campos(registro_do_layout("0200", rng, COD_ITEM=cod_item))
+        escritor.fechar_bloco("0")
+
+        # --- Bloco C: C100 com os itens (C170/C175) distribuídos entre os documentos ---
+        documentos = quantidades.get("C100", 0)
+        escritor.abrir_bloco("C", documentos > 0)
+        if documentos:
+            escritor.campos(["C010", CNPJ_EMPRESA, "2"])
+            variantes_c170 = _variantes("C170", rng, VARIANTES_POR_TIPO) if quantidades.get("C170") else []
+            variantes_c175 = _variantes("C175", rng, VARIANTES_POR_TIPO) if quantidades.get("C175") else []
+            detalhes = [("C170", quantidades.get("C170", 0)), ("C175", quantidades.get("C175", 0))]
+            for numero_doc in range(documentos):
+                cod_part = cods_part[numero_doc % participantes] if participantes else ""
+                valor = _numero(rng, 2)
+                escritor.campos(["C100", str(numero_doc % 2), "0", cod_part, "55", "00", "1", str(numero_doc + 1),
+                                 f"{numero_doc:044d}", f"01{MES:02d}{ANO}", f"01{MES:02d}{ANO}", valor, "0", "0,00", "0,00",
+                                 valor, "0", "0,00", "0,00", "0,00", "0,00", "0,00", "0,00", "0,00", "0,00", "0,00", "0,00",
+                                 "0,00", "0,00"])
+                for tipo_detalhe, total in detalhes:
+                    # Itens do documento: parte igual do total, o resto nos primeiros documentos
+                    por_documento = total // documentos + (numero_doc < total % documentos)
+                    if not por_documento:
+                        continue
+                    if tipo_detalhe == "C170":
+                        restos = rng.choices(variantes_c170, k=por_documento)
+                        linhas_c170 = [f"|C170|{n}|{cods_item[rng.randrange(itens)] if itens else ''}|{resto.split('|', 1)[1]}|\n"
+                                       for n, resto in enumerate(restos, 1)]
+                        escritor.escrever("C170", "".join(linhas_c170), por_documento)
+                    else:
+                        restos = rng.choices(variantes_c175, k=por_documento)
+                        escritor.escrever("C175", "".join(f"|C175|{rng.choice(('5102', '6102'))}|{resto}|\n" for resto in restos),
+                                          por_documento)
+        escritor.fechar_bloco("C")
+
+        # --- Bloco F ---
+        total_f100 = quantidades.get("F100", 0)
+        escritor.abrir_bloco("F", total_f100 > 0)
+        if total_f100:
+            escritor.campos(["F010", CNPJ_EMPRESA])
+            variantes_f100 = _variantes("F100", rng, VARIANTES_POR_TIPO)
+            for inicio_lote in range(0, total_f100, LOTE_LINHAS):
+                restos = rng.choices(variantes_f100, k=min(LOTE_LINHAS, total_f100 - inicio_lote))
+                linhas_f100 = [f"|F100|{rng.choice(('0', '1', '2'))}|{cods_part[rng.randrange(participantes)] if participantes else ''}|"
+                               f"{resto.split('|', 1)[1]}|\n" for resto in restos]
+                escritor.escrever("F100", "".join(linhas_f100), len(restos))
+        escritor.fechar_bloco("F")
+
+        # --- Bloco M: M100/M105, M200 com os M210, M600 com os M610 ---
+        escritor.abrir_bloco("M", True)
+        escritor.campos(registro_do_layout("M100", rng))
+        escritor.campos(registro_do_layout("M105", rng))
+        escritor.campos(registro_do_layout("M200", rng))
+        for _ in range(quantidades.get("M210", 0)):
+            escritor.campos(registro_do_layout("M210", rng))
+        escritor.campos(["M600"] + ["0,00"] * 12)
+        for _ in range(quantidades.get("M610", 0)):
+            escritor.campos(registro_do_layout("M610", rng))
+        escritor.fechar_bloco("M")
+
+        # --- Bloco 1: controle de créditos ---
+        controles = quantidades.get("1100", 0) + quantidades.get("1500", 0)
+        escritor.abrir_bloco("1", controles > 0)
+        for tipo_controle in ("1100", "1500"):
+            for _ in range(quantidades.get(tipo_controle, 0)):
+                escritor.campos(registro_do_layout(tipo_controle, rng))
+        escritor.fechar_bloco("1")
+
+        # --- Bloco 9: quantidade de linhas por tipo ---
+        escritor.abrir_bloco("9", True)
+        tipos_no_arquivo = list(escritor.por_tipo) + ["9900", "9990", "9999"]
+        for tipo in tipos_no_arquivo:
+            quantidade = escritor.por_tipo[tipo]
+            if tipo == "9900":
+                quantidade = len(tipos_no_arquivo)
+            elif tipo in ("9990", "9999"):
+                quantidade = 1
+            escritor.campos(["9900", tipo, str(quantidade)])
+        escritor.campos(["9990", str(escritor.linhas_bloco + 2)]) # Conta também o 9999
+        escritor.campos(["9999", str(escritor.total + 1)])
+        escritor.descarregar()
+
+    if progresso is not None:
+        progresso(escritor.bytes, escritor.total)
+    return {"caminho": caminho, "linhas": escritor.total, "bytes": escritor.bytes, "semente": semente,
+            "mistura": mistura, "por_tipo": dict(escritor.por_tipo), "segundos": time.perf_counter() - inicio}
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.gerador_efd", description="Gera um arquivo EFD Contribuições sintético.")
+    parser.add_argument("saida", help="Arquivo .txt a gerar.")
+    parser.add_argument("--linhas", type=int, default=1_000_000, help="Quantidade aproximada de registros de detalhe.")
+    parser.add_argument("--mistura", default="", help="Pesos por tipo, ex: C100=0.1,C170=0.8,F100=0.1 (padrão: MISTURA_PADRAO).")
+    parser.add_argument("--semente", type=int, default=1914)
+    parser.add_argument("--participantes", type=int, default=1000, help="Registros 0150.")
+    parser.add_argument("--itens", type=int, default=5000, help="Registros 0200.")
+    args = parser.parse_args(argv)
+    try:
+        mistura = interpretar_mistura(args.mistura) if args.mistura else None
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+    resumo = gerar_arquivo_efd(args.saida, args.linhas, mistura, args.semente, args.participantes, args.itens)
+    print(f"{resumo['caminho']}: {resumo['linhas']:,} linhas, {resumo['bytes'] / 1048576:.1f} MB "
+          f"({resumo['segundos']:.1f} s)".replace(",", "."))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,152 @@
+# cli.py
+
+"""
+Interface de linha de comando (sem PyQt) para retificar vários arquivos EFD em paralelo.
+
+Exemplos:
+    python -m core.cli retificar --regras M100,M210 entrada/*.txt -o saida/
+    python -m core.cli regras
+    python -m core.cli comparar original.txt retificado.txt
+
+Cada arquivo é processado em um processo separado (um por núcleo, por padrão) pelo
+pipeline em fluxo de core.efd_pipeline, então a memória de cada processo não depende
+do tamanho do arquivo.
+"""
+import argparse
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .efd_pipeline import retificar_efd_em_fluxo
+from .efd_record_automations import regras_disponiveis, resolver_regras
+from .efd_comparacao import iter_diferencas
+
+def _agrupar_por_tipo(regras: list[dict]) -> dict[str, list[dict]]:
+    """Agrupa as regras selecionadas no formato esperado por retificar_efd_em_fluxo."""
+    regras_por_tipo: dict[str, list[dict]] = {}
+    for regra in regras:
+        regras_por_tipo.setdefault(regra["tipo_registro"], []).append(regra)
+    return regras_por_tipo
+
+def _retificar_arquivo(caminho_entrada: str, caminho_saida: str, especificacoes: list[str]) -> dict:
+    """Executado no processo trabalhador: resolve as regras e roda o pipeline em fluxo."""
+    regras = _agrupar_por_tipo(resolver_regras(especificacoes))
+    return retificar_efd_em_fluxo(caminho_entrada, caminho_saida, regras)
+
+def _expandir_entradas(padroes: list[str]) -> list[str]:
+    """Expande curingas (no Windows o shell não faz isso) mantendo a ordem e sem repetições."""
+    caminhos: list[str] = []
+    for padrao in padroes:
+        encontrados = sorted(glob.glob(padrao)) if glob.has_magic(padrao) else [padrao]
+        for caminho in encontrados:
+            if caminho not in caminhos:
+                caminhos.append(caminho)
+    return caminhos
+
+def comando_retificar(args: argparse.Namespace) -> int:
+    especificacoes = [item for item in args.regras.split(',') if item.strip()]
+    try:
+        resolver_regras(especificacoes) # Valida antes de iniciar os processos
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+
+    entradas = _expandir_entradas(args.entradas)
+    if not entradas:
+        print("Erro: nenhum arquivo de entrada encontrado.", file=sys.stderr)
+        return 2
+
+    tarefas: list[tuple[str, str]] = []
+    entrada_por_saida: dict[str, str] = {} # Saída normalizada -> entrada que a gera
+    for caminho_entrada in entradas:
+        caminho_saida = os.path.join(args.saida, os.path.basename(caminho_entrada))
+        saida_normalizada = os.path.normcase(os.path.abspath(caminho_saida))
+        if saida_normalizada == os.path.normcase(os.path.abspath(caminho_entrada)):
+            print(f"Erro: a saída sobrescreveria a entrada '{caminho_entrada}'. Escolha outro diretório.", file=sys.stderr)
+            return 2
+        if saida_normalizada in entrada_por_saida: # Mesmo nome em diretórios diferentes: um processo apagaria o resultado do outro
+            print(f"Erro: '{entrada_por_saida[saida_normalizada]}' e '{caminho_entrada}' seriam gravados no mesmo "
+                  f"arquivo '{caminho_saida}'. Processe-os em execuções separadas.", file=sys.stderr)
+            return 2
+        entrada_por_saida[saida_normalizada] = caminho_entrada
+        tarefas.append((caminho_entrada, caminho_saida))
+    os.makedirs(args.saida, exist_ok=True)
+
+    falhas = 0
+    with ProcessPoolExecutor(max_workers=args.processos) as executor:
+        futuros = {executor.submit(_retificar_arquivo, entrada, saida, especificacoes): entrada
+                   for entrada, saida in tarefas}
+        for futuro in as_completed(futuros):
+            caminho_entrada = futuros[futuro]
+            try:
+                resumo = futuro.result()
+            except Exception as e:
+                falhas += 1
+                print(f"FALHA {caminho_entrada}: {e}")
+                continue
+            problemas = resumo["problemas_leitura"]
+            if not resumo["sucesso"]:
+                falhas += 1
+                print(f"FALHA {caminho_entrada}: {resumo['erro']}")
+                continue
+            print(f"OK    {caminho_entrada}: {resumo['registros_lidos']} registros, "
+                  f"{resumo['registros_alterados']} alterados, {resumo['erros']} erros de regra, "
+                  f"{problemas['total']} linhas ignoradas")
+            for mensagem in problemas["amostras"][:args.max_mensagens] + resumo["mensagens_erro"][:args.max_mensagens]:
+                print(f"      {mensagem}")
+
+    return 1 if falhas else 0
+
+def comando_listar_regras(args: argparse.Namespace) -> int:
+    for tipo_registro, regras_do_tipo in regras_disponiveis.items():
+        for regra in regras_do_tipo:
+            print(f"{tipo_registro}  {regra['funcao'].__name__:<45} {regra['nome_exibicao']}")
+    return 0
+
+def comando_comparar(args: argparse.Namespace) -> int:
+    """Lista as diferenças (uma por linha, em fluxo). Retorna 1 se houver diferenças, como o diff."""
+    total = 0
+    try:
+        for diferenca in iter_diferencas(args.original, args.retificado):
+            total += 1
+            print(diferenca)
+    except FileNotFoundError as e:
+        print(f"Erro: Arquivo não encontrado em '{e.filename}'", file=sys.stderr)
+        return 2
+    print(f"{total} diferença(s).", file=sys.stderr)
+    return 1 if total else 0
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m core.cli", description="Retificador EFD Contribuições (modo linha de comando).")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    retificar = subparsers.add_parser("retificar", aliases=["rectify"], help="Aplica regras a um ou mais arquivos EFD.")
+    retificar.add_argument("entradas", nargs="+", help="Arquivos .txt de entrada (aceita curingas, ex: entrada/*.txt).")
+    retificar.add_argument("-r", "--regras", "--rules", required=True,
+                           help="Lista separada por vírgulas de tipos de registro (todas as regras do tipo) "
+                                "ou nomes de função de regra. Ex: M100,M210")
+    retificar.add_argument("-o", "--saida", required=True, help="Diretório onde os arquivos retificados serão gravados, com o nome do arquivo de entrada "
+                                "(entradas com o mesmo nome são recusadas).")
+    retificar.add_argument("-j", "--processos", type=int, default=os.cpu_count(),
+                           help="Quantidade de processos trabalhadores (padrão: um por núcleo).")
+    retificar.add_argument("--max-mensagens", type=int, default=5,
+                           help="Máximo de mensagens de erro de regra (e de linhas ignoradas) exibidas por arquivo.")
+    retificar.set_defaults(funcao=comando_retificar)
+
+    listar = subparsers.add_parser("regras", aliases=["rules"], help="Lista as regras disponíveis.")
+    listar.set_defaults(funcao=comando_listar_regras)
+
+    comparar = subparsers.add_parser("comparar", aliases=["diff"],
+                                     help="Lista os registros alterados, incluídos e removidos entre dois arquivos EFD.")
+    comparar.add_argument("original", help="Arquivo EFD original (.txt).")
+    comparar.add_argument("retificado", help="Arquivo EFD retificado (.txt).")
+    comparar.set_defaults(funcao=comando_comparar)
+    return parser
+
+def main(argv: list[str] | None = None) -> int:
+    args = criar_parser().parse_args(argv)
+    return args.funcao(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,401 @@
+# efd_busca.py
+
+"""
+Busca indexada por valor de campo no arquivo carregado.
+
+Consultas (o texto digitado na interface, ver interpretar_consulta):
+    C170.COD_ITEM=123          igualdade
+    0150.NOME^=PADARIA         prefixo
+    F100.VL_OPER>1000000       comparação numérica (>, >=, <, <=)
+    F100.VL_OPER=1000..5000    faixa numérica, inclusiva
+    CNPJ=11111111000191        sem o tipo: todos os tipos que têm o campo
+    C170.COD_NCM=30049099      campo do registro referenciado (C170.COD_ITEM -> 0200.COD_NCM)
+O campo pode ser o nome do leiaute ou o índice (ex: C170.2=123). Em campos numéricos do
+leiaute, '=' compara o valor ("1000" encontra "1000,00"). Condições separadas por ';' são
+combinadas com E (interseção).
+
+IndiceBusca monta, na primeira consulta que precisa dele, um índice invertido por
+(tipo, campo): valor -> posições, com as chaves ordenadas para as buscas por prefixo e, se
+alguma consulta numérica usar o campo, as chaves convertidas para ponto fixo e ordenadas
+para as faixas. Depois disso cada consulta custa algumas buscas binárias.
+
+Os índices continuam válidos durante a edição: as alterações feitas por definir_campo são
+anotadas (via store.ouvintes) e as posições alteradas são conferidas pelo valor atual na
+consulta. Acima de LIMITE_ALTERACOES_PENDENTES, o índice do campo é descartado e reconstruído
+na próxima consulta.
+"""
+import math
+import re
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable
+from fractions import Fraction
+
+from .efd_numerico import ForaDoCaminhoRapido, decodificar
+from .efd_schema import SCHEMA_EFD, TIPO_NUMERICO
+from .efd_structures import RegistroStore
+
+LIMITE_ALTERACOES_PENDENTES = 10_000 # Posições alteradas por índice antes de reconstruí-lo
+INTERVALO_PROGRESSO = 65536 # Registros lidos entre dois avisos de progresso
+
+# Campos que apontam para um registro do bloco 0: (tipo, campo) -> (tipo referenciado, campo chave)
+REFERENCIAS_CAMPOS: dict[tuple[str, str], tuple[str, str]] = {
+    ("C170", "COD_ITEM"): ("0200", "COD_ITEM"),
+    ("F100", "COD_ITEM"): ("0200", "COD_ITEM"),
+    ("F100", "COD_PART"): ("0150", "COD_PART"),
+}
+
+# Operadores
+OPERADOR_IGUAL = "="
+OPERADOR_PREFIXO = "^="
+OPERADORES_NUMERICOS = (">=", "<=", ">", "<")
+
+_PADRAO_CONDICAO = re.compile(r"\s*(?:(?P<tipo>[0-9A-Za-z]{4})\.)?(?P<campo>[A-Za-z0-9_]+)\s*"
+                              r"(?P<operador>\^=|>=|<=|=|>|<)\s*(?P<valor>.*?)\s*")
+_SEPARADOR_FAIXA = ".."
+
+
+class CondicaoBusca:
+    """Uma condição da consulta: [tipo.]campo operador valor."""
+    __slots__ = ("tipo_registro", "campo", "operador", "valor")
+
+    def __init__(self, tipo_registro: str | None, campo: str, operador: str, valor: str):
+        self.tipo_registro = tipo_registro
+        self.campo = campo
+        self.operador = operador
+        self.valor = valor
+
+    def __repr__(self) -> str:
+        return f"CondicaoBusca('{self}')"
+
+    def __str__(self) -> str:
+        prefixo_tipo = f"{self.tipo_registro}." if self.tipo_registro else ""
+        return f"{prefixo_tipo}{self.campo}{self.operador}{self.valor}"
+
+
+def interpretar_consulta(texto: str) -> list[CondicaoBusca]:
+    """Converte o texto da consulta em condições. Levanta ValueError se alguma parte não for reconhecida."""
+    condicoes = []
+    for parte in texto.split(';'):
+        if not parte.strip():
+            continue
+        correspondencia = _PADRAO_CONDICAO.fullmatch(parte)
+        if correspondencia is None:
+            raise ValueError(f"Condição de busca não reconhecida: '{parte.strip()}' (use TIPO.CAMPO=valor)")
+        tipo_registro, campo, operador, valor = correspondencia.group("tipo", "campo", "operador", "valor")
+        if not valor:
+            raise ValueError(f"Informe o valor a buscar em '{parte.strip()}'")
+        condicoes.append(CondicaoBusca(tipo_registro.upper() if tipo_registro else None, campo.upper(), operador, valor))
+    if not condicoes:
+        raise ValueError("Consulta de busca vazia")
+    return condicoes
+
+def _numero(texto: str) -> Fraction:
+    """Valor numérico exato de um texto no formato da EFD. Levanta ValueError se não for número."""
+    try:
+        inteiro, casas = decodificar(texto.strip())
+    except ForaDoCaminhoRapido:
+        raise ValueError(f"Valor numérico inválido na busca: '{texto}'") from None
+    return Fraction(inteiro, 10 ** casas)
+
+def _limites_numericos(condicao: CondicaoBusca) -> tuple[Fraction | None, bool, Fraction | None, bool]:
+    """(mínimo, mínimo incluído, máximo, máximo incluído) da condição numérica; None = sem limite."""
+    operador, valor = condicao.operador, condicao.valor
+    if operador == OPERADOR_IGUAL:
+        if _SEPARADOR_FAIXA in valor:
+            inicio, _, fim = valor.partition(_SEPARADOR_FAIXA)
+            return _numero(inicio), True, _numero(fim), True
+        numero = _numero(valor)
+        return numero, True, numero, True
+    numero = _numero(valor)
+    if operador == ">=":
+        return numero, True, None, False
+    if operador == ">":
+        return numero, False, None, False
+    if operador == "<=":
+        return None, False, numero, True
+    return None, False, numero, False
+
+def _atende_limites(numero: Fraction, limites) -> bool:
+    minimo, inclui_minimo, maximo, inclui_maximo = limites
+    if minimo is not None and (numero < minimo or (numero == minimo and not inclui_minimo)):
+        return False
+    if maximo is not None and (numero > maximo or (numero == maximo and not inclui_maximo)):
+        return False
+    return True
+
+
+class _IndiceCampo:
+    """Índice invertido de um campo de um tipo de registro."""
+    __slots__ = ("por_valor", "chaves", "escala", "numeros", "chaves_numericas", "alteradas")
+
+    def __init__(self, por_valor: dict[bytes, int | list[int]]):
+        self.por_valor = por_valor # Valor -> posição (valor único) ou lista ordenada de posições
+        self.chaves: list[bytes] = sorted(por_valor)
+        self.escala = 0 # Casas decimais de 'numeros' (montados na primeira consulta numérica)
+        self.numeros: list[int] | None = None
+        self.chaves_numericas: list[bytes] = []
+        self.alteradas: set[int] = set() # Posições editadas depois da montagem do índice
+
+    def montar_numeros(self):
+        decodificados = []
+        for chave in self.chaves:
+            try:
+                decodificados.append((decodificar(chave.decode('latin-1')), chave))
+            except ForaDoCaminhoRapido: # Texto que não é número: fica fora das consultas numéricas
+                continue
+        self.escala = max((casas for (_, casas), _ in decodificados), default=0)
+        pares = sorted((inteiro * 10 ** (self.escala - casas), chave) for (inteiro, casas), chave in decodificados)
+        self.numeros = [numero for numero, _ in pares]
+        self.chaves_numericas = [chave for _, chave in pares]
+
+    def posicoes_das_chaves(self, chaves) -> list[int]:
+        posicoes = []
+        for chave in chaves:
+            encontradas = self.por_valor[chave]
+            if type(encontradas) is int:
+                posicoes.append(encontradas)
+            else:
+                posicoes.extend(encontradas)
+        return posicoes
+
+    def igual(self, valor: bytes) -> list[int]:
+        encontradas = self.por_valor.get(valor)
+        if encontradas is None:
+            return []
+        return [encontradas] if type(encontradas) is int else list(encontradas)
+
+    def prefixo(self, prefixo: bytes) -> list[int]:
+        inicio = bisect_left(self.chaves, prefixo)
+        fim = inicio
+        while fim < len(self.chaves) and self.chaves[fim].startswith(prefixo):
+            fim += 1
+        return self.posicoes_das_chaves(self.chaves[inicio:fim])
+
+    def faixa(self, limites) -> list[int]:
+        if self.numeros is None:
+            self.montar_numeros()
+        minimo, inclui_minimo, maximo, inclui_maximo = limites
+        escala = 10 ** self.escala
+        inicio, fim = 0, len(self.numeros)
+        if minimo is not None:
+            limite = minimo * escala
+            inicio = bisect_left(self.numeros, math.ceil(limite)) if inclui_minimo else bisect_right(self.numeros, math.floor(limite))
+        if maximo is not None:
+            limite = maximo * escala
+            fim = bisect_right(self.numeros, math.floor(limite)) if inclui_maximo else bisect_left(self.numeros, math.ceil(limite))
+        return self.posicoes_das_chaves(self.chaves_numericas[inicio:max(inicio, fim)])
+
+
+class IndiceBusca:
+    """
+    Índices de busca de um RegistroStore, montados sob demanda. Use anexar(store) ao
+    carregar um arquivo e buscar(texto) para obter as posições (ordenadas) que atendem
+    à consulta.
+    """
+
+    def __init__(self):
+        self._store: RegistroStore | None = None
+        self._indices: dict[tuple[str, int], _IndiceCampo] = {}
+
+    def __repr__(self) -> str:
+        return f"IndiceBusca(campos_indexados={len(self._indices)})"
+
+    # --- Ligação com o store ---
+
+    def anexar(self, store: RegistroStore):
+        """Passa a buscar em 'store' (descarta os índices do store anterior)."""
+        self.desanexar()
+        self._store = store
+        store.ouvintes.append(self._observar)
+
+    def desanexar(self):
+        if self._store is not None and self._observar in self._store.ouvintes:
+            self._store.ouvintes.remove(self._observar)
+        self._store = None
+        self._indices.clear()
+
+    def _observar(self, posicao: int, indice: int, valor_antigo: str, valor_novo: str):
+        chave = (self._store.tipo_registro(posicao), indice)
+        indice_campo = self._indices.get(chave)
+        if indice_campo is not None:
+            indice_campo.alteradas.add(posicao)
+            if len(indice_campo.alteradas) > LIMITE_ALTERACOES_PENDENTES:
+                del self._indices[chave]
+
+    def campos_indexados(self) -> list[tuple[str, int]]:
+        return list(self._indices)
+
+    # --- Consulta ---
+
+    def preparar(self, consulta: str) -> list[CondicaoBusca]:
+        """
+        Interpreta a consulta e confere, sem montar índices, que cada campo existe no arquivo
+        e que os valores numéricos são válidos. Levanta ValueError descrevendo o problema.
+        """
+        condicoes = interpretar_consulta(consulta)
+        for condicao in condicoes:
+            if not self._resolver(condicao):
+                raise ValueError(f"Nenhum tipo de registro do arquivo tem o campo '{condicao.campo}'")
+            if condicao.operador in OPERADORES_NUMERICOS or _SEPARADOR_FAIXA in condicao.valor:
+                _limites_numericos(condicao)
+        return condicoes
+
+    def buscar(self, consulta: str | list[CondicaoBusca],
+               progresso: Callable[[int, int], None] | None = None) -> dict:
+        """
+        Executa a consulta (texto ou condições de interpretar_consulta).
+
+        Args:
+            progresso: Chamado com (0, registros lidos) enquanto algum índice é montado.
+
+        Returns:
+            dict: "posicoes" (array ordenado das posições encontradas), "consulta" (texto
+                  normalizado), "campos_montados" (índices montados por esta consulta) e "segundos".
+        Levanta ValueError para consultas inválidas ou campos desconhecidos.
+        """
+        inicio = time.perf_counter()
+        condicoes = interpretar_consulta(consulta) if isinstance(consulta, str) else consulta
+        indices_antes = len(self._indices)
+        resultado: set[int] | None = None
+        for condicao in condicoes:
+            encontradas = self._avaliar(condicao, progresso)
+            resultado = encontradas if resultado is None else resultado & encontradas
+            if not resultado:
+                break
+        return {"posicoes": array('q', sorted(resultado or ())),
+                "consulta": "; ".join(map(str, condicoes)),
+                "campos_montados": max(0, len(self._indices) - indices_antes),
+                "segundos": time.perf_counter() - inicio}
+
+    def _avaliar(self, condicao: CondicaoBusca, progresso) -> set[int]:
+        alvos = self._resolver(condicao)
+        if not alvos:
+            raise ValueError(f"Nenhum tipo de registro do arquivo tem o campo '{condicao.campo}'")
+        encontradas: set[int] = set()
+        for tipo_registro, indice, referencia in alvos:
+            if referencia is None:
+                encontradas.update(self._avaliar_campo(tipo_registro, indice, condicao, progresso))
+                continue
+            # Campo de outro registro: localiza os referenciados e depois quem aponta para eles
+            tipo_ref, indice_ref, indice_chave = referencia
+            chaves = {self._store.obter_campo(posicao, indice_chave)
+                      for posicao in self._avaliar_campo(tipo_ref, indice_ref, condicao, progresso)}
+            chaves.discard(None)
+            for chave in chaves:
+                encontradas.update(self._avaliar_campo(tipo_registro, indice, CondicaoBusca(
+                    tipo_registro, "", OPERADOR_IGUAL, chave), progresso, texto_exato=True))
+        return encontradas
+
+    def _resolver(self, condicao: CondicaoBusca) -> list[tuple[str, int, tuple[str, int, int] | None]]:
+        """
+        Campos consultados pela condição: (tipo, índice, None) para campos do próprio tipo ou
+        (tipo, índice do campo que referencia, (tipo referenciado, índice do campo buscado,
+        índice da chave)) para campos alcançados por REFERENCIAS_CAMPOS.
+        """
+        indice_tipos = self._store.indice
+        presentes = set(indice_tipos.posicoes_por_tipo) if indice_tipos is not None else set(self._store.tipos)
+        if condicao.tipo_registro is not None:
+            if condicao.tipo_registro not in presentes:
+                return []
+            tipos = [condicao.tipo_registro]
+        else:
+            tipos = sorted(presentes)
+
+        alvos = []
+        for tipo_registro in tipos:
+            schema = SCHEMA_EFD.get(tipo_registro)
+            if condicao.campo.isdigit():
+                if condicao.tipo_registro is not None:
+                    alvos.append((tipo_registro, int(condicao.campo), None))
+                continue
+            if schema is not None and condicao.campo in schema.indices:
+                alvos.append((tipo_registro, schema.indices[condicao.campo], None))
+                continue
+            for (tipo_origem, campo_origem), (tipo_ref, campo_chave) in REFERENCIAS_CAMPOS.items():
+                schema_ref = SCHEMA_EFD.get(tipo_ref)
+                if tipo_origem == tipo_registro and schema_ref is not None and condicao.campo in schema_ref.indices:
+                    alvos.append((tipo_registro, schema.indices[campo_origem],
+                                  (tipo_ref, schema_ref.indices[condicao.campo], schema_ref.indices[campo_chave])))
+        return alvos
+
+    def _avaliar_campo(self, tipo_registro: str, indice: int, condicao: CondicaoBusca, progresso,
+                       texto_exato: bool = False) -> list[int]:
+        indice_campo = self._indice_campo(tipo_registro, indice, progresso)
+        schema = SCHEMA_EFD.get(tipo_registro)
+        campo_schema = schema.campo(indice) if schema is not None else None
+        numerico = not texto_exato and (condicao.operador in OPERADORES_NUMERICOS or (
+            condicao.operador == OPERADOR_IGUAL and campo_schema is not None and campo_schema.tipo == TIPO_NUMERICO))
+
+        if numerico:
+            limites = _limites_numericos(condicao)
+            posicoes = indice_campo.faixa(limites)
+            def atende(valor: str) -> bool:
+                try:
+                    return _atende_limites(_numero(valor), limites)
+                except ValueError:
+                    return False
+        elif condicao.operador == OPERADOR_PREFIXO:
+            prefixo = condicao.valor
+            posicoes = indice_campo.prefixo(prefixo.encode('latin-1', errors='replace'))
+            def atende(valor: str) -> bool:
+                return valor.startswith(prefixo)
+        else:
+            if _SEPARADOR_FAIXA in condicao.valor and not texto_exato:
+                raise ValueError(f"Faixa de valores só vale para campos numéricos: '{condicao.valor}'")
+            procurado = condicao.valor
+            posicoes = indice_campo.igual(procurado.encode('latin-1', errors='replace'))
+            def atende(valor: str) -> bool:
+                return valor == procurado
+
+        if not indice_campo.alteradas:
+            return posicoes
+        # Posições editadas depois da montagem: valem pelo valor atual, não pelo indexado
+        alteradas = indice_campo.alteradas
+        resultado = [posicao for posicao in posicoes if posicao not in alteradas]
+        for posicao in alteradas:
+            valor = self._store.obter_campo(posicao, indice)
+            if valor is not None and atende(valor):
+                resultado.append(posicao)
+        return resultado
+
+    def _indice_campo(self, tipo_registro: str, indice: int, progresso) -> _IndiceCampo:
+        chave = (tipo_registro, indice)
+        indice_campo = self._indices.get(chave)
+        if indice_campo is None:
+            indice_campo = _IndiceCampo(self._valores_por_posicao(tipo_registro, indice, progresso))
+            self._indices[chave] = indice_campo
+        return indice_campo
+
+    def _valores_por_posicao(self, tipo_registro: str, indice: int, progresso) -> dict[bytes, int | list[int]]:
+        """Lê o campo de todos os registros do tipo e agrupa as posições por valor (em bytes)."""
+        store = self._store
+        if store.indice is not None:
+            posicoes = store.indice.posicoes(tipo_registro)
+        else:
+            posicoes = [pos for pos in range(len(store)) if store.tipo_registro(pos) == tipo_registro]
+        dados, inicio_linhas, fim_linhas, editados = store.dados, store.inicio_linhas, store.fim_linhas, store.editados
+        por_valor: dict[bytes, int | list[int]] = {}
+        for lidos, posicao in enumerate(posicoes):
+            if progresso is not None and lidos % INTERVALO_PROGRESSO == 0:
+                progresso(0, lidos)
+            campos_editados = editados.get(posicao)
+            if campos_editados is not None:
+                if indice >= len(campos_editados):
+                    continue
+                valor = campos_editados[indice].encode('latin-1', errors='replace')
+            else:
+                # Linha "|REG|campo|...|": sem os pipes das pontas, o split fica alinhado aos índices
+                campos = dados[inicio_linhas[posicao] + 1:fim_linhas[posicao] - 1].split(b'|')
+                if indice >= len(campos):
+                    continue
+                valor = campos[indice]
+            atual = por_valor.get(valor)
+            if atual is None:
+                por_valor[valor] = posicao
+            elif type(atual) is int:
+                por_valor[valor] = [atual, posicao]
+            else:
+                atual.append(posicao)
+        return por_valor
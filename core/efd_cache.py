@@ -0,0 +1,335 @@
+# efd_cache.py
+
+"""
+Cache em disco das sessões de arquivos EFD já abertos.
+
+Cada arquivo é identificado pelo hash do seu conteúdo (BLAKE2b). A entrada do cache guarda,
+em formato binário compacto, o que carregar_registro_store(mapear=True) calcula: offsets de
+início/fim das linhas, códigos de tipo, o IndiceEFD e os problemas de leitura. Reabrir um arquivo inalterado custa
+apenas a leitura desses arrays e o mmap do arquivo, sem reindexar o texto.
+
+Para não ler o arquivo inteiro só para calcular o hash, o diretório guarda também
+ARQUIVO_IDENTIDADES: caminho absoluto -> (st_ino, st_size, st_mtime_ns, hash). Se o stat do
+arquivo bate com o guardado, o hash é reaproveitado; caso contrário (ou se a entrada não
+existe mais), o conteúdo é lido e o hash recalculado. Arquivos modificados há menos de
+MARGEM_MTIME_NS não são registrados, pois uma nova escrita no mesmo tique do relógio do
+sistema de arquivos não mudaria o mtime.
+
+Ao lado de cada entrada pode ficar um jornal de edições pendentes (ver core.efd_journal),
+salvo quando a sessão é encerrada sem gravar o arquivo.
+
+O tamanho total do diretório é limitado; ao passar do limite, as entradas usadas há mais
+tempo são removidas (LRU, pela data de modificação, atualizada a cada uso).
+
+Formato do arquivo .efdcache:
+    ASSINATURA (8 bytes) | tamanho do cabeçalho JSON (uint64, little-endian) | cabeçalho JSON | arrays
+Os arrays são gravados em sequência com array.tobytes(), na ordem descrita no cabeçalho.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from collections.abc import Callable
+
+from .efd_structures import RegistroStore, OperacaoCancelada, ProblemasLeitura, identidade_arquivo
+from .efd_hierarquia import IndiceEFD
+from .efd_journal import JornalEdicoes
+from .efd_parser import carregar_registro_store
+
+ASSINATURA_CACHE = b"EFDCACHE"
+VERSAO_FORMATO_CACHE = 3 # 2: problemas de leitura (linhas descartadas) guardados na entrada; 3: pontas das linhas sem ESPACOS_LINHA
+LIMITE_PADRAO_CACHE = 512 * 1024 * 1024 # Bytes ocupados pelo diretório do cache
+TAMANHO_BLOCO_HASH = 8 * 1024 * 1024
+EXTENSAO_ENTRADA = ".efdcache"
+EXTENSAO_JORNAL = ".jornal.json"
+NOME_IDENTIDADES = "identidades"
+ARQUIVO_IDENTIDADES = NOME_IDENTIDADES + ".json" # Caminho -> identidade do arquivo e hash (ver acima)
+MARGEM_MTIME_NS = 2_000_000_000 # Idade mínima do mtime para registrar a identidade
+
+def diretorio_cache_padrao() -> str:
+    """Diretório do cache: variável EFD_RETIFICADOR_CACHE ou ~/.cache/efd_retificador."""
+    return os.environ.get("EFD_RETIFICADOR_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "efd_retificador")
+
+def hash_conteudo(filepath: str, progresso: Callable[[int, int], None] | None = None) -> str:
+    """Hash BLAKE2b (hex) do conteúdo do arquivo. 'progresso' recebe (bytes_lidos, 0) a cada bloco."""
+    resumo = hashlib.blake2b(digest_size=20)
+    bytes_lidos = 0
+    with open(filepath, 'rb') as file:
+        while bloco := file.read(TAMANHO_BLOCO_HASH):
+            resumo.update(bloco)
+            bytes_lidos += len(bloco)
+            if progresso is not None:
+                progresso(bytes_lidos, 0)
+    return resumo.hexdigest()
+
+
+class CacheSessoes:
+    """
+    Cache de sessões em um diretório. Use carregar_store() no lugar de
+    carregar_registro_store(filepath, mapear=True): em caso de acerto, o store é montado a
+    partir do cache; em caso de falta, o arquivo é indexado normalmente e a entrada é gravada.
+    Falhas do cache (disco cheio, entrada corrompida...) nunca impedem a abertura do arquivo.
+    """
+
+    def __init__(self, diretorio: str | None = None, limite_bytes: int = LIMITE_PADRAO_CACHE):
+        self.diretorio = diretorio or diretorio_cache_padrao()
+        self.limite_bytes = limite_bytes
+
+    def __repr__(self) -> str:
+        return f"CacheSessoes(diretorio='{self.diretorio}', limite_bytes={self.limite_bytes})"
+
+    def _caminho(self, chave: str, extensao: str) -> str:
+        return os.path.join(self.diretorio, chave + extensao)
+
+    # --- Store ---
+
+    def carregar_store(self, filepath: str, progresso: Callable[[int, int], None] | None = None) -> RegistroStore:
+        """
+        Equivalente a carregar_registro_store(filepath, mapear=True), usando o cache.
+        O store retornado tem 'hash_conteudo' preenchido (chave do cache e do jornal pendente).
+        Se o stat do arquivo bate com o registrado em ARQUIVO_IDENTIDADES, o hash não é recalculado.
+        """
+        try:
+            identidade = identidade_arquivo(os.stat(filepath))
+        except OSError:
+            return carregar_registro_store(filepath, mapear=True, progresso=progresso) # Ele reporta o erro
+        caminho_absoluto = os.path.abspath(filepath)
+        chave = self._chave_registrada(caminho_absoluto, identidade)
+        store = self._ler_entrada(chave, filepath, identidade) if chave else None
+        if store is None:
+            try:
+                chave = hash_conteudo(filepath, progresso)
+            except OperacaoCancelada:
+                raise
+            except OSError:
+                return carregar_registro_store(filepath, mapear=True, progresso=progresso)
+
+            store = self._ler_entrada(chave, filepath)
+            if store is None:
+                store = carregar_registro_store(filepath, mapear=True, progresso=progresso)
+                if len(store) > 0:
+                    self._gravar_entrada(chave, store)
+            elif progresso is not None:
+                progresso(len(store.dados), len(store))
+            if store.identidade_origem == identidade: # O arquivo não mudou entre o stat e a leitura
+                self._registrar_identidade(caminho_absoluto, identidade, chave)
+        elif progresso is not None:
+            progresso(len(store.dados), len(store))
+        store.hash_conteudo = chave
+        return store
+
+    # --- Identidade (stat) -> hash ---
+
+    def _ler_identidades(self) -> dict:
+        try:
+            with open(os.path.join(self.diretorio, ARQUIVO_IDENTIDADES), 'r', encoding='utf-8') as file:
+                identidades = json.load(file)
+            return identidades if isinstance(identidades, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _chave_registrada(self, caminho_absoluto: str, identidade: tuple[int, int, int]) -> str | None:
+        registro = self._ler_identidades().get(caminho_absoluto)
+        if not isinstance(registro, list) or len(registro) != 4 or tuple(registro[:3]) != identidade:
+            return None
+        return registro[3]
+
+    def _registrar_identidade(self, caminho_absoluto: str, identidade: tuple[int, int, int], chave: str):
+        if time.time_ns() - identidade[2] < MARGEM_MTIME_NS:
+            return # Modificado agora há pouco: outra escrita no mesmo tique não mudaria o mtime
+        identidades = self._ler_identidades()
+        identidades[caminho_absoluto] = [*identidade, chave]
+        # Descarta os caminhos cujas entradas já saíram do cache
+        identidades = {caminho: registro for caminho, registro in identidades.items()
+                       if isinstance(registro, list) and len(registro) == 4
+                       and os.path.isfile(self._caminho(registro[3], EXTENSAO_ENTRADA))}
+        if caminho_absoluto not in identidades:
+            return # A entrada do arquivo não foi gravada
+        temporario = None
+        try:
+            descritor, temporario = tempfile.mkstemp(dir=self.diretorio, prefix=ARQUIVO_IDENTIDADES + ".")
+            with os.fdopen(descritor, 'w', encoding='utf-8') as file:
+                json.dump(identidades, file, ensure_ascii=False)
+            os.replace(temporario, os.path.join(self.diretorio, ARQUIVO_IDENTIDADES))
+        except OSError as e:
+            print(f"Aviso: não foi possível gravar as identidades do cache de sessões: {e}")
+            if temporario is not None and os.path.exists(temporario):
+                os.remove(temporario)
+
+    def _ler_entrada(self, chave: str, filepath: str, identidade: tuple[int, int, int] | None = None) -> RegistroStore | None:
+        """Monta o store a partir da entrada 'chave'. Com 'identidade', só aceita o arquivo se o fstat ainda bate com ela."""
+        caminho = self._caminho(chave, EXTENSAO_ENTRADA)
+        if not os.path.isfile(caminho):
+            return None
+        try:
+            with open(caminho, 'rb') as file:
+                if file.read(len(ASSINATURA_CACHE)) != ASSINATURA_CACHE:
+                    raise ValueError("assinatura inválida")
+                (tamanho_cabecalho,) = struct.unpack("<Q", file.read(8))
+                cabecalho = json.loads(file.read(tamanho_cabecalho).decode('utf-8'))
+                if cabecalho.get("versao") != VERSAO_FORMATO_CACHE or cabecalho.get("ordem_bytes") != sys.byteorder:
+                    raise ValueError("versão ou ordem de bytes diferente")
+                arrays = {}
+                for nome, typecode, itens in cabecalho["arrays"]:
+                    valores = array(typecode)
+                    valores.frombytes(file.read(itens * valores.itemsize))
+                    if len(valores) != itens:
+                        raise ValueError("entrada truncada")
+                    arrays[nome] = valores
+
+            with open(filepath, 'rb') as file:
+                estado = os.fstat(file.fileno())
+                if estado.st_size != cabecalho["tamanho_arquivo"]:
+                    return None # O arquivo mudou depois do hash
+                if identidade is not None and identidade_arquivo(estado) != identidade:
+                    return None # O arquivo mudou depois do stat: a chave registrada não vale mais
+                dados = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError, KeyError, TypeError, struct.error) as e:
+            print(f"Aviso: entrada do cache de sessões ignorada ('{caminho}'): {e}")
+            self._remover_entrada(chave, incluir_jornal=False)
+            return None
+
+        store = RegistroStore(dados, arrays["inicio_linhas"], arrays["fim_linhas"], arrays["codigos_tipo"],
+                              cabecalho["tipos"], caminho_origem=filepath,
+                              linhas_regulares=cabecalho["linhas_regulares"])
+        store.indice = _indice_do_cabecalho(cabecalho, arrays, len(store))
+        store.problemas_leitura = _problemas_do_cabecalho(cabecalho, arrays)
+        store.identidade_origem = identidade_arquivo(estado)
+        _marcar_uso(caminho)
+        return store
+
+    def _gravar_entrada(self, chave: str, store: RegistroStore):
+        indice = store.indice
+        tipos_indice = list(indice.posicoes_por_tipo)
+        arrays = [("inicio_linhas", store.inicio_linhas), ("fim_linhas", store.fim_linhas),
+                  ("codigos_tipo", store.codigos_tipo), ("pais", indice.pais),
+                  ("fim_subarvore", indice.fim_subarvore)]
+        arrays.extend((f"tipo:{tipo}", indice.posicoes_por_tipo[tipo]) for tipo in tipos_indice)
+        problemas = store.problemas_leitura
+        arrays += [("problemas:linhas", problemas.linhas), ("problemas:offsets", problemas.offsets),
+                   ("problemas:tipos", problemas.tipos)]
+        cabecalho = {
+            "versao": VERSAO_FORMATO_CACHE,
+            "ordem_bytes": sys.byteorder,
+            "tamanho_arquivo": len(store.dados),
+            "tipos": store.tipos,
+            "linhas_regulares": store.linhas_regulares,
+            "blocos": indice.blocos,
+            "tipos_indice": tipos_indice,
+            "problemas_leitura": {"contagem": problemas.contagem, "amostras": problemas.amostras, "erro": problemas.erro},
+            "arrays": [(nome, valores.typecode, len(valores)) for nome, valores in arrays],
+        }
+        cabecalho_bytes = json.dumps(cabecalho, ensure_ascii=False).encode('utf-8')
+
+        caminho = self._caminho(chave, EXTENSAO_ENTRADA)
+        temporario = f"{caminho}.tmp"
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            with open(temporario, 'wb') as file:
+                file.write(ASSINATURA_CACHE)
+                file.write(struct.pack("<Q", len(cabecalho_bytes)))
+                file.write(cabecalho_bytes)
+                for _, valores in arrays:
+                    valores.tofile(file)
+            os.replace(temporario, caminho)
+        except OSError as e:
+            print(f"Aviso: não foi possível gravar o cache de sessões em '{self.diretorio}': {e}")
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            return
+        self.aplicar_limite()
+
+    # --- Jornal de edições pendentes ---
+
+    def salvar_jornal_pendente(self, chave: str, jornal: JornalEdicoes):
+        """Guarda o jornal de uma sessão encerrada sem salvar (ou o remove, se estiver vazio)."""
+        if not jornal.pode_desfazer():
+            self.descartar_jornal_pendente(chave)
+            return
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            jornal.salvar(self._caminho(chave, EXTENSAO_JORNAL))
+        except OSError as e:
+            print(f"Aviso: não foi possível gravar o jornal pendente no cache de sessões: {e}")
+            return
+        _marcar_uso(self._caminho(chave, EXTENSAO_ENTRADA))
+        self.aplicar_limite()
+
+    def carregar_jornal_pendente(self, chave: str) -> JornalEdicoes | None:
+        caminho = self._caminho(chave, EXTENSAO_JORNAL)
+        if not os.path.isfile(caminho):
+            return None
+        try:
+            return JornalEdicoes.carregar(caminho)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Aviso: jornal pendente ignorado ('{caminho}'): {e}")
+            self.descartar_jornal_pendente(chave)
+            return None
+
+    def descartar_jornal_pendente(self, chave: str):
+        caminho = self._caminho(chave, EXTENSAO_JORNAL)
+        if os.path.exists(caminho):
+            os.remove(caminho)
+
+    # --- Limite de tamanho (LRU) ---
+
+    def aplicar_limite(self):
+        """Remove as entradas usadas há mais tempo até o diretório caber em 'limite_bytes'."""
+        entradas: dict[str, list[int]] = {} # chave -> [bytes ocupados, último uso]
+        try:
+            with os.scandir(self.diretorio) as itens:
+                for item in itens:
+                    chave, separador, _ = item.name.partition('.')
+                    if not separador or chave == NOME_IDENTIDADES or not item.is_file():
+                        continue
+                    info = item.stat()
+                    entrada = entradas.setdefault(chave, [0, 0])
+                    entrada[0] += info.st_size
+                    entrada[1] = max(entrada[1], info.st_mtime_ns)
+        except OSError:
+            return
+        total = sum(tamanho for tamanho, _ in entradas.values())
+        for chave, (tamanho, _) in sorted(entradas.items(), key=lambda item: item[1][1]):
+            if total <= self.limite_bytes:
+                break
+            self._remover_entrada(chave, incluir_jornal=True)
+            total -= tamanho
+
+    def _remover_entrada(self, chave: str, incluir_jornal: bool):
+        extensoes = (EXTENSAO_ENTRADA, EXTENSAO_JORNAL) if incluir_jornal else (EXTENSAO_ENTRADA,)
+        for extensao in extensoes:
+            try:
+                os.remove(self._caminho(chave, extensao))
+            except OSError:
+                pass
+
+
+def _indice_do_cabecalho(cabecalho: dict, arrays: dict[str, array], total_registros: int) -> IndiceEFD:
+    indice = IndiceEFD(total_registros)
+    indice.posicoes_por_tipo = {tipo: arrays[f"tipo:{tipo}"] for tipo in cabecalho["tipos_indice"]}
+    indice.blocos = {letra: tuple(faixa) for letra, faixa in cabecalho["blocos"].items()}
+    indice.pais = arrays["pais"]
+    indice.fim_subarvore = arrays["fim_subarvore"]
+    return indice
+
+def _problemas_do_cabecalho(cabecalho: dict, arrays: dict[str, array]) -> ProblemasLeitura:
+    problemas = ProblemasLeitura()
+    problemas.linhas = arrays["problemas:linhas"]
+    problemas.offsets = arrays["problemas:offsets"]
+    problemas.tipos = arrays["problemas:tipos"]
+    problemas.contagem = cabecalho["problemas_leitura"]["contagem"]
+    problemas.amostras = [tuple(amostra) for amostra in cabecalho["problemas_leitura"]["amostras"]]
+    problemas.erro = cabecalho["problemas_leitura"]["erro"]
+    return problemas
+
+def _marcar_uso(caminho: str):
+    """Atualiza a data de modificação da entrada (base da ordem LRU)."""
+    try:
+        os.utime(caminho)
+    except OSError:
+        pass
@@ -0,0 +1,375 @@
+# efd_comparacao.py
+
+"""
+Comparação (diff) entre o arquivo EFD original e o retificado, registro a registro.
+
+Os dois arquivos são lidos em fluxo, ao mesmo tempo, e os registros são alinhados pela
+posição na hierarquia e pela chave de cada registro, não pelo número da linha. O caminho de
+um registro é a sequência das chaves dele e dos seus ancestrais, por exemplo:
+    0000 > C001 > C010[CNPJ] > C100[IND_OPER, IND_EMIT, COD_PART, COD_MOD, SER, NUM_DOC] > C170[NUM_ITEM]
+A chave de cada tipo está em CHAVES_REGISTRO. Os tipos sem chave (F100, M200, ...) são
+identificados pelo conteúdo da linha: um F100 incluído no meio do F010 não desloca os
+seguintes. Irmãos com a mesma linha têm o mesmo caminho e são casados na ordem do arquivo
+(a janela guarda, para cada caminho, todas as ocorrências dentro dela). Quando os conteúdos não se
+reencontram na janela, dois registros sem chave do mesmo tipo e do mesmo pai, um em cada
+arquivo, são pareados pela posição e comparados campo a campo (alterado); os filhos do
+retificado são comparados como se estivessem sob o registro pareado do original.
+
+Registros com o mesmo caminho nos dois arquivos são comparados campo a campo. Quando os
+caminhos divergem, cada lado procura o caminho do outro nos próximos JANELA_ALINHAMENTO
+registros: o que sobrar antes do ponto de reencontro foi incluído (no retificado) ou
+removido (do original), junto com os filhos. Assim o custo é linear e a memória fica
+limitada à janela, qualquer que seja o tamanho dos arquivos.
+"""
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from operator import itemgetter
+
+from .efd_structures import INTERVALO_PROGRESSO, ESPACOS_LINHA
+from .efd_hierarquia import nivel_registro
+from .efd_schema import schema_do_tipo
+
+SITUACAO_ALTERADO = "alterado"
+SITUACAO_INCLUIDO = "incluido"
+SITUACAO_REMOVIDO = "removido"
+
+JANELA_ALINHAMENTO = 10_000 # Registros lidos à frente, em cada arquivo, para reencontrar o alinhamento
+LIMITE_PADRAO_DIFERENCAS = 10_000 # Diferenças guardadas com detalhes (as demais são só contadas)
+
+# Campos (por índice) que identificam um registro entre os irmãos do mesmo tipo
+CHAVES_REGISTRO: dict[str, tuple[int, ...]] = {
+    "0140": (3,), # CNPJ do estabelecimento
+    "0150": (1,), # COD_PART
+    "0190": (1,), # UNID
+    "0200": (1,), # COD_ITEM
+    "0400": (1,), # COD_NAT
+    "0450": (1,), # COD_INF
+    "A010": (1,), "C010": (1,), "D010": (1,), "F010": (1,), "I010": (1,), "P010": (1,), # CNPJ
+    "A100": (1, 2, 3, 5, 6, 7), # IND_OPER, IND_EMIT, COD_PART, SER, SUB, NUM_DOC
+    "A170": (1,), # NUM_ITEM
+    "C100": (1, 2, 3, 4, 6, 7), # IND_OPER, IND_EMIT, COD_PART, COD_MOD, SER, NUM_DOC
+    "C170": (1,), # NUM_ITEM
+    "C175": (1, 4), # CFOP, CST_PIS
+    "M100": (1, 2), "M500": (1, 2), # COD_CRED, IND_CRED_ORI
+    "M105": (1, 2), "M505": (1, 2), # NAT_BC_CRED, CST
+    "M210": (1,), "M610": (1,), # COD_CONT
+    "M400": (1,), "M800": (1,), # CST
+    "M410": (1,), "M810": (1,), # NAT_REC
+    "1100": (1, 2, 3, 4), "1500": (1, 2, 3, 4), # PER_APU_CRED, ORIG_CRED, CNPJ_SUC, COD_CRED
+    "9900": (1,), # REG_BLC
+}
+
+
+class DiferencaRegistro:
+    """
+    Uma diferença entre os arquivos. As posições são as dos registros válidos de cada arquivo
+    (as mesmas do RegistroStore), -1 no lado em que o registro não existe. Para registros
+    alterados, 'campos' lista (índice, valor original, valor retificado) dos campos diferentes.
+    """
+    __slots__ = ("situacao", "tipo_registro", "posicao_original", "posicao_retificada", "caminho", "campos", "linha")
+
+    def __init__(self, situacao: str, tipo_registro: str, posicao_original: int, posicao_retificada: int,
+                 caminho: str, campos: list[tuple[int, str, str]] | None = None, linha: str = ""):
+        self.situacao = situacao
+        self.tipo_registro = tipo_registro
+        self.posicao_original = posicao_original
+        self.posicao_retificada = posicao_retificada
+        self.caminho = caminho
+        self.campos = campos if campos is not None else []
+        self.linha = linha # Linha do registro incluído/removido
+
+    def __repr__(self) -> str:
+        return (f"DiferencaRegistro(situacao='{self.situacao}', tipo='{self.tipo_registro}', "
+                f"original={self.posicao_original}, retificado={self.posicao_retificada}, campos={len(self.campos)})")
+
+    def __str__(self) -> str:
+        if self.situacao == SITUACAO_INCLUIDO:
+            return f"+ [{self.posicao_retificada}] {self.caminho}: {self.linha}"
+        if self.situacao == SITUACAO_REMOVIDO:
+            return f"- [{self.posicao_original}] {self.caminho}: {self.linha}"
+        alteracoes = "; ".join(f"{nome_campo(self.tipo_registro, i)}: '{antigo}' -> '{novo}'" for i, antigo, novo in self.campos)
+        return f"~ [{self.posicao_original} -> {self.posicao_retificada}] {self.caminho}: {alteracoes}"
+
+
+def nome_campo(tipo_registro: str, indice: int) -> str:
+    """Nome do campo no layout (ex: VL_CONT_PER), ou 'Campo N' se o layout não o descreve."""
+    schema = schema_do_tipo(tipo_registro)
+    campo = schema.campo(indice) if schema is not None else None
+    return campo.nome if campo is not None else f"Campo {indice}"
+
+def _extrator_chave(indices: tuple[int, ...]) -> Callable[[bytes], tuple[bytes, ...]]:
+    """Função linha (sem os pipes das pontas) -> valores dos campos da chave ('' para campos ausentes)."""
+    obter = itemgetter(*indices) if len(indices) > 1 else (lambda campos: (campos[indices[0]],))
+    tamanho_minimo = max(indices) + 1
+
+    def extrair(linha: bytes) -> tuple[bytes, ...]:
+        campos = linha.split(b'|')
+        if len(campos) < tamanho_minimo:
+            campos += [b''] * (tamanho_minimo - len(campos))
+        return obter(campos)
+    return extrair
+
+def _info_tipo(tipo: str) -> tuple:
+    indices = CHAVES_REGISTRO.get(tipo)
+    return tipo, nivel_registro(tipo), _extrator_chave(indices) if indices else None
+
+def _descrever_caminho(caminho: tuple) -> str:
+    partes = []
+    for componente in caminho:
+        if isinstance(componente[1], tuple): # (tipo, valores da chave)
+            tipo, chave = componente
+            partes.append(f"{tipo}[{', '.join(v.decode('latin-1') for v in chave)}]")
+        else: # (tipo, linha): tipo sem chave
+            partes.append(componente[0])
+    return " > ".join(partes)
+
+def _sem_chave(caminho: tuple) -> bool:
+    return isinstance(caminho[-1][1], bytes)
+
+def _sob(caminho: tuple, prefixo: tuple) -> bool:
+    """True se o caminho é de um descendente do registro com o caminho 'prefixo'."""
+    return len(caminho) > len(prefixo) and caminho[:len(prefixo)] == prefixo
+
+def _traduzir(caminho: tuple, apelidos: list[tuple[tuple, tuple]], lado: int) -> tuple:
+    """Reescreve o caminho de um descendente de registro pareado com o prefixo do outro arquivo ('lado': 0 se é do original, 1 se é do retificado)."""
+    for apelido in reversed(apelidos):
+        prefixo = apelido[lado]
+        if _sob(caminho, prefixo):
+            return apelido[1 - lado] + caminho[len(prefixo):]
+    return caminho
+
+
+class _FluxoAlinhado:
+    """
+    Lê um arquivo EFD em fluxo, calculando o caminho de cada registro, e guarda até
+    JANELA_ALINHAMENTO registros à frente com um dicionário caminho -> primeira sequência na
+    janela; as ocorrências repetidas de um caminho ficam encadeadas em '_proximas'. Nada sobrevive à saída do registro da janela, então a memória não depende
+    do tamanho do arquivo.
+    Cada item é (caminho, posição, tipo, linha em bytes, sem os pipes das pontas). O caminho
+    é uma tupla de componentes (tipo, valores da chave) ou, nos tipos sem chave, (tipo, linha).
+    """
+
+    def __init__(self, caminho_arquivo: str):
+        self._arquivo = open(caminho_arquivo, 'rb')
+        self._linhas = iter(self._arquivo)
+        self.bytes_lidos = 0
+        self.registros = 0 # Registros válidos lidos até agora
+        self.buffer: deque = deque()
+        self._inicio = 0 # Sequência do primeiro item do buffer
+        self._sequencias: dict[tuple, int] = {}
+        self._proximas: dict[int, int] = {} # sequência -> próxima sequência do mesmo caminho
+        self._ultimas: dict[tuple, int] = {} # caminho repetido -> última sequência na janela
+        self._pilha: list[tuple[int, tuple]] = [] # (nível, caminho) dos registros abertos
+        self._info_tipos: dict[bytes, tuple] = {} # tipo em bytes -> (tipo, nível, extrator da chave)
+        self._fim = False
+
+    def fechar(self):
+        self._arquivo.close()
+
+    def preencher(self, quantidade: int):
+        """Lê registros até o buffer ter 'quantidade' itens ou o arquivo acabar."""
+        buffer = self.buffer
+        if len(buffer) >= quantidade or self._fim:
+            return
+        sequencias = self._sequencias
+        proximas = self._proximas
+        ultimas = self._ultimas
+        pilha = self._pilha
+        info_tipos = self._info_tipos
+        # Mesmas regras de iter_efd_records/carregar_registro_store: as linhas descartadas lá
+        # (em branco, sem pipes nas pontas ou sem tipo) também não contam posição aqui
+        for linha_bruta in self._linhas:
+            self.bytes_lidos += len(linha_bruta)
+            linha = linha_bruta.strip(ESPACOS_LINHA)
+            if len(linha) < 2 or linha[0] != 0x7C or linha[-1] != 0x7C: # '|'
+                continue
+            linha = linha[1:-1]
+            tipo_bytes = linha.partition(b'|')[0]
+            if not tipo_bytes:
+                continue
+            info = info_tipos.get(tipo_bytes)
+            if info is None:
+                info = info_tipos[tipo_bytes] = _info_tipo(tipo_bytes.decode('latin-1'))
+            tipo, nivel, extrair_chave = info
+
+            while pilha and pilha[-1][0] >= nivel:
+                pilha.pop()
+            componente = (tipo, extrair_chave(linha) if extrair_chave is not None else linha)
+            caminho = (pilha[-1][1] + (componente,)) if pilha else (componente,)
+            pilha.append((nivel, caminho))
+
+            sequencia = self._inicio + len(buffer)
+            primeira = sequencias.setdefault(caminho, sequencia)
+            if primeira != sequencia: # Caminho repetido na janela: encadeia depois da última ocorrência
+                proximas[ultimas.get(caminho, primeira)] = sequencia
+                ultimas[caminho] = sequencia
+            buffer.append((caminho, self.registros, tipo, linha))
+            self.registros += 1
+            if len(buffer) >= quantidade:
+                return
+        self._fim = True
+
+    def distancia(self, caminho: tuple) -> int | None:
+        """Quantos itens do buffer vêm antes do primeiro registro com esse caminho (None se não está na janela)."""
+        sequencia = self._sequencias.get(caminho)
+        return None if sequencia is None else sequencia - self._inicio
+
+    def retirar(self) -> tuple:
+        item = self.buffer.popleft()
+        proxima = self._proximas.pop(self._inicio, None) if self._proximas else None
+        if proxima is None:
+            del self._sequencias[item[0]]
+            if self._ultimas:
+                self._ultimas.pop(item[0], None)
+        else:
+            self._sequencias[item[0]] = proxima
+        self._inicio += 1
+        return item
+
+
+def _campos_alterados(linha_original: bytes, linha_retificada: bytes) -> list[tuple[int, str, str]]:
+    campos_original = linha_original.split(b'|')
+    campos_retificado = linha_retificada.split(b'|')
+    alterados = []
+    for i in range(max(len(campos_original), len(campos_retificado))):
+        antigo = campos_original[i] if i < len(campos_original) else b''
+        novo = campos_retificado[i] if i < len(campos_retificado) else b''
+        if antigo != novo or (i >= len(campos_original)) != (i >= len(campos_retificado)):
+            alterados.append((i, antigo.decode('latin-1'), novo.decode('latin-1')))
+    return alterados
+
+@contextmanager
+def _abrir_fluxos(caminho_original: str, caminho_retificado: str):
+    original = _FluxoAlinhado(caminho_original)
+    try:
+        retificado = _FluxoAlinhado(caminho_retificado)
+        try:
+            yield original, retificado
+        finally:
+            retificado.fechar()
+    finally:
+        original.fechar()
+
+def iter_diferencas(caminho_original: str, caminho_retificado: str,
+                    progresso: Callable[[int, int], None] | None = None) -> Iterator[DiferencaRegistro]:
+    """
+    Compara os dois arquivos em fluxo, produzindo as diferenças em ordem de arquivo.
+    Erros de abertura (ex: FileNotFoundError) são propagados ao chamador.
+
+    Args:
+        progresso: Chamado com (bytes lidos dos dois arquivos, registros lidos dos dois
+                   arquivos) a cada INTERVALO_PROGRESSO registros. Pode levantar
+                   OperacaoCancelada para interromper a comparação.
+    """
+    with _abrir_fluxos(caminho_original, caminho_retificado) as (original, retificado):
+        yield from _diferencas(original, retificado, progresso)
+
+def _diferencas(original: _FluxoAlinhado, retificado: _FluxoAlinhado, progresso) -> Iterator[DiferencaRegistro]:
+    def removido(item) -> DiferencaRegistro:
+        return DiferencaRegistro(SITUACAO_REMOVIDO, item[2], item[1], -1, _descrever_caminho(item[0]),
+                                 linha=f"|{item[3].decode('latin-1')}|")
+
+    def incluido(item) -> DiferencaRegistro:
+        return DiferencaRegistro(SITUACAO_INCLUIDO, item[2], -1, item[1], _descrever_caminho(item[0]),
+                                 linha=f"|{item[3].decode('latin-1')}|")
+
+    # (caminho no original, caminho no retificado) dos registros sem chave pareados pela posição,
+    # enquanto os filhos deles são comparados (no máximo um por nível)
+    apelidos: list[tuple[tuple, tuple]] = []
+    proximo_aviso = INTERVALO_PROGRESSO
+    while True:
+        if progresso is not None and original.registros + retificado.registros >= proximo_aviso:
+            proximo_aviso += INTERVALO_PROGRESSO
+            progresso(original.bytes_lidos + retificado.bytes_lidos, original.registros + retificado.registros)
+        if not original.buffer:
+            original.preencher(1)
+        if not retificado.buffer:
+            retificado.preencher(1)
+        if not original.buffer:
+            if not retificado.buffer:
+                break
+            yield incluido(retificado.retirar())
+            continue
+        if not retificado.buffer:
+            yield removido(original.retirar())
+            continue
+
+        item_original, item_retificado = original.buffer[0], retificado.buffer[0]
+        caminho_original, caminho_retificado = item_original[0], item_retificado[0]
+        if apelidos:
+            while apelidos and not _sob(caminho_original, apelidos[-1][0]) and not _sob(caminho_retificado, apelidos[-1][1]):
+                apelidos.pop()
+            caminho_retificado = _traduzir(caminho_retificado, apelidos, 1)
+        if caminho_original == caminho_retificado: # Caminho comum: mesmo registro nos dois arquivos
+            original.retirar()
+            retificado.retirar()
+            if item_original[3] != item_retificado[3]:
+                yield DiferencaRegistro(SITUACAO_ALTERADO, item_original[2], item_original[1], item_retificado[1],
+                                        _descrever_caminho(item_original[0]),
+                                        _campos_alterados(item_original[3], item_retificado[3]))
+            continue
+
+        # Desalinhados: procura cada cabeça na janela do outro arquivo
+        original.preencher(JANELA_ALINHAMENTO)
+        retificado.preencher(JANELA_ALINHAMENTO)
+        distancia_no_retificado = retificado.distancia(_traduzir(caminho_original, apelidos, 0) if apelidos else caminho_original)
+        distancia_no_original = original.distancia(caminho_retificado)
+        if distancia_no_retificado is None and distancia_no_original is None:
+            if (_sem_chave(caminho_original) and _sem_chave(caminho_retificado)
+                    and caminho_original[-1][0] == caminho_retificado[-1][0] and caminho_original[:-1] == caminho_retificado[:-1]):
+                # Mesmo tipo sem chave sob o mesmo pai, conteúdos diferentes: pareados pela posição
+                original.retirar()
+                retificado.retirar()
+                while apelidos and len(apelidos[-1][0]) >= len(caminho_original):
+                    apelidos.pop()
+                apelidos.append((caminho_original, item_retificado[0]))
+                yield DiferencaRegistro(SITUACAO_ALTERADO, item_original[2], item_original[1], item_retificado[1],
+                                        _descrever_caminho(caminho_original),
+                                        _campos_alterados(item_original[3], item_retificado[3]))
+                continue
+            yield removido(original.retirar())
+            yield incluido(retificado.retirar())
+        elif distancia_no_original is None or (distancia_no_retificado is not None
+                                               and distancia_no_retificado <= distancia_no_original):
+            for _ in range(distancia_no_retificado):
+                yield incluido(retificado.retirar())
+        else:
+            for _ in range(distancia_no_original):
+                yield removido(original.retirar())
+
+    if progresso is not None:
+        progresso(original.bytes_lidos + retificado.bytes_lidos, original.registros + retificado.registros)
+
+def comparar_arquivos_efd(caminho_original: str, caminho_retificado: str, limite: int = LIMITE_PADRAO_DIFERENCAS,
+                          progresso: Callable[[int, int], None] | None = None) -> dict:
+    """
+    Compara os dois arquivos e resume as diferenças.
+
+    Returns:
+        dict: "diferencas" (as primeiras 'limite' DiferencaRegistro, em ordem de arquivo),
+              "total_diferencas", "alterados", "incluidos", "removidos", "campos_alterados",
+              "registros_original", "registros_retificado" e "segundos".
+    """
+    inicio = time.perf_counter()
+    contagens = {SITUACAO_ALTERADO: 0, SITUACAO_INCLUIDO: 0, SITUACAO_REMOVIDO: 0}
+    diferencas: list[DiferencaRegistro] = []
+    campos_alterados = 0
+    with _abrir_fluxos(caminho_original, caminho_retificado) as (original, retificado):
+        for diferenca in _diferencas(original, retificado, progresso):
+            contagens[diferenca.situacao] += 1
+            campos_alterados += len(diferenca.campos)
+            if len(diferencas) < limite:
+                diferencas.append(diferenca)
+    return {
+        "diferencas": diferencas,
+        "total_diferencas": sum(contagens.values()),
+        "alterados": contagens[SITUACAO_ALTERADO],
+        "incluidos": contagens[SITUACAO_INCLUIDO],
+        "removidos": contagens[SITUACAO_REMOVIDO],
+        "campos_alterados": campos_alterados,
+        "registros_original": original.registros,
+        "registros_retificado": retificado.registros,
+        "segundos": time.perf_counter() - inicio,
+    }
@@ -0,0 +1,287 @@
+# efd_conciliacao.py
+
+"""
+Conciliação entre os totais do bloco M e os registros de detalhe dos documentos.
+
+Cada conciliação de CONCILIACOES soma as bases dos registros de detalhe (C170, C175, F100),
+agrupadas por uma chave (o CST ou a alíquota), e compara com a soma do campo correspondente
+nos registros de apuração (M105, M210, M610) com a mesma chave:
+
+  - Base de crédito do PIS/Pasep (M105.VL_BC_PIS_TOT) por CST de crédito (50 a 66), somando
+    todas as naturezas do crédito. O M105 é identificado por (NAT_BC_CRED, CST_PIS), mas no
+    leiaute só o F100 informa a NAT_BC_CRED; o C170 não tem o campo, e a natureza das bases
+    dele não pode ser tirada do documento. Por isso a conferência é do total de cada CST, e
+    não de cada par (natureza, CST);
+  - Base da contribuição do PIS/Pasep (M210.VL_BC_CONT) por alíquota, receitas com CST 01/02;
+  - Base da Cofins (M610.VL_BC_CONT) por alíquota, receitas com CST 01/02.
+
+Todas as conciliações são calculadas em uma única passagem pelos registros envolvidos, com
+acumuladores em dicionários (chave -> soma em ponto fixo, ver core.efd_numerico), de forma que o
+custo é linear no tamanho do arquivo. As divergências são ProblemaValidacao (ver
+core.efd_validacao), navegáveis pela interface; quando há um único registro de apuração para
+a chave, a correção (o valor somado dos detalhes) é proposta e pode ser aplicada.
+"""
+import time
+from collections.abc import Callable, Iterator
+
+from .efd_structures import RegistroStore
+from .efd_numerico import ForaDoCaminhoRapido, decodificar, codificar
+from .efd_schema import SCHEMA_EFD
+from .efd_validacao import ProblemaValidacao, GRAVIDADE_AVISO
+
+CSTS_CREDITO = frozenset(str(cst) for cst in (*range(50, 57), *range(60, 67)))
+CSTS_RECEITA_TRIBUTAVEL = frozenset(("01", "02"))
+
+# Cada conciliação: "detalhes" mapeia o tipo de registro de detalhe para os nomes dos campos
+# (CST, valor, chave); "apuracao" é (tipo de registro, campo chave, campo valor).
+CONCILIACOES = [
+    {
+        "nome": "Base de crédito do PIS/Pasep por CST (M105)",
+        "csts": CSTS_CREDITO,
+        # Por CST, sem a NAT_BC_CRED da chave do M105: o C170 não informa a natureza (ver acima)
+        "detalhes": {"C170": ("CST_PIS", "VL_BC_PIS", "CST_PIS"),
+                     "F100": ("CST_PIS", "VL_BC_PIS", "CST_PIS")},
+        "apuracao": ("M105", "CST_PIS", "VL_BC_PIS_TOT"),
+    },
+    {
+        "nome": "Base da contribuição do PIS/Pasep por alíquota (M210)",
+        "csts": CSTS_RECEITA_TRIBUTAVEL,
+        "detalhes": {"C170": ("CST_PIS", "VL_BC_PIS", "ALIQ_PIS"),
+                     "C175": ("CST_PIS", "VL_BC_PIS", "ALIQ_PIS"),
+                     "F100": ("CST_PIS", "VL_BC_PIS", "ALIQ_PIS")},
+        "apuracao": ("M210", "ALIQ_PIS", "VL_BC_CONT"),
+    },
+    {
+        "nome": "Base da contribuição da Cofins por alíquota (M610)",
+        "csts": CSTS_RECEITA_TRIBUTAVEL,
+        "detalhes": {"C170": ("CST_COFINS", "VL_BC_COFINS", "ALIQ_COFINS"),
+                     "C175": ("CST_COFINS", "VL_BC_COFINS", "ALIQ_COFINS"),
+                     "F100": ("CST_COFINS", "VL_BC_COFINS", "ALIQ_COFINS")},
+        "apuracao": ("M610", "ALIQ_COFINS", "VL_BC_CONT"),
+    },
+]
+
+# Correção proposta: (posição do registro, índice do campo, valor novo)
+Correcao = tuple[int, int, str]
+
+class _Grupo:
+    """
+    Acumulador de um grupo (chave): soma exata em ponto fixo, na maior escala vista, e a
+    posição/tipo do primeiro registro. Nos grupos de apuração, guarda também as posições.
+    """
+    __slots__ = ("inteiro", "casas", "primeira_posicao", "primeiro_tipo", "posicoes")
+
+    def __init__(self, posicao: int, tipo: str):
+        self.inteiro = 0
+        self.casas = 0
+        self.primeira_posicao = posicao
+        self.primeiro_tipo = tipo
+        self.posicoes: list[int] = []
+
+    def adicionar(self, valor: tuple[int, int]):
+        inteiro, casas = valor
+        if casas > self.casas:
+            self.inteiro *= 10 ** (casas - self.casas)
+            self.casas = casas
+        self.inteiro += inteiro * 10 ** (self.casas - casas)
+
+    def adicionar_texto(self, texto: str):
+        """
+        Soma um campo numérico. O formato canônico ("1234,56") é lido direto com int(); os
+        demais passam por decodificar, que levanta ForaDoCaminhoRapido para textos inválidos.
+        """
+        parte_inteira, virgula, parte_decimal = texto.partition(",")
+        digitos = parte_inteira + parte_decimal
+        if parte_inteira and digitos.isdecimal() and (parte_decimal or not virgula):
+            self.adicionar((int(digitos), len(parte_decimal)))
+        else:
+            self.adicionar(decodificar(texto))
+
+    def mesclar(self, outro: "_Grupo"):
+        self.adicionar((outro.inteiro, outro.casas))
+        if outro.primeira_posicao < self.primeira_posicao:
+            self.primeira_posicao, self.primeiro_tipo = outro.primeira_posicao, outro.primeiro_tipo
+        self.posicoes.extend(outro.posicoes)
+
+    def formatada(self) -> str:
+        return codificar(self.inteiro, self.casas, 2)
+
+
+class _Acumulador:
+    """
+    Acumuladores de uma conciliação, para os detalhes e para a apuração. Durante a passagem
+    os grupos são indexados pelo texto bruto da chave (sem normalizar registro a registro);
+    _por_chave junta os textos equivalentes (ex: "1,65" e "1,6500") no final.
+    """
+    __slots__ = ("conciliacao", "csts", "detalhes", "apuracao")
+
+    def __init__(self, conciliacao: dict):
+        self.conciliacao = conciliacao
+        self.csts: frozenset[str] = conciliacao["csts"]
+        self.detalhes: dict[str, _Grupo] = {}
+        self.apuracao: dict[str, _Grupo] = {}
+
+
+def _chave(texto: str, campo: str) -> str:
+    """Normaliza a chave de agrupamento: alíquotas com 4 casas ("1,65" == "1,6500"), códigos sem espaços."""
+    if campo.startswith("ALIQ_"):
+        try:
+            return codificar(*decodificar(texto), 4)
+        except ForaDoCaminhoRapido:
+            pass
+    return texto.strip()
+
+def _por_chave(grupos: dict[str, _Grupo], campo_chave: str) -> dict[str, _Grupo]:
+    """Junta os grupos cujos textos de chave são equivalentes."""
+    normalizados: dict[str, _Grupo] = {}
+    for texto, grupo in grupos.items():
+        chave = _chave(texto, campo_chave)
+        existente = normalizados.get(chave)
+        if existente is None:
+            normalizados[chave] = grupo
+        else:
+            existente.mesclar(grupo)
+    return normalizados
+
+def _indices(tipo: str, *nomes: str) -> tuple[int, ...]:
+    indices = SCHEMA_EFD[tipo].indices
+    return tuple(indices[nome] for nome in nomes)
+
+def _compilar(acumuladores: list[_Acumulador]) -> dict[str, list[tuple]]:
+    """Tipo de registro -> lista de (acumulador, é detalhe, índices dos campos, maior índice)."""
+    por_tipo: dict[str, list[tuple]] = {}
+    for acumulador in acumuladores:
+        conciliacao = acumulador.conciliacao
+        for tipo, (campo_cst, campo_valor, campo_chave) in conciliacao["detalhes"].items():
+            indices = _indices(tipo, campo_cst, campo_valor, campo_chave)
+            por_tipo.setdefault(tipo, []).append((acumulador, True, indices, max(indices)))
+        tipo, campo_chave, campo_valor = conciliacao["apuracao"]
+        indices = _indices(tipo, campo_chave, campo_valor)
+        por_tipo.setdefault(tipo, []).append((acumulador, False, indices, max(indices)))
+    return por_tipo
+
+def _registros_envolvidos(registros, tipos: set[str]) -> Iterator[tuple[int, str, list[str]]]:
+    """
+    (posição, tipo, campos) dos registros dos tipos pedidos. As somas não dependem da ordem:
+    com o índice, os registros são lidos tipo a tipo, sem passar pelos demais registros.
+    """
+    if isinstance(registros, RegistroStore) and registros.indice is not None:
+        for tipo in tipos:
+            for posicao in registros.indice.posicoes(tipo):
+                yield posicao, tipo, registros.campos(posicao)
+    else:
+        for posicao, registro in enumerate(registros):
+            if registro.tipo_registro in tipos:
+                yield posicao, registro.tipo_registro, registro.campos
+
+
+def conciliar_bloco_m(registros, corrigir: bool = False, conciliacoes: list[dict] | None = None,
+                      progresso: Callable[[int, int], None] | None = None) -> dict:
+    """
+    Compara os totais do bloco M com as somas dos registros de detalhe, em uma passagem.
+
+    Args:
+        registros: O RegistroStore carregado (usa o índice por tipo) ou uma lista de RegistroEFD.
+        corrigir (bool): Se True, aplica as correções propostas (com definir_campo).
+        conciliacoes (list[dict] | None): Conciliações a executar (padrão: CONCILIACOES).
+        progresso: Callback opcional chamado com (0, registros lidos) a cada 65536 registros;
+                   pode levantar OperacaoCancelada para interromper.
+
+    Returns:
+        dict: Relatório com:
+            "divergencias": lista de ProblemaValidacao, uma por chave divergente, apontando
+                            para o registro de apuração (ou o primeiro detalhe, se ele não existir);
+            "correcoes": lista de (posição, índice do campo, valor novo) propostas;
+            "corrigidos": quantidade de correções aplicadas (0 se corrigir=False);
+            "valores_invalidos": avisos (ProblemaValidacao) de valores/alíquotas não numéricos ignorados;
+            "registros": quantidade de registros de detalhe e de apuração lidos;
+            "segundos": tempo total de execução.
+    """
+    inicio = time.perf_counter()
+    acumuladores = [_Acumulador(conciliacao) for conciliacao in (conciliacoes or CONCILIACOES)]
+    por_tipo = _compilar(acumuladores)
+    valores_invalidos: list[ProblemaValidacao] = []
+
+    lidos = 0
+    for posicao, tipo, campos in _registros_envolvidos(registros, set(por_tipo)):
+        lidos += 1
+        if progresso is not None and lidos % 65536 == 0:
+            progresso(0, lidos)
+        for acumulador, e_detalhe, indices, indice_maximo in por_tipo[tipo]:
+            if indice_maximo >= len(campos):
+                continue # Registro truncado: a validação de leiaute aponta
+            if e_detalhe:
+                indice_cst, indice_valor, indice_chave = indices
+                if campos[indice_cst] not in acumulador.csts:
+                    continue
+                grupos = acumulador.detalhes
+            else:
+                indice_chave, indice_valor = indices
+                grupos = acumulador.apuracao
+            grupo = grupos.get(campos[indice_chave])
+            if grupo is None:
+                grupo = grupos[campos[indice_chave]] = _Grupo(posicao, tipo)
+            if not e_detalhe:
+                grupo.posicoes.append(posicao)
+            texto_valor = campos[indice_valor]
+            if not texto_valor:
+                continue
+            try:
+                grupo.adicionar_texto(texto_valor)
+            except ForaDoCaminhoRapido:
+                valores_invalidos.append(ProblemaValidacao(
+                    posicao, tipo, indice_valor, f"Valor '{texto_valor}' ignorado na conciliação: não é numérico.",
+                    GRAVIDADE_AVISO))
+
+    divergencias: list[ProblemaValidacao] = []
+    correcoes: list[Correcao] = []
+    for acumulador in acumuladores:
+        _comparar(acumulador, divergencias, correcoes)
+    divergencias.sort(key=lambda problema: problema.posicao)
+
+    corrigidos = 0
+    if corrigir:
+        corrigidos = aplicar_correcoes(registros, correcoes)
+
+    return {
+        "divergencias": divergencias,
+        "correcoes": correcoes,
+        "corrigidos": corrigidos,
+        "valores_invalidos": valores_invalidos,
+        "registros": lidos,
+        "segundos": time.perf_counter() - inicio,
+    }
+
+def _comparar(acumulador: _Acumulador, divergencias: list[ProblemaValidacao], correcoes: list[Correcao]):
+    conciliacao = acumulador.conciliacao
+    tipo_apuracao, campo_chave, campo_valor = conciliacao["apuracao"]
+    (indice_valor,) = _indices(tipo_apuracao, campo_valor)
+    detalhes = _por_chave(acumulador.detalhes, campo_chave)
+    apuracao = _por_chave(acumulador.apuracao, campo_chave)
+    for chave in sorted(set(detalhes) | set(apuracao)):
+        grupo_detalhes, grupo_apuracao = detalhes.get(chave), apuracao.get(chave)
+        soma_detalhes = grupo_detalhes.formatada() if grupo_detalhes else codificar(0, 0, 2)
+        soma_apuracao = grupo_apuracao.formatada() if grupo_apuracao else codificar(0, 0, 2)
+        if soma_detalhes == soma_apuracao:
+            continue
+        mensagem = (f"{conciliacao['nome']}, chave {chave}: os documentos somam {soma_detalhes}, "
+                    f"o {tipo_apuracao} informa {soma_apuracao}.")
+        if grupo_apuracao is None:
+            divergencias.append(ProblemaValidacao(grupo_detalhes.primeira_posicao, grupo_detalhes.primeiro_tipo, None,
+                                                  f"{mensagem} Não há registro {tipo_apuracao} para a chave."))
+            continue
+        posicoes = sorted(grupo_apuracao.posicoes)
+        if len(posicoes) == 1:
+            correcoes.append((posicoes[0], indice_valor, soma_detalhes))
+        else:
+            mensagem += f" Há {len(posicoes)} registros {tipo_apuracao} para a chave; correção manual."
+        divergencias.append(ProblemaValidacao(posicoes[0], tipo_apuracao, indice_valor, mensagem))
+
+def aplicar_correcoes(registros, correcoes: list[Correcao]) -> int:
+    """Aplica as correções propostas por conciliar_bloco_m. Retorna quantas alteraram um campo."""
+    aplicadas = 0
+    for posicao, indice, valor in correcoes:
+        registro = registros[posicao]
+        if registro.obter_campo(indice) != valor and registro.definir_campo(indice, valor):
+            aplicadas += 1
+    return aplicadas
@@ -0,0 +1,229 @@
+# efd_dependencias.py
+
+"""
+Propagação incremental das regras de automação pelas dependências entre campos.
+
+Cada regra de 'regras_disponiveis' declara os campos que lê ("le") e os que escreve
+("escreve"): pelo nome, para campos do próprio registro ("VL_BC_CONT"), ou como
+"TIPO.CAMPO" para campos de outros registros ("M210.VL_CONT_PER"). GrafoDependencias
+compila essas declarações uma única vez em:
+  - dependentes: (tipo, índice do campo) -> regras que leem o campo;
+  - uma ordem topológica das regras (quem escreve um campo roda antes de quem o lê).
+
+O PropagadorRegras observa as alterações de um RegistroStore. Dentro de um bloco
+'with propagador.propagando():' ele anota os campos alterados e, ao sair do bloco,
+reexecuta só as regras que dependem deles e só nos registros afetados:
+  - o próprio registro alterado, quando a regra é do mesmo tipo (ex: M210 -> M210);
+  - senão, o ancestral do tipo da regra (ex: o M200 de um M210) ou, se não houver
+    ancestral, os registros daquele tipo, localizados pelo índice (ex: 1100 -> M200).
+As alterações feitas pelas regras propagam em cascata, na ordem topológica, e cada par
+(regra, registro) roda no máximo uma vez por bloco: uma regra em lote sobre 100 mil M210
+recalcula o M200 uma única vez, ao final. Os registros de uma mesma regra são recalculados
+juntos, pela "funcao_lote" da regra quando ela existir.
+
+Só as regras com "propagar": True são reexecutadas (cálculos derivados, como totais e
+saldos). Regras que representam uma escolha do analista (ex: uso do crédito no M100) não
+rodam sozinhas, mas o que elas escrevem propaga normalmente.
+
+Alterações feitas fora de um bloco propagando() não são propagadas. É o caso de
+desfazer/refazer e da reaplicação do jornal: o passo guardado no jornal já contém os
+valores derivados, e recalculá-los mudaria o que está sendo restaurado.
+"""
+import heapq
+import time
+from contextlib import contextmanager
+
+from .efd_schema import SCHEMA_EFD
+from .efd_structures import RegistroStore
+from .efd_record_automations import regras_disponiveis, coletando_mensagens
+from .efd_instrumentacao import cronometrado, contar
+
+# Campo de um tipo de registro: (tipo_registro, índice do campo)
+CampoTipo = tuple[str, int]
+
+def _resolver_campo(referencia: str, tipo_padrao: str) -> CampoTipo:
+    """Converte "CAMPO" (do tipo padrão) ou "TIPO.CAMPO" em (tipo, índice). Levanta ValueError se não existir."""
+    tipo_registro, separador, nome = referencia.partition('.')
+    if not separador:
+        tipo_registro, nome = tipo_padrao, referencia
+    schema = SCHEMA_EFD.get(tipo_registro)
+    if schema is None or nome not in schema.indices:
+        raise ValueError(f"Campo '{referencia}' desconhecido na declaração de uma regra do registro {tipo_padrao}")
+    return tipo_registro, schema.indices[nome]
+
+
+class GrafoDependencias:
+    """
+    Grafo (campo -> regras que o leem) das regras com "propagar": True, com as regras em
+    ordem topológica. Levanta ValueError para campos desconhecidos ou dependências circulares.
+    """
+
+    def __init__(self, regras: list[dict]):
+        propagaveis = [regra for regra in regras if regra.get("propagar")]
+        leituras = [{_resolver_campo(ref, regra["tipo_registro"]) for ref in regra.get("le", ())} for regra in propagaveis]
+        escritas = [{_resolver_campo(ref, regra["tipo_registro"]) for ref in regra.get("escreve", ())} for regra in propagaveis]
+
+        # Aresta a -> b quando 'a' escreve um campo que 'b' lê (uma regra não depende de si mesma)
+        sucessores: list[list[int]] = [[] for _ in propagaveis]
+        entradas = [0] * len(propagaveis)
+        for a, escritos in enumerate(escritas):
+            for b, lidos in enumerate(leituras):
+                if a != b and escritos & lidos:
+                    sucessores[a].append(b)
+                    entradas[b] += 1
+
+        # Ordem topológica (Kahn), mantendo a ordem de declaração entre regras independentes
+        prontas = [i for i, total in enumerate(entradas) if total == 0]
+        heapq.heapify(prontas)
+        ordem: list[int] = []
+        while prontas:
+            atual = heapq.heappop(prontas)
+            ordem.append(atual)
+            for seguinte in sucessores[atual]:
+                entradas[seguinte] -= 1
+                if entradas[seguinte] == 0:
+                    heapq.heappush(prontas, seguinte)
+        if len(ordem) != len(propagaveis):
+            em_ciclo = [propagaveis[i]["nome_exibicao"] for i, total in enumerate(entradas) if total > 0]
+            raise ValueError(f"Dependência circular entre as regras: {', '.join(em_ciclo)}")
+
+        self.regras: list[dict] = [propagaveis[i] for i in ordem]
+        self.dependentes: dict[CampoTipo, list[int]] = {} # Campo -> posições em self.regras
+        for posicao_ordem, i in enumerate(ordem):
+            for campo in sorted(leituras[i]):
+                self.dependentes.setdefault(campo, []).append(posicao_ordem)
+
+    def __repr__(self) -> str:
+        return f"GrafoDependencias(regras={len(self.regras)}, campos={len(self.dependentes)})"
+
+    def regras_que_leem(self, tipo_registro: str, indice: int) -> list[dict]:
+        """Regras propagáveis que leem o campo, na ordem em que seriam executadas."""
+        return [self.regras[i] for i in self.dependentes.get((tipo_registro, indice), ())]
+
+
+GRAFO_EFD = GrafoDependencias([regra for regras_do_tipo in regras_disponiveis.values() for regra in regras_do_tipo])
+
+
+class PropagadorRegras:
+    """
+    Reexecuta as regras dependentes das alterações feitas em um RegistroStore dentro de
+    um bloco propagando(). Anexe-o ao store depois do jornal de edições, de forma que as
+    alterações propagadas entram no mesmo passo de desfazer quando o bloco está dentro de
+    JornalEdicoes.agrupar().
+    """
+
+    def __init__(self, grafo: GrafoDependencias | None = None):
+        self.grafo = grafo if grafo is not None else GRAFO_EFD
+        self._store: RegistroStore | None = None
+        self._profundidade = 0
+        self._pendentes: list[tuple[int, int]] = [] # (posição, índice do campo) alterados no bloco
+
+    def __repr__(self) -> str:
+        return f"PropagadorRegras(grafo={self.grafo!r}, ativo={self._profundidade > 0})"
+
+    # --- Ligação com o store ---
+
+    def anexar(self, store: RegistroStore):
+        """Passa a observar as alterações de 'store' (desanexa do store anterior)."""
+        self.desanexar()
+        self._store = store
+        store.ouvintes.append(self._observar)
+
+    def desanexar(self):
+        if self._store is not None and self._observar in self._store.ouvintes:
+            self._store.ouvintes.remove(self._observar)
+        self._store = None
+
+    def _observar(self, posicao: int, indice: int, valor_antigo: str, valor_novo: str):
+        if self._profundidade:
+            self._pendentes.append((posicao, indice))
+
+    # --- Propagação ---
+
+    @contextmanager
+    def propagando(self):
+        """
+        Anota os campos alterados dentro do bloco 'with' e, ao final, recalcula o que depende
+        deles. Produz o relatório da propagação, preenchido na saída do bloco:
+            "recalculos": execuções de regra;
+            "alterados": posição -> lista ordenada dos índices alterados pela propagação;
+            "erros": lista de (posição, nome da regra, mensagem) das execuções que retornaram None;
+            "segundos": tempo da propagação.
+        Blocos aninhados propagam junto com o mais externo (o relatório deles fica vazio).
+        Se o bloco terminar com exceção, nada é propagado.
+        """
+        relatorio = {"recalculos": 0, "alterados": {}, "erros": [], "segundos": 0.0}
+        self._profundidade += 1
+        try:
+            yield relatorio
+            if self._profundidade == 1:
+                self._propagar(relatorio)
+        finally:
+            self._profundidade -= 1
+            if not self._profundidade:
+                self._pendentes = []
+
+    def _alvos(self, tipo_regra: str, tipo_origem: str, posicao: int):
+        """Registros em que uma regra de 'tipo_regra' deve rodar após a alteração em 'posicao'."""
+        if tipo_regra == tipo_origem:
+            return (posicao,)
+        indice = self._store.indice
+        if indice is None:
+            return [pos for pos in range(len(self._store)) if self._store.tipo_registro(pos) == tipo_regra]
+        ancestral = indice.ancestral(posicao, tipo_regra)
+        return (ancestral,) if ancestral != -1 else indice.posicoes(tipo_regra)
+
+    @cronometrado("propagar regras", "regras")
+    def _propagar(self, relatorio: dict):
+        store = self._store
+        if store is None or not self._pendentes:
+            return
+        inicio = time.perf_counter()
+        regras = self.grafo.regras
+        dependentes = self.grafo.dependentes
+        alterados: dict[int, list[int]] = relatorio["alterados"]
+        originais = len(self._pendentes) # Os demais pendentes são alterações feitas pela propagação
+        processados = 0
+        fila: list[tuple[int, int]] = [] # (posição da regra na ordem topológica, posição do registro)
+        agendados: set[tuple[int, int]] = set()
+
+        with coletando_mensagens([]) as mensagens:
+            while True:
+                # _observar continua anotando enquanto as regras rodam, então a lista cresce aqui
+                while processados < len(self._pendentes):
+                    posicao, indice = self._pendentes[processados]
+                    if processados >= originais:
+                        campos_do_registro = alterados.setdefault(posicao, [])
+                        if indice not in campos_do_registro:
+                            campos_do_registro.append(indice)
+                    processados += 1
+                    tipo_origem = store.tipo_registro(posicao)
+                    for ordem_regra in dependentes.get((tipo_origem, indice), ()):
+                        for alvo in self._alvos(regras[ordem_regra]["tipo_registro"], tipo_origem, posicao):
+                            chave = (ordem_regra, alvo)
+                            if chave not in agendados:
+                                agendados.add(chave)
+                                heapq.heappush(fila, chave)
+                if not fila:
+                    break
+                # Regras só alimentam regras posteriores na ordem, então todos os registros de uma
+                # regra já estão na fila quando ela chega ao topo: roda de uma vez (em lote, se houver)
+                ordem_regra = fila[0][0]
+                posicoes = []
+                while fila and fila[0][0] == ordem_regra:
+                    posicoes.append(heapq.heappop(fila)[1])
+                regra = regras[ordem_regra]
+                funcao_lote = regra.get("funcao_lote")
+                resultados_lote = funcao_lote(store, posicoes) if funcao_lote and len(posicoes) > 1 else [None] * len(posicoes)
+                for alvo, resultado in zip(posicoes, resultados_lote):
+                    if resultado is None:
+                        mensagens.clear()
+                        resultado = regra["funcao"](store[alvo], store)
+                    relatorio["recalculos"] += 1
+                    if resultado is None:
+                        relatorio["erros"].append((alvo, regra["nome_exibicao"], " ".join(mensagens)))
+
+        for campos_do_registro in alterados.values():
+            campos_do_registro.sort()
+        relatorio["segundos"] = time.perf_counter() - inicio
+        contar("regras.recalculos", relatorio["recalculos"])
@@ -6,6 +6,10 @@ Mapeia: TipoDeRegistro -> IndiceDoCampo -> {"nome": "NOME_CAMPO", "descr": "Desc
 
 Onde "IndiceDoCampo" é o índice na lista de campos (0-based) após o split da linha.
 O campo de índice 0 é sempre o próprio tipo do registro.
+
+Chaves opcionais por campo: "tipo" (N, D, P ou C) e "casas" (casas decimais), para os campos
+que fogem da convenção de nomes usada por core.efd_schema (ex: VL_ -> numérico com 2 casas),
+e "obrigatorio" (True para os campos de preenchimento obrigatório, conferidos por core.efd_validacao).
 """
 
 # 0: {"nome": "", "descr": ""}
@@ -14,29 +18,29 @@ efd_layout = {
     # --- Bloco 0 ---
     "0000": {
         0: {"nome": "REG", "descr": "Identificador do Registro"},
-        1: {"nome": "COD_VER", "descr": "Código da versão do leiaute"},
-        2: {"nome": "TIPO_ESCRIT", "descr": "Tipo de escrituração (0-Original; 1-Retificadora)"},
+        1: {"nome": "COD_VER", "descr": "Código da versão do leiaute", "obrigatorio": True},
+        2: {"nome": "TIPO_ESCRIT", "descr": "Tipo de escrituração (0-Original; 1-Retificadora)", "obrigatorio": True},
         3: {"nome": "IND_SIT_ESP", "descr": "Indicador de situação especial"},
         4: {"nome": "NUM_REC_ANTERIOR", "descr": "Número do recibo da escrituração anterior a ser retificada"},
-        5: {"nome": "DT_INI", "descr": "Data de início do período da escrituração (DDMMAAAA)"},
-        6: {"nome": "DT_FIN", "descr": "Data de fim do período da escrituração (DDMMAAAA)"},
-        7: {"nome": "NOME", "descr": "Nome empresarial da pessoa jurídica"},
-        8: {"nome": "CNPJ", "descr": "CNPJ da pessoa jurídica"},
-        9: {"nome": "UF", "descr": "Unidade Federativa da pessoa jurídica"},
-        10: {"nome": "COD_MUN", "descr": "Código do município do domicílio fiscal (Tabela IBGE)"},
+        5: {"nome": "DT_INI", "descr": "Data de início do período da escrituração (DDMMAAAA)", "obrigatorio": True},
+        6: {"nome": "DT_FIN", "descr": "Data de fim do período da escrituração (DDMMAAAA)", "obrigatorio": True},
+        7: {"nome": "NOME", "descr": "Nome empresarial da pessoa jurídica", "obrigatorio": True},
+        8: {"nome": "CNPJ", "descr": "CNPJ da pessoa jurídica", "obrigatorio": True},
+        9: {"nome": "UF", "descr": "Unidade Federativa da pessoa jurídica", "obrigatorio": True},
+        10: {"nome": "COD_MUN", "descr": "Código do município do domicílio fiscal (Tabela IBGE)", "obrigatorio": True},
         11: {"nome": "SUFRAMA", "descr": "Inscrição na Suframa"},
         12: {"nome": "IND_NAT_PJ", "descr": "Indicador da natureza da pessoa jurídica"},
         13: {"nome": "IND_ATIV", "descr": "Indicador do tipo de atividade preponderante"},
     },
     "0001": {
         0: {"nome": "REG", "descr": "Identificador do Registro"},
-        1: {"nome": "IND_MOV", "descr": "Indicador de movimento (0-Bloco com dados; 1-Bloco sem dados)"},
+        1: {"nome": "IND_MOV", "descr": "Indicador de movimento (0-Bloco com dados; 1-Bloco sem dados)", "obrigatorio": True},
     },
     "0100": {
         0: {"nome": "REG", "descr": "Identificador do Registro."},
-        1: {"nome": "NOME", "descr": "Nome do Contabilista."},
-        2: {"nome": "CPF", "descr": "Número de Inscrição do Contabilista no CPF."},
-        3: {"nome": "CRC", "descr": "Número de Inscrição do Contabilista no Conselho Regional de Contabilidade."},
+        1: {"nome": "NOME", "descr": "Nome do Contabilista.", "obrigatorio": True},
+        2: {"nome": "CPF", "descr": "Número de Inscrição do Contabilista no CPF.", "obrigatorio": True},
+        3: {"nome": "CRC", "descr": "Número de Inscrição do Contabilista no Conselho Regional de Contabilidade.", "obrigatorio": True},
         4: {"nome": "CNPJ", "descr": "Número de Inscrição do Escritório de Contabilidade no CNPJ."},
         5: {"nome": "CEP", "descr": "Código de Endereçamento Postal."},
         6: {"nome": "END", "descr": "Logradouro e Endereço do Imóvel."},
@@ -50,7 +54,7 @@ efd_layout = {
     },
     "0110": { # Regime de Apuração da Contribuição
         0: {"nome": "REG", "descr": "Identificação do Registro."},
-        1: {"nome": "COD_INC_TRIB", "descr": "Indicador do regime de incidência (1-Não Cumulativo; 2-Cumulativo; 3-Ambos)"},
+        1: {"nome": "COD_INC_TRIB", "descr": "Indicador do regime de incidência (1-Não Cumulativo; 2-Cumulativo; 3-Ambos)", "obrigatorio": True},
         2: {"nome": "IND_APRO_CRED", "descr": "Código indicador de método de apropriação de c´reditos comuns, no caso de incidência no regime não-culumativo (COD_INC_TRIB = 1 OU 3): 1 - Método de Apropriação Direta; 2 - Método de Rateio Proporcional (Receita Bruta)."},
         3: {"nome": "COD_TIPO_CONT", "descr": "Código indicador do Tipo de Contribuição Apurada no Período: 1 - Apuração da Contribuição Exclusivamente a Alíquota Básica; 2 - Apuração da Contribuição a Aliquotas Específicas (Diferenciadas e/ou por Unidade de Medida de Produto)."},
         4: {"nome": "IND_REG_CUM", "descr": "Código indicador do critério de escrituração e apuração adotado, no caos de incidência exclusivamente no regime cumulativo (COD_INC_TRIB = 2), pela pessoa jurídica: 1 - Regime de Caixa - Escrituração consolidada (Registro F500); 2 - Regime de Competência - Escrituração consolidada (Registro F550); 9 - Regime de Competência - Escrituração detalhada, com base nos registros dos blocos A, C, D e F."},
@@ -58,19 +62,19 @@ efd_layout = {
     "0140": {
         0: {"nome": "REG", "descr": "Identificador do Registro."},
         1: {"nome": "COD_EST", "descr": "Código de Identificação do Estabelecimento."},
-        2: {"nome": "NOME", "descr": "Nome Empresarial do Estabelecimento."},
-        3: {"nome": "CNPJ", "descr": "Número de Inscrição do Estabelecimento no CNPJ."},
-        4: {"nome": "UF", "descr": "Sigla da Unidade da Federação do Estabelecimento."},
+        2: {"nome": "NOME", "descr": "Nome Empresarial do Estabelecimento.", "obrigatorio": True},
+        3: {"nome": "CNPJ", "descr": "Número de Inscrição do Estabelecimento no CNPJ.", "obrigatorio": True},
+        4: {"nome": "UF", "descr": "Sigla da Unidade da Federação do Estabelecimento.", "obrigatorio": True},
         5: {"nome": "IE", "descr": "Inscrição Estadual do Estabelecimento, se contribuinte de ICMS."},
-        6: {"nome": "COD_MUN", "descr": "Código do Município do Domicílio Fiscal do Estabelecimento, conforme a tabela IBGE."},
+        6: {"nome": "COD_MUN", "descr": "Código do Município do Domicílio Fiscal do Estabelecimento, conforme a tabela IBGE.", "obrigatorio": True},
         7: {"nome": "IM", "descr": "Inscrição Municipal do Estabelecmento, se contribuinte do ISS."},
         8: {"nome": "SUFRAMA", "descr": "Inscrição do Estabelecimento na Suframa."},
     },
     "0150": {
         0: {"nome": "REG", "descr": "Identificador do Registro"},
-        1: {"nome": "COD_PART", "descr": "Código de Identificação do Participante no Arquivo."},
-        2: {"nome": "NOME", "descr": "Nome Pessoal ou Empresarial do Participante."},
-        3: {"nome": "COD_PAIS", "descr": "Código do País do Participante."},
+        1: {"nome": "COD_PART", "descr": "Código de Identificação do Participante no Arquivo.", "obrigatorio": True},
+        2: {"nome": "NOME", "descr": "Nome Pessoal ou Empresarial do Participante.", "obrigatorio": True},
+        3: {"nome": "COD_PAIS", "descr": "Código do País do Participante.", "obrigatorio": True},
         4: {"nome": "CNPJ", "descr": "CNPJ do Participante."},
         5: {"nome": "CPF", "descr": "CPF do Participante."},
         6: {"nome": "IE", "descr": "Inscrição Estadual do Participante"},
@@ -81,114 +85,237 @@ efd_layout = {
         11: {"nome": "COMPL", "descr": "Dados Complementares do Endereço."},
         12: {"nome": "BAIRRO", "descr": "Bairro em que o imóvel está situado."},
     },
+    "0200": { # Tabela de Identificação do Item (Produtos e Serviços)
+        0: {"nome": "REG", "descr": "Identificador do Registro"},
+        1: {"nome": "COD_ITEM", "descr": "Código do item", "obrigatorio": True},
+        2: {"nome": "DESCR_ITEM", "descr": "Descrição do item", "obrigatorio": True},
+        3: {"nome": "COD_BARRA", "descr": "Representação alfanumérico do código de barra do produto, se houver"},
+        4: {"nome": "COD_ANT_ITEM", "descr": "Código anterior do item com relação à última informação apresentada"},
+        5: {"nome": "UNID_INV", "descr": "Unidade de medida utilizada na quantificação de estoques"},
+        6: {"nome": "TIPO_ITEM", "descr": "Tipo do item – Atividades Industriais, Comerciais e Serviços (00 – Mercadoria para Revenda; 01 – Matéria-Prima; ...; 99 – Outras)", "obrigatorio": True},
+        7: {"nome": "COD_NCM", "descr": "Código da Nomenclatura Comum do Mercosul"},
+        8: {"nome": "EX_IPI", "descr": "Código EX, conforme a TIPI"},
+        9: {"nome": "COD_GEN", "descr": "Código do gênero do item, conforme a Tabela 4.2.1"},
+        10: {"nome": "COD_LST", "descr": "Código do serviço conforme lista do Anexo I da Lei Complementar nº 116/2003"},
+        11: {"nome": "ALIQ_ICMS", "descr": "Alíquota de ICMS aplicável ao item nas operações internas", "casas": 2},
+    },
+    # --- Bloco C ---
+    "C170": { # Complemento do Documento - Itens do Documento (Código 01, 1B, 04 e 55)
+        0: {"nome": "REG", "descr": "Identificador do Registro"},
+        1: {"nome": "NUM_ITEM", "descr": "Número sequencial do item no documento fiscal", "obrigatorio": True},
+        2: {"nome": "COD_ITEM", "descr": "Código do item (campo 02 do Registro 0200)", "obrigatorio": True},
+        3: {"nome": "DESCR_COMPL", "descr": "Descrição complementar do item como adotado no documento fiscal"},
+        4: {"nome": "QTD", "descr": "Quantidade do item", "tipo": "N", "casas": 5},
+        5: {"nome": "UNID", "descr": "Unidade do item (campo 02 do Registro 0190)"},
+        6: {"nome": "VL_ITEM", "descr": "Valor total do item (mercadorias ou serviços)", "obrigatorio": True},
+        7: {"nome": "VL_DESC", "descr": "Valor do desconto comercial / exclusão da base de cálculo do PIS/Pasep e da Cofins"},
+        8: {"nome": "IND_MOV", "descr": "Movimentação física do item/produto (0-Sim; 1-Não)"},
+        9: {"nome": "CST_ICMS", "descr": "Código da Situação Tributária referente ao ICMS"},
+        10: {"nome": "CFOP", "descr": "Código Fiscal de Operação e Prestação"},
+        11: {"nome": "COD_NAT", "descr": "Código da natureza da operação (campo 02 do Registro 0400)"},
+        12: {"nome": "VL_BC_ICMS", "descr": "Valor da base de cálculo do ICMS"},
+        13: {"nome": "ALIQ_ICMS", "descr": "Alíquota do ICMS", "casas": 2},
+        14: {"nome": "VL_ICMS", "descr": "Valor do ICMS creditado/debitado"},
+        15: {"nome": "VL_BC_ICMS_ST", "descr": "Valor da base de cálculo referente à substituição tributária"},
+        16: {"nome": "ALIQ_ST", "descr": "Alíquota do ICMS da substituição tributária na unidade da federação de destino", "casas": 2},
+        17: {"nome": "VL_ICMS_ST", "descr": "Valor do ICMS referente à substituição tributária"},
+        18: {"nome": "IND_APUR", "descr": "Indicador de período de apuração do IPI (0-Mensal; 1-Decendial)"},
+        19: {"nome": "CST_IPI", "descr": "Código da Situação Tributária referente ao IPI"},
+        20: {"nome": "COD_ENQ", "descr": "Código de enquadramento legal do IPI"},
+        21: {"nome": "VL_BC_IPI", "descr": "Valor da base de cálculo do IPI"},
+        22: {"nome": "ALIQ_IPI", "descr": "Alíquota do IPI", "casas": 2},
+        23: {"nome": "VL_IPI", "descr": "Valor do IPI creditado/debitado"},
+        24: {"nome": "CST_PIS", "descr": "Código da Situação Tributária referente ao PIS/Pasep", "obrigatorio": True},
+        25: {"nome": "VL_BC_PIS", "descr": "Valor da base de cálculo do PIS/Pasep"},
+        26: {"nome": "ALIQ_PIS", "descr": "Alíquota do PIS/Pasep (em percentual)"},
+        27: {"nome": "QUANT_BC_PIS", "descr": "Quantidade - Base de cálculo PIS/Pasep"},
+        28: {"nome": "ALIQ_PIS_QUANT", "descr": "Alíquota do PIS/Pasep (em reais)"},
+        29: {"nome": "VL_PIS", "descr": "Valor do PIS/Pasep"},
+        30: {"nome": "CST_COFINS", "descr": "Código da Situação Tributária referente à Cofins", "obrigatorio": True},
+        31: {"nome": "VL_BC_COFINS", "descr": "Valor da base de cálculo da Cofins"},
+        32: {"nome": "ALIQ_COFINS", "descr": "Alíquota da Cofins (em percentual)"},
+        33: {"nome": "QUANT_BC_COFINS", "descr": "Quantidade - Base de cálculo da Cofins"},
+        34: {"nome": "ALIQ_COFINS_QUANT", "descr": "Alíquota da Cofins (em reais)"},
+        35: {"nome": "VL_COFINS", "descr": "Valor da Cofins"},
+        36: {"nome": "COD_CTA", "descr": "Código da conta analítica contábil debitada/creditada"},
+    },
+    "C175": { # Registro Analítico do Documento (Código 65)
+        0: {"nome": "REG", "descr": "Identificador do Registro"},
+        1: {"nome": "CFOP", "descr": "Código Fiscal de Operação e Prestação", "obrigatorio": True},
+        2: {"nome": "VL_OPR", "descr": "Valor da operação na combinação de CFOP, CST e alíquotas", "obrigatorio": True},
+        3: {"nome": "VL_DESC", "descr": "Valor do desconto comercial / exclusão"},
+        4: {"nome": "CST_PIS", "descr": "Código da Situação Tributária referente ao PIS/Pasep", "obrigatorio": True},
+        5: {"nome": "VL_BC_PIS", "descr": "Valor da base de cálculo do PIS/Pasep"},
+        6: {"nome": "ALIQ_PIS", "descr": "Alíquota do PIS/Pasep (em percentual)"},
+        7: {"nome": "QUANT_BC_PIS", "descr": "Quantidade - Base de cálculo PIS/Pasep"},
+        8: {"nome": "ALIQ_PIS_QUANT", "descr": "Alíquota do PIS/Pasep (em reais)"},
+        9: {"nome": "VL_PIS", "descr": "Valor do PIS/Pasep"},
+        10: {"nome": "CST_COFINS", "descr": "Código da Situação Tributária referente à Cofins", "obrigatorio": True},
+        11: {"nome": "VL_BC_COFINS", "descr": "Valor da base de cálculo da Cofins"},
+        12: {"nome": "ALIQ_COFINS", "descr": "Alíquota da Cofins (em percentual)"},
+        13: {"nome": "QUANT_BC_COFINS", "descr": "Quantidade - Base de cálculo da Cofins"},
+        14: {"nome": "ALIQ_COFINS_QUANT", "descr": "Alíquota da Cofins (em reais)"},
+        15: {"nome": "VL_COFINS", "descr": "Valor da Cofins"},
+        16: {"nome": "COD_CTA", "descr": "Código da conta analítica contábil debitada/creditada"},
+        17: {"nome": "INFO_COMPL", "descr": "Informação complementar"},
+    },
+    # --- Bloco F ---
+    "F100": { # Demais Documentos e Operações Geradoras de Contribuição e Créditos
+        0: {"nome": "REG", "descr": "Identificador do Registro"},
+        1: {"nome": "IND_OPER", "descr": "Indicador do tipo da operação (0-Aquisição com direito a crédito; 1-Receita auferida sujeita ao pagamento da contribuição; 2-Receita não sujeita ao pagamento da contribuição)", "obrigatorio": True},
+        2: {"nome": "COD_PART", "descr": "Código do participante (campo 02 do Registro 0150)"},
+        3: {"nome": "COD_ITEM", "descr": "Código do item (campo 02 do Registro 0200)"},
+        4: {"nome": "DT_OPER", "descr": "Data da operação (DDMMAAAA)", "obrigatorio": True},
+        5: {"nome": "VL_OPER", "descr": "Valor da operação/item", "obrigatorio": True},
+        6: {"nome": "CST_PIS", "descr": "Código da Situação Tributária referente ao PIS/Pasep", "obrigatorio": True},
+        7: {"nome": "VL_BC_PIS", "descr": "Valor da base de cálculo do PIS/Pasep"},
+        8: {"nome": "ALIQ_PIS", "descr": "Alíquota do PIS/Pasep (em percentual)"},
+        9: {"nome": "VL_PIS", "descr": "Valor do PIS/Pasep"},
+        10: {"nome": "CST_COFINS", "descr": "Código da Situação Tributária referente à Cofins", "obrigatorio": True},
+        11: {"nome": "VL_BC_COFINS", "descr": "Valor da base de cálculo da Cofins"},
+        12: {"nome": "ALIQ_COFINS", "descr": "Alíquota da Cofins (em percentual)"},
+        13: {"nome": "VL_COFINS", "descr": "Valor da Cofins"},
+        14: {"nome": "NAT_BC_CRED", "descr": "Código da base de cálculo do crédito (Tabela 4.3.7)"},
+        15: {"nome": "IND_ORIG_CRED", "descr": "Indicador da origem do crédito (0-Operação no mercado interno; 1-Operação de importação)"},
+        16: {"nome": "COD_CTA", "descr": "Código da conta analítica contábil debitada/creditada"},
+        17: {"nome": "COD_CCUS", "descr": "Código do centro de custos"},
+        18: {"nome": "DESC_DOC_OPER", "descr": "Descrição do documento/operação"},
+    },
     # --- Bloco M ---
     "M001": {
         0: {"nome": "REG", "descr": "Identificador do Registro"},
-        1: {"nome": "IND_MOV", "descr": "Indicador de movimento (0-Bloco com dados; 1-Bloco sem dados)"},
+        1: {"nome": "IND_MOV", "descr": "Indicador de movimento (0-Bloco com dados; 1-Bloco sem dados)", "obrigatorio": True},
     },
     "M100": {
         0: {"nome": "REG", "descr": "Identificador do Registro"},
-        1: {"nome": "COD_CRED", "descr": "Código de Tipo de Crédito apurado no período"},
-        2: {"nome": "IND_CRED_ORI", "descr": "Indicador de Crédito Oriundo (0 – Operações próprias, 1 – Evento de incorporação, cisão ou fusão.)"},
+        1: {"nome": "COD_CRED", "descr": "Código de Tipo de Crédito apurado no período", "obrigatorio": True},
+        2: {"nome": "IND_CRED_ORI", "descr": "Indicador de Crédito Oriundo (0 – Operações próprias, 1 – Evento de incorporação, cisão ou fusão.)", "obrigatorio": True},
         3: {"nome": "VL_BC_PIS", "descr": "Valor da Base de Cálculo do Crédito"},
         4: {"nome": "ALIQ_PIS", "descr": "Alíquota do PIS/PASEP (em percentual)"},
         5: {"nome": "QUANT_BC_PIS", "descr": "Quantidade – Base de cálculo PIS"},
         6: {"nome": "ALIQ_PIS_QUANT", "descr": "Alíquota do PIS (em reais)"},
-        7: {"nome": "VL_CRED", "descr": "Valor total do crédito apurado no período"},
-        8: {"nome": "VL_AJUS_ACRES", "descr": "Valor total dos ajustes de acréscimo"},
-        9: {"nome": "VL_AJUS_REDUC", "descr": "Valor total dos ajustes de redução"},
-        10: {"nome": "VL_CRED_DIF", "descr": "Valor total do crédito diferido no período"},
-        11: {"nome": "VL_CRED_DISP", "descr": "Valor Total do Crédito Disponível relativo ao Período (07 + 08 – 09 – 10)"},
-        12: {"nome": "IND_DESC_CRED", "descr": "Indicador de opção de utilização do crédito disponível no período (0 - Uso Total, 1 - Uso Parcial)"},
+        7: {"nome": "VL_CRED", "descr": "Valor total do crédito apurado no período", "obrigatorio": True},
+        8: {"nome": "VL_AJUS_ACRES", "descr": "Valor total dos ajustes de acréscimo", "obrigatorio": True},
+        9: {"nome": "VL_AJUS_REDUC", "descr": "Valor total dos ajustes de redução", "obrigatorio": True},
+        10: {"nome": "VL_CRED_DIF", "descr": "Valor total do crédito diferido no período", "obrigatorio": True},
+        11: {"nome": "VL_CRED_DISP", "descr": "Valor Total do Crédito Disponível relativo ao Período (07 + 08 – 09 – 10)", "obrigatorio": True},
+        12: {"nome": "IND_DESC_CRED", "descr": "Indicador de opção de utilização do crédito disponível no período (0 - Uso Total, 1 - Uso Parcial)", "obrigatorio": True},
         13: {"nome": "VL_CRED_DESC", "descr": "Valor do Crédito disponível, descontado da contribuição apurada no próprio período"},
-        14: {"nome": "SLD_CRED", "descr": "Saldo de créditos a utilizar em períodos futuros (11 – 13)"},
+        14: {"nome": "SLD_CRED", "descr": "Saldo de créditos a utilizar em períodos futuros (11 – 13)", "obrigatorio": True},
+    },
+    "M105": { # Detalhamento da Base de Cálculo do Crédito Apurado no Período - PIS/Pasep
+        0: {"nome": "REG", "descr": "Identificador do Registro"},
+        1: {"nome": "NAT_BC_CRED", "descr": "Código da base de cálculo do crédito apurado no período (Tabela 4.3.7)", "obrigatorio": True},
+        2: {"nome": "CST_PIS", "descr": "Código da Situação Tributária referente ao crédito de PIS/Pasep", "obrigatorio": True},
+        3: {"nome": "VL_BC_PIS_TOT", "descr": "Valor total da base de cálculo escriturada nos documentos e operações (blocos A, C, D e F), referente ao CST_PIS informado", "obrigatorio": True},
+        4: {"nome": "VL_BC_PIS_CUM", "descr": "Parcela do valor total da base de cálculo vinculada a receitas cumulativas"},
+        5: {"nome": "VL_BC_PIS_NC", "descr": "Valor total da base de cálculo do crédito vinculada ao tipo de crédito escriturado em M100"},
+        6: {"nome": "VL_BC_PIS", "descr": "Valor da base de cálculo do crédito vinculada ao tipo de crédito escriturado em M100"},
+        7: {"nome": "QUANT_BC_PIS_TOT", "descr": "Quantidade total da base de cálculo do crédito apurado em unidade de medida de produto"},
+        8: {"nome": "QUANT_BC_PIS", "descr": "Parcela da base de cálculo do crédito em quantidade vinculada ao tipo de crédito escriturado em M100"},
+        9: {"nome": "DESC_CRED", "descr": "Descrição do crédito"},
     },
     "M200": { # Consolidação da Contribuição para o PIS/Pasep do Período
         0: {"nome": "REG", "descr": "Identificador do Registro"},
-        1: {"nome": "VL_TOT_CONT_NC_PER", "descr": "Valor Total da Contribuição Não Cumulativa do Período (recuperado do campo 13 do Registro M210, quando o campo “COD_CONT” = 01, 02, 03, 04, 32 e 71"},
-        2: {"nome": "VL_TOT_CRED_DESC", "descr": "Valor do Crédito Descontado, Apurado no Próprio Período da Escrituração (recuperado do campo 14 do Registro M100)"},
-        3: {"nome": "VL_TOT_CRED_DESC_ANT", "descr": "Valor do Crédito Descontado, Apurado em Período de Apuração Anterior (recuperado do campo 13 do Registro 1100)"},
-        4: {"nome": "VL_TOT_CONT_NC_DEV", "descr": "Valor Total da Contribuição Não Cumulativa Devida (01 – 02 - 03)"},
-        5: {"nome": "VL_RET_NC", "descr": "	Valor Retido na Fonte Deduzido no Período"},
-        6: {"nome": "VL_OUT_DED_NC", "descr": "Outras Deduções no Período"},
-        7: {"nome": "VL_CONT_NC_REC", "descr": "Valor da Contribuição Não Cumulativa a Recolher/Pagar (04 – 05 - 06)"},
-        8: {"nome": "VL_TOT_CONT_CUM_PER", "descr": "Valor Total da Contribuição Cumulativa do Período (recuperado do campo 13 do Registro M210, quando o campo “COD_CONT” = 31, 32, 51, 52, 53, 54 e 72)"},
-        9: {"nome": "VL_RET_CUM", "descr": "Valor Retido na Fonte Deduzido no Período"},
-        10: {"nome": "VL_OUT_DED_CUM", "descr": "Outras Deduções no Período"},
-        11: {"nome": "VL_CONT_CUM_REC", "descr": "Valor da Contribuição Cumulativa a Recolher/Pagar (08 - 09 – 10)"},
-        12: {"nome": "VL_TOT_CONT_REC", "descr": "Valor Total da Contribuição a Recolher/Pagar no Período (07 + 11)"},
+        1: {"nome": "VL_TOT_CONT_NC_PER", "descr": "Valor Total da Contribuição Não Cumulativa do Período (recuperado do campo 13 do Registro M210, quando o campo “COD_CONT” = 01, 02, 03, 04, 32 e 71", "obrigatorio": True},
+        2: {"nome": "VL_TOT_CRED_DESC", "descr": "Valor do Crédito Descontado, Apurado no Próprio Período da Escrituração (recuperado do campo 14 do Registro M100)", "obrigatorio": True},
+        3: {"nome": "VL_TOT_CRED_DESC_ANT", "descr": "Valor do Crédito Descontado, Apurado em Período de Apuração Anterior (recuperado do campo 13 do Registro 1100)", "obrigatorio": True},
+        4: {"nome": "VL_TOT_CONT_NC_DEV", "descr": "Valor Total da Contribuição Não Cumulativa Devida (01 – 02 - 03)", "obrigatorio": True},
+        5: {"nome": "VL_RET_NC", "descr": "	Valor Retido na Fonte Deduzido no Período", "obrigatorio": True},
+        6: {"nome": "VL_OUT_DED_NC", "descr": "Outras Deduções no Período", "obrigatorio": True},
+        7: {"nome": "VL_CONT_NC_REC", "descr": "Valor da Contribuição Não Cumulativa a Recolher/Pagar (04 – 05 - 06)", "obrigatorio": True},
+        8: {"nome": "VL_TOT_CONT_CUM_PER", "descr": "Valor Total da Contribuição Cumulativa do Período (recuperado do campo 13 do Registro M210, quando o campo “COD_CONT” = 31, 32, 51, 52, 53, 54 e 72)", "obrigatorio": True},
+        9: {"nome": "VL_RET_CUM", "descr": "Valor Retido na Fonte Deduzido no Período", "obrigatorio": True},
+        10: {"nome": "VL_OUT_DED_CUM", "descr": "Outras Deduções no Período", "obrigatorio": True},
+        11: {"nome": "VL_CONT_CUM_REC", "descr": "Valor da Contribuição Cumulativa a Recolher/Pagar (08 - 09 – 10)", "obrigatorio": True},
+        12: {"nome": "VL_TOT_CONT_REC", "descr": "Valor Total da Contribuição a Recolher/Pagar no Período (07 + 11)", "obrigatorio": True},
     },
     "M210": { # Detalhamento da Contribuição para PIS/Pasep
         0: {"nome": "REG", "descr": "Identificador do Registro"},
-        1: {"nome": "COD_CONT", "descr": "Código da Contribuição Social (conforme a Tabela 4.3.5)"},
-        2: {"nome": "VL_REC_BRT", "descr": "Valor da Receita Bruta"},
-        3: {"nome": "VL_BC_CONT", "descr": "Valor da Base de Cálculo da Contribuição"},
+        1: {"nome": "COD_CONT", "descr": "Código da Contribuição Social (conforme a Tabela 4.3.5)", "obrigatorio": True},
+        2: {"nome": "VL_REC_BRT", "descr": "Valor da Receita Bruta", "obrigatorio": True},
+        3: {"nome": "VL_BC_CONT", "descr": "Valor da Base de Cálculo da Contribuição", "obrigatorio": True},
         4: {"nome": "ALIQ_PIS", "descr": "Alíquota do PIS/Pasep (em percentual)"},
         5: {"nome": "QUANT_BC_PIS", "descr": "Quantidade - Base de cálculo PIS"},
         6: {"nome": "ALIQ_PIS_QUANT", "descr": "Alíquota do PIS (em reais)"},
-        7: {"nome": "VL_CONT_APUR", "descr": "Valor total da contribuição social apurada"},
-        8: {"nome": "VL_AJUS_ACRES", "descr": "Valor total dos ajustes de acréscimo"},
-        9: {"nome": "VL_AJUS_REDUC", "descr": "Valor total dos ajustes de redução"},
-        10: {"nome": "VL_CONT_DIFER", "descr": "Valor da contribuição a diferir no período"},
-        11: {"nome": "VL_CONT_DIFER_ANT", "descr": "Valor da contribuição diferida em períodos anteriores"},
-        12: {"nome": "VL_CONT_PER", "descr": "Valor total da Contribuição do Período (08 + 09 - 10 - 11 + 12)"},
+        7: {"nome": "VL_CONT_APUR", "descr": "Valor total da contribuição social apurada", "obrigatorio": True},
+        8: {"nome": "VL_AJUS_ACRES", "descr": "Valor total dos ajustes de acréscimo", "obrigatorio": True},
+        9: {"nome": "VL_AJUS_REDUC", "descr": "Valor total dos ajustes de redução", "obrigatorio": True},
+        10: {"nome": "VL_CONT_DIFER", "descr": "Valor da contribuição a diferir no período", "obrigatorio": True},
+        11: {"nome": "VL_CONT_DIFER_ANT", "descr": "Valor da contribuição diferida em períodos anteriores", "obrigatorio": True},
+        12: {"nome": "VL_CONT_PER", "descr": "Valor total da Contribuição do Período (08 + 09 - 10 - 11 + 12)", "obrigatorio": True},
+    },
+    "M610": { # Detalhamento da Contribuição para a Seguridade Social - Cofins do Período
+        0: {"nome": "REG", "descr": "Identificador do Registro"},
+        1: {"nome": "COD_CONT", "descr": "Código da Contribuição Social (conforme a Tabela 4.3.5)", "obrigatorio": True},
+        2: {"nome": "VL_REC_BRT", "descr": "Valor da Receita Bruta", "obrigatorio": True},
+        3: {"nome": "VL_BC_CONT", "descr": "Valor da Base de Cálculo da Contribuição", "obrigatorio": True},
+        4: {"nome": "ALIQ_COFINS", "descr": "Alíquota da Cofins (em percentual)"},
+        5: {"nome": "QUANT_BC_COFINS", "descr": "Quantidade - Base de cálculo da Cofins"},
+        6: {"nome": "ALIQ_COFINS_QUANT", "descr": "Alíquota da Cofins (em reais)"},
+        7: {"nome": "VL_CONT_APUR", "descr": "Valor total da contribuição social apurada", "obrigatorio": True},
+        8: {"nome": "VL_AJUS_ACRES", "descr": "Valor total dos ajustes de acréscimo", "obrigatorio": True},
+        9: {"nome": "VL_AJUS_REDUC", "descr": "Valor total dos ajustes de redução", "obrigatorio": True},
+        10: {"nome": "VL_CONT_DIFER", "descr": "Valor da contribuição a diferir no período", "obrigatorio": True},
+        11: {"nome": "VL_CONT_DIFER_ANT", "descr": "Valor da contribuição diferida em períodos anteriores", "obrigatorio": True},
+        12: {"nome": "VL_CONT_PER", "descr": "Valor total da Contribuição do Período (08 + 09 - 10 - 11 + 12)", "obrigatorio": True},
     },
     # --- Bloco 1 ---
     "1001": {
         0: {"nome": "REG", "descr": "Identificador do Registro"},
-        1: {"nome": "IND_MOV", "descr": "Indicador de movimento (0-Bloco com dados; 1-Bloco sem dados)"},
+        1: {"nome": "IND_MOV", "descr": "Indicador de movimento (0-Bloco com dados; 1-Bloco sem dados)", "obrigatorio": True},
     },
     "1100": {
         0: {"nome": "REG", "descr": "Identificador do Registro"},
-        1: {"nome": "PER_APU_CRED", "descr": "Período de Apuração do Crédito (MM/AAAA)"},
-        2: {"nome": "ORIG_CRED", "descr": "Indicador da origem do crédito: 01 – Crédito decorrente de operações próprias; 02 – Crédito transferido por pessoa jurídica sucedida."},
+        1: {"nome": "PER_APU_CRED", "descr": "Período de Apuração do Crédito (MM/AAAA)", "obrigatorio": True},
+        2: {"nome": "ORIG_CRED", "descr": "Indicador da origem do crédito: 01 – Crédito decorrente de operações próprias; 02 – Crédito transferido por pessoa jurídica sucedida.", "obrigatorio": True},
         3: {"nome": "CNPJ_SUC", "descr": "CNPJ da pessoa jurídica cedente do crédito (se ORIG_CRED = 02)"},
-        4: {"nome": "COD_CRED", "descr": "Código do Tipo do Crédito"},
-        5: {"nome": "VL_CRED_APU", "descr": "Valor total do crédito apurado na Escrituração Fiscal Digital (Registro M100) ou em demonstrativo DACON (Fichas 06A e 06B) de período anterior."},
+        4: {"nome": "COD_CRED", "descr": "Código do Tipo do Crédito", "obrigatorio": True},
+        5: {"nome": "VL_CRED_APU", "descr": "Valor total do crédito apurado na Escrituração Fiscal Digital (Registro M100) ou em demonstrativo DACON (Fichas 06A e 06B) de período anterior.", "obrigatorio": True},
         6: {"nome": "VL_CRED_EXT_APU", "descr": "Valor de Crédito Extemporâneo Apurado (Registro 1101), referente a Período Anterior, Informado no Campo 02 – PER_APU_CRED"},
-        7: {"nome": "VL_TOT_CRED_APU", "descr": "Valor Total do Crédito Apurado (05 + 06)"},
+        7: {"nome": "VL_TOT_CRED_APU", "descr": "Valor Total do Crédito Apurado (05 + 06)", "obrigatorio": True},
         8: {"nome": "VL_CRED_DESC_PA_ANT", "descr": "Valor do Crédito utilizado mediante Desconto, em Período(s) Anterior(es)."},
         9: {"nome": "VL_CRED_PER_PA_ANT", "descr": "Valor do Crédito utilizado mediante Pedido de Ressarcimento, em Período(s) Anterior(es)."},
         10: {"nome": "VL_CRED_DCOMP_PA_ANT", "descr": "Valor do Crédito utilizado mediante Declaração de Compensação Intermediária (Crédito de Exportação), em Período(s) Anterior(es)."},
-        11: {"nome": "SD_CRED_DISP_EFD", "descr": "Saldo do Crédito Disponível para Utilização neste Período de Escrituração (07 – 08 – 09 - 10)."},
+        11: {"nome": "SD_CRED_DISP_EFD", "descr": "Saldo do Crédito Disponível para Utilização neste Período de Escrituração (07 – 08 – 09 - 10).", "obrigatorio": True},
         12: {"nome": "VL_CRED_DESC_EFD", "descr": "Valor do Crédito descontado neste período de escrituração."},
         13: {"nome": "VL_CRED_PER_EFD", "descr": "Valor do Crédito objeto de Pedido de Ressarcimento (PER) neste período de escrituração."},
         14: {"nome": "VL_CRED_DCOMP_EFD", "descr": "Valor do Crédito utilizado mediante Declaração de Compensação Intermediária neste período de escrituração."},
         15: {"nome": "VL_CRED_TRANS", "descr": "Valor do crédito transferido em evento de cisão, fusão ou incorporação."},
         16: {"nome": "VL_CRED_OUT", "descr": "Valor do crédito utilizado por outras formas."},
-        17: {"nome": "SLD_CRED_FIM", "descr": "Saldo de créditos a utilizar em período de apuração futuro (11 – 12 – 13 – 14 – 15 - 16)."},
+        17: {"nome": "SLD_CRED_FIM", "descr": "Saldo de créditos a utilizar em período de apuração futuro (11 – 12 – 13 – 14 – 15 - 16).", "obrigatorio": True},
     },
     "1500": {
         0: {"nome": "REG", "descr": "Identificador do Registro"},
-        1: {"nome": "PER_APU_CRED", "descr": "Período de Apuração do Crédito (MM/AAAA)"},
-        2: {"nome": "ORIG_CRED", "descr": "Indicador da origem do crédito: 01 – Crédito decorrente de operações próprias; 02 – Crédito transferido por pessoa jurídica sucedida."},
+        1: {"nome": "PER_APU_CRED", "descr": "Período de Apuração do Crédito (MM/AAAA)", "obrigatorio": True},
+        2: {"nome": "ORIG_CRED", "descr": "Indicador da origem do crédito: 01 – Crédito decorrente de operações próprias; 02 – Crédito transferido por pessoa jurídica sucedida.", "obrigatorio": True},
         3: {"nome": "CNPJ_SUC", "descr": "CNPJ da pessoa jurídica cedente do crédito (se ORIG_CRED = 02)"},
-        4: {"nome": "COD_CRED", "descr": "Código do Tipo do Crédito"},
-        5: {"nome": "VL_CRED_APU", "descr": "Valor total do crédito apurado na Escrituração Fiscal Digital (Registro M500) ou em demonstrativo DACON (Fichas 16A e 16B) de período anterior."},
+        4: {"nome": "COD_CRED", "descr": "Código do Tipo do Crédito", "obrigatorio": True},
+        5: {"nome": "VL_CRED_APU", "descr": "Valor total do crédito apurado na Escrituração Fiscal Digital (Registro M500) ou em demonstrativo DACON (Fichas 16A e 16B) de período anterior.", "obrigatorio": True},
         6: {"nome": "VL_CRED_EXT_APU", "descr": "Valor de Crédito Extemporâneo Apurado (Registro 1501), referente a Período Anterior, Informado no Campo 01 – PER_APU_CRED"},
-        7: {"nome": "VL_TOT_CRED_APU", "descr": "Valor Total do Crédito Apurado (05 + 06)"},
+        7: {"nome": "VL_TOT_CRED_APU", "descr": "Valor Total do Crédito Apurado (05 + 06)", "obrigatorio": True},
         8: {"nome": "VL_CRED_DESC_PA_ANT", "descr": "Valor do Crédito utilizado mediante Desconto, em Período(s) Anterior(es)."},
         9: {"nome": "VL_CRED_PER_PA_ANT", "descr": "Valor do Crédito utilizado mediante Pedido de Ressarcimento, em Período(s) Anterior(es)."},
         10: {"nome": "VL_CRED_DCOMP_PA_ANT", "descr": "Valor do Crédito utilizado mediante Declaração de Compensação Intermediária (Crédito de Exportação), em Período(s) Anterior(es)."},
-        11: {"nome": "SD_CRED_DISP_EFD", "descr": "Saldo do Crédito Disponível para Utilização neste Período de Escrituração (07 – 08 – 09 - 10)."},
+        11: {"nome": "SD_CRED_DISP_EFD", "descr": "Saldo do Crédito Disponível para Utilização neste Período de Escrituração (07 – 08 – 09 - 10).", "obrigatorio": True},
         12: {"nome": "VL_CRED_DESC_EFD", "descr": "Valor do Crédito descontado neste período de escrituração."},
         13: {"nome": "VL_CRED_PER_EFD", "descr": "Valor do Crédito objeto de Pedido de Ressarcimento (PER) neste período de escrituração."},
         14: {"nome": "VL_CRED_DCOMP_EFD", "descr": "Valor do Crédito utilizado mediante Declaração de Compensação Intermediária neste período de escrituração."},
         15: {"nome": "VL_CRED_TRANS", "descr": "Valor do crédito transferido em evento de cisão, fusão ou incorporação."},
         16: {"nome": "VL_CRED_OUT", "descr": "Valor do crédito utilizado por outras formas."},
-        17: {"nome": "SLD_CRED_FIM", "descr": "Saldo de créditos a utilizar em período de apuração futuro (11 – 12 – 13 – 14 – 15 - 16)."},
+        17: {"nome": "SLD_CRED_FIM", "descr": "Saldo de créditos a utilizar em período de apuração futuro (11 – 12 – 13 – 14 – 15 - 16).", "obrigatorio": True},
     },
     "1900": { # Consolidação dos Documentos Emitidos por ECF (PIS/Pasep e Cofins)
         0: {"nome": "REG", "descr": "Identificador do Registro"},
-        1: {"nome": "CNPJ", "descr": "CNPJ do estabelecimento"},
-        2: {"nome": "COD_MOD", "descr": "Código do modelo do documento fiscal (02, 2D)"},
+        1: {"nome": "CNPJ", "descr": "CNPJ do estabelecimento", "obrigatorio": True},
+        2: {"nome": "COD_MOD", "descr": "Código do modelo do documento fiscal (02, 2D)", "obrigatorio": True},
         3: {"nome": "SER", "descr": "Série do documento fiscal"},
         4: {"nome": "SUB_SER", "descr": "Subsérie do documento fiscal"},
-        5: {"nome": "COD_SIT", "descr": "Código da situação do documento fiscal: 00 – Documento regular; 02 – Documento cancelado; 99 – Outros"},
-        6: {"nome": "VL_TOT_REC", "descr": "Valor total da receita, conforme os documentos emitidos no período, representativos da venda de bens e serviços"},
-        7: {"nome": "QUANT_DOC", "descr": "Quantidade total de documentos emitidos no período"},
-        8: {"nome": "CST_PIS", "descr": "Código da Situação Tributária do PIS/Pasep"},
-        9: {"nome": "CST_COFINS", "descr": "Código da Situação Tributária da Cofins"},
+        5: {"nome": "COD_SIT", "descr": "Código da situação do documento fiscal: 00 – Documento regular; 02 – Documento cancelado; 99 – Outros", "obrigatorio": True},
+        6: {"nome": "VL_TOT_REC", "descr": "Valor total da receita, conforme os documentos emitidos no período, representativos da venda de bens e serviços", "obrigatorio": True},
+        7: {"nome": "QUANT_DOC", "descr": "Quantidade total de documentos emitidos no período", "casas": 0},
+        8: {"nome": "CST_PIS", "descr": "Código da Situação Tributária do PIS/Pasep", "obrigatorio": True},
+        9: {"nome": "CST_COFINS", "descr": "Código da Situação Tributária da Cofins", "obrigatorio": True},
         10: {"nome": "CFOP", "descr": "Código fiscal de operação e prestação"},
         11: {"nome": "INF_COMPL", "descr": "Informações complementares"},
         12: {"nome": "COD_CTA", "descr": "Código da conta analítica contábil representativa da receita"},
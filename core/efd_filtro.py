@@ -0,0 +1,107 @@
+# efd_filtro.py
+
+"""
+Filtro da lista de registros por tipo, preparado para rodar fora da thread da interface.
+
+filtrar_registros() devolve um FiltroRegistros (texto, tipos que casam e posições). Ele
+pode ser chamado a cada tecla digitada:
+  - texto vazio, um único tipo ou o mesmo conjunto de tipos do filtro anterior custam O(1)
+    (a faixa inteira, o array do tipo no índice ou as posições anteriores);
+  - quando o texto novo estende o anterior (ex: "C" -> "C1"), só os tipos do resultado
+    anterior são candidatos e só a faixa ocupada por ele é percorrida; resultados anteriores
+    pequenos são simplesmente filtrados pelo código de tipo de cada posição;
+  - nos demais casos, as posições dos tipos são intercaladas a partir do índice.
+O trabalho pesado é feito em lotes de TAMANHO_LOTE posições, chamando 'progresso' entre
+eles, de forma que uma tarefa em segundo plano pode ser cancelada (OperacaoCancelada)
+quando o usuário continua digitando.
+"""
+from array import array
+from collections.abc import Callable, Sequence
+from bisect import bisect_left
+from itertools import compress
+
+from .efd_instrumentacao import cronometrado
+
+TAMANHO_LOTE = 65536 # Posições processadas entre dois avisos de progresso
+
+class FiltroRegistros:
+    """Resultado de um filtro: o texto normalizado, os tipos que casam (None = todos) e as posições."""
+    __slots__ = ("texto", "tipos", "posicoes")
+
+    def __init__(self, texto: str, tipos: frozenset[str] | None, posicoes: Sequence[int]):
+        self.texto = texto
+        self.tipos = tipos
+        self.posicoes = posicoes
+
+    def __repr__(self) -> str:
+        return f"FiltroRegistros(texto='{self.texto}', tipos={None if self.tipos is None else len(self.tipos)}, posicoes={len(self.posicoes)})"
+
+
+@cronometrado("filtrar_registros", "filtro")
+def filtrar_registros(store, texto: str, anterior: FiltroRegistros | None = None,
+                      progresso: Callable[[int, int], None] | None = None) -> FiltroRegistros:
+    """
+    Posições, em ordem de arquivo, dos registros cujo tipo contém 'texto' (sem diferenciar
+    maiúsculas). Trate as posições retornadas como somente leitura.
+
+    Args:
+        store: O RegistroStore carregado (usa store.indice e store.codigos_tipo).
+        anterior: Resultado do filtro anterior sobre o mesmo store, para refinar.
+        progresso: Chamado com (0, posições processadas) entre os lotes; pode levantar
+                   OperacaoCancelada para interromper.
+    """
+    texto = texto.strip().upper()
+    indice = store.indice
+    if not texto or indice is None:
+        return FiltroRegistros(texto, None, range(len(store)) if indice is not None else [])
+
+    refinando = anterior is not None and anterior.tipos is not None and anterior.texto in texto
+    candidatos = anterior.tipos if refinando else indice.posicoes_por_tipo
+    tipos = frozenset(tipo for tipo in candidatos if texto in tipo.upper())
+
+    if not tipos:
+        posicoes: Sequence[int] = []
+    elif len(tipos) == 1:
+        posicoes = indice.posicoes(next(iter(tipos)))
+    elif refinando and tipos == anterior.tipos:
+        posicoes = anterior.posicoes
+    elif refinando and len(anterior.posicoes) <= TAMANHO_LOTE:
+        posicoes = _refinar(store, anterior.posicoes, tipos)
+    elif refinando: # Só a faixa ocupada pelo resultado anterior precisa ser percorrida
+        posicoes = _intercalar(store, tipos, progresso, anterior.posicoes[0], anterior.posicoes[-1] + 1)
+    else:
+        posicoes = _intercalar(store, tipos, progresso, 0, len(store))
+    return FiltroRegistros(texto, tipos, posicoes)
+
+def _codigos_aceitos(store, tipos: frozenset[str]) -> bytearray:
+    """Tabela código de tipo -> 1 se o tipo está no filtro."""
+    aceitos = bytearray(len(store.tipos))
+    for codigo, tipo in enumerate(store.tipos):
+        if tipo in tipos:
+            aceitos[codigo] = 1
+    return aceitos
+
+def _refinar(store, posicoes_anteriores: Sequence[int], tipos: frozenset[str]) -> array:
+    """Mantém, das posições anteriores (até um lote), as dos tipos informados, pelo código de tipo de cada registro."""
+    aceita_codigo = _codigos_aceitos(store, tipos).__getitem__
+    # compress/map mantêm o laço em C
+    return array('q', compress(posicoes_anteriores, map(aceita_codigo, map(store.codigos_tipo.__getitem__, posicoes_anteriores))))
+
+def _intercalar(store, tipos: frozenset[str], progresso, primeira: int, limite: int) -> array:
+    """
+    Posições (em ordem de arquivo) dos registros dos tipos informados entre 'primeira' e
+    'limite' (exclusive). A faixa é percorrida em janelas de TAMANHO_LOTE posições: em cada
+    uma, as fatias dos arrays do índice (achadas por busca binária) são concatenadas e
+    ordenadas em C, sem laço em Python por registro.
+    """
+    listas_posicoes = [store.indice.posicoes(tipo) for tipo in tipos]
+    resultado = array('q')
+    for inicio in range(primeira, limite, TAMANHO_LOTE):
+        if progresso is not None:
+            progresso(0, inicio - primeira)
+        fim = min(inicio + TAMANHO_LOTE, limite)
+        janela = array('q')
+        for posicoes in listas_posicoes:
+            janela += posicoes[bisect_left(posicoes, inicio):bisect_left(posicoes, fim)]
+        resultado.extend(sorted(janela))
+    return resultado
@@ -1,36 +1,282 @@
 # efd_generator.py
 
-from .efd_structures import RegistroEFD # Para type hinting
+import mmap
+import os
+import stat
+import tempfile
+from bisect import bisect_right
+from collections.abc import Callable, Iterable, Iterator
 
-def generate_efd_file(filepath: str, registros: list[RegistroEFD]) -> bool:
+from .efd_structures import RegistroEFD, RegistroStore, OperacaoCancelada, INTERVALO_PROGRESSO # RegistroEFD para type hinting
+from .efd_instrumentacao import cronometrado
+
+TAMANHO_BLOCO_COPIA = 64 * 1024 * 1024 # Bytes copiados do arquivo de origem por escrita na gravação incremental
+
+_UMASK = os.umask(0o022) # Lida na importação (só dá para ler trocando): permissões dos arquivos novos
+os.umask(_UMASK)
+
+def _linhas_com_totalizadores(registros: Iterable[RegistroEFD]) -> Iterator[str]:
+    """
+    Produz as linhas do arquivo recalculando, na mesma passagem, os totalizadores:
+    - x990 (encerramento de bloco): QTD_LIN_x = linhas do bloco x, da abertura ao x990;
+    - Bloco 9 (9001, 9900, 9990, 9999): descartado da entrada e regerado ao final, com um
+      9900 por tipo de registro gravado (em ordem de primeira ocorrência) e os totais de linhas.
+    O bloco 9 só é gerado se a entrada tiver um (arquivos parciais continuam sem ele).
+    """
+    qtd_por_tipo: dict[str, int] = {}
+    linhas_por_bloco: dict[str, int] = {}
+    total_linhas = 0
+    tem_bloco_9 = False
+
+    for registro in registros:
+        tipo = registro.tipo_registro
+        if tipo[:1] == '9':
+            tem_bloco_9 = True # Regerado ao final
+            continue
+        bloco = tipo[:1]
+        linhas_por_bloco[bloco] = linhas_por_bloco.get(bloco, 0) + 1
+        if tipo[1:] == '990':
+            linha = f"|{tipo}|{linhas_por_bloco[bloco]}|\n"
+        else:
+            linha = registro.para_linha_txt() + '\n'
+        if tipo:
+            qtd_por_tipo[tipo] = qtd_por_tipo.get(tipo, 0) + 1
+        total_linhas += 1
+        yield linha
+
+    if tem_bloco_9:
+        for linha in _linhas_bloco_9(qtd_por_tipo, total_linhas):
+            yield linha + '\n'
+
+def _linhas_bloco_9(qtd_por_tipo: dict[str, int], total_linhas: int) -> list[str]:
+    """
+    Linhas (sem quebra) do bloco 9 para um arquivo com 'total_linhas' linhas fora do bloco 9
+    e as quantidades por tipo em 'qtd_por_tipo' (alterado: recebe os tipos do próprio bloco 9).
+    """
+    for tipo in ('9001', '9900', '9990', '9999'):
+        qtd_por_tipo[tipo] = 1
+    qtd_por_tipo['9900'] = len(qtd_por_tipo)
+    linhas_bloco_9 = 1 + qtd_por_tipo['9900'] + 1 # 9001 + 9900s + 9990
+
+    linhas = ["|9001|0|"]
+    linhas.extend(f"|9900|{tipo}|{quantidade}|" for tipo, quantidade in qtd_por_tipo.items())
+    linhas.append(f"|9990|{linhas_bloco_9 + 1}|") # QTD_LIN_9 inclui o 9999
+    linhas.append(f"|9999|{total_linhas + linhas_bloco_9 + 1}|")
+    return linhas
+
+def _totalizadores_do_indice(store: RegistroStore) -> tuple[dict[int, str], list[int], list[str]]:
+    """
+    Mesmos totalizadores de _linhas_com_totalizadores, calculados pelo IndiceEFD do store
+    (sem percorrer as linhas). Retorna (posição -> linha recalculada de cada x990,
+    posições do bloco 9 da entrada, linhas do bloco 9 regerado — vazia se não havia bloco 9).
+    """
+    posicoes_por_tipo = store.indice.posicoes_por_tipo
+    tipos_fora_do_9 = sorted((tipo for tipo in posicoes_por_tipo if tipo[:1] != '9'),
+                             key=lambda tipo: posicoes_por_tipo[tipo][0]) # Ordem de primeira ocorrência
+    posicoes_bloco_9 = sorted(posicao for tipo in posicoes_por_tipo if tipo[:1] == '9'
+                              for posicao in posicoes_por_tipo[tipo])
+
+    linhas_x990: dict[int, str] = {}
+    for tipo in tipos_fora_do_9:
+        if tipo[1:] != '990':
+            continue
+        do_bloco = [posicoes_por_tipo[t] for t in tipos_fora_do_9 if t[:1] == tipo[:1]]
+        for posicao in posicoes_por_tipo[tipo]:
+            linhas_no_bloco = sum(bisect_right(posicoes, posicao) for posicoes in do_bloco)
+            linhas_x990[posicao] = f"|{tipo}|{linhas_no_bloco}|"
+
+    linhas_bloco_9: list[str] = []
+    if posicoes_bloco_9:
+        qtd_por_tipo = {tipo: len(posicoes_por_tipo[tipo]) for tipo in tipos_fora_do_9}
+        linhas_bloco_9 = _linhas_bloco_9(qtd_por_tipo, len(store) - len(posicoes_bloco_9))
+    return linhas_x990, posicoes_bloco_9, linhas_bloco_9
+
+@cronometrado("gravação incremental", "gravacao")
+def _gravar_store_incremental(arquivo, store: RegistroStore, recalcular_totalizadores: bool,
+                              progresso: Callable[[int, int], None] | None) -> None:
+    """
+    Grava o store copiando do buffer de origem, em faixas contíguas, os bytes de todas as linhas
+    não modificadas; só os registros em 'editados' (e os totalizadores que mudaram) são
+    serializados de novo, com a mesma quebra de linha do arquivo de origem.
+    'arquivo' deve estar aberto em modo binário. Requer store.linhas_regulares e store.indice.
     """
-    Gera um arquivo EFD Contribuições (.txt) a partir de uma lista de objetos RegistroEFD.
+    dados = store.dados
+    inicio_linhas = store.inicio_linhas
+    fim_linhas = store.fim_linhas
+    total = len(store)
+    fim_dados = len(dados)
+    quebra = b'\r\n' if dados[fim_linhas[0]:fim_linhas[0] + 2] == b'\r\n' else b'\n'
+
+    # Posição -> nova linha, ou None para descartar (bloco 9 da entrada, regerado ao final)
+    substituicoes: dict[int, str | None] = {posicao: store.linha_txt(posicao) for posicao in store.editados}
+    linhas_bloco_9: list[str] = []
+    if recalcular_totalizadores:
+        linhas_x990, posicoes_bloco_9, linhas_bloco_9 = _totalizadores_do_indice(store)
+        for posicao, linha in linhas_x990.items():
+            if linha != dados[inicio_linhas[posicao]:fim_linhas[posicao]].decode('latin-1'):
+                substituicoes[posicao] = linha
+            else:
+                substituicoes.pop(posicao, None) # A linha original já está correta
+        for posicao in posicoes_bloco_9:
+            substituicoes[posicao] = None
+
+    gravados = [0]
+    def copiar(buffer: memoryview, inicio: int, fim: int):
+        # Em blocos, para que o progresso (e o cancelamento) funcionem também nas faixas longas
+        while inicio < fim:
+            parte = min(fim, inicio + TAMANHO_BLOCO_COPIA)
+            gravados[0] += arquivo.write(buffer[inicio:parte])
+            inicio = parte
+            if progresso is not None:
+                progresso(gravados[0], bisect_right(inicio_linhas, inicio))
+
+    with memoryview(dados) as buffer: # Fatias sem cópia, inclusive de um mmap
+        cursor = 0 # Início da faixa ainda não copiada
+        for posicao in sorted(substituicoes):
+            copiar(buffer, cursor, inicio_linhas[posicao])
+            linha = substituicoes[posicao]
+            if linha is not None:
+                gravados[0] += arquivo.write(linha.encode('latin-1') + quebra)
+            cursor = inicio_linhas[posicao + 1] if posicao + 1 < total else fim_dados
+        copiar(buffer, cursor, fim_dados)
+    if cursor < fim_dados and dados[fim_dados - 1:fim_dados] != b'\n':
+        gravados[0] += arquivo.write(quebra) # Origem sem quebra de linha após o último registro
+    for linha in linhas_bloco_9:
+        gravados[0] += arquivo.write(linha.encode('latin-1') + quebra)
+    if progresso is not None:
+        progresso(gravados[0], total)
+
+@cronometrado("generate_efd_file", "gravacao")
+def generate_efd_file(filepath: str, registros: Iterable[RegistroEFD],
+                      progresso: Callable[[int, int], None] | None = None,
+                      recalcular_totalizadores: bool = True) -> bool:
+    """
+    Gera um arquivo EFD Contribuições (.txt) a partir de uma sequência de objetos RegistroEFD.
+
+    Os registros são consumidos um a um, então 'registros' pode ser tanto uma lista
+    quanto um gerador (ex: iter_efd_records), sem materializar o arquivo em memória.
+
+    Se 'registros' for um RegistroStore lido de um arquivo regular (ver RegistroStore), a
+    gravação é incremental: as linhas não modificadas são copiadas em bloco do buffer de
+    origem e só os registros editados são serializados de novo.
+    O arquivo é gravado em um temporário de nome único ao lado do destino (tempfile.mkstemp,
+    com as permissões do arquivo substituído) e só então renomeado. Se o
+    destino é o próprio arquivo de origem do store, o store é recarregado do arquivo gravado
+    (RegistroStore.adotar: mapeado de novo se estava mapeado, sem editados), para que os
+    offsets, o hash e o caminho continuem descrevendo o que está no disco. No Windows, onde
+    um arquivo mapeado não pode ser substituído, o mapeamento é fechado antes da troca.
 
     Args:
         filepath (str): O caminho completo onde o arquivo será salvo.
-        registros (list[RegistroEFD]): A lista de objetos RegistroEFD a serem escritos.
+        registros (Iterable[RegistroEFD]): Os objetos RegistroEFD a serem escritos, em ordem.
+        progresso (Callable[[int, int], None] | None): Chamado periodicamente com
+                       (bytes_gravados, linhas_gravadas). Se levantar OperacaoCancelada, o
+                       arquivo parcial é removido (o destino fica intocado) e a exceção é
+                       propagada ao chamador.
+        recalcular_totalizadores (bool): Se True (padrão), os registros x990 e o bloco 9
+                       (9900/9990/9999) são recalculados durante a gravação, refletindo
+                       linhas incluídas ou removidas. Se False, tudo é gravado como recebido.
 
     Returns:
         bool: True se o arquivo foi salvo com sucesso, False caso contrário.
     """
+    temporario = None
+    sobre_a_origem = isinstance(registros, RegistroStore) and _mesmo_arquivo(registros.caminho_origem, filepath)
     try:
+        temporario = _criar_temporario(filepath)
+        if (isinstance(registros, RegistroStore) and registros.linhas_regulares
+                and registros.indice is not None and len(registros) > 0):
+            with open(temporario, 'wb') as file:
+                _gravar_store_incremental(file, registros, recalcular_totalizadores, progresso)
+            _substituir(temporario, filepath, registros if sobre_a_origem else None)
+            return True
+
         # Usar a mesma codificação do parser para consistência.
         # É importante garantir que a quebra de linha seja a padrão do sistema
         # ou a especificada pela EFD (CRLF - \r\n), mas o Python no modo texto
         # geralmente lida bem com isso ('\n' é convertido para a quebra de linha nativa).
         # Para EFD, o padrão é CRLF, mas o PVA costuma ser tolerante.
         # Se for estritamente necessário CRLF: open(..., newline='\r\n')
-        with open(filepath, 'w', encoding='latin-1', newline='') as file: # newline='' para evitar duplas quebras de linha no Windows
-            for registro in registros:
-                file.write(registro.para_linha_txt() + '\n') # Adiciona a quebra de linha no final
+        if recalcular_totalizadores:
+            linhas = _linhas_com_totalizadores(registros)
+        else:
+            linhas = (registro.para_linha_txt() + '\n' for registro in registros) # Adiciona a quebra de linha no final
+        with open(temporario, 'w', encoding='latin-1', newline='') as file: # newline='' para evitar duplas quebras de linha no Windows
+            if progresso is None:
+                file.writelines(linhas)
+            else:
+                bytes_gravados = 0
+                for linhas_gravadas, linha in enumerate(linhas, 1):
+                    file.write(linha)
+                    bytes_gravados += len(linha) # latin-1: um byte por caractere
+                    if linhas_gravadas % INTERVALO_PROGRESSO == 0:
+                        progresso(bytes_gravados, linhas_gravadas)
+        _substituir(temporario, filepath, registros if sobre_a_origem else None)
         return True
+    except OperacaoCancelada:
+        _remover_temporario(temporario) # Não deixa um arquivo EFD pela metade no disco
+        raise
     except IOError as e:
+        _remover_temporario(temporario)
         print(f"Erro de I/O ao salvar o arquivo '{filepath}': {e}")
         return False
     except Exception as e:
+        _remover_temporario(temporario)
         print(f"Erro inesperado ao salvar o arquivo '{filepath}': {e}")
         return False
 
+def _mesmo_arquivo(caminho_a: str | None, caminho_b: str) -> bool:
+    if not caminho_a:
+        return False
+    try:
+        return os.path.samefile(caminho_a, caminho_b)
+    except OSError: # Destino ainda não existe
+        return False
+
+def _substituir(temporario: str, filepath: str, store_origem: RegistroStore | None):
+    """Renomeia o temporário para o destino; se 'store_origem' foi lido do destino, recarrega-o do arquivo novo."""
+    if store_origem is None:
+        os.replace(temporario, filepath)
+        return
+    from .efd_parser import carregar_registro_store # Só ao salvar por cima da origem
+    mapeado = isinstance(store_origem.dados, mmap.mmap)
+    try:
+        os.replace(temporario, filepath)
+    except PermissionError: # Windows: arquivo com mapeamento ativo não pode ser substituído
+        if not mapeado:
+            raise
+        store_origem.fechar()
+        try:
+            os.replace(temporario, filepath)
+        except OSError: # O destino não mudou: volta a mapeá-lo, com os editados intactos
+            with open(filepath, 'rb') as arquivo:
+                store_origem.dados = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+            raise
+    novo = carregar_registro_store(filepath, mapear=mapeado)
+    if novo.problemas_leitura.erro:
+        raise IOError(f"arquivo gravado, mas não foi possível relê-lo: {novo.problemas_leitura.erro}")
+    store_origem.adotar(novo)
+
+def _criar_temporario(filepath: str) -> str:
+    """Cria, ao lado do destino, um arquivo vazio de nome único com as permissões que o destino terá."""
+    descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(filepath) or ".",
+                                             prefix=os.path.basename(filepath) + ".", suffix=".tmp")
+    os.close(descritor)
+    try:
+        modo = stat.S_IMODE(os.stat(filepath).st_mode) # Mantém as permissões do arquivo substituído
+    except FileNotFoundError:
+        modo = 0o666 & ~_UMASK # mkstemp cria com 0o600; um arquivo novo teria o padrão do sistema
+    try:
+        os.chmod(temporario, modo)
+    except OSError:
+        _remover_temporario(temporario)
+        raise
+    return temporario
+
+def _remover_temporario(caminho: str | None):
+    if caminho is not None and os.path.exists(caminho):
+        os.remove(caminho)
+
 # Exemplo de uso (apenas para ilustração, não faz parte da lógica principal):
 # if __name__ == '__main__':
 #     # Supondo que você tenha uma lista de objetos RegistroEFD
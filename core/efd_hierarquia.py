@@ -0,0 +1,214 @@
+# efd_hierarquia.py
+
+"""
+Hierarquia dos registros da EFD Contribuições e índice de registros construído no parse.
+
+HIERARQUIA_EFD mapeia: TipoDeRegistro -> TipoDoRegistroPai (None para os registros raiz 0000 e 9999).
+O nível de cada registro (0 = raiz, 1 = abertura/encerramento de bloco, ...) é derivado dessa tabela.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Sequence
+from heapq import merge
+
+HIERARQUIA_EFD: dict[str, str | None] = {
+    # --- Bloco 0 ---
+    "0000": None, "0001": "0000", "0035": "0001", "0100": "0001", "0110": "0001", "0111": "0110",
+    "0120": "0001", "0140": "0001", "0145": "0140", "0150": "0140", "0190": "0140", "0200": "0140",
+    "0205": "0200", "0206": "0200", "0208": "0200", "0400": "0140", "0450": "0140", "0500": "0001",
+    "0600": "0001", "0900": "0001", "0990": "0000",
+    # --- Bloco A ---
+    "A001": "0000", "A010": "A001", "A100": "A010", "A110": "A100", "A111": "A100", "A120": "A100",
+    "A170": "A100", "A990": "0000",
+    # --- Bloco C ---
+    "C001": "0000", "C010": "C001", "C100": "C010", "C110": "C100", "C111": "C100", "C120": "C100",
+    "C170": "C100", "C175": "C100", "C180": "C010", "C181": "C180", "C185": "C180", "C188": "C180",
+    "C190": "C010", "C191": "C190", "C195": "C190", "C198": "C190", "C199": "C190", "C380": "C010",
+    "C381": "C380", "C385": "C380", "C395": "C010", "C396": "C395", "C400": "C010", "C405": "C400",
+    "C481": "C405", "C485": "C405", "C489": "C400", "C490": "C010", "C491": "C490", "C495": "C490",
+    "C499": "C490", "C500": "C010", "C501": "C500", "C505": "C500", "C509": "C500", "C600": "C010",
+    "C601": "C600", "C605": "C600", "C609": "C600", "C800": "C010", "C810": "C800", "C820": "C800",
+    "C830": "C800", "C860": "C010", "C870": "C860", "C880": "C860", "C890": "C860", "C990": "0000",
+    # --- Bloco D ---
+    "D001": "0000", "D010": "D001", "D100": "D010", "D101": "D100", "D105": "D100", "D111": "D100",
+    "D200": "D010", "D201": "D200", "D205": "D200", "D209": "D200", "D300": "D010", "D309": "D300",
+    "D350": "D010", "D359": "D350", "D500": "D010", "D501": "D500", "D505": "D500", "D509": "D500",
+    "D600": "D010", "D601": "D600", "D605": "D600", "D609": "D600", "D990": "0000",
+    # --- Bloco F ---
+    "F001": "0000", "F010": "F001", "F100": "F010", "F111": "F100", "F120": "F010", "F129": "F120",
+    "F130": "F010", "F139": "F130", "F150": "F010", "F200": "F010", "F205": "F200", "F210": "F200",
+    "F211": "F200", "F500": "F010", "F509": "F500", "F510": "F010", "F519": "F510", "F525": "F010",
+    "F550": "F010", "F559": "F550", "F560": "F010", "F569": "F560", "F600": "F010", "F700": "F010",
+    "F800": "F010", "F990": "0000",
+    # --- Bloco I ---
+    "I001": "0000", "I010": "I001", "I100": "I010", "I199": "I100", "I200": "I100", "I299": "I200",
+    "I300": "I200", "I399": "I300", "I990": "0000",
+    # --- Bloco M ---
+    "M001": "0000", "M100": "M001", "M105": "M100", "M110": "M100", "M115": "M110", "M200": "M001",
+    "M205": "M200", "M210": "M200", "M211": "M210", "M215": "M210", "M220": "M210", "M225": "M220",
+    "M230": "M210", "M300": "M001", "M350": "M001", "M400": "M001", "M410": "M400", "M500": "M001",
+    "M505": "M500", "M510": "M500", "M515": "M510", "M600": "M001", "M605": "M600", "M610": "M600",
+    "M611": "M610", "M615": "M610", "M620": "M610", "M625": "M620", "M630": "M610", "M700": "M001",
+    "M800": "M001", "M810": "M800", "M990": "0000",
+    # --- Bloco P ---
+    "P001": "0000", "P010": "P001", "P100": "P010", "P110": "P100", "P199": "P100", "P200": "P001",
+    "P210": "P200", "P990": "0000",
+    # --- Bloco 1 ---
+    "1001": "0000", "1010": "1001", "1011": "1010", "1020": "1001", "1050": "1001", "1100": "1001",
+    "1101": "1100", "1102": "1101", "1200": "1001", "1210": "1200", "1220": "1200", "1300": "1001",
+    "1500": "1001", "1501": "1500", "1502": "1501", "1600": "1001", "1610": "1600", "1620": "1600",
+    "1700": "1001", "1800": "1001", "1809": "1800", "1900": "1001", "1990": "0000",
+    # --- Bloco 9 ---
+    "9001": "0000", "9900": "9001", "9990": "0000", "9999": None,
+}
+
+NIVEL_TIPO_DESCONHECIDO = 2 # Tipos fora da tabela ficam logo abaixo da abertura do bloco (x001)
+
+def nivel_registro(tipo_registro: str) -> int:
+    """Retorna o nível hierárquico do tipo de registro (0 para 0000/9999)."""
+    if tipo_registro not in HIERARQUIA_EFD:
+        return NIVEL_TIPO_DESCONHECIDO
+    nivel = 0
+    pai = HIERARQUIA_EFD[tipo_registro]
+    while pai is not None:
+        nivel += 1
+        pai = HIERARQUIA_EFD.get(pai)
+    return nivel
+
+
+class IndiceEFD:
+    """
+    Índice dos registros de um arquivo EFD, construído em uma única passagem.
+
+    - posicoes_por_tipo: tipo_registro -> array ordenado com as posições dos registros daquele tipo;
+    - blocos: letra do bloco ("0", "A", "C", ..., "9") -> (primeira posição, última posição + 1);
+    - pais: posição do registro pai de cada registro (-1 para os registros raiz);
+    - fim_subarvore: posição logo após o último descendente de cada registro.
+
+    Como o arquivo está em pré-ordem, os descendentes de 'p' ocupam exatamente as posições
+    (p, fim_subarvore[p]), o que torna as consultas proporcionais ao número de resultados.
+    """
+
+    def __init__(self, total_registros: int):
+        self.total_registros = total_registros
+        self.posicoes_por_tipo: dict[str, array] = {}
+        self.blocos: dict[str, tuple[int, int]] = {}
+        self.pais = array('q')
+        self.fim_subarvore = array('q')
+
+    def __repr__(self) -> str:
+        return f"IndiceEFD(registros={self.total_registros}, tipos={len(self.posicoes_por_tipo)}, blocos={len(self.blocos)})"
+
+    def posicoes(self, tipo_registro: str) -> array:
+        """Posições (ordenadas) dos registros do tipo informado."""
+        return self.posicoes_por_tipo.get(tipo_registro, array('q'))
+
+    def tipos_que_contem(self, texto: str) -> list[str]:
+        """Tipos de registro cujo código contém 'texto' (sem diferenciar maiúsculas)."""
+        texto = texto.upper()
+        return [tipo for tipo in self.posicoes_por_tipo if texto in tipo.upper()]
+
+    def filtrar_por_tipo(self, texto: str) -> Sequence[int]:
+        """
+        Posições, em ordem de arquivo, dos registros cujo tipo contém 'texto'.
+        Texto vazio retorna todas as posições (como um range, sem alocar uma lista).
+        Custo proporcional ao número de resultados. Trate o retorno como somente leitura.
+        """
+        if not texto:
+            return range(self.total_registros)
+        tipos = self.tipos_que_contem(texto)
+        if not tipos:
+            return []
+        if len(tipos) == 1:
+            return self.posicoes_por_tipo[tipos[0]]
+        return array('q', merge(*(self.posicoes_por_tipo[tipo] for tipo in tipos)))
+
+    def bloco(self, letra: str) -> range:
+        """Intervalo de posições ocupado pelo bloco (vazio se o bloco não existir)."""
+        inicio, fim = self.blocos.get(letra, (0, 0))
+        return range(inicio, fim)
+
+    def pai(self, posicao: int) -> int:
+        """Posição do registro pai, ou -1 se o registro for raiz."""
+        return self.pais[posicao]
+
+    def filhos(self, posicao: int) -> list[int]:
+        """Posições dos filhos diretos do registro (pulando a subárvore de cada filho)."""
+        filhos = []
+        atual = posicao + 1
+        fim = self.fim_subarvore[posicao]
+        while atual < fim:
+            filhos.append(atual)
+            atual = self.fim_subarvore[atual]
+        return filhos
+
+    def descendentes(self, posicao: int, tipo_registro: str) -> list[int]:
+        """Posições dos descendentes do registro que são do tipo informado (ex: C170 de um C100)."""
+        posicoes = self.posicoes_por_tipo.get(tipo_registro)
+        if not posicoes:
+            return []
+        inicio = bisect_right(posicoes, posicao)
+        fim = bisect_left(posicoes, self.fim_subarvore[posicao], inicio)
+        return list(posicoes[inicio:fim])
+
+    def ancestral(self, posicao: int, tipo_registro: str) -> int:
+        """Posição do ancestral mais próximo do tipo informado (ex: o C100 de um C170), ou -1."""
+        atual = self.pais[posicao]
+        while atual != -1 and not self._tipo_na_posicao(atual, tipo_registro):
+            atual = self.pais[atual]
+        return atual
+
+    def _tipo_na_posicao(self, posicao: int, tipo_registro: str) -> bool:
+        posicoes = self.posicoes_por_tipo.get(tipo_registro)
+        if not posicoes:
+            return False
+        i = bisect_left(posicoes, posicao)
+        return i < len(posicoes) and posicoes[i] == posicao
+
+
+def construir_indice(tipos_em_ordem: Iterable[str], total_registros: int) -> IndiceEFD:
+    """
+    Constrói o IndiceEFD a partir da sequência de tipos de registro, em ordem de arquivo.
+
+    Args:
+        tipos_em_ordem (Iterable[str]): O tipo de cada registro (ex: (r.tipo_registro for r in registros)).
+        total_registros (int): Quantidade de registros na sequência.
+
+    Returns:
+        IndiceEFD: O índice com posições por tipo, faixas de bloco e ligações pai/filho.
+    """
+    indice = IndiceEFD(total_registros)
+    pais = array('q', bytes(8 * total_registros))
+    fim_subarvore = array('q', bytes(8 * total_registros))
+    posicoes_por_tipo: dict[str, array] = {}
+    niveis: dict[str, int] = {}
+    blocos: dict[str, list[int]] = {}
+    pilha: list[tuple[int, int]] = [] # (nível, posição) dos registros ainda "abertos"
+
+    for posicao, tipo in enumerate(tipos_em_ordem):
+        posicoes = posicoes_por_tipo.get(tipo)
+        if posicoes is None:
+            posicoes = posicoes_por_tipo[tipo] = array('q')
+            niveis[tipo] = nivel_registro(tipo)
+        posicoes.append(posicao)
+
+        nivel = niveis[tipo]
+        while pilha and pilha[-1][0] >= nivel:
+            fim_subarvore[pilha.pop()[1]] = posicao
+        pais[posicao] = pilha[-1][1] if pilha else -1
+        pilha.append((nivel, posicao))
+
+        faixa = blocos.get(tipo[0])
+        if faixa is None:
+            blocos[tipo[0]] = [posicao, posicao + 1]
+        else:
+            faixa[1] = posicao + 1
+
+    for _, posicao in pilha:
+        fim_subarvore[posicao] = total_registros
+
+    indice.posicoes_por_tipo = posicoes_por_tipo
+    indice.blocos = {letra: (inicio, fim) for letra, (inicio, fim) in blocos.items()}
+    indice.pais = pais
+    indice.fim_subarvore = fim_subarvore
+    return indice
@@ -0,0 +1,286 @@
+# efd_instrumentacao.py
+
+"""
+Instrumentação leve dos caminhos críticos (leitura, filtro, painel de detalhes, regras,
+gravação...): intervalos de tempo e contadores, exportáveis como log estruturado (JSON por
+linha) ou como trace do Chrome (chrome://tracing ou https://ui.perfetto.dev).
+
+Desativada, o custo é o de uma chamada de função que testa um booleano: os pontos de medição
+podem ficar no código de produção. Uso:
+
+    from .efd_instrumentacao import medir, cronometrado, contar
+
+    @cronometrado("leitura")              # intervalo com o nome da função
+    def carregar(...): ...
+
+    with medir("filtro", texto=texto):    # intervalo com argumentos
+        ...
+    contar("cache.acertos")               # contador
+
+Modo de captura (opcional): além dos intervalos, um cProfile por thread (as tarefas do
+QThreadPool entram com perfilando()) e/ou o tracemalloc, gravados em arquivos ao encerrar.
+
+A variável de ambiente EFD_RETIFICADOR_INSTRUMENTACAO ativa tudo na inicialização:
+    "1" (ou "eventos"): só intervalos e contadores;
+    "perfil": intervalos + cProfile;  "memoria": intervalos + tracemalloc;
+    combinações separadas por vírgula ("perfil,memoria").
+Nesse caso, os arquivos são gravados na saída do programa, no diretório de
+EFD_RETIFICADOR_INSTRUMENTACAO_SAIDA (padrão: <temp>/efd_instrumentacao).
+
+O módulo é importado por todo o core: cProfile, pstats, tracemalloc e json só são
+importados quando a captura ou a exportação são usadas, para não pesar na inicialização.
+"""
+import atexit
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+LIMITE_EVENTOS = 200_000 # Eventos guardados (os mais antigos são descartados)
+QUADROS_TRACEMALLOC = 10 # Profundidade das pilhas guardadas pelo tracemalloc
+LINHAS_RELATORIO_MEMORIA = 40 # Linhas do relatório de alocações
+
+_ativa = False
+_perfil_ativo = False
+_memoria_ativa = False
+_eventos: deque = deque(maxlen=LIMITE_EVENTOS) # (fase, nome, categoria, início ns, duração ns, thread, args)
+_contadores: dict[str, float] = {}
+_nomes_threads: dict[int, str] = {}
+_perfis: list = [] # cProfile.Profile encerrados (uma tarefa ou a thread da interface)
+_perfil_principal = None # cProfile.Profile da thread que ligou a captura
+_trava = threading.Lock()
+_inicio_ns = time.perf_counter_ns()
+_NULO = nullcontext()
+
+
+def ativa() -> bool:
+    return _ativa
+
+def captura_ativa() -> bool:
+    """True se o cProfile ou o tracemalloc estão capturando."""
+    return _perfil_ativo or _memoria_ativa
+
+def ativar(perfil: bool = False, memoria: bool = False):
+    """Passa a registrar intervalos e contadores; 'perfil'/'memoria' ligam o cProfile/tracemalloc."""
+    global _ativa, _perfil_ativo, _memoria_ativa, _perfil_principal
+    _ativa = True
+    if perfil and not _perfil_ativo:
+        import cProfile
+        _perfil_ativo = True
+        _perfil_principal = cProfile.Profile() # Thread que ativou (a da interface, no GUI)
+        _perfil_principal.enable()
+    if memoria and not _memoria_ativa:
+        import tracemalloc
+        _memoria_ativa = True
+        tracemalloc.start(QUADROS_TRACEMALLOC)
+
+def desativar():
+    """Para de registrar. Os eventos já registrados continuam disponíveis para exportar."""
+    global _ativa
+    encerrar_captura()
+    _ativa = False
+
+def limpar():
+    with _trava:
+        _eventos.clear()
+        _contadores.clear()
+
+# --- Pontos de medição ---
+
+class _Intervalo:
+    __slots__ = ("nome", "categoria", "args", "inicio")
+
+    def __init__(self, nome: str, categoria: str, args: dict):
+        self.nome = nome
+        self.categoria = categoria
+        self.args = args
+
+    def __enter__(self):
+        self.inicio = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, tipo_excecao, excecao, rastreamento):
+        fim = time.perf_counter_ns()
+        if tipo_excecao is not None:
+            self.args["excecao"] = tipo_excecao.__name__
+        _registrar("X", self.nome, self.categoria, self.inicio, fim - self.inicio, self.args)
+        return False
+
+def medir(nome: str, categoria: str = "core", **args):
+    """
+    Context manager que registra a duração do bloco. Os argumentos nomeados vão para o evento;
+    o bloco pode acrescentar outros em 'intervalo.args' (ex: a quantidade de resultados).
+    Desativada, devolve um contexto nulo (o 'as' recebe None).
+    """
+    if not _ativa:
+        return _NULO
+    return _Intervalo(nome, categoria, args)
+
+def cronometrado(nome: str | None = None, categoria: str = "core"):
+    """Decorador: registra cada chamada da função como um intervalo ('nome' padrão: o da função)."""
+    def decorar(funcao):
+        nome_evento = nome or funcao.__name__
+
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if not _ativa:
+                return funcao(*args, **kwargs)
+            with _Intervalo(nome_evento, categoria, {}):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorar
+
+def contar(nome: str, valor: float = 1):
+    """Soma 'valor' ao contador (o trace mostra a evolução do total ao longo do tempo)."""
+    if not _ativa:
+        return
+    with _trava:
+        total = _contadores[nome] = _contadores.get(nome, 0) + valor
+    _registrar("C", nome, "contador", time.perf_counter_ns(), 0, {"valor": total})
+
+def _registrar(fase: str, nome: str, categoria: str, inicio: int, duracao: int, args: dict):
+    thread = threading.get_ident()
+    if thread not in _nomes_threads:
+        _nomes_threads[thread] = threading.current_thread().name
+    _eventos.append((fase, nome, categoria, inicio, duracao, thread, args)) # deque.append é atômico
+
+@contextmanager
+def perfilando():
+    """Perfila (cProfile) o bloco na thread atual se a captura estiver ativa; usado pelas tarefas em segundo plano."""
+    if not _perfil_ativo:
+        yield
+        return
+    import cProfile
+    perfil = cProfile.Profile()
+    try:
+        perfil.enable()
+    except ValueError: # Outro profiler já ativo nesta thread
+        yield
+        return
+    try:
+        yield
+    finally:
+        perfil.disable()
+        with _trava:
+            _perfis.append(perfil)
+
+# --- Resultados ---
+
+def resumo() -> dict:
+    """Por nome de intervalo: quantidade, total e máximo em ms; e o valor final dos contadores."""
+    intervalos: dict[str, dict] = {}
+    for fase, nome, _, _, duracao, _, _ in list(_eventos):
+        if fase != "X":
+            continue
+        estatistica = intervalos.setdefault(nome, {"chamadas": 0, "total_ms": 0.0, "max_ms": 0.0})
+        estatistica["chamadas"] += 1
+        estatistica["total_ms"] += duracao / 1e6
+        estatistica["max_ms"] = max(estatistica["max_ms"], duracao / 1e6)
+    return {"intervalos": intervalos, "contadores": dict(_contadores)}
+
+def _json_seguro(args: dict) -> dict:
+    return {chave: valor if isinstance(valor, (str, int, float, bool, type(None))) else str(valor) for chave, valor in args.items()}
+
+def exportar_chrome_trace(caminho: str) -> int:
+    """Grava os eventos no formato Trace Event (JSON) do Chrome. Retorna a quantidade de eventos."""
+    import json
+    pid = os.getpid()
+    eventos = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": thread, "args": {"name": nome}}
+               for thread, nome in list(_nomes_threads.items())]
+    for fase, nome, categoria, inicio, duracao, thread, args in list(_eventos):
+        evento = {"name": nome, "cat": categoria, "ph": fase, "ts": (inicio - _inicio_ns) / 1000,
+                  "pid": pid, "tid": thread, "args": _json_seguro(args)}
+        if fase == "X":
+            evento["dur"] = duracao / 1000
+        eventos.append(evento)
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump({"traceEvents": eventos, "displayTimeUnit": "ms"}, arquivo, ensure_ascii=False)
+    return len(eventos)
+
+def exportar_log(caminho: str) -> int:
+    """Grava um evento por linha (JSON), com tempos em ms desde o início do programa."""
+    import json
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        total = 0
+        for fase, nome, categoria, inicio, duracao, thread, args in list(_eventos):
+            registro = {"evento": nome, "categoria": categoria, "inicio_ms": round((inicio - _inicio_ns) / 1e6, 3),
+                        "thread": _nomes_threads.get(thread, str(thread))}
+            if fase == "X":
+                registro["duracao_ms"] = round(duracao / 1e6, 3)
+            registro.update(_json_seguro(args))
+            arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            total += 1
+    return total
+
+def encerrar_captura(diretorio: str | None = None) -> list[str]:
+    """
+    Encerra o cProfile/tracemalloc e, se 'diretorio' for informado, grava o perfil combinado
+    (perfil_*.prof, para pstats/snakeviz, e um resumo .txt) e o relatório de memória
+    (memoria_*.txt). Retorna os caminhos gravados.
+    """
+    global _perfil_ativo, _memoria_ativa, _perfil_principal
+    gravados: list[str] = []
+    carimbo = time.strftime("%Y%m%d_%H%M%S")
+    if _perfil_ativo:
+        _perfil_ativo = False
+        if _perfil_principal is not None:
+            _perfil_principal.disable()
+            with _trava:
+                _perfis.append(_perfil_principal)
+            _perfil_principal = None
+        with _trava:
+            perfis, _perfis[:] = list(_perfis), []
+        if diretorio and perfis:
+            import io
+            import pstats
+            os.makedirs(diretorio, exist_ok=True)
+            estatisticas = pstats.Stats(perfis[0])
+            for perfil in perfis[1:]:
+                estatisticas.add(perfil)
+            caminho_perfil = os.path.join(diretorio, f"perfil_{carimbo}.prof")
+            estatisticas.dump_stats(caminho_perfil)
+            texto = io.StringIO()
+            pstats.Stats(caminho_perfil, stream=texto).sort_stats("cumulative").print_stats(60)
+            with open(caminho_perfil[:-5] + ".txt", "w", encoding="utf-8") as arquivo:
+                arquivo.write(texto.getvalue())
+            gravados += [caminho_perfil, caminho_perfil[:-5] + ".txt"]
+    if _memoria_ativa:
+        import tracemalloc
+        _memoria_ativa = False
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+            atual, pico = tracemalloc.get_traced_memory()
+            linhas = [f"Memória rastreada: atual {atual / 1048576:.1f} MB, pico {pico / 1048576:.1f} MB", ""]
+            linhas += [str(estatistica) for estatistica in
+                       tracemalloc.take_snapshot().statistics("lineno")[:LINHAS_RELATORIO_MEMORIA]]
+            caminho_memoria = os.path.join(diretorio, f"memoria_{carimbo}.txt")
+            with open(caminho_memoria, "w", encoding="utf-8") as arquivo:
+                arquivo.write("\n".join(linhas) + "\n")
+            gravados.append(caminho_memoria)
+        tracemalloc.stop()
+    return gravados
+
+# --- Ativação pela variável de ambiente ---
+
+def diretorio_saida() -> str:
+    import tempfile
+    return os.environ.get("EFD_RETIFICADOR_INSTRUMENTACAO_SAIDA") or os.path.join(tempfile.gettempdir(), "efd_instrumentacao")
+
+def _gravar_na_saida():
+    diretorio = diretorio_saida()
+    os.makedirs(diretorio, exist_ok=True)
+    caminho_trace = os.path.join(diretorio, f"trace_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    exportar_chrome_trace(caminho_trace)
+    for caminho in [caminho_trace] + encerrar_captura(diretorio):
+        print(f"Instrumentação: {caminho}")
+
+def _ativar_pelo_ambiente():
+    modos = {modo.strip().lower() for modo in os.environ.get("EFD_RETIFICADOR_INSTRUMENTACAO", "").split(",") if modo.strip()}
+    if not modos or modos <= {"0"}:
+        return
+    ativar(perfil="perfil" in modos, memoria="memoria" in modos)
+    atexit.register(_gravar_na_saida)
+
+_ativar_pelo_ambiente()
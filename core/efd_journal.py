@@ -0,0 +1,199 @@
+# efd_journal.py
+
+"""
+Jornal de edições (desfazer/refazer) de um RegistroStore.
+
+Cada alteração de campo é guardada como um delta (posição, índice do campo, valor antigo,
+valor novo); o consumo de memória cresce com o número de edições, não com o tamanho do
+arquivo. Deltas são agrupados em passos: uma edição manual é um passo, e uma execução de
+regra em lote inteira pode virar um único passo com JornalEdicoes.agrupar().
+
+O jornal pode ser salvo em disco (JSON) e reaplicado sobre o arquivo original,
+reconstruindo a sessão de edição.
+"""
+import os
+from contextlib import contextmanager
+
+from .efd_structures import RegistroStore
+
+VERSAO_FORMATO_JORNAL = 1
+
+# Delta de um campo: (posição do registro, índice do campo, valor antigo, valor novo)
+AlteracaoCampo = tuple[int, int, str, str]
+
+class PassoEdicao:
+    """Um passo desfazível: a descrição exibida na interface e os deltas, na ordem em que ocorreram."""
+    __slots__ = ("descricao", "alteracoes")
+
+    def __init__(self, descricao: str, alteracoes: list[AlteracaoCampo] | None = None):
+        self.descricao = descricao
+        self.alteracoes: list[AlteracaoCampo] = alteracoes if alteracoes is not None else []
+
+    def __repr__(self) -> str:
+        return f"PassoEdicao(descricao='{self.descricao}', alteracoes={len(self.alteracoes)})"
+
+    def posicoes(self) -> set[int]:
+        return {posicao for posicao, _, _, _ in self.alteracoes}
+
+
+class JornalEdicoes:
+    """
+    Histórico ilimitado de desfazer/refazer de um RegistroStore.
+
+    Depois de anexar(store), toda alteração feita por definir_campo (edição manual ou regra)
+    é registrada automaticamente. Fora de um agrupar(), cada alteração vira um passo próprio.
+    Uma nova alteração descarta os passos que estavam disponíveis para refazer.
+    """
+
+    def __init__(self):
+        self.desfeitos_disponiveis: list[PassoEdicao] = [] # Pilha de desfazer (passos aplicados)
+        self.refazer_disponiveis: list[PassoEdicao] = []   # Pilha de refazer
+        self._store: RegistroStore | None = None
+        self._grupo: PassoEdicao | None = None
+        self._aplicando = False # Desfazendo/refazendo: não registrar as próprias alterações
+        self.arquivo_origem: str | None = None # Preenchidos por carregar()
+        self.tamanho_origem: int | None = None
+
+    def __repr__(self) -> str:
+        return f"JornalEdicoes(passos={len(self.desfeitos_disponiveis)}, refazer={len(self.refazer_disponiveis)})"
+
+    # --- Ligação com o store ---
+
+    def anexar(self, store: RegistroStore):
+        """Passa a registrar as alterações feitas em 'store' (desanexa do store anterior)."""
+        self.desanexar()
+        self._store = store
+        store.ouvintes.append(self._registrar)
+
+    def desanexar(self):
+        if self._store is not None and self._registrar in self._store.ouvintes:
+            self._store.ouvintes.remove(self._registrar)
+        self._store = None
+
+    def _registrar(self, posicao: int, indice: int, valor_antigo: str, valor_novo: str):
+        if self._aplicando:
+            return
+        self.refazer_disponiveis.clear()
+        if self._grupo is not None:
+            self._grupo.alteracoes.append((posicao, indice, valor_antigo, valor_novo))
+        else:
+            self.desfeitos_disponiveis.append(
+                PassoEdicao(f"Editar campo {indice} do registro {posicao}", [(posicao, indice, valor_antigo, valor_novo)]))
+
+    @contextmanager
+    def agrupar(self, descricao: str):
+        """
+        Agrupa todas as alterações feitas dentro do bloco 'with' em um único passo.
+        Blocos aninhados entram no grupo mais externo. Grupos sem alterações são descartados.
+        """
+        if self._grupo is not None:
+            yield self._grupo
+            return
+        self._grupo = PassoEdicao(descricao)
+        try:
+            yield self._grupo
+        finally:
+            grupo, self._grupo = self._grupo, None
+            if grupo.alteracoes:
+                self.desfeitos_disponiveis.append(grupo)
+
+    # --- Desfazer / refazer ---
+
+    def pode_desfazer(self) -> bool:
+        return bool(self.desfeitos_disponiveis)
+
+    def pode_refazer(self) -> bool:
+        return bool(self.refazer_disponiveis)
+
+    def desfazer(self) -> PassoEdicao | None:
+        """Desfaz o último passo no store anexado. Retorna o passo desfeito (None se não havia)."""
+        if not self.desfeitos_disponiveis or self._store is None:
+            return None
+        passo = self.desfeitos_disponiveis.pop()
+        self._aplicar(reversed(passo.alteracoes), desfazendo=True)
+        self.refazer_disponiveis.append(passo)
+        return passo
+
+    def refazer(self) -> PassoEdicao | None:
+        """Refaz o último passo desfeito. Retorna o passo refeito (None se não havia)."""
+        if not self.refazer_disponiveis or self._store is None:
+            return None
+        passo = self.refazer_disponiveis.pop()
+        self._aplicar(passo.alteracoes, desfazendo=False)
+        self.desfeitos_disponiveis.append(passo)
+        return passo
+
+    def _aplicar(self, alteracoes, desfazendo: bool):
+        self._aplicando = True
+        try:
+            for posicao, indice, valor_antigo, valor_novo in alteracoes:
+                self._store.definir_campo(posicao, indice, valor_antigo if desfazendo else valor_novo)
+        finally:
+            self._aplicando = False
+
+    # --- Persistência ---
+
+    def salvar(self, caminho: str, caminho_origem: str | None = None):
+        """
+        Grava o jornal em JSON. 'caminho_origem' (padrão: o do store anexado) e o tamanho
+        desse arquivo são guardados para conferência ao reaplicar.
+        """
+        if caminho_origem is None and self._store is not None:
+            caminho_origem = self._store.caminho_origem
+        conteudo = {
+            "versao": VERSAO_FORMATO_JORNAL,
+            "arquivo_origem": caminho_origem,
+            "tamanho_origem": os.path.getsize(caminho_origem) if caminho_origem and os.path.isfile(caminho_origem) else None,
+            "passos": [_passo_para_dict(passo) for passo in self.desfeitos_disponiveis],
+            "refazer": [_passo_para_dict(passo) for passo in self.refazer_disponiveis],
+        }
+        import json # Só ao salvar/carregar: o jornal é criado na inicialização da janela
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            json.dump(conteudo, arquivo, ensure_ascii=False)
+
+    @classmethod
+    def carregar(cls, caminho: str) -> "JornalEdicoes":
+        """Lê um jornal gravado por salvar(). Levanta ValueError se o formato não for reconhecido."""
+        import json
+        with open(caminho, 'r', encoding='utf-8') as arquivo:
+            conteudo = json.load(arquivo)
+        if not isinstance(conteudo, dict) or conteudo.get("versao") != VERSAO_FORMATO_JORNAL:
+            raise ValueError(f"Formato de jornal de edições não reconhecido: '{caminho}'")
+        jornal = cls()
+        jornal.desfeitos_disponiveis = [_passo_de_dict(passo) for passo in conteudo.get("passos", [])]
+        jornal.refazer_disponiveis = [_passo_de_dict(passo) for passo in conteudo.get("refazer", [])]
+        jornal.arquivo_origem = conteudo.get("arquivo_origem")
+        jornal.tamanho_origem = conteudo.get("tamanho_origem")
+        return jornal
+
+    def reaplicar(self, store: RegistroStore):
+        """
+        Reaplica todos os passos do jornal sobre 'store' (o arquivo original recém-carregado)
+        e anexa o jornal a ele, de forma que desfazer/refazer continuam funcionando.
+
+        Antes de alterar qualquer campo, confere que cada valor antigo registrado bate com o
+        conteúdo do store; se não bater (outro arquivo, ou o arquivo mudou), levanta ValueError
+        e o store não é modificado.
+        """
+        valores_atuais: dict[tuple[int, int], str | None] = {}
+        for passo in self.desfeitos_disponiveis:
+            for posicao, indice, valor_antigo, valor_novo in passo.alteracoes:
+                chave = (posicao, indice)
+                atual = valores_atuais[chave] if chave in valores_atuais else (
+                    store.obter_campo(posicao, indice) if 0 <= posicao < len(store) else None)
+                if atual != valor_antigo:
+                    raise ValueError(f"O jornal não corresponde ao arquivo: registro {posicao}, campo {indice} "
+                                     f"deveria ser '{valor_antigo}', mas é '{atual}'.")
+                valores_atuais[chave] = valor_novo
+
+        self.anexar(store)
+        for passo in self.desfeitos_disponiveis:
+            self._aplicar(passo.alteracoes, desfazendo=False)
+
+
+def _passo_para_dict(passo: PassoEdicao) -> dict:
+    return {"descricao": passo.descricao, "alteracoes": [list(alteracao) for alteracao in passo.alteracoes]}
+
+def _passo_de_dict(dados: dict) -> PassoEdicao:
+    return PassoEdicao(dados["descricao"], [(int(p), int(i), str(antigo), str(novo))
+                                            for p, i, antigo, novo in dados["alteracoes"]])
@@ -0,0 +1,121 @@
+# efd_numerico.py
+
+"""
+Codec de ponto fixo para campos monetários e alíquotas da EFD ("1234,56", "1,6500").
+
+Os valores são representados como inteiros escalados: "1234,56" -> (123456, 2), ou seja,
+123456 × 10^-2. As contas das regras são feitas com inteiros e o resultado é formatado de
+volta com arredondamento "meio para o par" (ROUND_HALF_EVEN), reproduzindo exatamente o
+que Decimal.quantize e f"{Decimal:.2f}" produzem no contexto padrão.
+
+Textos fora do formato canônico (espaços, expoente, "NaN", "-0", mais de 28 dígitos...)
+levantam ForaDoCaminhoRapido; nesses casos o chamador deve usar Decimal, que já trata
+(ou rejeita) essas formas.
+"""
+import re
+
+try:
+    import numpy as np # Opcional: acelera as contas em lote
+except ImportError:
+    np = None
+
+class ForaDoCaminhoRapido(ValueError):
+    """O texto não está no formato canônico; use o caminho com Decimal."""
+
+_PADRAO_NUMERO = re.compile(r"(-?)(\d+)(?:[.,](\d+))?")
+_PRECISAO_DECIMAL = 28 # Precisão do contexto padrão de Decimal
+
+def decodificar(texto: str) -> tuple[int, int]:
+    """
+    Converte o texto de um campo numérico em (inteiro, casas decimais).
+    Ex: "1234,56" -> (123456, 2); "10" -> (10, 0); "-0,5" -> (-5, 1).
+    """
+    correspondencia = _PADRAO_NUMERO.fullmatch(texto)
+    if correspondencia is None:
+        raise ForaDoCaminhoRapido(texto)
+    sinal, parte_inteira, parte_decimal = correspondencia.groups()
+    digitos = parte_inteira + (parte_decimal or "")
+    if len(digitos) > _PRECISAO_DECIMAL:
+        raise ForaDoCaminhoRapido(texto)
+    inteiro = int(digitos)
+    if sinal:
+        if inteiro == 0:
+            raise ForaDoCaminhoRapido(texto) # "-0": Decimal preserva o sinal do zero
+        inteiro = -inteiro
+    return inteiro, len(parte_decimal or "")
+
+def alinhar(*valores: tuple[int, int]) -> tuple[list[int], int]:
+    """Leva vários (inteiro, casas) para a mesma escala, sem perda. Retorna (inteiros, casas)."""
+    casas = max(c for _, c in valores)
+    return [inteiro * 10 ** (casas - c) for inteiro, c in valores], casas
+
+def _arredondar_meio_par(magnitude: int, divisor: int) -> int:
+    """Divide 'magnitude' (>= 0) por 'divisor' arredondando meio para o par."""
+    quociente, resto = divmod(magnitude, divisor)
+    if 2 * resto > divisor or (2 * resto == divisor and quociente & 1):
+        quociente += 1
+    return quociente
+
+def codificar(inteiro: int, casas_origem: int, casas: int = 2, negativo: bool | None = None) -> str:
+    """
+    Formata inteiro × 10^-casas_origem com 'casas' decimais e vírgula, como f"{Decimal:.2f}".
+    'negativo' força o sinal (necessário quando o resultado arredonda para zero, ex: "-0,00").
+    """
+    if negativo is None:
+        negativo = inteiro < 0
+    magnitude = abs(inteiro)
+    if casas_origem > casas:
+        magnitude = _arredondar_meio_par(magnitude, 10 ** (casas_origem - casas))
+    elif casas_origem < casas:
+        magnitude *= 10 ** (casas - casas_origem)
+    texto = str(magnitude).rjust(casas + 1, "0")
+    if casas:
+        texto = f"{texto[:-casas]},{texto[-casas:]}"
+    return f"-{texto}" if negativo else texto
+
+def aplicar_aliquota_percentual(base: tuple[int, int], aliquota: tuple[int, int], casas: int = 2) -> str:
+    """
+    Calcula base × (aliquota / 100), arredondado para 'casas' decimais (ROUND_HALF_EVEN).
+    Equivale a (Decimal(base) * (Decimal(aliquota) / 100)).quantize(Decimal('0.01')).
+    """
+    (b, casas_b), (a, casas_a) = base, aliquota
+    produto = b * a
+    if len(str(abs(produto))) > _PRECISAO_DECIMAL:
+        raise ForaDoCaminhoRapido(f"{base} x {aliquota}") # Decimal arredondaria o produto antes do quantize
+    negativo = (b < 0) != (a < 0) # Decimal mantém o sinal mesmo quando o produto é zero
+    return codificar(produto, casas_b + casas_a + 2, casas, negativo)
+
+def aplicar_aliquota_percentual_lote(bases: list[tuple[int, int]], aliquotas: list[tuple[int, int]],
+                                     casas: int = 2) -> list[str | None]:
+    """
+    Versão em lote de aplicar_aliquota_percentual, com resultados idênticos.
+    Com NumPy disponível (e valores que cabem em int64), multiplicação e arredondamento
+    são vetorizados; caso contrário, usa inteiros do Python. Posições que exigiriam
+    o caminho com Decimal (produto com mais de 28 dígitos) retornam None.
+    """
+    if not bases:
+        return []
+    inteiros_b, casas_b = alinhar(*bases)
+    inteiros_a, casas_a = alinhar(*aliquotas)
+    escala = casas_b + casas_a + 2 - casas
+
+    if np is not None and 0 <= escala <= 18:
+        maior_b = max(map(abs, inteiros_b))
+        maior_a = max(map(abs, inteiros_a))
+        if maior_b * maior_a < 2**62:
+            vetor_b = np.array(inteiros_b, dtype=np.int64)
+            vetor_a = np.array(inteiros_a, dtype=np.int64)
+            negativos = (vetor_b < 0) != (vetor_a < 0)
+            divisor = 10 ** escala
+            quocientes, restos = np.divmod(np.abs(vetor_b * vetor_a), divisor)
+            arredonda = (2 * restos > divisor) | ((2 * restos == divisor) & (quocientes % 2 == 1))
+            magnitudes = quocientes + arredonda
+            return [codificar(int(m), casas, casas, bool(n)) for m, n in zip(magnitudes.tolist(), negativos.tolist())]
+
+    resultados: list[str | None] = []
+    for base, aliquota in zip(bases, aliquotas):
+        try:
+            resultados.append(aplicar_aliquota_percentual(base, aliquota, casas))
+        except ForaDoCaminhoRapido:
+            resultados.append(None)
+    return resultados
@@ -1,60 +1,303 @@
 # efd_parser.py
 
-from .efd_structures import RegistroEFD  # Importa a classe que definimos
+import mmap
+import os
+from array import array
+from collections.abc import Callable, Iterator
 
-def parse_efd_file(filepath: str) -> list[RegistroEFD]:
+from .efd_structures import (RegistroEFD, RegistroStore, OperacaoCancelada,  # Importa as classes que definimos
+                             ProblemasLeitura, PROBLEMA_SEM_PIPES, PROBLEMA_TIPO_AUSENTE,
+                             INTERVALO_PROGRESSO, ESPACOS_LINHA, identidade_arquivo, typecode_offsets)
+from .efd_hierarquia import IndiceEFD, construir_indice
+from .efd_instrumentacao import cronometrado, medir, contar
+
+def iter_efd_records(filepath: str, problemas: ProblemasLeitura | None = None) -> Iterator[RegistroEFD]:
     """
-    Lê um arquivo EFD Contribuições (.txt) e faz o parse das linhas em objetos RegistroEFD.
+    Lê um arquivo EFD Contribuições (.txt) linha a linha, produzindo um RegistroEFD por vez.
+
+    Diferente de parse_efd_file, nada é acumulado em memória: cada registro é entregue
+    assim que a linha é lida, de forma que o consumo de memória não depende do tamanho
+    do arquivo. Erros de abertura (ex: FileNotFoundError) são propagados ao chamador.
 
     Args:
         filepath (str): O caminho para o arquivo .txt da EFD Contribuições.
+        problemas (ProblemasLeitura | None): Recebe as linhas descartadas (sem pipes nas
+                       pontas ou sem tipo) e o erro que interromper a leitura, se houver.
+                       Nada é escrito no console.
 
-    Returns:
-        list[RegistroEFD]: Uma lista de objetos RegistroEFD representando o arquivo.
-                           Retorna uma lista vazia em caso de erro ao abrir o arquivo
-                           ou se o arquivo estiver vazio.
+    Yields:
+        RegistroEFD: Os registros válidos do arquivo, na ordem em que aparecem.
     """
-    registros: list[RegistroEFD] = []
-    try:
-        # EFD Contribuições usualmente utiliza a codificação 'latin-1' ou 'cp1252'
-        with open(filepath, 'r', encoding='latin-1') as file:
-            for linha_num, linha_str in enumerate(file, 1):
-                linha_str = linha_str.strip()
+    # Lido em bytes, com as mesmas regras de carregar_registro_store: linhas separadas só por
+    # b'\n' e pontas sem ESPACOS_LINHA. O texto é decodificado depois, em 'latin-1' (a EFD
+    # Contribuições usualmente utiliza 'latin-1' ou 'cp1252')
+    with open(filepath, 'rb') as file:
+        offset = 0
+        linha_num = 0
+        try:
+            for linha_num, linha_bruta in enumerate(file, 1):
+                inicio = offset
+                offset += len(linha_bruta)
+                linha = linha_bruta.strip(ESPACOS_LINHA)
 
-                if not linha_str:  # Pula linhas em branco
+                if not linha:  # Pula linhas em branco
                     continue
 
                 # Verifica se a linha tem o formato mínimo esperado (começa e termina com pipe)
-                if not linha_str.startswith('|') or not linha_str.endswith('|'):
-                    print(f"Alerta: Linha {linha_num} não parece ser um registro EFD válido (não começa/termina com '|'): '{linha_str[:50]}...'")
+                if not linha.startswith(b'|') or not linha.endswith(b'|'):
+                    if problemas is not None:
+                        problemas.registrar(linha_num, inicio, PROBLEMA_SEM_PIPES, linha[:50])
                     continue
 
                 # Remove o pipe inicial e final para facilitar o split
                 # Ex: "|0000|LEIAUTE|..." -> "0000|LEIAUTE|..."
-                campos_str = linha_str[1:-1]
-                
+                campos_str = linha[1:-1].decode('latin-1')
+
                 # Divide a string pelos campos usando o delimitador '|'
                 lista_de_campos = campos_str.split('|')
 
                 if not lista_de_campos or not lista_de_campos[0]: # Deve haver pelo menos o tipo do registro
-                    print(f"Alerta: Linha {linha_num} resultou em campos vazios ou tipo de registro ausente: '{linha_str[:50]}...'")
+                    if problemas is not None:
+                        problemas.registrar(linha_num, inicio, PROBLEMA_TIPO_AUSENTE, linha[:50])
                     continue
-                
+
                 tipo_registro = lista_de_campos[0]
-                
-                # Cria o objeto RegistroEFD
-                registro = RegistroEFD(tipo_registro=tipo_registro, campos=lista_de_campos)
-                registros.append(registro)
 
-    except FileNotFoundError:
+                yield RegistroEFD(tipo_registro=tipo_registro, campos=lista_de_campos)
+        except Exception as e:
+            if problemas is not None:
+                problemas.registrar_erro(linha_num + 1, offset, e)
+            raise
+
+@cronometrado("parse_efd_file", "leitura")
+def parse_efd_file(filepath: str, problemas: ProblemasLeitura | None = None) -> list[RegistroEFD]:
+    """
+    Lê um arquivo EFD Contribuições (.txt) e faz o parse das linhas em objetos RegistroEFD.
+
+    É um invólucro fino sobre iter_efd_records que materializa todos os registros em
+    uma lista. Para arquivos muito grandes, prefira iter_efd_records.
+
+    Args:
+        filepath (str): O caminho para o arquivo .txt da EFD Contribuições.
+        problemas (ProblemasLeitura | None): Recebe as linhas descartadas e o erro que
+                       interromper a leitura (ver ProblemasLeitura).
+
+    Returns:
+        list[RegistroEFD]: Uma lista de objetos RegistroEFD representando o arquivo.
+                           Vazia se o arquivo não puder ser aberto ou estiver vazio; se
+                           um erro interromper a leitura, contém os registros lidos até ali.
+    """
+    registros: list[RegistroEFD] = []
+    try:
+        registros.extend(iter_efd_records(filepath, problemas)) # extend mantém o que foi lido antes de um erro
+    except FileNotFoundError as e:
         print(f"Erro: Arquivo não encontrado em '{filepath}'")
-        return []
+        if problemas is not None:
+            problemas.registrar_erro(0, 0, e)
     except Exception as e:
-        print(f"Erro ao processar o arquivo '{filepath}': {e}")
-        return []
-        
+        print(f"Erro ao processar o arquivo '{filepath}': {e} ({len(registros)} registro(s) lido(s) até o erro)")
     return registros
 
+def parse_efd_file_com_indice(filepath: str, problemas: ProblemasLeitura | None = None) -> tuple[list[RegistroEFD], IndiceEFD]:
+    """
+    Igual a parse_efd_file, mas retorna também o IndiceEFD (tipo -> posições, faixas de
+    bloco e ligações pai/filho) dos registros lidos.
+    """
+    registros = parse_efd_file(filepath, problemas)
+    return registros, construir_indice((r.tipo_registro for r in registros), len(registros))
+
+@cronometrado("carregar_registro_store", "leitura")
+def carregar_registro_store(filepath: str, mapear: bool = False,
+                            progresso: Callable[[int, int], None] | None = None,
+                            problemas: ProblemasLeitura | None = None) -> RegistroStore:
+    """
+    Lê um arquivo EFD Contribuições para um RegistroStore (armazenamento colunar compacto).
+
+    Aplica as mesmas validações de iter_efd_records, mas em vez de um objeto por linha
+    guarda apenas o buffer de bytes do arquivo, os offsets dos pipes de cada registro e o
+    código internado do tipo de registro.
+
+    Args:
+        filepath (str): O caminho para o arquivo .txt da EFD Contribuições.
+        mapear (bool): Se True, mapeia o arquivo com mmap e indexa apenas o início/fim de
+                       cada linha e o tipo do registro; os campos só são divididos quando o
+                       registro é acessado (obter_campo/campos). Indicado para arquivos muito
+                       grandes, dos quais só alguns registros serão abertos.
+        progresso (Callable[[int, int], None] | None): Chamado periodicamente com
+                       (bytes_lidos, linhas_lidas). Pode levantar OperacaoCancelada para
+                       interromper a leitura; a exceção é propagada ao chamador.
+        problemas (ProblemasLeitura | None): Coletor das linhas descartadas; se omitido, um
+                       novo é criado. Nos dois casos fica em store.problemas_leitura.
+
+    Returns:
+        RegistroStore: O store com os registros válidos. Vazio em caso de erro (descrito
+                       em store.problemas_leitura.erro).
+    """
+    if problemas is None:
+        problemas = ProblemasLeitura()
+    try:
+        with open(filepath, 'rb') as file:
+            estado = os.fstat(file.fileno())
+            if mapear:
+                if estado.st_size == 0:  # mmap não aceita arquivos vazios
+                    return _com_indice(RegistroStore(caminho_origem=filepath), problemas)
+                mapa = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                store = _com_indice(_indexar_linhas_mapeadas(mapa, filepath, progresso, problemas), problemas)
+                store.identidade_origem = identidade_arquivo(estado)
+                return store
+            with medir("ler arquivo", "leitura"):
+                dados = file.read()
+    except OperacaoCancelada:
+        raise
+    except FileNotFoundError as e:
+        print(f"Erro: Arquivo não encontrado em '{filepath}'")
+        problemas.registrar_erro(0, 0, e)
+        return _com_indice(RegistroStore(), problemas)
+    except Exception as e:
+        print(f"Erro ao processar o arquivo '{filepath}': {e}")
+        problemas.registrar_erro(0, 0, e)
+        return _com_indice(RegistroStore(), problemas)
+
+    typecode = typecode_offsets(len(dados))
+    inicio_linhas = array(typecode)
+    fim_linhas = array(typecode)
+    limites_campos = array(typecode)
+    primeiro_limite = array(typecode)
+    codigos_tipo = array('H')
+    tipos: list[str] = []
+    codigo_por_tipo: dict[bytes, int] = {}
+
+    linhas_regulares = True # Nenhuma linha descartada nem com espaços em volta (ver RegistroStore)
+    pos = 0
+    tamanho = len(dados)
+    linha_num = 0
+    while pos < tamanho:
+        linha_num += 1
+        if progresso is not None and linha_num % INTERVALO_PROGRESSO == 0:
+            progresso(pos, linha_num)
+        fim_bruto = dados.find(b'\n', pos)
+        if fim_bruto == -1:
+            fim_bruto = tamanho
+        linha_bruta = dados[pos:fim_bruto]
+        linha = linha_bruta.strip(ESPACOS_LINHA)
+        inicio = pos + (len(linha_bruta) - len(linha_bruta.lstrip(ESPACOS_LINHA)))
+        pos = fim_bruto + 1
+        if len(linha) + (linha_bruta[-1:] == b'\r') != len(linha_bruta):
+            linhas_regulares = False
+
+        if not linha:  # Pula linhas em branco
+            continue
+
+        if not linha.startswith(b'|') or not linha.endswith(b'|'):
+            problemas.registrar(linha_num, inicio, PROBLEMA_SEM_PIPES, linha[:50])
+            linhas_regulares = False
+            continue
+
+        partes = linha.split(b'|')  # partes[0] e partes[-1] são vazias (pipes das pontas)
+        tipo_bytes = partes[1]
+        if not tipo_bytes:
+            linhas_regulares = False
+            problemas.registrar(linha_num, inicio, PROBLEMA_TIPO_AUSENTE, linha[:50])
+            continue
+
+        codigo = codigo_por_tipo.get(tipo_bytes)
+        if codigo is None:
+            codigo = len(tipos)
+            codigo_por_tipo[tipo_bytes] = codigo
+            tipos.append(tipo_bytes.decode('latin-1'))
+
+        inicio_linhas.append(inicio)
+        fim_linhas.append(inicio + len(linha))
+        codigos_tipo.append(codigo)
+        primeiro_limite.append(len(limites_campos))
+        offset = inicio
+        for parte in partes[:-1]:
+            offset += len(parte)
+            limites_campos.append(offset)
+            offset += 1
+
+    if progresso is not None:
+        progresso(tamanho, linha_num)
+    store = _com_indice(RegistroStore(dados, inicio_linhas, fim_linhas, codigos_tipo, tipos,
+                                      limites_campos, primeiro_limite, caminho_origem=filepath,
+                                      linhas_regulares=linhas_regulares), problemas)
+    store.identidade_origem = identidade_arquivo(estado)
+    return store
+
+@cronometrado("construir índice", "leitura")
+def _com_indice(store: RegistroStore, problemas: ProblemasLeitura) -> RegistroStore:
+    """Constrói o IndiceEFD do store a partir dos códigos de tipo já internados e anexa os problemas de leitura."""
+    contar("leitura.registros", len(store))
+    contar("leitura.linhas_ignoradas", problemas.total)
+    store.problemas_leitura = problemas
+    store.indice = construir_indice(map(store.tipos.__getitem__, store.codigos_tipo), len(store))
+    return store
+
+@cronometrado("indexar linhas (mmap)", "leitura")
+def _indexar_linhas_mapeadas(dados: mmap.mmap, filepath: str,
+                             progresso: Callable[[int, int], None] | None,
+                             problemas: ProblemasLeitura) -> RegistroStore:
+    """
+    Indexa um arquivo mapeado em memória guardando só o início/fim de cada registro e o
+    código do tipo. Nenhum campo é dividido aqui (ver RegistroStore, modo preguiçoso).
+    """
+    typecode = typecode_offsets(len(dados))
+    inicio_linhas = array(typecode)
+    fim_linhas = array(typecode)
+    codigos_tipo = array('H')
+    tipos: list[str] = []
+    codigo_por_tipo: dict[bytes, int] = {}
+    linhas_regulares = True
+
+    pos = 0
+    tamanho = len(dados)
+    linha_num = 0
+    while pos < tamanho:
+        linha_num += 1
+        if progresso is not None and linha_num % INTERVALO_PROGRESSO == 0:
+            progresso(pos, linha_num)
+        fim = dados.find(b'\n', pos)
+        if fim == -1:
+            fim = tamanho
+        inicio = pos
+        pos = fim + 1
+
+        # Caminho comum: a linha começa com '|' e termina em '|' ou '|\r'
+        if dados[fim - 1:fim] == b'\r':
+            fim -= 1
+        if dados[inicio:inicio + 1] != b'|' or dados[fim - 1:fim] != b'|' or fim - inicio < 2:
+            linhas_regulares = False
+            linha = dados[inicio:fim].strip(ESPACOS_LINHA)
+            if not linha:  # Pula linhas em branco
+                continue
+            if not linha.startswith(b'|') or not linha.endswith(b'|'):
+                problemas.registrar(linha_num, inicio, PROBLEMA_SEM_PIPES, linha[:50])
+                continue
+            inicio = dados.find(linha, inicio, fim)
+            fim = inicio + len(linha)
+
+        fim_tipo = dados.find(b'|', inicio + 1, fim)
+        tipo_bytes = dados[inicio + 1:fim_tipo] if fim_tipo != -1 else b''  # -1: a linha é só "|"
+        if not tipo_bytes:
+            linhas_regulares = False
+            problemas.registrar(linha_num, inicio, PROBLEMA_TIPO_AUSENTE, dados[inicio:min(fim, inicio + 50)])
+            continue
+
+        codigo = codigo_por_tipo.get(tipo_bytes)
+        if codigo is None:
+            codigo = len(tipos)
+            codigo_por_tipo[tipo_bytes] = codigo
+            tipos.append(tipo_bytes.decode('latin-1'))
+
+        inicio_linhas.append(inicio)
+        fim_linhas.append(fim)
+        codigos_tipo.append(codigo)
+
+    if progresso is not None:
+        progresso(tamanho, linha_num)
+    return RegistroStore(dados, inicio_linhas, fim_linhas, codigos_tipo, tipos, caminho_origem=filepath,
+                         linhas_regulares=linhas_regulares)
+
 # Exemplo de uso (para teste, pode ser movido para um script de teste ou main.py depois):
 # if __name__ == '__main__':
 #     # Crie um arquivo dummy_efd.txt para testar, por exemplo:
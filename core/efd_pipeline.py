@@ -0,0 +1,76 @@
+# efd_pipeline.py
+
+"""
+Pipeline de retificação em fluxo (streaming) para arquivos EFD Contribuições.
+
+Lê o arquivo de entrada registro a registro, aplica as regras de automação e grava
+o resultado diretamente no arquivo de saída, sem manter o arquivo inteiro em memória.
+"""
+import os
+from collections.abc import Iterator
+
+from .efd_parser import iter_efd_records
+from .efd_generator import generate_efd_file
+from .efd_structures import RegistroEFD, ProblemasLeitura
+from .efd_record_automations import coletando_mensagens
+
+LIMITE_MENSAGENS_ERRO = 100 # Máximo de mensagens de erro guardadas no resumo
+
+def _aplicar_regras_em_fluxo(registros: Iterator[RegistroEFD], regras: dict, resumo: dict) -> Iterator[RegistroEFD]:
+    """
+    Aplica as regras a cada registro à medida que ele passa pelo pipeline.
+    As regras recebem 'todos_os_registros=None', já que o arquivo não está em memória.
+    Suas mensagens não vão para o console: só as das aplicações com erro entram no resumo.
+    """
+    with coletando_mensagens([]) as mensagens:
+        for registro in registros:
+            resumo["registros_lidos"] += 1
+            regras_do_tipo = regras.get(registro.tipo_registro)
+            if regras_do_tipo:
+                alterado = False
+                for regra_info in regras_do_tipo:
+                    mensagens.clear()
+                    resultado = regra_info["funcao"](registro, None)
+                    if resultado is None:
+                        resumo["erros"] += 1
+                        if len(resumo["mensagens_erro"]) < LIMITE_MENSAGENS_ERRO:
+                            resumo["mensagens_erro"].append(f"Registro {resumo['registros_lidos']} ({registro.tipo_registro}): {' '.join(mensagens)}")
+                    elif resultado:
+                        alterado = True
+                if alterado:
+                    resumo["registros_alterados"] += 1
+            yield registro
+
+def retificar_efd_em_fluxo(caminho_entrada: str, caminho_saida: str, regras: dict) -> dict:
+    """
+    Executa o pipeline leitura -> regras -> gravação em uma única passagem.
+
+    Args:
+        caminho_entrada (str): Arquivo EFD original (.txt).
+        caminho_saida (str): Arquivo onde a EFD retificada será gravada.
+        regras (dict): Regras a aplicar, no mesmo formato de 'regras_disponiveis'
+                       (tipo_registro -> lista de dicionários de regra). As regras de um
+                       tipo são executadas na ordem da lista.
+
+    Returns:
+        dict: Resumo com "sucesso", "registros_lidos", "registros_alterados", "erros"
+              (quantidade de aplicações de regra que retornaram None) e "mensagens_erro"
+              (as primeiras mensagens dessas aplicações); "problemas_leitura", o resumo das
+              linhas descartadas pelo parser (ver ProblemasLeitura.resumo); e "erro", o motivo
+              da falha quando "sucesso" é False (None caso contrário).
+    """
+    problemas = ProblemasLeitura()
+    resumo = {"sucesso": False, "registros_lidos": 0, "registros_alterados": 0, "erros": 0, "mensagens_erro": [],
+              "problemas_leitura": problemas.resumo(), "erro": None}
+    # Verifica a entrada antes de criar o arquivo de saída (o gerador só abre o arquivo na primeira leitura)
+    if not os.path.isfile(caminho_entrada):
+        resumo["erro"] = f"Arquivo não encontrado em '{caminho_entrada}'"
+        return resumo
+
+    registros = _aplicar_regras_em_fluxo(iter_efd_records(caminho_entrada, problemas), regras, resumo)
+    resumo["sucesso"] = generate_efd_file(caminho_saida, registros)
+    resumo["problemas_leitura"] = problemas.resumo()
+    if not resumo["sucesso"]:
+        # O gerador só devolve False: o erro de leitura fica em 'problemas'; sem ele, a falha foi na gravação
+        resumo["erro"] = problemas.erro or f"Não foi possível gravar '{caminho_saida}'"
+    return resumo
@@ -3,8 +3,91 @@
 """
 Define regras de automação aplicáveis a registros específicos da EFD Contribuições.
 """
+import time
+from contextlib import contextmanager
 from decimal import Decimal, InvalidOperation # Usar Decimal para precisão financeira
 
+from .efd_numerico import (ForaDoCaminhoRapido, decodificar, alinhar, codificar,
+                           aplicar_aliquota_percentual, aplicar_aliquota_percentual_lote)
+from .efd_schema import SCHEMA_EFD
+from .efd_instrumentacao import cronometrado, medir, contar
+
+# Schemas compilados dos registros usados pelas regras (acesso aos campos por nome, ver core.efd_schema)
+_M210 = SCHEMA_EFD["M210"]
+_M100 = SCHEMA_EFD["M100"]
+_M200 = SCHEMA_EFD["M200"]
+_1100 = SCHEMA_EFD["1100"]
+
+# Códigos de contribuição (COD_CONT do M210) totalizados em cada campo do M200
+COD_CONT_NAO_CUMULATIVA = frozenset({"01", "02", "03", "04", "32", "71"})
+COD_CONT_CUMULATIVA = frozenset({"31", "32", "51", "52", "53", "54", "72"})
+
+# --- Mensagens das Regras ---
+# Fora de um lote, as mensagens vão para o console como sempre. Durante aplicar_regras_em_lote
+# elas são coletadas por registro (e só guardadas no relatório quando a regra falha), evitando
+# centenas de milhares de escritas no console.
+_mensagens_coletadas: list[str] | None = None
+
+def _avisar(mensagem: str):
+    if _mensagens_coletadas is None:
+        print(mensagem)
+    else:
+        _mensagens_coletadas.append(mensagem)
+
+@contextmanager
+def coletando_mensagens(mensagens: list[str]):
+    """Enquanto ativo, as mensagens das regras vão para 'mensagens' em vez do console."""
+    global _mensagens_coletadas
+    anteriores = _mensagens_coletadas
+    _mensagens_coletadas = mensagens
+    try:
+        yield mensagens
+    finally:
+        _mensagens_coletadas = anteriores
+
+# --- Aritmética das Regras ---
+# O caminho rápido usa o codec de ponto fixo (core.efd_numerico); textos fora do formato
+# canônico caem no caminho com Decimal, de forma que o resultado é sempre o mesmo.
+
+def _formatar_decimal(valor: Decimal) -> str:
+    return f"{valor:.2f}".replace('.', ',')
+
+def _aplicar_aliquota(base_str: str, aliquota_str: str) -> str:
+    """base × (alíquota / 100), com 2 casas. Levanta InvalidOperation para textos inválidos."""
+    try:
+        return aplicar_aliquota_percentual(decodificar(base_str), decodificar(aliquota_str))
+    except ForaDoCaminhoRapido:
+        base = Decimal(base_str.replace(',', '.'))
+        aliquota = Decimal(aliquota_str.replace(',', '.'))
+        return _formatar_decimal((base * (aliquota / Decimal('100'))).quantize(Decimal('0.01')))
+
+def _ler_valores(*textos: str):
+    """
+    Lê campos monetários para comparação/subtração. Retorna (valores, formatar): inteiros na
+    mesma escala com o formatador do codec ou, fora do caminho rápido, Decimals com f"{:.2f}".
+    Levanta InvalidOperation para textos inválidos.
+    """
+    try:
+        valores, casas = alinhar(*(decodificar(texto) for texto in textos))
+        return valores, lambda valor: codificar(valor, casas)
+    except ForaDoCaminhoRapido:
+        return [Decimal(texto.replace(',', '.')) for texto in textos], _formatar_decimal
+
+def _combinar(parcelas: list[tuple[int, str | None]]) -> str:
+    """
+    Soma sinal × valor de cada parcela (sinal 1 ou -1), com 2 casas. Campos vazios ou
+    ausentes valem zero. Levanta InvalidOperation para textos inválidos.
+    """
+    if not parcelas:
+        return "0,00"
+    valores, formatar_valor = _ler_valores(*((texto or "0") for _, texto in parcelas))
+    return formatar_valor(sum(sinal * valor for (sinal, _), valor in zip(parcelas, valores)))
+
+def _definir_se_diferente(registro, indice: int, valor: str, campos_modificados_indices: list[int]):
+    if registro.obter_campo(indice) != valor:
+        registro.definir_campo(indice, valor)
+        campos_modificados_indices.append(indice)
+
 # --- Funções de Regra ---
 # Cada função de regra deve aceitar o objeto 'registro' como primeiro argumento.
 # Pode, opcionalmente, aceitar 'todos_os_registros' se precisar de contexto mais amplo.
@@ -13,47 +96,80 @@ from decimal import Decimal, InvalidOperation # Usar Decimal para precisão fina
 
 def calcular_contribuicao_m210(registro_m210, todos_os_registros=None) -> list[int] | None: 
     """
-    Calcula o VL_CONT_APUR (campo 5) do registro M210.
+    Calcula o VL_CONT_APUR (campo 7) do registro M210: VL_BC_CONT × ALIQ_PIS / 100.
     Retorna lista de índices de campos modificados, lista vazia se nada mudou, ou None em caso de erro.
     """
     campos_modificados_indices = [] 
     try:
-        idx_vl_bc_cont = 3
-        idx_aliq_pis = 4
-        idx_vl_cont_apur = 5
+        m210 = _M210.acessar(registro_m210)
+        idx_vl_cont_apur = _M210.indices["VL_CONT_APUR"]
         
-        vl_bc_cont_str = registro_m210.obter_campo(idx_vl_bc_cont)
-        aliq_pis_str = registro_m210.obter_campo(idx_aliq_pis)
+        vl_bc_cont_str = m210.VL_BC_CONT
+        aliq_pis_str = m210.ALIQ_PIS
 
         if vl_bc_cont_str is None or aliq_pis_str is None:
-            print(f"M210 (Calc Contrib): Campos {idx_vl_bc_cont} ou {idx_aliq_pis} não encontrados.")
+            _avisar("M210 (Calc Contrib): Campos VL_BC_CONT ou ALIQ_PIS não encontrados.")
             return None # Erro: campo não encontrado
 
-        vl_bc_cont = Decimal(vl_bc_cont_str.replace(',', '.'))
-        aliq_pis = Decimal(aliq_pis_str.replace(',', '.'))
-        
-        vl_cont_apur_calculado = (vl_bc_cont * (aliq_pis / Decimal('100'))).quantize(Decimal('0.01'))
-        vl_cont_apur_calculado_str = f"{vl_cont_apur_calculado:.2f}".replace('.', ',')
+        vl_cont_apur_calculado_str = _aplicar_aliquota(vl_bc_cont_str, aliq_pis_str)
         
-        valor_antigo_cont_apur = registro_m210.obter_campo(idx_vl_cont_apur)
+        valor_antigo_cont_apur = m210.VL_CONT_APUR
         
         if valor_antigo_cont_apur != vl_cont_apur_calculado_str:
-            registro_m210.definir_campo(idx_vl_cont_apur, vl_cont_apur_calculado_str)
+            m210.VL_CONT_APUR = vl_cont_apur_calculado_str
             campos_modificados_indices.append(idx_vl_cont_apur) # Adiciona o índice do campo modificado
-            print(f"Regra 'calcular_contribuicao_m210' aplicada. VL_CONT_APUR (campo {idx_vl_cont_apur}): {vl_cont_apur_calculado_str}")
+            _avisar(f"Regra 'calcular_contribuicao_m210' aplicada. VL_CONT_APUR (campo {idx_vl_cont_apur}): {vl_cont_apur_calculado_str}")
         else:
-            print(f"Regra 'calcular_contribuicao_m210': VL_CONT_APUR já está correto ({vl_cont_apur_calculado_str}). Nenhuma alteração.")
+            _avisar(f"Regra 'calcular_contribuicao_m210': VL_CONT_APUR já está correto ({vl_cont_apur_calculado_str}). Nenhuma alteração.")
             # Nenhuma modificação, campos_modificados_indices permanecerá vazia
             
         return campos_modificados_indices # Retorna a lista (pode estar vazia)
 
     except InvalidOperation:
-        print(f"M210 (Calc Contrib): Erro de conversão de valor. Verifique campos {idx_vl_bc_cont} e {idx_aliq_pis}.")
+        _avisar("M210 (Calc Contrib): Erro de conversão de valor. Verifique os campos VL_BC_CONT e ALIQ_PIS.")
         return None # Erro de conversão
     except Exception as e:
-        print(f"Erro ao aplicar regra 'calcular_contribuicao_m210': {e}")
+        _avisar(f"Erro ao aplicar regra 'calcular_contribuicao_m210': {e}")
         return None # Outro err
 
+def calcular_contribuicao_m210_lote(registros, posicoes) -> list[list[int] | None]:
+    """
+    Versão em lote de calcular_contribuicao_m210, usada pelo motor de lote.
+    Calcula o VL_CONT_APUR de todos os M210 em 'posicoes' de uma vez (vetorizado com NumPy,
+    quando disponível). Retorna, para cada posição, a lista de índices modificados ou None
+    quando o registro precisa passar pela regra individual (campo ausente, valor inválido ou
+    fora do caminho rápido), que então trata o caso e emite as mensagens.
+    """
+    idx_vl_bc_cont = _M210.indices["VL_BC_CONT"]
+    idx_aliq_pis = _M210.indices["ALIQ_PIS"]
+    idx_vl_cont_apur = _M210.indices["VL_CONT_APUR"]
+
+    resultados: list[list[int] | None] = [None] * len(posicoes)
+    linhas_calculaveis: list[int] = []
+    bases, aliquotas = [], []
+    for linha, posicao in enumerate(posicoes):
+        registro = registros[posicao]
+        try:
+            base = decodificar(registro.obter_campo(idx_vl_bc_cont))
+            aliquota = decodificar(registro.obter_campo(idx_aliq_pis))
+        except (ForaDoCaminhoRapido, TypeError): # TypeError: campo ausente (None)
+            continue
+        linhas_calculaveis.append(linha)
+        bases.append(base)
+        aliquotas.append(aliquota)
+
+    calculados = aplicar_aliquota_percentual_lote(bases, aliquotas)
+    for linha, valor_calculado in zip(linhas_calculaveis, calculados):
+        if valor_calculado is None:
+            continue
+        registro = registros[posicoes[linha]]
+        if registro.obter_campo(idx_vl_cont_apur) != valor_calculado:
+            registro.definir_campo(idx_vl_cont_apur, valor_calculado)
+            resultados[linha] = [idx_vl_cont_apur]
+        else:
+            resultados[linha] = []
+    return resultados
+
 def aplicar_logica_utilizacao_credito_m100(registro_m100, todos_os_registros=None) -> list[int] | None:
     """
     Aplica a lógica de utilização de crédito para o registro M100.
@@ -65,38 +181,38 @@ def aplicar_logica_utilizacao_credito_m100(registro_m100, todos_os_registros=Non
     """
     campos_modificados_indices = []
     try:
-        idx_vl_cred_disponivel = 11
-        idx_ind_desc_cred = 12
-        idx_vl_cred_desc = 13     
-        idx_sld_cred_a_diferir = 14
+        m100 = _M100.acessar(registro_m100)
+        idx_vl_cred_disponivel = _M100.indices["VL_CRED_DISP"]
+        idx_ind_desc_cred = _M100.indices["IND_DESC_CRED"]
+        idx_vl_cred_desc = _M100.indices["VL_CRED_DESC"]
+        idx_sld_cred_a_diferir = _M100.indices["SLD_CRED"]
 
-        vl_cred_disponivel_str = registro_m100.obter_campo(idx_vl_cred_disponivel)
-        vl_cred_desc_str = registro_m100.obter_campo(idx_vl_cred_desc)
+        vl_cred_disponivel_str = m100.VL_CRED_DISP
+        vl_cred_desc_str = m100.VL_CRED_DESC
 
         if vl_cred_disponivel_str is None or vl_cred_desc_str is None:
-            print(f"M100 (Lógica Uso): Campo {idx_vl_cred_disponivel} (VL_CRED_DISP) ou {idx_vl_cred_desc} (VL_CRED_DESC) não encontrado.")
+            _avisar(f"M100 (Lógica Uso): Campo {idx_vl_cred_disponivel} (VL_CRED_DISP) ou {idx_vl_cred_desc} (VL_CRED_DESC) não encontrado.")
             return None
 
-        cred_disponivel = Decimal(vl_cred_disponivel_str.replace(',', '.'))
-        cred_utilizado = Decimal(vl_cred_desc_str.replace(',', '.'))
+        (cred_disponivel, cred_utilizado), formatar_valor = _ler_valores(vl_cred_disponivel_str, vl_cred_desc_str)
         
         novo_ind_desc_cred = ""
         
         # Lógica para ajuste e verificação do VL_CRED_DESC (idx_vl_cred_desc)
-        if cred_utilizado < Decimal('0'):
-            print("M100 (Lógica Uso): Valor do Crédito Utilizado (VL_CRED_DESC) não pode ser negativo. Regra não aplicada.")
+        if cred_utilizado < 0:
+            _avisar("M100 (Lógica Uso): Valor do Crédito Utilizado (VL_CRED_DESC) não pode ser negativo. Regra não aplicada.")
             return None
         
         if cred_utilizado > cred_disponivel:
-            print(f"M100 (Lógica Uso): Alerta! Crédito Utilizado ({cred_utilizado}) maior que o Disponível ({cred_disponivel}). Ajustando VL_CRED_DESC para o máximo disponível.")
+            _avisar(f"M100 (Lógica Uso): Alerta! Crédito Utilizado ({vl_cred_desc_str}) maior que o Disponível ({vl_cred_disponivel_str}). Ajustando VL_CRED_DESC para o máximo disponível.")
             cred_utilizado = cred_disponivel 
-            novo_vl_cred_desc_str = f"{cred_utilizado:.2f}".replace('.', ',')
-            if registro_m100.obter_campo(idx_vl_cred_desc) != novo_vl_cred_desc_str:
-                 registro_m100.definir_campo(idx_vl_cred_desc, novo_vl_cred_desc_str)
+            novo_vl_cred_desc_str = formatar_valor(cred_utilizado)
+            if m100.VL_CRED_DESC != novo_vl_cred_desc_str:
+                 m100.VL_CRED_DESC = novo_vl_cred_desc_str
                  campos_modificados_indices.append(idx_vl_cred_desc)
 
         # Lógica para IND_DESC_CRED (idx_ind_desc_cred)
-        if cred_disponivel >= Decimal('0'):
+        if cred_disponivel >= 0:
             if cred_utilizado == cred_disponivel:
                 novo_ind_desc_cred = "0" 
             else: 
@@ -104,32 +220,32 @@ def aplicar_logica_utilizacao_credito_m100(registro_m100, todos_os_registros=Non
         else: 
             novo_ind_desc_cred = "1" 
 
-        valor_antigo_ind = registro_m100.obter_campo(idx_ind_desc_cred)
+        valor_antigo_ind = m100.IND_DESC_CRED
         if valor_antigo_ind != novo_ind_desc_cred:
-            registro_m100.definir_campo(idx_ind_desc_cred, novo_ind_desc_cred)
+            m100.IND_DESC_CRED = novo_ind_desc_cred
             campos_modificados_indices.append(idx_ind_desc_cred)
 
         # Lógica para SLD_CRED (idx_sld_cred_a_diferir)
         sld_cred_a_diferir = cred_disponivel - cred_utilizado
-        novo_sld_cred_str = f"{sld_cred_a_diferir:.2f}".replace('.', ',')
+        novo_sld_cred_str = formatar_valor(sld_cred_a_diferir)
 
-        valor_antigo_sld = registro_m100.obter_campo(idx_sld_cred_a_diferir)
+        valor_antigo_sld = m100.SLD_CRED
         if valor_antigo_sld != novo_sld_cred_str:
-            registro_m100.definir_campo(idx_sld_cred_a_diferir, novo_sld_cred_str)
+            m100.SLD_CRED = novo_sld_cred_str
             campos_modificados_indices.append(idx_sld_cred_a_diferir)
         
         if campos_modificados_indices:
-            print(f"Regra 'aplicar_logica_utilizacao_credito_m100' aplicada. Campos alterados: {campos_modificados_indices}")
+            _avisar(f"Regra 'aplicar_logica_utilizacao_credito_m100' aplicada. Campos alterados: {campos_modificados_indices}")
         else:
-            print("Regra 'aplicar_logica_utilizacao_credito_m100': Nenhuma alteração efetiva nos campos calculados.")
+            _avisar("Regra 'aplicar_logica_utilizacao_credito_m100': Nenhuma alteração efetiva nos campos calculados.")
             
         return campos_modificados_indices
 
     except InvalidOperation:
-        print(f"M100 (Lógica Uso): Erro de conversão de valor numérico. Verifique os campos VL_CRED_DISP e VL_CRED_DESC.")
+        _avisar(f"M100 (Lógica Uso): Erro de conversão de valor numérico. Verifique os campos VL_CRED_DISP e VL_CRED_DESC.")
         return None
     except Exception as e:
-        print(f"Erro ao aplicar regra 'aplicar_logica_utilizacao_credito_m100': {e}")
+        _avisar(f"Erro ao aplicar regra 'aplicar_logica_utilizacao_credito_m100': {e}")
         return None
 
 def m100_usar_credito_total(registro_m100, todos_os_registros=None) -> list[int] | None:
@@ -142,50 +258,187 @@ def m100_usar_credito_total(registro_m100, todos_os_registros=None) -> list[int]
     """
     campos_modificados_indices = []
     try:
-        idx_vl_cred_disponivel = 11
-        idx_ind_desc_cred = 12
-        idx_vl_cred_desc = 13
-        idx_sld_cred_a_diferir = 14
+        m100 = _M100.acessar(registro_m100)
+        idx_ind_desc_cred = _M100.indices["IND_DESC_CRED"]
+        idx_vl_cred_desc = _M100.indices["VL_CRED_DESC"]
+        idx_sld_cred_a_diferir = _M100.indices["SLD_CRED"]
 
-        vl_cred_disponivel_str = registro_m100.obter_campo(idx_vl_cred_disponivel)
+        vl_cred_disponivel_str = m100.VL_CRED_DISP
 
         if vl_cred_disponivel_str is None:
-            print("M100 (Usar Total): Campo VL_CRED_DISP não encontrado.")
+            _avisar("M100 (Usar Total): Campo VL_CRED_DISP não encontrado.")
             return None
 
-        cred_disponivel = Decimal(vl_cred_disponivel_str.replace(',', '.'))
+        (cred_disponivel,), formatar_valor = _ler_valores(vl_cred_disponivel_str)
 
         # Definir VL_CRED_DESC para ser igual ao VL_CRED_DISP
-        novo_vl_cred_desc_str = f"{cred_disponivel:.2f}".replace('.', ',')
+        novo_vl_cred_desc_str = formatar_valor(cred_disponivel)
         # Definir IND_DESC_CRED para "0"
         novo_ind_desc_cred = "0"
         # Definir SLD_CRED para "0,00"
         novo_sld_cred_a_diferir_str = "0,00"
 
-        if registro_m100.obter_campo(idx_vl_cred_desc) != novo_vl_cred_desc_str:
-            registro_m100.definir_campo(idx_vl_cred_desc, novo_vl_cred_desc_str)
+        if m100.VL_CRED_DESC != novo_vl_cred_desc_str:
+            m100.VL_CRED_DESC = novo_vl_cred_desc_str
             campos_modificados_indices.append(idx_vl_cred_desc)
         
-        if registro_m100.obter_campo(idx_ind_desc_cred) != novo_ind_desc_cred:
-            registro_m100.definir_campo(idx_ind_desc_cred, novo_ind_desc_cred)
+        if m100.IND_DESC_CRED != novo_ind_desc_cred:
+            m100.IND_DESC_CRED = novo_ind_desc_cred
             campos_modificados_indices.append(idx_ind_desc_cred)
 
-        if registro_m100.obter_campo(idx_sld_cred_a_diferir) != novo_sld_cred_a_diferir_str:
-            registro_m100.definir_campo(idx_sld_cred_a_diferir, novo_sld_cred_a_diferir_str)
+        if m100.SLD_CRED != novo_sld_cred_a_diferir_str:
+            m100.SLD_CRED = novo_sld_cred_a_diferir_str
             campos_modificados_indices.append(idx_sld_cred_a_diferir)
 
         if campos_modificados_indices:
-            print(f"Regra M100 'Usar Crédito Total' aplicada. Campos alterados: {campos_modificados_indices}")
+            _avisar(f"Regra M100 'Usar Crédito Total' aplicada. Campos alterados: {campos_modificados_indices}")
         else:
-            print("Regra M100 'Usar Crédito Total': Nenhuma alteração necessária.")
+            _avisar("Regra M100 'Usar Crédito Total': Nenhuma alteração necessária.")
             
         return campos_modificados_indices
 
     except InvalidOperation:
-        print("M100 (Usar Total): Erro de conversão de valor numérico para VL_CRED_DISP.")
+        _avisar("M100 (Usar Total): Erro de conversão de valor numérico para VL_CRED_DISP.")
+        return None
+    except Exception as e:
+        _avisar(f"Erro ao aplicar regra 'M100 Usar Crédito Total': {e}")
+        return None
+
+def calcular_contribuicao_periodo_m210(registro_m210, todos_os_registros=None) -> list[int] | None:
+    """
+    Calcula o VL_CONT_PER (campo 12) do registro M210:
+    VL_CONT_APUR + VL_AJUS_ACRES - VL_AJUS_REDUC - VL_CONT_DIFER + VL_CONT_DIFER_ANT.
+    Retorna lista de índices de campos modificados, lista vazia se nada mudou, ou None em caso de erro.
+    """
+    campos_modificados_indices = []
+    try:
+        m210 = _M210.acessar(registro_m210)
+        if m210.VL_CONT_APUR is None:
+            _avisar("M210 (Contrib Período): Campo VL_CONT_APUR não encontrado.")
+            return None
+        vl_cont_per_str = _combinar([(1, m210.VL_CONT_APUR), (1, m210.VL_AJUS_ACRES), (-1, m210.VL_AJUS_REDUC),
+                                     (-1, m210.VL_CONT_DIFER), (1, m210.VL_CONT_DIFER_ANT)])
+        _definir_se_diferente(registro_m210, _M210.indices["VL_CONT_PER"], vl_cont_per_str, campos_modificados_indices)
+        if campos_modificados_indices:
+            _avisar(f"Regra 'calcular_contribuicao_periodo_m210' aplicada. VL_CONT_PER: {vl_cont_per_str}")
+        return campos_modificados_indices
+
+    except InvalidOperation:
+        _avisar("M210 (Contrib Período): Erro de conversão de valor. Verifique os campos 07 a 11.")
         return None
     except Exception as e:
-        print(f"Erro ao aplicar regra 'M100 Usar Crédito Total': {e}")
+        _avisar(f"Erro ao aplicar regra 'calcular_contribuicao_periodo_m210': {e}")
+        return None
+
+def consolidar_totais_m200(registro_m200, todos_os_registros=None) -> list[int] | None:
+    """
+    Recupera os totais do M200 a partir dos registros de origem:
+    - VL_TOT_CONT_NC_PER (1) e VL_TOT_CONT_CUM_PER (8): soma do VL_CONT_PER dos M210,
+      conforme o COD_CONT (ver COD_CONT_NAO_CUMULATIVA e COD_CONT_CUMULATIVA);
+    - VL_TOT_CRED_DESC (2): soma do VL_CRED_DESC dos M100;
+    - VL_TOT_CRED_DESC_ANT (3): soma do VL_CRED_DESC_EFD dos 1100.
+    Precisa de 'todos_os_registros' (no pipeline em fluxo, sem o arquivo em memória, retorna None).
+    Retorna lista de índices de campos modificados, lista vazia se nada mudou, ou None em caso de erro.
+    """
+    if todos_os_registros is None:
+        _avisar("M200 (Consolidar): A regra precisa do arquivo completo (M210, M100 e 1100).")
+        return None
+    campos_modificados_indices = []
+    try:
+        idx_cod_cont = _M210.indices["COD_CONT"]
+        idx_vl_cont_per = _M210.indices["VL_CONT_PER"]
+        nao_cumulativa, cumulativa = [], []
+        for posicao in _posicoes_do_tipo(todos_os_registros, "M210"):
+            registro = todos_os_registros[posicao]
+            cod_cont = (registro.obter_campo(idx_cod_cont) or "").strip()
+            parcela = (1, registro.obter_campo(idx_vl_cont_per))
+            if cod_cont in COD_CONT_NAO_CUMULATIVA:
+                nao_cumulativa.append(parcela)
+            if cod_cont in COD_CONT_CUMULATIVA:
+                cumulativa.append(parcela)
+        idx_vl_cred_desc = _M100.indices["VL_CRED_DESC"]
+        creditos_descontados = [(1, todos_os_registros[posicao].obter_campo(idx_vl_cred_desc))
+                                for posicao in _posicoes_do_tipo(todos_os_registros, "M100")]
+        idx_vl_cred_desc_efd = _1100.indices["VL_CRED_DESC_EFD"]
+        creditos_anteriores = [(1, todos_os_registros[posicao].obter_campo(idx_vl_cred_desc_efd))
+                               for posicao in _posicoes_do_tipo(todos_os_registros, "1100")]
+
+        for nome_campo, parcelas in (("VL_TOT_CONT_NC_PER", nao_cumulativa), ("VL_TOT_CRED_DESC", creditos_descontados),
+                                     ("VL_TOT_CRED_DESC_ANT", creditos_anteriores), ("VL_TOT_CONT_CUM_PER", cumulativa)):
+            _definir_se_diferente(registro_m200, _M200.indices[nome_campo], _combinar(parcelas), campos_modificados_indices)
+        if campos_modificados_indices:
+            _avisar(f"Regra 'consolidar_totais_m200' aplicada. Campos alterados: {campos_modificados_indices}")
+        return campos_modificados_indices
+
+    except InvalidOperation:
+        _avisar("M200 (Consolidar): Erro de conversão de valor nos registros M210, M100 ou 1100.")
+        return None
+    except Exception as e:
+        _avisar(f"Erro ao aplicar regra 'consolidar_totais_m200': {e}")
+        return None
+
+def calcular_saldos_m200(registro_m200, todos_os_registros=None) -> list[int] | None:
+    """
+    Calcula os campos derivados do M200 a partir dos totais do próprio registro:
+    - VL_TOT_CONT_NC_DEV (4) = 01 - 02 - 03
+    - VL_CONT_NC_REC (7) = 04 - 05 - 06
+    - VL_CONT_CUM_REC (11) = 08 - 09 - 10
+    - VL_TOT_CONT_REC (12) = 07 + 11
+    Retorna lista de índices de campos modificados, lista vazia se nada mudou, ou None em caso de erro.
+    """
+    campos_modificados_indices = []
+    try:
+        m200 = _M200.acessar(registro_m200)
+        vl_tot_cont_nc_dev = _combinar([(1, m200.VL_TOT_CONT_NC_PER), (-1, m200.VL_TOT_CRED_DESC),
+                                        (-1, m200.VL_TOT_CRED_DESC_ANT)])
+        vl_cont_nc_rec = _combinar([(1, vl_tot_cont_nc_dev), (-1, m200.VL_RET_NC), (-1, m200.VL_OUT_DED_NC)])
+        vl_cont_cum_rec = _combinar([(1, m200.VL_TOT_CONT_CUM_PER), (-1, m200.VL_RET_CUM), (-1, m200.VL_OUT_DED_CUM)])
+        vl_tot_cont_rec = _combinar([(1, vl_cont_nc_rec), (1, vl_cont_cum_rec)])
+
+        for nome_campo, valor in (("VL_TOT_CONT_NC_DEV", vl_tot_cont_nc_dev), ("VL_CONT_NC_REC", vl_cont_nc_rec),
+                                  ("VL_CONT_CUM_REC", vl_cont_cum_rec), ("VL_TOT_CONT_REC", vl_tot_cont_rec)):
+            _definir_se_diferente(registro_m200, _M200.indices[nome_campo], valor, campos_modificados_indices)
+        if campos_modificados_indices:
+            _avisar(f"Regra 'calcular_saldos_m200' aplicada. Campos alterados: {campos_modificados_indices}")
+        return campos_modificados_indices
+
+    except InvalidOperation:
+        _avisar("M200 (Saldos): Erro de conversão de valor numérico nos campos do registro.")
+        return None
+    except Exception as e:
+        _avisar(f"Erro ao aplicar regra 'calcular_saldos_m200': {e}")
+        return None
+
+def calcular_saldos_controle_credito(registro_controle, todos_os_registros=None) -> list[int] | None:
+    """
+    Calcula os saldos do controle de créditos fiscais (1100 para PIS/Pasep, 1500 para Cofins;
+    os dois registros têm o mesmo leiaute):
+    - VL_TOT_CRED_APU (7) = 05 + 06
+    - SD_CRED_DISP_EFD (11) = 07 - 08 - 09 - 10
+    - SLD_CRED_FIM (17) = 11 - 12 - 13 - 14 - 15 - 16
+    Retorna lista de índices de campos modificados, lista vazia se nada mudou, ou None em caso de erro.
+    """
+    campos_modificados_indices = []
+    try:
+        controle = SCHEMA_EFD[registro_controle.tipo_registro].acessar(registro_controle)
+        vl_tot_cred_apu = _combinar([(1, controle.VL_CRED_APU), (1, controle.VL_CRED_EXT_APU)])
+        sd_cred_disp_efd = _combinar([(1, vl_tot_cred_apu), (-1, controle.VL_CRED_DESC_PA_ANT),
+                                      (-1, controle.VL_CRED_PER_PA_ANT), (-1, controle.VL_CRED_DCOMP_PA_ANT)])
+        sld_cred_fim = _combinar([(1, sd_cred_disp_efd), (-1, controle.VL_CRED_DESC_EFD), (-1, controle.VL_CRED_PER_EFD),
+                                  (-1, controle.VL_CRED_DCOMP_EFD), (-1, controle.VL_CRED_TRANS), (-1, controle.VL_CRED_OUT)])
+
+        for nome_campo, valor in (("VL_TOT_CRED_APU", vl_tot_cred_apu), ("SD_CRED_DISP_EFD", sd_cred_disp_efd),
+                                  ("SLD_CRED_FIM", sld_cred_fim)):
+            _definir_se_diferente(registro_controle, _1100.indices[nome_campo], valor, campos_modificados_indices)
+        if campos_modificados_indices:
+            _avisar(f"Regra 'calcular_saldos_controle_credito' aplicada ({registro_controle.tipo_registro}). Campos alterados: {campos_modificados_indices}")
+        return campos_modificados_indices
+
+    except InvalidOperation:
+        _avisar(f"{registro_controle.tipo_registro} (Saldos): Erro de conversão de valor numérico nos campos do registro.")
+        return None
+    except Exception as e:
+        _avisar(f"Erro ao aplicar regra 'calcular_saldos_controle_credito': {e}")
         return None
 
 # --- Dicionário de Regras Disponíveis ---
@@ -194,15 +447,52 @@ def m100_usar_credito_total(registro_m100, todos_os_registros=None) -> list[int]
 #   "nome_exibicao": O nome que aparecerá na GUI.
 #   "funcao": A referência à função Python que executa a regra.
 #   "descricao": Uma breve descrição da regra (para tooltips, por exemplo).
+#   "funcao_lote" (opcional): Versão da regra que processa várias posições de uma vez
+#                             (usada pelo motor de lote; None na lista de retorno = usar "funcao").
+#   "le" / "escreve": Campos que a regra lê e os que ela altera. Campos do próprio registro vão
+#                     pelo nome ("VL_BC_CONT"); de outros tipos, como "TIPO.CAMPO" ("M210.VL_CONT_PER").
+#                     Com eles, core.efd_dependencias recalcula só o que depende de cada alteração.
+#   "propagar" (opcional): True para regras de cálculo derivado, reexecutadas automaticamente
+#                          quando um campo lido muda (ver core.efd_dependencias).
 
 regras_disponiveis = {
     "M210": [
         {
             "nome_exibicao": "M210: Calcular Contribuição PIS",
             "funcao": calcular_contribuicao_m210,
-            "descricao": "Calcula o Valor da Contribuição Apurada (VL_CONT_APUR) baseado na Base de Cálculo e Alíquota."
+            "funcao_lote": calcular_contribuicao_m210_lote,
+            "descricao": "Calcula o Valor da Contribuição Apurada (VL_CONT_APUR) baseado na Base de Cálculo e Alíquota.",
+            "le": ["VL_BC_CONT", "ALIQ_PIS"],
+            "escreve": ["VL_CONT_APUR"],
+            "propagar": True,
+        },
+        {
+            "nome_exibicao": "M210: Calcular Contribuição do Período",
+            "funcao": calcular_contribuicao_periodo_m210,
+            "descricao": "Calcula o Valor Total da Contribuição do Período (VL_CONT_PER) a partir da contribuição apurada, dos ajustes e dos diferimentos.",
+            "le": ["VL_CONT_APUR", "VL_AJUS_ACRES", "VL_AJUS_REDUC", "VL_CONT_DIFER", "VL_CONT_DIFER_ANT"],
+            "escreve": ["VL_CONT_PER"],
+            "propagar": True,
+        },
+    ],
+    "M200": [
+        {
+            "nome_exibicao": "M200: Consolidar Totais (M210, M100 e 1100)",
+            "funcao": consolidar_totais_m200,
+            "descricao": "Recupera a contribuição não cumulativa e cumulativa dos M210 e os créditos descontados dos M100 e 1100.",
+            "le": ["M210.COD_CONT", "M210.VL_CONT_PER", "M100.VL_CRED_DESC", "1100.VL_CRED_DESC_EFD"],
+            "escreve": ["VL_TOT_CONT_NC_PER", "VL_TOT_CRED_DESC", "VL_TOT_CRED_DESC_ANT", "VL_TOT_CONT_CUM_PER"],
+            "propagar": True,
+        },
+        {
+            "nome_exibicao": "M200: Calcular Valores a Recolher",
+            "funcao": calcular_saldos_m200,
+            "descricao": "Calcula a contribuição devida e os valores a recolher (campos 04, 07, 11 e 12) a partir dos totais e deduções do M200.",
+            "le": ["VL_TOT_CONT_NC_PER", "VL_TOT_CRED_DESC", "VL_TOT_CRED_DESC_ANT", "VL_RET_NC", "VL_OUT_DED_NC",
+                   "VL_TOT_CONT_CUM_PER", "VL_RET_CUM", "VL_OUT_DED_CUM"],
+            "escreve": ["VL_TOT_CONT_NC_DEV", "VL_CONT_NC_REC", "VL_CONT_CUM_REC", "VL_TOT_CONT_REC"],
+            "propagar": True,
         },
-        # Adicionar mais regras para M210 aqui, se houver
     ],
     "0000": [
         # Exemplo de regra placeholder para outro registro
@@ -221,13 +511,123 @@ regras_disponiveis["M100"].append(
     {
         "nome_exibicao": "M100: Uso de Crédito (11 - 13)",
         "funcao": aplicar_logica_utilizacao_credito_m100,
-        "descricao": "Calcula o Indicador de Uso e o Saldo a Diferir com base no Crédito Disponível e no Crédito Utilizado no período."
+        "descricao": "Calcula o Indicador de Uso e o Saldo a Diferir com base no Crédito Disponível e no Crédito Utilizado no período.",
+        "le": ["VL_CRED_DISP", "VL_CRED_DESC"],
+        "escreve": ["VL_CRED_DESC", "IND_DESC_CRED", "SLD_CRED"],
     }
 )
 regras_disponiveis["M100"].append(
     {
         "nome_exibicao": "M100: Usar Crédito Total (Zerar Saldo)",
         "funcao": m100_usar_credito_total,
-        "descricao": "Define VL_CRED_DESC igual a VL_CRED_DISP, IND_DESC_CRED para '0' e SLD_CRED para '0,00'."
+        "descricao": "Define VL_CRED_DESC igual a VL_CRED_DISP, IND_DESC_CRED para '0' e SLD_CRED para '0,00'.",
+        "le": ["VL_CRED_DISP"],
+        "escreve": ["VL_CRED_DESC", "IND_DESC_CRED", "SLD_CRED"],
     }
-)
\ No newline at end of file
+)
+for _tipo_controle, _tributo in (("1100", "PIS/Pasep"), ("1500", "Cofins")):
+    regras_disponiveis[_tipo_controle] = [
+        {
+            "nome_exibicao": f"{_tipo_controle}: Calcular Saldos do Crédito",
+            "funcao": calcular_saldos_controle_credito,
+            "descricao": f"Calcula o crédito total apurado, o saldo disponível no período e o saldo a utilizar em períodos futuros ({_tributo}).",
+            "le": ["VL_CRED_APU", "VL_CRED_EXT_APU", "VL_CRED_DESC_PA_ANT", "VL_CRED_PER_PA_ANT", "VL_CRED_DCOMP_PA_ANT",
+                   "VL_CRED_DESC_EFD", "VL_CRED_PER_EFD", "VL_CRED_DCOMP_EFD", "VL_CRED_TRANS", "VL_CRED_OUT"],
+            "escreve": ["VL_TOT_CRED_APU", "SD_CRED_DISP_EFD", "SLD_CRED_FIM"],
+            "propagar": True,
+        }
+    ]
+# Cada regra conhece o tipo de registro ao qual se aplica (usado pelo motor de lote)
+for _tipo_registro, _regras_do_tipo in regras_disponiveis.items():
+    for _regra_info in _regras_do_tipo:
+        _regra_info["tipo_registro"] = _tipo_registro
+
+def resolver_regras(especificacoes: list[str]) -> list[dict]:
+    """
+    Converte identificadores de regra em dicionários de 'regras_disponiveis', na ordem dada.
+
+    Cada identificador pode ser um tipo de registro (ex: "M210", seleciona todas as regras do
+    tipo, na ordem em que foram declaradas) ou o nome da função da regra
+    (ex: "m100_usar_credito_total", seleciona só aquela regra; se a mesma função atende a
+    vários tipos, como "calcular_saldos_controle_credito", seleciona a regra de cada um deles).
+    Levanta ValueError para identificadores desconhecidos.
+    """
+    regras_por_funcao: dict[str, list[dict]] = {}
+    for regras_do_tipo in regras_disponiveis.values():
+        for regra in regras_do_tipo:
+            regras_por_funcao.setdefault(regra["funcao"].__name__, []).append(regra)
+    selecionadas: list[dict] = []
+    for especificacao in especificacoes:
+        especificacao = especificacao.strip()
+        if especificacao.upper() in regras_disponiveis:
+            candidatas = regras_disponiveis[especificacao.upper()]
+        elif especificacao in regras_por_funcao:
+            candidatas = regras_por_funcao[especificacao]
+        else:
+            raise ValueError(f"Regra ou tipo de registro desconhecido: '{especificacao}'")
+        selecionadas.extend(regra for regra in candidatas if regra not in selecionadas)
+    return selecionadas
+
+# --- Motor de Lote ---
+
+def _posicoes_do_tipo(registros, tipo_registro: str):
+    """Posições dos registros do tipo, pelo índice do store quando existir (senão, varredura linear)."""
+    indice = getattr(registros, "indice", None)
+    if indice is not None:
+        return indice.posicoes(tipo_registro)
+    return [pos for pos, reg in enumerate(registros) if reg.tipo_registro == tipo_registro]
+
+@cronometrado("aplicar_regras_em_lote", "regras")
+def aplicar_regras_em_lote(registros, regras: list[dict], limite_erros_detalhados: int = 1000) -> dict:
+    """
+    Aplica uma ou mais regras a todos os registros do tipo de cada regra, em uma passagem por regra.
+
+    Args:
+        registros: O RegistroStore carregado (usa seu índice por tipo) ou uma lista de RegistroEFD.
+        regras (list[dict]): Dicionários de regra de 'regras_disponiveis', executados na ordem dada.
+        limite_erros_detalhados (int): Máximo de erros guardados com posição e mensagem no
+                                       relatório (os demais são apenas contados).
+
+    Returns:
+        dict: Relatório único do lote, com:
+            "regras": nomes de exibição das regras executadas;
+            "processados": quantidade de aplicações de regra;
+            "alterados": posição -> lista ordenada dos índices de campos modificados;
+            "sem_alteracao": aplicações que não mudaram nada;
+            "erros": lista de (posição, nome da regra, mensagem) das aplicações que retornaram None;
+            "total_erros": quantidade total de erros;
+            "segundos": tempo total de execução.
+    """
+    relatorio = {"regras": [], "processados": 0, "alterados": {}, "sem_alteracao": 0,
+                 "erros": [], "total_erros": 0, "segundos": 0.0}
+    alterados: dict[int, list[int]] = relatorio["alterados"]
+    inicio = time.perf_counter()
+
+    with coletando_mensagens([]) as mensagens:
+        for regra_info in regras:
+            funcao_regra = regra_info["funcao"]
+            nome_regra = regra_info["nome_exibicao"]
+            relatorio["regras"].append(nome_regra)
+            posicoes = _posicoes_do_tipo(registros, regra_info["tipo_registro"])
+            with medir("regra em lote", "regras", regra=nome_regra, registros=len(posicoes)):
+                funcao_lote = regra_info.get("funcao_lote")
+                resultados_lote = funcao_lote(registros, posicoes) if funcao_lote else [None] * len(posicoes)
+                for posicao, modificados in zip(posicoes, resultados_lote):
+                    mensagens.clear()
+                    if modificados is None:
+                        modificados = funcao_regra(registros[posicao], registros)
+                    relatorio["processados"] += 1
+                    if modificados is None:
+                        relatorio["total_erros"] += 1
+                        if len(relatorio["erros"]) < limite_erros_detalhados:
+                            relatorio["erros"].append((posicao, nome_regra, " ".join(mensagens)))
+                    elif modificados:
+                        campos_do_registro = alterados.setdefault(posicao, [])
+                        campos_do_registro.extend(i for i in modificados if i not in campos_do_registro)
+                        campos_do_registro.sort()
+                    else:
+                        relatorio["sem_alteracao"] += 1
+
+    relatorio["segundos"] = time.perf_counter() - inicio
+    contar("regras.aplicacoes", relatorio["processados"])
+    return relatorio
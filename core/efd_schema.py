@@ -0,0 +1,163 @@
+# efd_schema.py
+
+"""
+Schema compilado a partir do dicionário de dados (efd_field_descriptions.efd_layout).
+
+compilar_schema() percorre o layout uma única vez e produz, por tipo de registro, um
+SchemaRegistro com:
+  - os descritores dos campos (CampoSchema: índice, nome, descrição, tipo, casas decimais e
+    obrigatoriedade);
+  - o mapa nome -> índice (ex: SCHEMA_EFD["M210"].indices["VL_BC_CONT"] == 3);
+  - uma classe de acesso com uma property por campo, de forma que as regras podem escrever
+    m210 = SCHEMA_EFD["M210"].acessar(registro); m210.VL_BC_CONT; m210.VL_CONT_APUR = "1,65"
+    com o custo de um obter_campo/definir_campo por índice.
+
+O tipo e as casas decimais de cada campo vêm das chaves opcionais "tipo"/"casas" do layout
+ou, na ausência delas, da convenção de nomes do leiaute da EFD (ver _inferir_tipo).
+A interface, as regras e a validação usam esta mesma estrutura pré-calculada.
+"""
+from .efd_field_descriptions import efd_layout
+
+# Tipos de campo
+TIPO_NUMERICO = "N"   # Número com vírgula decimal e 'casas' casas (ex: "1234,56")
+TIPO_DATA = "D"       # Data no formato DDMMAAAA
+TIPO_PERIODO = "P"    # Período no formato MMAAAA
+TIPO_TEXTO = "C"      # Alfanumérico (inclui códigos e indicadores)
+
+# Prefixo do nome do campo -> (tipo, casas decimais), conforme a convenção do leiaute
+_TIPOS_POR_PREFIXO = (
+    ("VL_", TIPO_NUMERICO, 2),
+    ("SLD_", TIPO_NUMERICO, 2),
+    ("SD_", TIPO_NUMERICO, 2),
+    ("ALIQ_", TIPO_NUMERICO, 4),
+    ("QUANT_", TIPO_NUMERICO, 3),
+    ("DT_", TIPO_DATA, 0),
+    ("PER_", TIPO_PERIODO, 0),
+)
+
+class CampoSchema:
+    """Descritor de um campo de um tipo de registro."""
+    __slots__ = ("indice", "nome", "descricao", "tipo", "casas", "obrigatorio")
+
+    def __init__(self, indice: int, nome: str, descricao: str, tipo: str, casas: int, obrigatorio: bool = False):
+        self.indice = indice
+        self.nome = nome
+        self.descricao = descricao
+        self.tipo = tipo
+        self.casas = casas
+        self.obrigatorio = obrigatorio
+
+    def __repr__(self) -> str:
+        return f"CampoSchema(indice={self.indice}, nome='{self.nome}', tipo='{self.tipo}', casas={self.casas})"
+
+
+class AcessorRegistro:
+    """
+    Base das classes de acesso geradas por compilar_schema. Envolve um RegistroEFD ou
+    RegistroView; cada campo do layout vira uma property (leitura: obter_campo,
+    escrita: definir_campo).
+    """
+    __slots__ = ("registro",)
+    schema: "SchemaRegistro"
+
+    def __init__(self, registro):
+        self.registro = registro
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.registro!r})"
+
+
+class SchemaRegistro:
+    """Schema compilado de um tipo de registro."""
+    __slots__ = ("tipo_registro", "campos", "indices", "_acessor")
+
+    def __init__(self, tipo_registro: str, campos: list[CampoSchema]):
+        self.tipo_registro = tipo_registro
+        # Tupla indexada pelo índice do campo (None para índices ausentes do layout)
+        self.campos: tuple[CampoSchema | None, ...] = tuple(
+            _por_indice(campos, max((c.indice for c in campos), default=-1) + 1))
+        self.indices: dict[str, int] = {}
+        for campo in campos:
+            if campo.nome in self.indices:
+                raise ValueError(f"Campo '{campo.nome}' duplicado no layout do registro {tipo_registro}")
+            self.indices[campo.nome] = campo.indice
+        self._acessor = _classe_acessora(self)
+
+    def __repr__(self) -> str:
+        return f"SchemaRegistro(tipo='{self.tipo_registro}', campos={len(self.indices)})"
+
+    @property
+    def num_campos(self) -> int:
+        """Quantidade de campos prevista no layout (incluindo o campo 0, REG)."""
+        return len(self.campos)
+
+    def campo(self, indice: int) -> CampoSchema | None:
+        """Descritor do campo pelo índice, ou None se o layout não o descreve."""
+        return self.campos[indice] if 0 <= indice < len(self.campos) else None
+
+    def acessar(self, registro) -> AcessorRegistro:
+        """Envolve o registro para acesso por nome (ex: acessor.VL_BC_CONT)."""
+        return self._acessor(registro)
+
+
+def _por_indice(campos: list[CampoSchema], tamanho: int) -> list[CampoSchema | None]:
+    por_indice: list[CampoSchema | None] = [None] * tamanho
+    for campo in campos:
+        por_indice[campo.indice] = campo
+    return por_indice
+
+def _inferir_tipo(nome: str) -> tuple[str, int]:
+    """Tipo e casas decimais de um campo pelo prefixo do nome (ex: VL_ -> numérico, 2 casas)."""
+    for prefixo, tipo, casas in _TIPOS_POR_PREFIXO:
+        if nome.startswith(prefixo):
+            return tipo, casas
+    return TIPO_TEXTO, 0
+
+def _classe_acessora(schema: SchemaRegistro) -> type:
+    atributos = {"__slots__": (), "schema": schema,
+                 "__doc__": f"Acesso por nome aos campos do registro {schema.tipo_registro}."}
+    for campo in schema.campos:
+        if campo is None or campo.indice == 0: # REG não é alterável; use registro.tipo_registro
+            continue
+        atributos[campo.nome] = property(_leitor(campo.indice), _escritor(campo.indice), doc=campo.descricao)
+    return type(f"Campos{schema.tipo_registro}", (AcessorRegistro,), atributos)
+
+def _leitor(indice: int):
+    def ler(self) -> str | None:
+        return self.registro.obter_campo(indice)
+    return ler
+
+def _escritor(indice: int):
+    def escrever(self, valor: str):
+        self.registro.definir_campo(indice, valor)
+    return escrever
+
+def compilar_schema(layout: dict[str, dict[int, dict]]) -> dict[str, SchemaRegistro]:
+    """
+    Compila o dicionário de dados em um SchemaRegistro por tipo de registro.
+
+    Args:
+        layout (dict): No formato de efd_layout: tipo -> índice -> {"nome", "descr",
+                       e opcionalmente "tipo" (N/D/P/C), "casas" e "obrigatorio"}.
+                       O campo 0 (REG) é sempre obrigatório.
+
+    Returns:
+        dict[str, SchemaRegistro]: tipo_registro -> schema compilado.
+    """
+    schemas: dict[str, SchemaRegistro] = {}
+    for tipo_registro, campos_layout in layout.items():
+        campos = []
+        for indice, info in sorted(campos_layout.items()):
+            nome = info.get("nome", "") or f"CAMPO_{indice}"
+            tipo_inferido, casas_inferidas = _inferir_tipo(nome)
+            campos.append(CampoSchema(indice, nome, info.get("descr", "").strip(),
+                                      info.get("tipo", tipo_inferido), info.get("casas", casas_inferidas),
+                                      indice == 0 or bool(info.get("obrigatorio", False))))
+        schemas[tipo_registro] = SchemaRegistro(tipo_registro, campos)
+    return schemas
+
+SCHEMA_EFD: dict[str, SchemaRegistro] = compilar_schema(efd_layout)
+
+def schema_do_tipo(tipo_registro: str) -> SchemaRegistro | None:
+    """Schema compilado do tipo de registro, ou None se ele não está no layout."""
+    return SCHEMA_EFD.get(tipo_registro)
@@ -1,5 +1,112 @@
 # efd_structures.py
 
+import os
+from array import array
+from collections import OrderedDict
+from collections.abc import Callable
+
+class OperacaoCancelada(Exception):
+    """
+    Levantada por um callback de progresso para interromper uma leitura ou gravação longa.
+    As funções de core que aceitam 'progresso' nunca engolem esta exceção.
+    """
+
+INTERVALO_PROGRESSO = 65536 # Linhas entre duas chamadas do callback de progresso
+# Bytes removidos das pontas de cada linha. As linhas são separadas só por b'\n', em todos os
+# leitores (iter_efd_records, carregar_registro_store, comparação): as posições dos registros batem
+ESPACOS_LINHA = b' \t\r\n'
+
+# --- Problemas de leitura (linhas descartadas pelo parser) ---
+PROBLEMA_SEM_PIPES = 0     # A linha não começa/termina com '|'
+PROBLEMA_TIPO_AUSENTE = 1  # Campos vazios ou tipo de registro ausente
+PROBLEMA_ERRO_LEITURA = 2  # Erro de E/S (ou inesperado): a leitura parou nesta linha
+DESCRICAO_PROBLEMAS = (
+    "linha não começa/termina com '|'",
+    "tipo de registro ausente",
+    "erro de leitura",
+)
+LIMITE_PADRAO_OCORRENCIAS = 1_000_000 # Ocorrências guardadas com linha e offset (as demais só são contadas)
+LIMITE_PADRAO_AMOSTRAS = 20 # Amostras de texto guardadas por tipo de problema
+
+class ProblemasLeitura:
+    """
+    Coletor dos problemas encontrados pelo parser, no lugar de um print por linha.
+
+    Cada ocorrência é guardada em arrays compactos (número da linha, offset em bytes do início
+    da linha e tipo do problema, um de PROBLEMA_*), até 'limite_ocorrencias'; a contagem por
+    tipo é sempre completa. Só as primeiras 'limite_amostras' ocorrências de cada tipo guardam
+    o trecho da linha. A leitura continua após as linhas inválidas; um erro que interrompe a
+    leitura fica em 'erro' (e os registros lidos até ali são mantidos).
+    """
+    __slots__ = ("linhas", "offsets", "tipos", "contagem", "amostras", "erro",
+                 "limite_ocorrencias", "limite_amostras")
+
+    def __init__(self, limite_ocorrencias: int = LIMITE_PADRAO_OCORRENCIAS,
+                 limite_amostras: int = LIMITE_PADRAO_AMOSTRAS):
+        self.linhas = array('q')
+        self.offsets = array('q')
+        self.tipos = array('B')
+        self.contagem = [0] * len(DESCRICAO_PROBLEMAS)
+        self.amostras: list[tuple[int, int, int, str]] = [] # (linha, offset, tipo, trecho)
+        self.erro: str | None = None
+        self.limite_ocorrencias = limite_ocorrencias
+        self.limite_amostras = limite_amostras
+
+    def __repr__(self) -> str:
+        return f"ProblemasLeitura(total={self.total}, guardados={len(self.linhas)}, erro={self.erro!r})"
+
+    def __len__(self) -> int:
+        return self.total
+
+    @property
+    def total(self) -> int:
+        return sum(self.contagem)
+
+    @property
+    def truncado(self) -> bool:
+        """True se houve mais ocorrências do que as guardadas com linha e offset."""
+        return self.total > len(self.linhas)
+
+    def registrar(self, linha: int, offset: int, tipo: int, trecho: bytes | str = ""):
+        """Anota um problema. 'trecho' (o início da linha) só é decodificado se virar amostra."""
+        self.contagem[tipo] += 1
+        if len(self.linhas) < self.limite_ocorrencias:
+            self.linhas.append(linha)
+            self.offsets.append(offset)
+            self.tipos.append(tipo)
+        if self.contagem[tipo] <= self.limite_amostras:
+            if isinstance(trecho, bytes):
+                trecho = trecho.decode('latin-1')
+            self.amostras.append((linha, offset, tipo, trecho[:50]))
+
+    def registrar_erro(self, linha: int, offset: int, erro: BaseException):
+        """Anota o erro que interrompeu a leitura na 'linha' (0 se o arquivo nem chegou a ser lido)."""
+        self.erro = f"{type(erro).__name__}: {erro}"
+        self.registrar(linha, offset, PROBLEMA_ERRO_LEITURA, str(erro))
+
+    def resumo(self) -> dict:
+        """Resumo serializável: "total", "por_tipo" (descrição -> quantidade), "amostras", "truncado" e "erro"."""
+        return {
+            "total": self.total,
+            "por_tipo": {DESCRICAO_PROBLEMAS[tipo]: quantidade for tipo, quantidade in enumerate(self.contagem) if quantidade},
+            "amostras": [f"Linha {linha} ({DESCRICAO_PROBLEMAS[tipo]}): '{trecho}'" for linha, _, tipo, trecho in self.amostras],
+            "truncado": self.truncado,
+            "erro": self.erro,
+        }
+
+    def descrever(self, max_amostras: int = 10) -> str:
+        """Texto para o usuário: totais por tipo e as primeiras amostras."""
+        linhas = [f"{self.total:,} linha(s) ignorada(s) na leitura:".replace(",", ".")]
+        linhas += [f"  - {descricao}: {quantidade:,}".replace(",", ".")
+                   for descricao, quantidade in self.resumo()["por_tipo"].items()]
+        if self.erro:
+            linhas.append(f"A leitura foi interrompida: {self.erro}")
+        if self.amostras:
+            linhas.append("")
+            linhas += [f"Linha {linha} ({DESCRICAO_PROBLEMAS[tipo]}): '{trecho}'"
+                       for linha, _, tipo, trecho in sorted(self.amostras)[:max_amostras]]
+        return "\n".join(linhas)
+
 class RegistroEFD:
     def __init__(self, tipo_registro: str, campos: list[str]):
         """
@@ -20,6 +127,7 @@ class RegistroEFD:
 
         self.tipo_registro: str = tipo_registro
         self.campos: list[str] = campos # A lista completa, incluindo o tipo_registro como campos[0]
+        self.modificado: bool = False # Marcado por definir_campo
 
     def __repr__(self) -> str:
         return f"RegistroEFD(tipo='{self.tipo_registro}', num_campos={len(self.campos)})"
@@ -41,6 +149,7 @@ class RegistroEFD:
         """
         if 0 < indice < len(self.campos): # Não permite alterar o campo 0 (tipo)
             self.campos[indice] = valor
+            self.modificado = True
             return True
         # Se quiser permitir criar novos campos (ex: se a linha original era menor)
         # elif indice >= len(self.campos) and indice > 0:
@@ -70,4 +179,228 @@ class RegistroEFD:
 #     campos_0000_exemplo = ["0000", "LEIAUTE_CONTRIB_007", "0", "NOME EMPRESA", "12345678000199", "UF", "1234567", "", "0", "1"]
 #     reg_0000 = RegistroEFD(campos_0000_exemplo[0], campos_0000_exemplo)
 #     print(reg_0000)
-#     print(reg_0000.para_linha_txt())
\ No newline at end of file
+#     print(reg_0000.para_linha_txt())
+
+class RegistroStore:
+    """
+    Armazenamento colunar (arena) dos registros de um arquivo EFD.
+
+    Em vez de um objeto RegistroEFD por linha, guarda:
+      - 'dados': um único buffer com os bytes brutos do arquivo;
+      - 'inicio_linhas'/'fim_linhas': offsets do pipe inicial e da posição logo após o pipe final de cada registro;
+      - 'limites_campos'/'primeiro_limite': offsets de todos os pipes, achatados, e o índice do primeiro pipe de cada registro;
+      - 'codigos_tipo': o código (internado em 'tipos') do tipo de cada registro.
+
+    O acesso é feito por RegistroView, que expõe a mesma API de RegistroEFD
+    (tipo_registro, campos, obter_campo, definir_campo, para_linha_txt).
+    Campos alterados ficam em 'editados' (posição -> lista de campos); o buffer original nunca é modificado.
+    Cada alteração efetiva feita por definir_campo é avisada aos 'ouvintes', chamados com
+    (posição, índice do campo, valor antigo, valor novo) — ex: o jornal de desfazer (core.efd_journal).
+    Um registro está "sujo" (modificado) se e somente se sua posição está em 'editados': na gravação
+    (ver core.efd_generator), só essas linhas são serializadas de novo; as demais são copiadas do buffer.
+
+    'linhas_regulares' indica que o arquivo de origem não tinha linhas descartadas pelo parser
+    (em branco/inválidas) nem espaços em volta dos registros, ou seja, os bytes entre dois
+    registros são apenas a quebra de linha, e faixas inteiras do buffer podem ser copiadas como estão.
+
+    Se 'limites_campos' for None (modo preguiçoso, ex: buffer mapeado com mmap), os campos
+    só são divididos quando um registro é acessado, e o resultado fica num cache limitado.
+    """
+
+    TAMANHO_CACHE_CAMPOS = 4096
+
+    def __init__(self, dados: bytes = b"", inicio_linhas: array | None = None, fim_linhas: array | None = None,
+                 codigos_tipo: array | None = None, tipos: list[str] | None = None,
+                 limites_campos: array | None = None, primeiro_limite: array | None = None,
+                 caminho_origem: str | None = None, linhas_regulares: bool = False):
+        self.dados = dados
+        self.inicio_linhas: array = inicio_linhas if inicio_linhas is not None else array(typecode_offsets(len(dados)))
+        self.fim_linhas: array = fim_linhas if fim_linhas is not None else array(self.inicio_linhas.typecode)
+        self.codigos_tipo: array = codigos_tipo if codigos_tipo is not None else array('H')
+        self.tipos: list[str] = tipos if tipos is not None else []
+        self.limites_campos = limites_campos
+        self.primeiro_limite = primeiro_limite
+        self.caminho_origem = caminho_origem
+        self.linhas_regulares = linhas_regulares
+        self.editados: dict[int, list[str]] = {}
+        self.ouvintes: list[Callable[[int, int, str, str], None]] = []
+        self.indice = None # IndiceEFD preenchido pelo parser (ver core.efd_hierarquia)
+        self.hash_conteudo: str | None = None # Preenchido pelo cache de sessões (ver core.efd_cache)
+        self.identidade_origem: tuple[int, int, int] | None = None # identidade_arquivo() da origem quando foi lida
+        self.problemas_leitura = ProblemasLeitura() # Linhas descartadas pelo parser
+        self._cache_campos: OrderedDict[int, list[str]] = OrderedDict()
+
+    def __repr__(self) -> str:
+        return f"RegistroStore(registros={len(self)}, tipos={len(self.tipos)}, editados={len(self.editados)})"
+
+    def __len__(self) -> int:
+        return len(self.codigos_tipo)
+
+    def __getitem__(self, posicao: int) -> "RegistroView":
+        if posicao < 0:
+            posicao += len(self)
+        if not 0 <= posicao < len(self):
+            raise IndexError("posição de registro fora do intervalo")
+        return RegistroView(self, posicao)
+
+    def __iter__(self):
+        for posicao in range(len(self)):
+            yield RegistroView(self, posicao)
+
+    def tipo_registro(self, posicao: int) -> str:
+        return self.tipos[self.codigos_tipo[posicao]]
+
+    def campos(self, posicao: int) -> list[str]:
+        """
+        Retorna a lista de campos do registro. Para registros editados é a própria lista
+        armazenada; para os demais, uma lista nova decodificada do buffer (alterá-la não
+        afeta o store — use definir_campo).
+        """
+        editado = self.editados.get(posicao)
+        if editado is not None:
+            return editado
+        if self.limites_campos is None:
+            return list(self._campos_divididos(posicao))
+        return self._dividir_campos(posicao)
+
+    def _dividir_campos(self, posicao: int) -> list[str]:
+        return self.dados[self.inicio_linhas[posicao] + 1:self.fim_linhas[posicao] - 1].decode('latin-1').split('|')
+
+    def _campos_divididos(self, posicao: int) -> list[str]:
+        """Divide os campos sob demanda (modo preguiçoso), reaproveitando o cache. Não alterar o retorno."""
+        campos = self._cache_campos.get(posicao)
+        if campos is None:
+            campos = self._dividir_campos(posicao)
+            if len(self._cache_campos) >= self.TAMANHO_CACHE_CAMPOS:
+                self._cache_campos.popitem(last=False)  # Descarta o mais antigo (O(1), mesmo após muitas remoções)
+            self._cache_campos[posicao] = campos
+        return campos
+
+    def num_campos(self, posicao: int) -> int:
+        editado = self.editados.get(posicao)
+        if editado is not None:
+            return len(editado)
+        if self.limites_campos is not None:
+            return self._fim_limites(posicao) - self.primeiro_limite[posicao] - 1
+        return len(self._campos_divididos(posicao))
+
+    def _fim_limites(self, posicao: int) -> int:
+        if posicao + 1 < len(self.primeiro_limite):
+            return self.primeiro_limite[posicao + 1]
+        return len(self.limites_campos)
+
+    def obter_campo(self, posicao: int, indice: int) -> str | None:
+        editado = self.editados.get(posicao)
+        if editado is not None:
+            return editado[indice] if 0 <= indice < len(editado) else None
+        if self.limites_campos is None:
+            campos = self._campos_divididos(posicao)
+            return campos[indice] if 0 <= indice < len(campos) else None
+        base = self.primeiro_limite[posicao]
+        if not 0 <= indice < self._fim_limites(posicao) - base - 1:
+            return None
+        return self.dados[self.limites_campos[base + indice] + 1:self.limites_campos[base + indice + 1]].decode('latin-1')
+
+    def definir_campo(self, posicao: int, indice: int, valor: str) -> bool:
+        """Mesma regra de RegistroEFD.definir_campo: o campo 0 (tipo) não pode ser alterado."""
+        campos = self.editados.get(posicao)
+        if campos is None:
+            if not 0 < indice < self.num_campos(posicao):
+                return False
+            campos = self.campos(posicao)
+            self.editados[posicao] = campos
+            self._cache_campos.pop(posicao, None)
+        elif not 0 < indice < len(campos):
+            return False
+        valor_antigo = campos[indice]
+        campos[indice] = valor
+        if valor_antigo != valor:
+            for ouvinte in self.ouvintes:
+                ouvinte(posicao, indice, valor_antigo, valor)
+        return True
+
+    def linha_txt(self, posicao: int) -> str:
+        editado = self.editados.get(posicao)
+        if editado is not None:
+            return f"|{'|'.join(editado)}|"
+        # A linha original já está no formato "|campo|campo|" (sem espaços nas pontas)
+        return self.dados[self.inicio_linhas[posicao]:self.fim_linhas[posicao]].decode('latin-1')
+
+    def adotar(self, outro: "RegistroStore"):
+        """
+        Passa a representar o conteúdo de 'outro' (ex: o próprio arquivo de origem, regravado):
+        buffer, offsets, índice e problemas de leitura são os dele, e os editados são descartados.
+        Os ouvintes continuam os deste store. O buffer anterior é liberado.
+        """
+        buffer_anterior = self.dados
+        self.dados = outro.dados
+        self.inicio_linhas = outro.inicio_linhas
+        self.fim_linhas = outro.fim_linhas
+        self.codigos_tipo = outro.codigos_tipo
+        self.tipos = outro.tipos
+        self.limites_campos = outro.limites_campos
+        self.primeiro_limite = outro.primeiro_limite
+        self.caminho_origem = outro.caminho_origem
+        self.linhas_regulares = outro.linhas_regulares
+        self.indice = outro.indice
+        self.hash_conteudo = outro.hash_conteudo
+        self.identidade_origem = outro.identidade_origem
+        self.problemas_leitura = outro.problemas_leitura
+        self.editados = {}
+        self._cache_campos.clear()
+        if buffer_anterior is not outro.dados:
+            fechar_buffer = getattr(buffer_anterior, "close", None)
+            if fechar_buffer is not None:
+                fechar_buffer()
+
+    def fechar(self):
+        """Libera o buffer quando ele é um mmap (modo mapeado). Seguro de chamar em qualquer modo."""
+        fechar_buffer = getattr(self.dados, "close", None)
+        if fechar_buffer is not None:
+            fechar_buffer()
+        self._cache_campos.clear()
+
+
+class RegistroView:
+    """
+    Visão leve (sem __dict__) de um registro dentro de um RegistroStore.
+    Oferece a mesma API de RegistroEFD, delegando tudo ao store.
+    """
+    __slots__ = ("store", "posicao")
+
+    def __init__(self, store: RegistroStore, posicao: int):
+        self.store = store
+        self.posicao = posicao
+
+    def __repr__(self) -> str:
+        return f"RegistroView(tipo='{self.tipo_registro}', num_campos={self.store.num_campos(self.posicao)}, posicao={self.posicao})"
+
+    @property
+    def tipo_registro(self) -> str:
+        return self.store.tipos[self.store.codigos_tipo[self.posicao]]
+
+    @property
+    def campos(self) -> list[str]:
+        return self.store.campos(self.posicao)
+
+    @property
+    def modificado(self) -> bool:
+        return self.posicao in self.store.editados
+
+    def obter_campo(self, indice: int) -> str | None:
+        return self.store.obter_campo(self.posicao, indice)
+
+    def definir_campo(self, indice: int, valor: str) -> bool:
+        return self.store.definir_campo(self.posicao, indice, valor)
+
+    def para_linha_txt(self) -> str:
+        return self.store.linha_txt(self.posicao)
+
+
+def identidade_arquivo(estado: os.stat_result) -> tuple[int, int, int]:
+    """(inode, tamanho, data de modificação em ns): muda se o arquivo for regravado ou substituído."""
+    return estado.st_ino, estado.st_size, estado.st_mtime_ns
+
+def typecode_offsets(tamanho: int) -> str:
+    """Typecode de array suficiente para guardar offsets de um buffer de 'tamanho' bytes."""
+    return 'I' if tamanho < 2**32 else 'Q'
@@ -0,0 +1,373 @@
+# efd_validacao.py
+
+"""
+Validação do arquivo EFD inteiro, guiada pelo schema compilado (core.efd_schema) e pela
+hierarquia dos registros (core.efd_hierarquia).
+
+Verificações:
+  - quantidade de campos de cada registro descrito no layout;
+  - formato dos campos numéricos (vírgula decimal, até 'casas' casas), das datas (DDMMAAAA)
+    e dos períodos (MMAAAA);
+  - preenchimento dos campos obrigatórios (chave "obrigatorio" do layout);
+  - ordem hierárquica: o pai de cada registro é do tipo previsto em HIERARQUIA_EFD, o 0000 é
+    o primeiro registro, o 9999 é o último e os blocos aparecem na ordem do leiaute.
+
+O arquivo é dividido em fatias (uma por bloco; blocos muito grandes, como o C, em várias),
+validadas em paralelo por processos trabalhadores. Cada processo abre o arquivo de origem com
+mmap e recebe só os offsets das suas linhas e os registros editados da fatia, não o conteúdo.
+O resultado é uma lista de ProblemaValidacao em ordem de arquivo, que a interface usa para
+navegar até cada registro.
+"""
+import mmap
+import os
+import re
+import time
+from array import array
+from bisect import bisect_left
+from collections.abc import Callable
+from datetime import date
+
+from .efd_structures import RegistroStore, identidade_arquivo
+from .efd_hierarquia import HIERARQUIA_EFD, construir_indice
+from .efd_schema import SCHEMA_EFD, SchemaRegistro, TIPO_NUMERICO, TIPO_DATA, TIPO_PERIODO
+
+GRAVIDADE_ERRO = "erro"
+GRAVIDADE_AVISO = "aviso"
+
+ORDEM_BLOCOS = "0ACDFIMP19" # Ordem dos blocos no leiaute da EFD Contribuições
+TAMANHO_FATIA = 250_000 # Registros por tarefa dos processos trabalhadores
+LIMITE_VALIDACAO_SERIAL = 200_000 # Abaixo disso, iniciar processos custa mais do que validar direto
+LIMITE_PADRAO_PROBLEMAS = 10_000 # Problemas guardados com detalhes (os demais são só contados)
+
+class ProblemaValidacao:
+    """Um problema encontrado pela validação, localizado por posição (e campo, se for o caso)."""
+    __slots__ = ("posicao", "tipo_registro", "indice_campo", "mensagem", "gravidade")
+
+    def __init__(self, posicao: int, tipo_registro: str, indice_campo: int | None, mensagem: str,
+                 gravidade: str = GRAVIDADE_ERRO):
+        self.posicao = posicao
+        self.tipo_registro = tipo_registro
+        self.indice_campo = indice_campo # None para problemas do registro como um todo
+        self.mensagem = mensagem
+        self.gravidade = gravidade
+
+    def __repr__(self) -> str:
+        return (f"ProblemaValidacao(posicao={self.posicao}, tipo='{self.tipo_registro}', "
+                f"campo={self.indice_campo}, gravidade='{self.gravidade}')")
+
+    def __str__(self) -> str:
+        return f"Registro [{self.posicao}] {self.tipo_registro}: {self.mensagem}"
+
+
+# --- Verificações de campo pré-compiladas a partir do schema ---
+
+_PADRAO_DATA = re.compile(r"\d{8}", re.ASCII)
+_PADRAO_PERIODO = re.compile(r"\d{6}", re.ASCII)
+
+def _verificador_numerico(casas: int) -> Callable[[str], str | None]:
+    if casas:
+        padrao = re.compile(rf"-?\d+(?:,\d{{1,{casas}}})?", re.ASCII)
+        esperado = f"não é um número com até {casas} casas decimais (vírgula como separador)"
+    else:
+        padrao = re.compile(r"-?\d+", re.ASCII)
+        esperado = "não é um número inteiro"
+
+    def verificar(valor: str) -> str | None:
+        return None if padrao.fullmatch(valor) else esperado
+    return verificar
+
+def _verificar_data(valor: str) -> str | None:
+    if _PADRAO_DATA.fullmatch(valor):
+        try:
+            date(int(valor[4:]), int(valor[2:4]), int(valor[:2]))
+            return None
+        except ValueError:
+            pass
+    return "não é uma data válida no formato DDMMAAAA"
+
+def _verificar_periodo(valor: str) -> str | None:
+    if _PADRAO_PERIODO.fullmatch(valor) and 1 <= int(valor[:2]) <= 12:
+        return None
+    return "não é um período válido no formato MMAAAA"
+
+# Verificação de um campo: (índice, nome, verificador de formato ou None, obrigatório)
+VerificacaoCampo = tuple[int, str, Callable[[str], str | None] | None, bool]
+
+def _compilar_verificacoes(schema: SchemaRegistro) -> tuple[int, list[VerificacaoCampo]]:
+    """Quantidade de campos prevista e as verificações dos campos que têm alguma."""
+    verificadores_numericos: dict[int, Callable[[str], str | None]] = {}
+    verificacoes: list[VerificacaoCampo] = []
+    for campo in schema.campos:
+        if campo is None or campo.indice == 0: # REG já determinou o schema
+            continue
+        verificar = None
+        if campo.tipo == TIPO_NUMERICO:
+            verificar = verificadores_numericos.setdefault(campo.casas, _verificador_numerico(campo.casas))
+        elif campo.tipo == TIPO_DATA:
+            verificar = _verificar_data
+        elif campo.tipo == TIPO_PERIODO:
+            verificar = _verificar_periodo
+        if verificar is not None or campo.obrigatorio:
+            verificacoes.append((campo.indice, campo.nome, verificar, campo.obrigatorio))
+    return schema.num_campos, verificacoes
+
+_VERIFICACOES: dict[str, tuple[int, list[VerificacaoCampo]]] = {
+    tipo: _compilar_verificacoes(schema) for tipo, schema in SCHEMA_EFD.items()}
+
+
+class _Coletor:
+    """Guarda até 'limite' problemas e conta todos."""
+    __slots__ = ("problemas", "total", "limite")
+
+    def __init__(self, limite: int):
+        self.problemas: list[ProblemaValidacao] = []
+        self.total = 0
+        self.limite = limite
+
+    def adicionar(self, posicao: int, tipo: str, indice_campo: int | None, mensagem: str,
+                  gravidade: str = GRAVIDADE_ERRO):
+        self.total += 1
+        if len(self.problemas) < self.limite:
+            self.problemas.append(ProblemaValidacao(posicao, tipo, indice_campo, mensagem, gravidade))
+
+
+def _validar_campos(posicao: int, tipo: str, campos: list[str], coletor: _Coletor):
+    num_campos, verificacoes = _VERIFICACOES[tipo]
+    if len(campos) != num_campos:
+        coletor.adicionar(posicao, tipo, None, f"Registro com {len(campos)} campos; o leiaute prevê {num_campos}.")
+    for indice, nome, verificar, obrigatorio in verificacoes:
+        if indice >= len(campos):
+            break # Já reportado como quantidade de campos
+        valor = campos[indice]
+        if not valor:
+            if obrigatorio:
+                coletor.adicionar(posicao, tipo, indice, f"Campo obrigatório {nome} (índice {indice}) não preenchido.")
+            continue
+        if verificar is not None:
+            erro = verificar(valor)
+            if erro is not None:
+                coletor.adicionar(posicao, tipo, indice, f"Campo {nome} (índice {indice}): '{valor}' {erro}.")
+
+
+def _validar_fatia(dados, inicio: int, inicio_linhas: array | None, fim_linhas: array | None,
+                   codigos: array, pais: array, tipos: list[str], ancestrais: dict[int, int],
+                   editados: dict[int, list[str]], limite: int) -> tuple[list[ProblemaValidacao], int]:
+    """
+    Valida os registros das posições [inicio, inicio + len(codigos)).
+
+    'codigos', 'pais', 'inicio_linhas' e 'fim_linhas' são as fatias correspondentes dos arrays
+    do store/índice; 'ancestrais' traz os códigos de tipo dos registros anteriores à fatia que
+    podem ser pais de registros dela (a cadeia de ancestrais do registro inicio - 1).
+    'editados' tem os campos já decodificados por posição; os demais registros são lidos de 'dados'.
+
+    Returns:
+        tuple: (problemas guardados, total de problemas encontrados).
+    """
+    coletor = _Coletor(limite)
+    pais_esperados = [HIERARQUIA_EFD.get(tipo, "") for tipo in tipos] # "" = tipo desconhecido
+    com_schema = [tipo in _VERIFICACOES for tipo in tipos]
+
+    for i, codigo in enumerate(codigos):
+        posicao = inicio + i
+        tipo = tipos[codigo]
+
+        pai_esperado = pais_esperados[codigo]
+        if pai_esperado: # Raízes (None) e tipos desconhecidos ("") não têm pai a conferir
+            pai = pais[i]
+            if pai >= inicio:
+                codigo_pai = codigos[pai - inicio]
+            else:
+                codigo_pai = ancestrais.get(pai)
+            if codigo_pai is None:
+                coletor.adicionar(posicao, tipo, None, f"Fora da hierarquia: deveria estar sob um registro {pai_esperado}, "
+                                                       "mas não há registro pai.")
+            elif tipos[codigo_pai] != pai_esperado:
+                coletor.adicionar(posicao, tipo, None, f"Fora da hierarquia: deveria estar sob um registro {pai_esperado}, "
+                                                       f"mas está sob um {tipos[codigo_pai]}.")
+
+        if com_schema[codigo]:
+            campos = editados.get(posicao)
+            if campos is None:
+                campos = dados[inicio_linhas[i] + 1:fim_linhas[i] - 1].decode('latin-1').split('|')
+            _validar_campos(posicao, tipo, campos, coletor)
+
+    return coletor.problemas, coletor.total
+
+def _validar_fatia_em_arquivo(caminho: str, identidade: tuple[int, int, int], *args) -> tuple[list[ProblemaValidacao], int]:
+    """Executado no processo trabalhador: mapeia o arquivo de origem e valida a fatia."""
+    with open(caminho, 'rb') as file:
+        if identidade_arquivo(os.fstat(file.fileno())) != identidade:
+            raise ValueError(f"O arquivo '{caminho}' foi alterado durante a validação.")
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as dados:
+            return _validar_fatia(dados, *args)
+
+def _origem_inalterada(store: RegistroStore) -> bool:
+    """True se o arquivo de origem ainda é o que o store leu (os trabalhadores podem relê-lo pelos offsets)."""
+    if not store.caminho_origem or store.identidade_origem is None:
+        return False
+    try:
+        return identidade_arquivo(os.stat(store.caminho_origem)) == store.identidade_origem
+    except OSError:
+        return False
+
+
+def _fatias(blocos: dict[str, tuple[int, int]], total_registros: int) -> list[tuple[int, int]]:
+    """Divide o arquivo por bloco e os blocos grandes em pedaços de até TAMANHO_FATIA registros."""
+    fatias = []
+    limites = sorted(set([0, total_registros] + [inicio for inicio, _ in blocos.values()]))
+    for inicio, fim in zip(limites, limites[1:]):
+        for parte in range(inicio, fim, TAMANHO_FATIA):
+            fatias.append((parte, min(parte + TAMANHO_FATIA, fim)))
+    return fatias
+
+def _ancestrais(pais: array, codigos: array, posicao: int) -> dict[int, int]:
+    """Posição -> código de tipo de 'posicao' e de todos os seus ancestrais."""
+    ancestrais = {}
+    while posicao != -1:
+        ancestrais[posicao] = codigos[posicao]
+        posicao = pais[posicao]
+    return ancestrais
+
+def _validar_estrutura(indice, tipos_por_posicao: Callable[[int], str], total_registros: int, coletor: _Coletor):
+    """Verificações do arquivo como um todo: 0000/9999, ordem dos blocos e tipos desconhecidos."""
+    if total_registros == 0:
+        return
+    if tipos_por_posicao(0) != "0000":
+        coletor.adicionar(0, tipos_por_posicao(0), None, "O primeiro registro do arquivo deve ser o 0000.")
+    ultimo = total_registros - 1
+    if tipos_por_posicao(ultimo) != "9999":
+        coletor.adicionar(ultimo, tipos_por_posicao(ultimo), None, "O último registro do arquivo deve ser o 9999.")
+    for tipo in ("0000", "9999"):
+        for posicao in indice.posicoes(tipo)[1:]:
+            coletor.adicionar(posicao, tipo, None, f"Registro {tipo} repetido: deve haver apenas um por arquivo.")
+
+    ordem_anterior = -1
+    letra_anterior = fim_anterior = None
+    for letra, (inicio, fim) in sorted(indice.blocos.items(), key=lambda item: item[1][0]):
+        tipo_inicio = tipos_por_posicao(inicio)
+        if fim_anterior is not None and inicio < fim_anterior:
+            coletor.adicionar(inicio, tipo_inicio, None, f"Registros do bloco {letra} intercalados com os do bloco {letra_anterior}.")
+        ordem = ORDEM_BLOCOS.find(letra)
+        if ordem == -1:
+            continue # Tipos desconhecidos são avisados abaixo
+        if ordem < ordem_anterior:
+            coletor.adicionar(inicio, tipo_inicio, None, f"Bloco {letra} fora de ordem: deveria vir antes do bloco {letra_anterior}.")
+        ordem_anterior, letra_anterior, fim_anterior = ordem, letra, fim
+
+    for tipo, posicoes in indice.posicoes_por_tipo.items():
+        if tipo not in HIERARQUIA_EFD:
+            coletor.adicionar(posicoes[0], tipo, None,
+                              f"Tipo de registro desconhecido ({len(posicoes)} ocorrência(s)); hierarquia e campos não conferidos.",
+                              GRAVIDADE_AVISO)
+
+
+def validar_registros(registros, processos: int | None = None, limite_problemas: int = LIMITE_PADRAO_PROBLEMAS,
+                      progresso: Callable[[int, int], None] | None = None) -> dict:
+    """
+    Valida o arquivo inteiro (campos, obrigatórios, hierarquia e ordem dos blocos).
+
+    Args:
+        registros: O RegistroStore carregado (com índice) ou uma lista de RegistroEFD.
+        processos (int | None): Máximo de processos trabalhadores (padrão: um por núcleo).
+                                Com 1, ou para arquivos pequenos, valida no próprio processo.
+                                Os processos só são usados para stores mapeados do arquivo de origem,
+                                enquanto o arquivo no disco for o mesmo que foi lido (senão a
+                                validação usa o buffer do store, no próprio processo).
+        limite_problemas (int): Máximo de problemas guardados com detalhes (os demais são contados).
+        progresso: Callback opcional chamado com (bytes validados, registros validados) ao fim de
+                   cada fatia; pode levantar OperacaoCancelada para interromper.
+
+    Returns:
+        dict: Relatório com:
+            "problemas": lista de ProblemaValidacao, em ordem de arquivo;
+            "total_problemas": quantidade total encontrada (pode passar de len(problemas));
+            "total_erros"/"total_avisos": contagem por gravidade dos problemas guardados;
+            "registros": quantidade de registros validados;
+            "segundos": tempo total de execução.
+    """
+    inicio_validacao = time.perf_counter()
+    if isinstance(registros, RegistroStore):
+        store = registros
+        indice = store.indice if store.indice is not None else construir_indice(
+            (store.tipo_registro(p) for p in range(len(store))), len(store))
+        tipos, codigos = store.tipos, store.codigos_tipo
+        dados, inicio_linhas, fim_linhas, editados = store.dados, store.inicio_linhas, store.fim_linhas, store.editados
+        tipo_na_posicao = store.tipo_registro
+    else:
+        tipos, codigos = [], array('H')
+        codigo_do_tipo: dict[str, int] = {}
+        for registro in registros:
+            codigos.append(codigo_do_tipo.setdefault(registro.tipo_registro, len(codigo_do_tipo)))
+        tipos = list(codigo_do_tipo)
+        indice = construir_indice((tipos[c] for c in codigos), len(codigos))
+        dados = inicio_linhas = fim_linhas = None
+        editados = {posicao: registro.campos for posicao, registro in enumerate(registros)}
+        tipo_na_posicao = lambda posicao: tipos[codigos[posicao]]
+    total_registros = len(codigos)
+
+    coletor = _Coletor(limite_problemas)
+    _validar_estrutura(indice, tipo_na_posicao, total_registros, coletor)
+
+    fatias = _fatias(indice.blocos, total_registros)
+    posicoes_editadas = sorted(editados)
+    argumentos = []
+    for inicio, fim in fatias:
+        editados_fatia = {p: editados[p] for p in posicoes_editadas[bisect_left(posicoes_editadas, inicio):
+                                                                   bisect_left(posicoes_editadas, fim)]}
+        argumentos.append((inicio,
+                           inicio_linhas[inicio:fim] if inicio_linhas is not None else None,
+                           fim_linhas[inicio:fim] if fim_linhas is not None else None,
+                           codigos[inicio:fim], indice.pais[inicio:fim], tipos,
+                           _ancestrais(indice.pais, codigos, inicio - 1), editados_fatia, limite_problemas))
+
+    def tamanho_fatia(argumento) -> int:
+        return argumento[2][-1] - argumento[1][0] if argumento[1] else 0
+
+    resultados: list[tuple[list[ProblemaValidacao], int]] = []
+    registros_validados = bytes_validados = 0
+    usar_processos = ((processos or os.cpu_count() or 1) > 1 and total_registros >= LIMITE_VALIDACAO_SERIAL
+                      and len(fatias) > 1 and isinstance(dados, mmap.mmap) and _origem_inalterada(store))
+    if usar_processos:
+        import multiprocessing # Só quando há processos: pesa na importação do módulo (e na inicialização do GUI)
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        # 'spawn': o processo principal pode ter threads (ex: a interface Qt), onde fork não é seguro
+        executor = ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            futuros = {executor.submit(_validar_fatia_em_arquivo, store.caminho_origem, store.identidade_origem, *argumento): argumento
+                       for argumento in argumentos}
+            for futuro in as_completed(futuros):
+                resultados.append(futuro.result())
+                argumento = futuros[futuro]
+                registros_validados += len(argumento[3])
+                bytes_validados += tamanho_fatia(argumento)
+                if progresso is not None:
+                    progresso(bytes_validados, registros_validados)
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+    else:
+        for argumento in argumentos:
+            resultados.append(_validar_fatia(dados, *argumento))
+            registros_validados += len(argumento[3])
+            bytes_validados += tamanho_fatia(argumento)
+            if progresso is not None:
+                progresso(bytes_validados, registros_validados)
+
+    problemas = coletor.problemas
+    total_problemas = coletor.total
+    for problemas_fatia, total_fatia in resultados:
+        problemas.extend(problemas_fatia)
+        total_problemas += total_fatia
+    problemas.sort(key=lambda problema: problema.posicao)
+    del problemas[limite_problemas:]
+
+    total_avisos = sum(1 for problema in problemas if problema.gravidade == GRAVIDADE_AVISO)
+    return {
+        "problemas": problemas,
+        "total_problemas": total_problemas,
+        "total_erros": len(problemas) - total_avisos,
+        "total_avisos": total_avisos,
+        "registros": total_registros,
+        "segundos": time.perf_counter() - inicio_validacao,
+    }
@@ -1,19 +1,28 @@
 # main_window.py
 
-from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                             QPushButton, QFileDialog, QListWidget, QListWidgetItem,
-                             QLabel, QLineEdit, QMenuBar, QFormLayout,
-                             QScrollArea, QMessageBox, QComboBox)
-from PyQt6.QtGui import QAction, QIcon
-from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+                             QPushButton, QFileDialog, QListView,
+                             QLabel, QLineEdit, QMenuBar,
+                             QScrollArea, QMessageBox, QComboBox, QProgressDialog,
+                             QDockWidget, QListWidget, QListWidgetItem, QAbstractItemView,
+                             QTreeWidget, QTreeWidgetItem)
+from PyQt6.QtGui import QAction, QIcon, QKeySequence
+from PyQt6.QtCore import Qt, QTimer, QThreadPool
 from functools import partial # Para conectar sinais com argumentos extras
 import os
 
-from core.efd_parser import parse_efd_file
-from core.efd_structures import RegistroEFD
-from core.efd_generator import generate_efd_file
-from core.efd_field_descriptions import efd_layout
-from core.efd_record_automations import regras_disponiveis
+from core.efd_structures import RegistroStore
+from core.efd_journal import JornalEdicoes
+from core.efd_filtro import FiltroRegistros, filtrar_registros
+from core import efd_instrumentacao as instrumentacao
+# Os demais módulos do core (cache, regras, propagação, busca, validação, conciliação, comparação,
+# gravação) só são usados depois de abrir um arquivo: são importados no primeiro uso, não na
+# inicialização da janela.
+from gui.widgets.modelo_registros import ModeloListaRegistros
+from gui.widgets.formulario_registro import PainelDetalhes
+from gui.workers import TarefaEFD
+
+INTERVALO_FILTRO_MS = 150 # Espera após a última tecla antes de filtrar a lista
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -21,10 +30,10 @@ class MainWindow(QMainWindow):
         self.base_window_title = "Retificador EFD Contribuições"
         self.setWindowTitle(self.base_window_title)
         self.setGeometry(100, 100, 900, 700)
-        self.efd_layout = efd_layout
-        self.regras_disponiveis_para_registro = regras_disponiveis # Carrega as definições de regras
+        self._regras_disponiveis: dict[str, list[dict]] | None = None # Definições das regras, carregadas no primeiro uso
         self.combo_regras_automacao = QComboBox()
         self.btn_aplicar_regra = QPushButton("Aplicar Regra")
+        self.btn_aplicar_regra_lote = QPushButton("Aplicar a Todos do Tipo")
 
         project_base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         icon_path = os.path.join(project_base_path, "resources", "SPED.png") # Substitua "app_icon.png" pelo nome do seu arquivo
@@ -34,13 +43,52 @@ class MainWindow(QMainWindow):
         else:
             print(f"Aviso: Ícone não encontrado em '{icon_path}'")
 
-        self.registros_carregados: list[RegistroEFD] = []
+        self.registros_carregados: RegistroStore = RegistroStore()
         self.dados_modificados: bool = False # Flag para rastrear alterações
-        self.mapa_campos_widgets: dict[int, QLineEdit] = {} 
+        self.mapa_campos_widgets: dict[int, QLineEdit] = {} # Campos do registro exibido (widgets reaproveitados, ver PainelDetalhes)
+        self._tipo_regras_exibidas: str | None = None # Tipo cujas regras estão no combo de automação
+        self._tarefa_atual: TarefaEFD | None = None # Leitura/gravação em andamento no QThreadPool
+        self.jornal = JornalEdicoes() # Desfazer/refazer das edições do store carregado
+        self._propagador = None # PropagadorRegras: recalcula os registros dependentes de cada edição
+        self._indice_busca = None # IndiceBusca: índices por campo, montados na primeira busca que os usa
+        self._cache_sessoes = None # CacheSessoes: índices dos arquivos já abertos e jornais pendentes
+        self._ultimo_filtro: FiltroRegistros | None = None # Refinado quando o texto novo estende o anterior
+        self._tarefa_filtro: TarefaEFD | None = None # Filtro em andamento no QThreadPool
+        self._geracao_filtro = 0 # Resultados de gerações anteriores chegam atrasados e são descartados
 
         self._setup_ui()
     
     # Método para destacar
+    # --- Objetos do core criados no primeiro uso (ver imports) ---
+
+    @property
+    def regras_disponiveis_para_registro(self) -> dict[str, list[dict]]:
+        if self._regras_disponiveis is None:
+            from core.efd_record_automations import regras_disponiveis
+            self._regras_disponiveis = regras_disponiveis
+        return self._regras_disponiveis
+
+    @property
+    def propagador(self):
+        if self._propagador is None:
+            from core.efd_dependencias import PropagadorRegras
+            self._propagador = PropagadorRegras()
+        return self._propagador
+
+    @property
+    def indice_busca(self):
+        if self._indice_busca is None:
+            from core.efd_busca import IndiceBusca
+            self._indice_busca = IndiceBusca()
+        return self._indice_busca
+
+    @property
+    def cache_sessoes(self):
+        if self._cache_sessoes is None:
+            from core.efd_cache import CacheSessoes
+            self._cache_sessoes = CacheSessoes()
+        return self._cache_sessoes
+
     def _destacar_campo_temporariamente(self, qlineedit_widget: QLineEdit, duracao_ms: int = 1500, cor: str = "#ccffcc"): # Verde claro
         if qlineedit_widget:
             try:
@@ -73,6 +121,7 @@ class MainWindow(QMainWindow):
 
     def _set_dados_modificados(self, modificado: bool):
         """Atualiza o estado de modificação e o título da janela."""
+        self._atualizar_acoes_jornal() # Toda modificação passa pelo jornal de desfazer
         if self.dados_modificados == modificado:
             return # Sem mudança no estado
         
@@ -102,10 +151,92 @@ class MainWindow(QMainWindow):
 
         arquivo_menu.addSeparator()
 
+        self.salvar_jornal_action = QAction("Salvar &Jornal de Edições...", self)
+        self.salvar_jornal_action.triggered.connect(self.salvar_jornal_edicoes)
+        self.salvar_jornal_action.setEnabled(False)
+        arquivo_menu.addAction(self.salvar_jornal_action)
+
+        self.reaplicar_jornal_action = QAction("&Reaplicar Jornal de Edições...", self)
+        self.reaplicar_jornal_action.triggered.connect(self.reaplicar_jornal_edicoes)
+        self.reaplicar_jornal_action.setEnabled(False)
+        arquivo_menu.addAction(self.reaplicar_jornal_action)
+
+        arquivo_menu.addSeparator()
+
         sair_action = QAction("&Sair", self)
         sair_action.triggered.connect(self.close) # Usaremos closeEvent para verificar modificações
         arquivo_menu.addAction(sair_action)
 
+        editar_menu = menu_bar.addMenu("&Editar")
+
+        self.desfazer_action = QAction("&Desfazer", self)
+        self.desfazer_action.setShortcut(QKeySequence.StandardKey.Undo)
+        self.desfazer_action.triggered.connect(self.desfazer_edicao)
+        editar_menu.addAction(self.desfazer_action)
+
+        self.refazer_action = QAction("&Refazer", self)
+        self.refazer_action.setShortcut(QKeySequence.StandardKey.Redo)
+        self.refazer_action.triggered.connect(self.refazer_edicao)
+        editar_menu.addAction(self.refazer_action)
+
+        buscar_action = QAction("&Buscar por Valor de Campo", self)
+        buscar_action.setShortcut(QKeySequence.StandardKey.Find)
+        buscar_action.triggered.connect(lambda: (self.busca_input.setFocus(), self.busca_input.selectAll()))
+        editar_menu.addAction(buscar_action)
+        self._atualizar_acoes_jornal()
+
+        ferramentas_menu = menu_bar.addMenu("&Ferramentas")
+
+        validar_action = QAction("&Validar Arquivo", self)
+        validar_action.setShortcut(QKeySequence("F7"))
+        validar_action.triggered.connect(lambda: self.validar_arquivo())
+        ferramentas_menu.addAction(validar_action)
+
+        conciliar_action = QAction("&Conciliar Bloco M com os Documentos", self)
+        conciliar_action.triggered.connect(self.conciliar_bloco_m)
+        ferramentas_menu.addAction(conciliar_action)
+
+        # --- Painel de Problemas de Validação (core.efd_validacao) ---
+        self.lista_problemas = QListWidget()
+        self.lista_problemas.itemActivated.connect(self._ir_para_problema)
+        self.dock_problemas = QDockWidget("Problemas de Validação", self)
+        self.dock_problemas.setWidget(self.lista_problemas)
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.dock_problemas)
+        self.dock_problemas.hide()
+        ferramentas_menu.addAction(self.dock_problemas.toggleViewAction())
+
+        ferramentas_menu.addSeparator()
+        comparar_action = QAction("Co&mparar com o Arquivo Original...", self)
+        comparar_action.triggered.connect(self.comparar_com_original)
+        ferramentas_menu.addAction(comparar_action)
+
+        # --- Painel de Diferenças entre original e retificado (core.efd_comparacao) ---
+        self.arvore_diferencas = QTreeWidget()
+        self.arvore_diferencas.setHeaderLabels(["Registro", "Campo", "Original", "Retificado"])
+        self.arvore_diferencas.setUniformRowHeights(True)
+        self.arvore_diferencas.itemActivated.connect(self._ir_para_diferenca)
+        self.dock_diferencas = QDockWidget("Diferenças", self)
+        self.dock_diferencas.setWidget(self.arvore_diferencas)
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.dock_diferencas)
+        self.dock_diferencas.hide()
+        ferramentas_menu.addAction(self.dock_diferencas.toggleViewAction())
+        self._arquivos_comparados: tuple[str, str] | None = None # (original, retificado) do painel de diferenças
+
+        # --- Instrumentação (core.efd_instrumentacao); já ligada se EFD_RETIFICADOR_INSTRUMENTACAO estiver definida ---
+        ferramentas_menu.addSeparator()
+        instrumentacao_menu = ferramentas_menu.addMenu("&Instrumentação")
+        self.registrar_tempos_action = QAction("Registrar &Tempos", self, checkable=True)
+        self.registrar_tempos_action.setChecked(instrumentacao.ativa())
+        self.registrar_tempos_action.toggled.connect(self._alternar_instrumentacao)
+        instrumentacao_menu.addAction(self.registrar_tempos_action)
+        self.capturar_perfil_action = QAction("Capturar &Perfil (cProfile + tracemalloc)", self, checkable=True)
+        self.capturar_perfil_action.setChecked(instrumentacao.captura_ativa())
+        self.capturar_perfil_action.toggled.connect(self._alternar_captura_perfil)
+        instrumentacao_menu.addAction(self.capturar_perfil_action)
+        exportar_trace_action = QAction("&Exportar Tempos...", self)
+        exportar_trace_action.triggered.connect(self.exportar_instrumentacao)
+        instrumentacao_menu.addAction(exportar_trace_action)
+
         # --- Layout Principal ---
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -119,15 +250,36 @@ class MainWindow(QMainWindow):
         filtro_label = QLabel("Filtrar tipo:")
         self.filtro_input = QLineEdit()
         self.filtro_input.setPlaceholderText("Ex: M200 (vazio p/ todos)")
-        self.filtro_input.textChanged.connect(self.aplicar_filtro_registros)
+        # Cada tecla só reinicia o temporizador; o filtro roda fora da thread da interface
+        self._temporizador_filtro = QTimer(self)
+        self._temporizador_filtro.setSingleShot(True)
+        self._temporizador_filtro.setInterval(INTERVALO_FILTRO_MS)
+        self._temporizador_filtro.timeout.connect(self._iniciar_filtro_assincrono)
+        self.filtro_input.textChanged.connect(self._filtro_digitado)
         
         filtro_layout.addWidget(filtro_label)
         filtro_layout.addWidget(self.filtro_input)
         left_panel_layout.addLayout(filtro_layout)
 
-        self.lista_registros_widget = QListWidget()
-        self.lista_registros_widget.itemSelectionChanged.connect(self.exibir_detalhes_registro)
-        left_panel_layout.addWidget(self.lista_registros_widget)
+        busca_layout = QHBoxLayout()
+        busca_label = QLabel("Buscar:")
+        self.busca_input = QLineEdit()
+        self.busca_input.setPlaceholderText("Ex: C170.COD_NCM=30049099; F100.VL_OPER>1000000 (Enter)")
+        self.busca_input.setToolTip("Busca por valor de campo: TIPO.CAMPO=valor, ^= (prefixo), >, >=, <, <=, "
+                                    "faixa com '..' (ex: VL_DOC=100..500).\nSem o tipo, busca em todos os tipos com o campo "
+                                    "(ex: CNPJ=...). Condições separadas por ';' são combinadas. Enter vazio volta ao filtro.")
+        self.busca_input.returnPressed.connect(self.buscar_registros)
+        busca_layout.addWidget(busca_label)
+        busca_layout.addWidget(self.busca_input)
+        left_panel_layout.addLayout(busca_layout)
+
+        # Lista virtual: o modelo só monta o texto das linhas visíveis
+        self.modelo_registros = ModeloListaRegistros(self)
+        self.lista_registros_view = QListView()
+        self.lista_registros_view.setUniformItemSizes(True)
+        self.lista_registros_view.setModel(self.modelo_registros)
+        self.lista_registros_view.selectionModel().selectionChanged.connect(lambda *_: self.exibir_detalhes_registro())
+        left_panel_layout.addWidget(self.lista_registros_view)
         
         main_splitter_layout.addWidget(left_panel_widget, 1)
 
@@ -156,17 +308,23 @@ class MainWindow(QMainWindow):
         self.btn_aplicar_regra.clicked.connect(self.aplicar_regra_selecionada)
         automacao_layout.addWidget(self.btn_aplicar_regra)
 
+        self.btn_aplicar_regra_lote.setEnabled(False)
+        self.btn_aplicar_regra_lote.setToolTip("Aplica a regra selecionada a todos os registros deste tipo no arquivo.")
+        self.btn_aplicar_regra_lote.clicked.connect(self.aplicar_regra_em_lote)
+        automacao_layout.addWidget(self.btn_aplicar_regra_lote)
+
         right_panel_v_layout.addLayout(automacao_layout) # Adiciona o layout de automação
 
         # ScrollArea para Detalhes do Registro (como antes)
         self.scroll_area_detalhes = QScrollArea()
         self.scroll_area_detalhes.setWidgetResizable(True)
 
-        self.container_widget_detalhes = QWidget() 
-        self.detalhes_layout = QFormLayout(self.container_widget_detalhes) 
-        self.detalhes_layout.addRow(QLabel("Selecione um registro para ver os detalhes."))
+        # Um formulário por tipo de registro, montado uma vez; a seleção só troca os valores
+        self.painel_detalhes = PainelDetalhes()
+        self.painel_detalhes.exibir_mensagem("Selecione um registro para ver os detalhes.")
+        self.painel_detalhes.campo_editado.connect(self.atualizar_campo_registro)
 
-        self.scroll_area_detalhes.setWidget(self.container_widget_detalhes)
+        self.scroll_area_detalhes.setWidget(self.painel_detalhes)
         right_panel_v_layout.addWidget(self.scroll_area_detalhes) # Adiciona a área de scroll com os detalhes
 
         main_splitter_layout.addWidget(right_panel_container_widget, 2) # Adiciona o container do painel direito ao splitter
@@ -186,146 +344,298 @@ class MainWindow(QMainWindow):
             "Arquivos de Texto (*.txt);;Todos os Arquivos (*)"
         )
         if filepath:
-            self.registros_carregados = parse_efd_file(filepath)
-            self._set_dados_modificados(False) # Resetar flag de modificação ao abrir novo arquivo
-            
-            if self.registros_carregados:
-                self.aplicar_filtro_registros()
-                if self.lista_registros_widget.count() > 0:
-                     self.lista_registros_widget.setCurrentRow(0)
-            else:
-                self.lista_registros_widget.clear()
-                self.limpar_detalhes_registro()
-                self.detalhes_layout.addRow(QLabel("Nenhum registro lido ou erro no parser."))
-                QMessageBox.warning(self, "Erro de Leitura", "Nenhum registro foi lido do arquivo ou ocorreu um erro durante o parse.")
+            # Modo mapeado: só indexa as linhas; os campos são divididos ao abrir cada registro.
+            # Arquivos já abertos antes (mesmo conteúdo) vêm do cache de sessões, sem reindexar.
+            # A leitura roda no QThreadPool e o store volta por sinal em _carregamento_concluido.
+            self._executar_em_segundo_plano(
+                TarefaEFD(self.cache_sessoes.carregar_store, filepath),
+                "Abrindo arquivo EFD...",
+                total=os.path.getsize(filepath), progresso_em_bytes=True,
+                ao_concluir=self._carregamento_concluido,
+                titulo_erro="Erro de Leitura")
         else: # Caso o usuário cancele o QFileDialog
             pass
 
+    def _carregamento_concluido(self, novo_store: RegistroStore):
+        if self.dados_modificados:
+            self._guardar_jornal_pendente() # O usuário descartou as alterações; ficam recuperáveis
+        store_anterior = self.registros_carregados
+        self.registros_carregados = novo_store
+        store_anterior.fechar()
+        self.jornal = JornalEdicoes()
+        self.jornal.anexar(novo_store) # Histórico de desfazer começa vazio a cada arquivo
+        self.propagador.anexar(novo_store)
+        self.indice_busca.anexar(novo_store)
+        self.busca_input.clear()
+        self._ultimo_filtro = None # As posições do filtro anterior são do store antigo
+        self._set_dados_modificados(False) # Resetar flag de modificação ao abrir novo arquivo
+        self._atualizar_acoes_jornal()
+        self._oferecer_jornal_pendente()
+
+        problemas = novo_store.problemas_leitura # Linhas descartadas pelo parser (core.efd_structures.ProblemasLeitura)
+        if self.registros_carregados:
+            self.aplicar_filtro_registros()
+            if self.modelo_registros.total_registros_visiveis() > 0:
+                 self.lista_registros_view.setCurrentIndex(self.modelo_registros.index(0))
+            if problemas:
+                QMessageBox.warning(self, "Linhas Ignoradas na Leitura", problemas.descrever())
+        else:
+            self.modelo_registros.definir_registros(None, [])
+            self.limpar_detalhes_registro()
+            self.painel_detalhes.exibir_mensagem("Nenhum registro lido ou erro no parser.")
+            QMessageBox.warning(self, "Erro de Leitura", "Nenhum registro foi lido do arquivo ou ocorreu um erro durante o parse."
+                                + (f"\n\n{problemas.descrever()}" if problemas else ""))
+
+    def _guardar_jornal_pendente(self):
+        """Guarda no cache de sessões as edições não salvas do arquivo atual."""
+        if self.registros_carregados.hash_conteudo:
+            self.cache_sessoes.salvar_jornal_pendente(self.registros_carregados.hash_conteudo, self.jornal)
+
+    def _oferecer_jornal_pendente(self):
+        """Se a última sessão deste arquivo terminou sem salvar, oferece restaurar as edições."""
+        chave = self.registros_carregados.hash_conteudo
+        jornal_pendente = self.cache_sessoes.carregar_jornal_pendente(chave) if chave else None
+        if jornal_pendente is None:
+            return
+        self.cache_sessoes.descartar_jornal_pendente(chave)
+        resposta = QMessageBox.question(self, "Edições Pendentes",
+                                        f"A última sessão deste arquivo terminou com {len(jornal_pendente.desfeitos_disponiveis)} "
+                                        "passo(s) de edição não salvos. Deseja restaurá-los?",
+                                        QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                                        QMessageBox.StandardButton.Yes)
+        if resposta == QMessageBox.StandardButton.No:
+            return
+        self.jornal.desanexar()
+        try:
+            jornal_pendente.reaplicar(self.registros_carregados)
+        except ValueError as e:
+            self.jornal.anexar(self.registros_carregados)
+            QMessageBox.warning(self, "Edições Pendentes", f"As edições não puderam ser restauradas:\n{e}")
+            return
+        self.jornal = jornal_pendente
+        self.modelo_registros.atualizar_todas()
+        self.exibir_detalhes_registro()
+        self._set_dados_modificados(True)
+
+    def _executar_em_segundo_plano(self, tarefa: TarefaEFD, texto: str, total: int, progresso_em_bytes: bool,
+                                   ao_concluir, titulo_erro: str):
+        """
+        Inicia 'tarefa' no QThreadPool com um QProgressDialog (barra + botão Cancelar).
+        'total' é o tamanho em bytes (progresso_em_bytes=True) ou em linhas; 'ao_concluir'
+        recebe o resultado da função quando ela termina sem erro nem cancelamento.
+        """
+        if self._tarefa_atual is not None:
+            QMessageBox.information(self, "Aguarde", "Já existe uma leitura ou gravação em andamento.")
+            return
+
+        dialogo = QProgressDialog(texto, "Cancelar", 0, 1000, self)
+        dialogo.setWindowModality(Qt.WindowModality.WindowModal)
+        dialogo.setMinimumDuration(300) # Arquivos pequenos terminam sem piscar o diálogo
+        dialogo.setAutoClose(False)
+        dialogo.setAutoReset(False)
+
+        def atualizar_progresso(bytes_processados: int, linhas_processadas: int):
+            feito = bytes_processados if progresso_em_bytes else linhas_processadas
+            dialogo.setValue(min(1000, feito * 1000 // total) if total else 0)
+            dialogo.setLabelText(f"{texto}\n{bytes_processados / 1048576:.1f} MB · {linhas_processadas:,} linhas".replace(",", "."))
+
+        def finalizar():
+            self._tarefa_atual = None
+            dialogo.canceled.disconnect()
+            dialogo.close()
+            dialogo.deleteLater()
+
+        def concluido(resultado):
+            finalizar()
+            ao_concluir(resultado)
+
+        def cancelado():
+            finalizar()
+            self.statusBar().showMessage("Operação cancelada.", 5000)
+
+        def falhou(mensagem: str):
+            finalizar()
+            QMessageBox.critical(self, titulo_erro, f"Ocorreu um erro inesperado:\n{mensagem}")
+
+        tarefa.sinais.progresso.connect(atualizar_progresso)
+        tarefa.sinais.concluido.connect(concluido)
+        tarefa.sinais.cancelado.connect(cancelado)
+        tarefa.sinais.falhou.connect(falhou)
+        dialogo.canceled.connect(tarefa.cancelar)
+
+        self._tarefa_atual = tarefa
+        QThreadPool.globalInstance().start(tarefa)
+
+
+    def _cancelar_filtro_em_andamento(self):
+        """Descarta o filtro agendado ou em andamento (o resultado dele será ignorado)."""
+        self._temporizador_filtro.stop()
+        self._geracao_filtro += 1
+        if self._tarefa_filtro is not None:
+            self._tarefa_filtro.cancelar() # Interrompe no próximo lote
+            self._tarefa_filtro = None
+
+    def _filtro_digitado(self, _texto: str):
+        self._cancelar_filtro_em_andamento()
+        self._temporizador_filtro.start()
+
+    def _iniciar_filtro_assincrono(self):
+        """Filtra a lista no QThreadPool, sem diálogo de progresso (ver core.efd_filtro)."""
+        self._cancelar_filtro_em_andamento()
+        store = self.registros_carregados
+        geracao = self._geracao_filtro
+        tarefa = TarefaEFD(filtrar_registros, store, self.filtro_input.text(), anterior=self._ultimo_filtro)
+        tarefa.sinais.concluido.connect(lambda resultado: self._filtro_concluido(geracao, store, resultado))
+        tarefa.sinais.falhou.connect(lambda mensagem: print(f"Erro ao filtrar registros: {mensagem}"))
+        self._tarefa_filtro = tarefa
+        QThreadPool.globalInstance().start(tarefa)
+
+    def _filtro_concluido(self, geracao: int, store: RegistroStore, resultado: FiltroRegistros):
+        if geracao != self._geracao_filtro or store is not self.registros_carregados:
+            return # O usuário continuou digitando ou abriu outro arquivo
+        self._tarefa_filtro = None
+        self._exibir_resultado_filtro(resultado)
 
     def aplicar_filtro_registros(self):
-        texto_filtro = self.filtro_input.text().strip().upper()
-        self.lista_registros_widget.clear()
-        # self.mapa_item_lista_para_indice_registro.clear() # Não precisamos mais deste mapa
-
-        for idx, reg in enumerate(self.registros_carregados):
-            if not texto_filtro or texto_filtro in reg.tipo_registro.upper():
-                num_campos_dados = len(reg.campos) -1
-                campos_preview = '|'.join(reg.campos[1:min(4, num_campos_dados + 1 )])
-                display_text = f"{reg.tipo_registro} | {campos_preview}..." if campos_preview else reg.tipo_registro
-                
-                list_item = QListWidgetItem(display_text)
-                list_item.setData(Qt.ItemDataRole.UserRole, idx) 
-                self.lista_registros_widget.addItem(list_item)
-        
+        """Aplica o filtro atual imediatamente, na thread da interface (ao abrir arquivo, ao ir para um problema...)."""
+        self._cancelar_filtro_em_andamento()
+        self._exibir_resultado_filtro(filtrar_registros(self.registros_carregados, self.filtro_input.text(),
+                                                        anterior=self._ultimo_filtro))
+
+    @instrumentacao.cronometrado("exibir resultado do filtro", "gui")
+    def _exibir_resultado_filtro(self, resultado: FiltroRegistros):
+        # O modelo apenas troca a sequência de posições (nenhum item é criado por registro)
+        self._ultimo_filtro = resultado
+        texto_filtro = resultado.texto
+        posicoes_filtradas = resultado.posicoes
+
+        mensagem_vazia = ""
+        if not self.registros_carregados:
+            mensagem_vazia = "Nenhum arquivo EFD carregado."
+        elif texto_filtro:
+            mensagem_vazia = f"Nenhum registro encontrado para o filtro '{texto_filtro}'."
+        self.modelo_registros.definir_registros(self.registros_carregados, posicoes_filtradas, mensagem_vazia)
+
         self.limpar_detalhes_registro()
         if not self.registros_carregados:
-             self.lista_registros_widget.addItem("Nenhum arquivo EFD carregado.")
-             self.detalhes_layout.addRow(QLabel("Carregue um arquivo EFD para começar."))
-        elif self.lista_registros_widget.count() == 0 and texto_filtro:
-            self.lista_registros_widget.addItem(f"Nenhum registro encontrado para o filtro '{texto_filtro}'.")
-            self.detalhes_layout.addRow(QLabel(f"Nenhum registro encontrado para o filtro '{texto_filtro}'."))
-        elif self.lista_registros_widget.count() > 0 :
-            # self.lista_registros_widget.setCurrentRow(0) # Movido para abrir_arquivo_efd para evitar re-seleção constante
+             self.painel_detalhes.exibir_mensagem("Carregue um arquivo EFD para começar.")
+        elif not posicoes_filtradas and texto_filtro:
+            self.painel_detalhes.exibir_mensagem(f"Nenhum registro encontrado para o filtro '{texto_filtro}'.")
+        elif posicoes_filtradas:
+            # self.lista_registros_view.setCurrentIndex(...) # Movido para abrir_arquivo_efd para evitar re-seleção constante
             pass
         else:
-            self.detalhes_layout.addRow(QLabel("Nenhum registro para exibir."))
+            self.painel_detalhes.exibir_mensagem("Nenhum registro para exibir.")
 
 
+    def buscar_registros(self):
+        """Executa a busca por valor de campo (core.efd_busca) e mostra o resultado na lista."""
+        consulta = self.busca_input.text().strip()
+        if not consulta:
+            self.aplicar_filtro_registros() # Busca vazia: volta à lista do filtro por tipo
+            return
+        if not self.registros_carregados:
+            QMessageBox.warning(self, "Atenção", "Nenhum arquivo EFD carregado para buscar.")
+            return
+        try:
+            condicoes = self.indice_busca.preparar(consulta) # Erros de digitação aparecem antes de indexar
+        except ValueError as e:
+            QMessageBox.warning(self, "Busca", str(e))
+            return
+        self._executar_em_segundo_plano(
+            TarefaEFD(self.indice_busca.buscar, condicoes),
+            "Indexando campos para a busca...",
+            total=len(self.registros_carregados), progresso_em_bytes=False,
+            ao_concluir=self._busca_concluida,
+            titulo_erro="Erro na Busca")
+
+    def _busca_concluida(self, resultado: dict):
+        posicoes = resultado["posicoes"]
+        self.modelo_registros.definir_registros(self.registros_carregados, posicoes,
+                                                f"Nenhum registro atende à busca '{resultado['consulta']}'.")
+        self.limpar_detalhes_registro()
+        if posicoes:
+            self.lista_registros_view.setCurrentIndex(self.modelo_registros.index(0))
+        self.statusBar().showMessage(f"Busca '{resultado['consulta']}': {len(posicoes):,} registro(s) "
+                                     f"({resultado['segundos'] * 1000:.0f} ms).".replace(",", "."), 10000)
+
+    def _posicao_selecionada(self) -> int | None:
+        """Posição (no store) do registro selecionado na lista, ou None."""
+        indices_selecionados = self.lista_registros_view.selectionModel().selectedIndexes()
+        if not indices_selecionados:
+            return None
+        return self.modelo_registros.posicao_da_linha(indices_selecionados[0].row())
+
     def limpar_detalhes_registro(self):
-        while self.detalhes_layout.rowCount() > 0:
-            self.detalhes_layout.removeRow(0)
+        self.painel_detalhes.exibir_mensagem("")
+        self.mapa_campos_widgets = {}
         # Limpar e desabilitar combo de regras também
+        self._tipo_regras_exibidas = None
         self.combo_regras_automacao.clear()
         self.combo_regras_automacao.setEnabled(False)
         self.combo_regras_automacao.setPlaceholderText("Selecione uma regra...")
         self.btn_aplicar_regra.setEnabled(False)
+        self.btn_aplicar_regra_lote.setEnabled(False)
 
+    @instrumentacao.cronometrado("exibir_detalhes_registro", "gui")
     def exibir_detalhes_registro(self):
-        self.limpar_detalhes_registro()
-        self.mapa_campos_widgets.clear()
-        
-        selected_items = self.lista_registros_widget.selectedItems()
-        if not selected_items:
-            self.detalhes_layout.addRow(QLabel("Nenhum registro selecionado."))
-            # Limpar e desabilitar combo de regras se nenhum registro selecionado
-            self.combo_regras_automacao.clear()
-            self.combo_regras_automacao.setEnabled(False)
-            self.btn_aplicar_regra.setEnabled(False)
+        """
+        Exibe o registro selecionado no formulário do seu tipo. Os formulários são montados
+        uma vez por tipo e reaproveitados (ver PainelDetalhes): trocar de registro só troca os
+        valores dos campos, e o combo de regras só é repopulado quando o tipo muda.
+        """
+        indice_registro_original = self._posicao_selecionada()
+        if indice_registro_original is None:
+            self.limpar_detalhes_registro()
+            self.painel_detalhes.exibir_mensagem("Nenhum registro selecionado.")
             self.combo_regras_automacao.setPlaceholderText("Selecione um registro...")
             return
 
-        list_item_selecionado = selected_items[0]
-        indice_registro_original = list_item_selecionado.data(Qt.ItemDataRole.UserRole)
-
-        if indice_registro_original is None or not (0 <= indice_registro_original < len(self.registros_carregados)):
-             self.detalhes_layout.addRow(QLabel("Erro ao obter dados do registro."))
+        if not (0 <= indice_registro_original < len(self.registros_carregados)):
+             self.limpar_detalhes_registro()
+             self.painel_detalhes.exibir_mensagem("Erro ao obter dados do registro.")
              return
 
         registro_selecionado = self.registros_carregados[indice_registro_original]
+        tipo_registro = registro_selecionado.tipo_registro
+        self.mapa_campos_widgets = self.painel_detalhes.exibir_registro(indice_registro_original, tipo_registro,
+                                                                        registro_selecionado.campos)
+        if tipo_registro != self._tipo_regras_exibidas:
+            self._popular_regras_automacao(tipo_registro)
+
+    def _popular_regras_automacao(self, tipo_registro: str):
+        """Popula o ComboBox de Regras de Automação com as regras do tipo de registro."""
+        self._tipo_regras_exibidas = tipo_registro
+        self.combo_regras_automacao.clear()
+        self.combo_regras_automacao.setEnabled(False)
+        self.btn_aplicar_regra.setEnabled(False)
+        self.btn_aplicar_regra_lote.setEnabled(False)
+
+        regras_para_tipo = self.regras_disponiveis_para_registro.get(tipo_registro, [])
+        if regras_para_tipo:
+            self.combo_regras_automacao.setPlaceholderText("Selecione uma regra...")
+            for i, regra_info in enumerate(regras_para_tipo):
+                self.combo_regras_automacao.addItem(regra_info["nome_exibicao"], userData=regra_info) # Armazena todo o dict da regra
+                descricao_tooltip = regra_info.get("descricao", "")
+                if descricao_tooltip:
+                    # Como fazemos clear() antes, 'i' corresponde ao índice do item adicionado.
+                    self.combo_regras_automacao.setItemData(i, descricao_tooltip, Qt.ItemDataRole.ToolTipRole)
+
+            self.combo_regras_automacao.setEnabled(True)
+            self.btn_aplicar_regra.setEnabled(True)
+            self.btn_aplicar_regra_lote.setEnabled(True)
+        else:
+            self.combo_regras_automacao.setPlaceholderText("Nenhuma regra para este tipo.")
 
-        self.detalhes_layout.addRow(QLabel(f"<b>Tipo do Registro: {registro_selecionado.tipo_registro}</b>"))
-
-        for i, valor_campo in enumerate(registro_selecionado.campos):
-            if i == 0: # Pula o campo de tipo de registro, já exibido
-                continue 
-            
-            # Buscar informações do campo no nosso dicionário de dados
-            info_campo = self.efd_layout.get(registro_selecionado.tipo_registro, {}).get(i)
-
-            label_texto_descritivo: str
-            tooltip_texto: str = ""
-
-            if info_campo and info_campo.get("nome"):
-                # Usar o nome oficial do campo e o índice para clareza
-                label_texto_descritivo = f"{info_campo['nome']} (Índice {i}):" 
-                tooltip_texto = info_campo.get('descr', '') # Pega a descrição para o tooltip
-            else:
-                label_texto_descritivo = f"Campo {i} (Nome Desconhecido):" # Fallback
-
-            campo_label_widget = QLabel(label_texto_descritivo)
-            if tooltip_texto:
-                campo_label_widget.setToolTip(tooltip_texto)
-
-            campo_edit = QLineEdit(valor_campo)
-            if tooltip_texto: # Adicionar tooltip ao QLineEdit também pode ser útil
-                campo_edit.setToolTip(f"{tooltip_texto}\nValor atual: {valor_campo}")
-
-            self.mapa_campos_widgets[i] = campo_edit
-
-            campo_edit.editingFinished.connect(
-                partial(self.atualizar_campo_registro, 
-                        indice_registro_original, 
-                        i, 
-                        campo_edit
-                    )
-            )
-            # Adiciona o QLabel e o QLineEdit ao layout de formulário
-            self.detalhes_layout.addRow(campo_label_widget, campo_edit)
-            # Popular ComboBox de Regras de Automação
-            self.combo_regras_automacao.clear()
-            self.combo_regras_automacao.setEnabled(False)
-            self.btn_aplicar_regra.setEnabled(False)
-
-            if registro_selecionado: # Verifica se há um registro selecionado
-                regras_para_tipo = self.regras_disponiveis_para_registro.get(registro_selecionado.tipo_registro, [])
-                if regras_para_tipo:
-                    self.combo_regras_automacao.setPlaceholderText("Selecione uma regra...")
-                    for i, regra_info in enumerate(regras_para_tipo):
-                        self.combo_regras_automacao.addItem(regra_info["nome_exibicao"], userData=regra_info) # Armazena todo o dict da regra
-                        descricao_tooltip = regra_info.get("descricao", "")
-                        if descricao_tooltip:
-                            # 'i' aqui é o índice do item que acabamos de adicionar NO CONTEXTO DESTE LOOP DE POPULAÇÃO.
-                            # Se o combo já tivesse itens antes de clear(), 'i' não seria o índice global correto.
-                            # Mas como fazemos clear() antes, 'i' corresponde ao índice do item adicionado.
-                            self.combo_regras_automacao.setItemData(i, descricao_tooltip, Qt.ItemDataRole.ToolTipRole)
-                    
-                    self.combo_regras_automacao.setEnabled(True)
-                    self.btn_aplicar_regra.setEnabled(True)
-                else:
-                    self.combo_regras_automacao.setPlaceholderText("Nenhuma regra para este tipo.")
-
-        if not registro_selecionado.campos or len(registro_selecionado.campos) <=1:
-             self.detalhes_layout.addRow(QLabel("Registro não possui campos de dados adicionais."))
+    def _atualizar_campos_exibidos(self, indices_campos):
+        """Atualiza no formulário só os campos alterados do registro exibido (ex: por uma regra) e os destaca."""
+        posicao = self._posicao_selecionada()
+        formulario = self.painel_detalhes.formulario_atual()
+        if posicao is None or formulario is None or formulario.posicao != posicao:
+            return
+        campos = self.registros_carregados[posicao].campos
+        for widget_do_campo in formulario.atualizar_campos(campos, indices_campos):
+            self._destacar_campo_temporariamente(widget_do_campo)
 
     def atualizar_campo_registro(self, indice_do_registro_na_lista: int, indice_do_campo_no_registro: int, qlineedit_referencia: QLineEdit):
         """
@@ -341,14 +651,18 @@ class MainWindow(QMainWindow):
         valor_antigo = registro_alvo.obter_campo(indice_do_campo_no_registro)
 
         if valor_antigo != novo_valor:
-            sucesso_definir = registro_alvo.definir_campo(indice_do_campo_no_registro, novo_valor)
+            # A edição e os recálculos dos registros dependentes formam um só passo de desfazer
+            with self.jornal.agrupar(f"Editar campo {indice_do_campo_no_registro} do registro {indice_do_registro_na_lista}"), \
+                 self.propagador.propagando() as propagacao:
+                sucesso_definir = registro_alvo.definir_campo(indice_do_campo_no_registro, novo_valor)
             if sucesso_definir:
                 print(f"Registro [{indice_do_registro_na_lista}] Campo [{indice_do_campo_no_registro}] atualizado para: '{novo_valor}'")
                 self._set_dados_modificados(True)
+                self.modelo_registros.atualizar_posicao(indice_do_registro_na_lista) # Atualiza a prévia na lista
                 if indice_do_campo_no_registro in self.mapa_campos_widgets:
                     widget_do_campo = self.mapa_campos_widgets[indice_do_campo_no_registro]
                     # Certificar-se de que o widget na tela é o mesmo que foi passado (qlineedit_referencia)
-                    # Isso é uma segurança extra, pois o mapa é recriado ao exibir detalhes.
+                    # Isso é uma segurança extra, pois o mapa muda quando outro tipo de registro é exibido.
                     # Se o widget que disparou 'editingFinished' é o mesmo que está no mapa para esse índice, destaque-o.
                     if widget_do_campo is qlineedit_referencia:
                          self._destacar_campo_temporariamente(widget_do_campo)
@@ -356,6 +670,7 @@ class MainWindow(QMainWindow):
                         # Isso pode acontecer se a exibição de detalhes foi recarregada entre a edição e o fim da edição,
                         # ou se o mapa de alguma forma ficou dessincronizado. Pouco provável com editingFinished.
                         print(f"Aviso: Widget para campo {indice_do_campo_no_registro} no mapa é diferente do widget editado.")
+                self._refletir_propagacao(propagacao)
             else:
                 # Isso não deveria acontecer se o índice do campo for > 0
                 print(f"Erro ao tentar definir campo [{indice_do_campo_no_registro}] do registro [{indice_do_registro_na_lista}]")
@@ -377,29 +692,397 @@ class MainWindow(QMainWindow):
             self, "Salvar Arquivo EFD Retificado", "",
             "Arquivos de Texto (*.txt);;Todos os Arquivos (*)"
         )
+        if filepath:
+            from core.efd_generator import generate_efd_file
+            store = self.registros_carregados
+            # Por cima do arquivo aberto, generate_efd_file recarrega o store do arquivo gravado
+            sobre_a_origem = bool(store.caminho_origem) and os.path.exists(filepath) and os.path.samefile(store.caminho_origem, filepath)
+            # Chama a função do nosso módulo gerador no QThreadPool; exceções inesperadas chegam pelo sinal 'falhou'
+            self._executar_em_segundo_plano(
+                TarefaEFD(generate_efd_file, filepath, store),
+                "Salvando arquivo EFD...",
+                total=len(store), progresso_em_bytes=False,
+                ao_concluir=partial(self._salvamento_concluido, filepath, store.hash_conteudo,
+                                    len(store) if sobre_a_origem else None),
+                titulo_erro="Erro Crítico ao Salvar")
+
+    def _salvamento_concluido(self, filepath: str, hash_anterior: str | None, total_anterior: int | None, sucesso: bool):
+        if sucesso:
+            QMessageBox.information(self, "Sucesso", f"Arquivo EFD retificado salvo em:\n{filepath}")
+            self._set_dados_modificados(False) # Resetar flag após salvar com sucesso
+            if hash_anterior:
+                self.cache_sessoes.descartar_jornal_pendente(hash_anterior)
+            if total_anterior is not None:
+                self._store_regravado(total_anterior)
+            self.validar_arquivo(automatica=True) # O conteúdo salvo é o do store: valida sem reler o arquivo
+        else:
+            QMessageBox.critical(self, "Erro ao Salvar", "Ocorreu um erro ao tentar salvar o arquivo.\nVerifique o console para mais detalhes.")
+
+
+    def _store_regravado(self, total_anterior: int):
+        """O store foi recarregado do arquivo salvo por cima da origem: índices e lista passam a refletir o arquivo novo."""
+        store = self.registros_carregados
+        self.indice_busca.anexar(store) # Descarta os índices de campo do conteúdo anterior (ex: x990 recalculados)
+        if len(store) != total_anterior: # As posições mudaram: o histórico de desfazer não vale mais
+            self.jornal.desanexar()
+            self.jornal = JornalEdicoes()
+            self.jornal.anexar(store)
+            self._atualizar_acoes_jornal()
+        self._ultimo_filtro = None
+        self.aplicar_filtro_registros()
+
+    # --- Validação (core.efd_validacao) ---
+
+    def validar_arquivo(self, automatica: bool = False):
+        """
+        Valida o store carregado em segundo plano e lista os problemas no painel.
+        Na validação automática (após salvar), o painel só aparece se houver problemas.
+        """
+        if not self.registros_carregados:
+            if not automatica:
+                QMessageBox.warning(self, "Atenção", "Nenhum arquivo EFD carregado para validar.")
+            return
+        from core.efd_validacao import validar_registros
+        self._executar_em_segundo_plano(
+            TarefaEFD(validar_registros, self.registros_carregados),
+            "Validando arquivo EFD...",
+            total=len(self.registros_carregados), progresso_em_bytes=False,
+            ao_concluir=partial(self._validacao_concluida, automatica),
+            titulo_erro="Erro na Validação")
+
+    def _validacao_concluida(self, automatica: bool, relatorio: dict):
+        total = relatorio["total_problemas"]
+        self._exibir_problemas(relatorio["problemas"], f"Problemas de Validação ({total})")
+        resumo = (f"Validação: {total} problema(s) em {relatorio['registros']:,} registros "
+                  f"({relatorio['segundos']:.2f} s).").replace(",", ".")
+        if total > len(relatorio["problemas"]):
+            resumo += f" Exibindo os primeiros {len(relatorio['problemas'])}."
+        self.statusBar().showMessage(resumo, 10000)
+        if total or not automatica:
+            self.dock_problemas.show()
+
+    def _exibir_problemas(self, problemas: list, titulo: str):
+        """Preenche o painel de problemas (ProblemaValidacao de core.efd_validacao ou core.efd_conciliacao)."""
+        from core.efd_validacao import GRAVIDADE_AVISO
+        self.lista_problemas.clear()
+        for problema in problemas:
+            item = QListWidgetItem(f"[{problema.posicao}] {problema.tipo_registro} — {problema.mensagem}")
+            item.setData(Qt.ItemDataRole.UserRole, problema)
+            if problema.gravidade == GRAVIDADE_AVISO:
+                item.setForeground(Qt.GlobalColor.darkYellow)
+            self.lista_problemas.addItem(item)
+        self.dock_problemas.setWindowTitle(titulo)
+
+    def conciliar_bloco_m(self):
+        """Compara M105/M210/M610 com as somas de C170/C175/F100 e oferece aplicar as correções."""
+        if not self.registros_carregados:
+            QMessageBox.warning(self, "Atenção", "Nenhum arquivo EFD carregado para conciliar.")
+            return
+        from core.efd_conciliacao import conciliar_bloco_m
+        self._executar_em_segundo_plano(
+            TarefaEFD(conciliar_bloco_m, self.registros_carregados),
+            "Conciliando o bloco M com os documentos...",
+            total=len(self.registros_carregados), progresso_em_bytes=False,
+            ao_concluir=self._conciliacao_concluida,
+            titulo_erro="Erro na Conciliação")
+
+    def _conciliacao_concluida(self, relatorio: dict):
+        divergencias = relatorio["divergencias"]
+        self._exibir_problemas(divergencias + relatorio["valores_invalidos"],
+                               f"Divergências da Conciliação ({len(divergencias)})")
+        self.dock_problemas.show()
+        self.statusBar().showMessage(f"Conciliação: {len(divergencias)} divergência(s) em {relatorio['registros']} "
+                                     f"registros ({relatorio['segundos']:.2f} s).", 10000)
+        correcoes = relatorio["correcoes"]
+        if not correcoes:
+            if not divergencias:
+                QMessageBox.information(self, "Conciliação", "Os totais do bloco M conferem com os documentos.")
+            return
+        resposta = QMessageBox.question(self, "Conciliação",
+                                        f"{len(divergencias)} divergência(s) encontrada(s). {len(correcoes)} delas podem ser "
+                                        "corrigidas automaticamente com a soma dos documentos. Deseja aplicar as correções?",
+                                        QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                                        QMessageBox.StandardButton.No)
+        if resposta == QMessageBox.StandardButton.No:
+            return
+        from core.efd_conciliacao import aplicar_correcoes
+        with self.jornal.agrupar("Conciliação do bloco M"), \
+             self.propagador.propagando() as propagacao: # Um único passo de desfazer, com os totais do M200 recalculados
+            aplicadas = aplicar_correcoes(self.registros_carregados, correcoes)
+        if aplicadas:
+            self._set_dados_modificados(True)
+            self.modelo_registros.atualizar_todas()
+            current_list_index = self.lista_registros_view.currentIndex()
+            self.exibir_detalhes_registro()
+            if current_list_index.isValid():
+                self.lista_registros_view.setCurrentIndex(current_list_index)
+        self.statusBar().showMessage(f"Conciliação: {aplicadas} campo(s) corrigido(s), "
+                                     f"{len(propagacao['alterados'])} registro(s) dependente(s) recalculado(s).", 10000)
+
+    # --- Comparação com o arquivo original (core.efd_comparacao) ---
+
+    def comparar_com_original(self):
+        """Compara o arquivo aberto (o retificado, como está no disco) com o original escolhido pelo usuário."""
+        caminho_retificado = self.registros_carregados.caminho_origem if self.registros_carregados else None
+        if not caminho_retificado:
+            caminho_retificado, _ = QFileDialog.getOpenFileName(
+                self, "Selecionar Arquivo EFD Retificado", "", "Arquivos de Texto (*.txt);;Todos os Arquivos (*)")
+            if not caminho_retificado:
+                return
+        elif self.dados_modificados:
+            resposta = QMessageBox.question(self, "Comparar",
+                                            "A comparação usa o arquivo salvo em disco; as alterações ainda não salvas "
+                                            "não aparecerão nas diferenças. Deseja continuar?",
+                                            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                                            QMessageBox.StandardButton.No)
+            if resposta == QMessageBox.StandardButton.No:
+                return
+        caminho_original, _ = QFileDialog.getOpenFileName(
+            self, "Selecionar Arquivo EFD Original", os.path.dirname(caminho_retificado),
+            "Arquivos de Texto (*.txt);;Todos os Arquivos (*)")
+        if not caminho_original:
+            return
+        from core.efd_comparacao import comparar_arquivos_efd
+        # Os dois arquivos são lidos em fluxo, ao mesmo tempo: o progresso é a soma dos bytes lidos
+        self._executar_em_segundo_plano(
+            TarefaEFD(comparar_arquivos_efd, caminho_original, caminho_retificado),
+            "Comparando arquivos EFD...",
+            total=os.path.getsize(caminho_original) + os.path.getsize(caminho_retificado), progresso_em_bytes=True,
+            ao_concluir=partial(self._comparacao_concluida, caminho_original, caminho_retificado),
+            titulo_erro="Erro na Comparação")
+
+    def _comparacao_concluida(self, caminho_original: str, caminho_retificado: str, relatorio: dict):
+        from core.efd_comparacao import nome_campo, SITUACAO_INCLUIDO, SITUACAO_REMOVIDO
+        self._arquivos_comparados = (caminho_original, caminho_retificado)
+        self.arvore_diferencas.clear()
+        itens = []
+        for diferenca in relatorio["diferencas"]:
+            if diferenca.situacao == SITUACAO_INCLUIDO:
+                item = QTreeWidgetItem([f"+ [{diferenca.posicao_retificada}] {diferenca.caminho}", "", "", diferenca.linha])
+                item.setForeground(0, Qt.GlobalColor.darkGreen)
+            elif diferenca.situacao == SITUACAO_REMOVIDO:
+                item = QTreeWidgetItem([f"- [{diferenca.posicao_original}] {diferenca.caminho}", "", diferenca.linha, ""])
+                item.setForeground(0, Qt.GlobalColor.red)
+            else:
+                item = QTreeWidgetItem([f"~ [{diferenca.posicao_original} -> {diferenca.posicao_retificada}] {diferenca.caminho}",
+                                        f"{len(diferenca.campos)} campo(s)", "", ""])
+                for indice, antigo, novo in diferenca.campos:
+                    filho = QTreeWidgetItem([diferenca.tipo_registro, f"{nome_campo(diferenca.tipo_registro, indice)} ({indice})",
+                                             antigo, novo])
+                    filho.setData(0, Qt.ItemDataRole.UserRole, (diferenca, indice))
+                    item.addChild(filho)
+            item.setData(0, Qt.ItemDataRole.UserRole, (diferenca, None))
+            itens.append(item)
+        self.arvore_diferencas.addTopLevelItems(itens) # De uma vez: bem mais rápido que item a item
+        total = relatorio["total_diferencas"]
+        self.dock_diferencas.setWindowTitle(f"Diferenças ({total}): {os.path.basename(caminho_original)} -> "
+                                            f"{os.path.basename(caminho_retificado)}")
+        self.dock_diferencas.show()
+        resumo = (f"Comparação: {relatorio['alterados']:,} alterado(s) ({relatorio['campos_alterados']:,} campos), "
+                  f"{relatorio['incluidos']:,} incluído(s), {relatorio['removidos']:,} removido(s) "
+                  f"({relatorio['segundos']:.2f} s).").replace(",", ".")
+        if total > len(relatorio["diferencas"]):
+            resumo += f" Exibindo as primeiras {len(relatorio['diferencas'])}."
+        self.statusBar().showMessage(resumo, 10000)
+        if not total:
+            QMessageBox.information(self, "Comparação", "Os dois arquivos têm os mesmos registros.")
+
+    def _ir_para_diferenca(self, item: QTreeWidgetItem, _coluna: int):
+        """Seleciona o registro da diferença, se o arquivo aberto é um dos dois comparados."""
+        diferenca, indice_campo = item.data(0, Qt.ItemDataRole.UserRole)
+        caminho_aberto = self.registros_carregados.caminho_origem
+        if not caminho_aberto or self._arquivos_comparados is None:
+            return
+        caminho_original, caminho_retificado = self._arquivos_comparados
+        if os.path.abspath(caminho_aberto) == os.path.abspath(caminho_retificado):
+            posicao = diferenca.posicao_retificada
+        elif os.path.abspath(caminho_aberto) == os.path.abspath(caminho_original):
+            posicao = diferenca.posicao_original
+        else:
+            self.statusBar().showMessage("O arquivo aberto não é nenhum dos dois arquivos comparados.", 5000)
+            return
+        if posicao < 0 or posicao >= len(self.registros_carregados):
+            return # Registro que só existe no outro arquivo
+        self._ir_para_posicao(posicao, indice_campo)
+
+    def _ir_para_problema(self, item: QListWidgetItem):
+        """Seleciona na lista o registro do problema e destaca o campo envolvido, se houver."""
+        problema = item.data(Qt.ItemDataRole.UserRole)
+        self._ir_para_posicao(problema.posicao, problema.indice_campo)
+
+    def _ir_para_posicao(self, posicao: int, indice_campo: int | None):
+        """Seleciona na lista o registro da posição (voltando à lista completa se preciso) e destaca o campo."""
+        linha = self.modelo_registros.linha_da_posicao(posicao)
+        if linha == -1 and (self.filtro_input.text() or self.busca_input.text()):
+            # O registro está escondido pelo filtro ou pela busca: volta à lista completa
+            self.busca_input.clear()
+            self.filtro_input.setText("")
+            self.aplicar_filtro_registros() # Na hora, sem esperar o temporizador do filtro
+            linha = self.modelo_registros.linha_da_posicao(posicao)
+        if linha == -1:
+            return
+        indice_lista = self.modelo_registros.index(linha)
+        self.lista_registros_view.setCurrentIndex(indice_lista)
+        self.lista_registros_view.scrollTo(indice_lista, QAbstractItemView.ScrollHint.PositionAtCenter)
+        widget_do_campo = self.mapa_campos_widgets.get(indice_campo)
+        if widget_do_campo is not None:
+            widget_do_campo.setFocus()
+            self._destacar_campo_temporariamente(widget_do_campo, cor="#ffcccc")
+
+
+    # --- Desfazer / Refazer (core.efd_journal) ---
+
+    def _atualizar_acoes_jornal(self):
+        """Habilita Desfazer/Refazer conforme o jornal e mostra o nome do passo no menu."""
+        if not hasattr(self, "desfazer_action"): # Chamado antes de _setup_ui criar o menu
+            return
+        pode_desfazer = self.jornal.pode_desfazer()
+        pode_refazer = self.jornal.pode_refazer()
+        self.desfazer_action.setEnabled(pode_desfazer)
+        self.desfazer_action.setText(f"&Desfazer: {self.jornal.desfeitos_disponiveis[-1].descricao}" if pode_desfazer else "&Desfazer")
+        self.refazer_action.setEnabled(pode_refazer)
+        self.refazer_action.setText(f"&Refazer: {self.jornal.refazer_disponiveis[-1].descricao}" if pode_refazer else "&Refazer")
+        self.salvar_jornal_action.setEnabled(pode_desfazer or pode_refazer)
+        self.reaplicar_jornal_action.setEnabled(bool(self.registros_carregados))
+
+    def desfazer_edicao(self):
+        passo = self.jornal.desfazer()
+        if passo is not None:
+            self._atualizar_apos_jornal(passo, "Desfeito")
+
+    def refazer_edicao(self):
+        passo = self.jornal.refazer()
+        if passo is not None:
+            self._atualizar_apos_jornal(passo, "Refeito")
+
+    def _refletir_propagacao(self, propagacao: dict):
+        """Atualiza a lista e os campos exibidos com o que a propagação das regras recalculou."""
+        alterados = propagacao["alterados"]
+        if len(alterados) > 100:
+            self.modelo_registros.atualizar_todas()
+        else:
+            for posicao in alterados:
+                self.modelo_registros.atualizar_posicao(posicao)
+        self._atualizar_campos_exibidos(alterados.get(self._posicao_selecionada(), []))
+        if propagacao["erros"]:
+            posicao, nome_regra, mensagem = propagacao["erros"][0]
+            self.statusBar().showMessage(f"Propagação: {len(propagacao['erros'])} erro(s). Registro [{posicao}] "
+                                         f"({nome_regra}): {mensagem}", 10000)
+        elif alterados:
+            self.statusBar().showMessage(f"Propagação: {len(alterados)} registro(s) dependente(s) recalculado(s).", 5000)
+
+    def _atualizar_apos_jornal(self, passo, acao: str):
+        """Atualiza a lista e os detalhes depois que um passo do jornal foi desfeito/refeito/reaplicado."""
+        posicoes = passo.posicoes()
+        if len(posicoes) == 1:
+            self.modelo_registros.atualizar_posicao(next(iter(posicoes)))
+        else:
+            self.modelo_registros.atualizar_todas()
+        current_list_index = self.lista_registros_view.currentIndex()
+        self.exibir_detalhes_registro() # Atualiza os QLineEdits do registro exibido
+        if current_list_index.isValid():
+            self.lista_registros_view.setCurrentIndex(current_list_index)
+        self._set_dados_modificados(True)
+        self.statusBar().showMessage(f"{acao}: {passo.descricao}", 5000)
+
+    def salvar_jornal_edicoes(self):
+        filepath, _ = QFileDialog.getSaveFileName(
+            self, "Salvar Jornal de Edições", "",
+            "Jornal de Edições (*.json);;Todos os Arquivos (*)"
+        )
         if filepath:
             try:
-                # Chama a função do nosso novo módulo gerador
-                sucesso = generate_efd_file(filepath, self.registros_carregados)
-                
-                if sucesso:
-                    QMessageBox.information(self, "Sucesso", f"Arquivo EFD retificado salvo em:\n{filepath}")
-                    self._set_dados_modificados(False) # Resetar flag após salvar com sucesso
-                else:
-                    QMessageBox.critical(self, "Erro ao Salvar", "Ocorreu um erro ao tentar salvar o arquivo.\nVerifique o console para mais detalhes.")
-            except Exception as e: # Captura qualquer outra exceção inesperada do processo
-                QMessageBox.critical(self, "Erro Crítico ao Salvar", f"Ocorreu um erro inesperado durante o salvamento:\n{e}")
-                print(f"Erro crítico ao salvar arquivo em: {filepath} - {e}")
+                self.jornal.salvar(filepath)
+                self.statusBar().showMessage(f"Jornal de edições salvo em {filepath}", 5000)
+            except OSError as e:
+                QMessageBox.critical(self, "Erro ao Salvar Jornal", f"Não foi possível salvar o jornal:\n{e}")
 
+    def reaplicar_jornal_edicoes(self):
+        """Reaplica um jornal salvo sobre o arquivo carregado (que deve ser o arquivo original da sessão)."""
+        if not self.registros_carregados:
+            QMessageBox.warning(self, "Atenção", "Abra o arquivo EFD original antes de reaplicar um jornal.")
+            return
+        if self.jornal.pode_desfazer():
+            resposta = QMessageBox.question(self, "Reaplicar Jornal",
+                                            "O histórico de edições atual será substituído pelo do jornal. Deseja continuar?",
+                                            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                                            QMessageBox.StandardButton.No)
+            if resposta == QMessageBox.StandardButton.No:
+                return
+
+        filepath, _ = QFileDialog.getOpenFileName(
+            self, "Reaplicar Jornal de Edições", "",
+            "Jornal de Edições (*.json);;Todos os Arquivos (*)"
+        )
+        if not filepath:
+            return
+        self.jornal.desanexar() # As alterações reaplicadas não devem entrar no histórico atual
+        try:
+            jornal = JornalEdicoes.carregar(filepath)
+            jornal.reaplicar(self.registros_carregados)
+        except (OSError, ValueError, KeyError, TypeError) as e: # KeyError/TypeError: jornal malformado
+            self.jornal.anexar(self.registros_carregados)
+            QMessageBox.critical(self, "Erro ao Reaplicar Jornal", f"O jornal não pôde ser reaplicado:\n{e}")
+            return
+
+        self.jornal = jornal
+        self.modelo_registros.atualizar_todas()
+        self.exibir_detalhes_registro()
+        self._set_dados_modificados(True)
+        QMessageBox.information(self, "Jornal Reaplicado",
+                                f"{len(jornal.desfeitos_disponiveis)} passo(s) de edição reaplicado(s).")
+
+    # --- Instrumentação ---
+
+    def _alternar_instrumentacao(self, ligada: bool):
+        if ligada:
+            instrumentacao.ativar()
+            self.statusBar().showMessage("Registrando tempos das operações (Ferramentas > Instrumentação > Exportar Tempos).", 5000)
+        else:
+            self.capturar_perfil_action.setChecked(False) # Grava a captura em andamento, se houver
+            instrumentacao.desativar()
+
+    def _alternar_captura_perfil(self, ligada: bool):
+        if ligada:
+            self.registrar_tempos_action.setChecked(True)
+            instrumentacao.ativar(perfil=True, memoria=True)
+            return
+        arquivos = instrumentacao.encerrar_captura(instrumentacao.diretorio_saida())
+        if arquivos:
+            QMessageBox.information(self, "Captura de Perfil", "Perfil e relatório de memória gravados:\n" + "\n".join(arquivos))
+
+    def exportar_instrumentacao(self):
+        """Grava os tempos registrados como trace do Chrome (.json) ou log estruturado (.jsonl)."""
+        if not instrumentacao.resumo()["intervalos"]:
+            QMessageBox.information(self, "Instrumentação", "Nenhum tempo registrado. Ligue Ferramentas > Instrumentação > Registrar Tempos e repita a operação.")
+            return
+        filepath, filtro = QFileDialog.getSaveFileName(
+            self, "Exportar Tempos", "",
+            "Trace do Chrome (*.json);;Log Estruturado (*.jsonl);;Todos os Arquivos (*)"
+        )
+        if not filepath:
+            return
+        try:
+            if filepath.endswith(".jsonl") or filtro.startswith("Log"):
+                quantidade = instrumentacao.exportar_log(filepath)
+            else:
+                quantidade = instrumentacao.exportar_chrome_trace(filepath)
+        except OSError as e:
+            QMessageBox.critical(self, "Erro ao Exportar", f"Não foi possível gravar os tempos:\n{e}")
+            return
+        self.statusBar().showMessage(f"{quantidade} evento(s) exportado(s) para {filepath}", 5000)
 
     def closeEvent(self, event):
         """Sobrescreve o evento de fechar a janela para verificar alterações não salvas."""
+        if self._tarefa_atual is not None:
+            self._tarefa_atual.cancelar() # Interrompe leitura/gravação em andamento no próximo aviso de progresso
         if self.dados_modificados:
             resposta = QMessageBox.question(self, "Sair",
                                             "Você tem alterações não salvas. Deseja realmente sair e descartá-las?",
                                             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
                                             QMessageBox.StandardButton.No)
             if resposta == QMessageBox.StandardButton.Yes:
+                self._guardar_jornal_pendente() # Recuperável ao reabrir o mesmo arquivo
                 event.accept()  # Fecha a janela
             else:
                 event.ignore()  # Não fecha a janela
@@ -408,8 +1091,8 @@ class MainWindow(QMainWindow):
     # Adicionar este novo método à classe MainWindow
 
     def aplicar_regra_selecionada(self):
-        selected_items_registro = self.lista_registros_widget.selectedItems()
-        if not selected_items_registro:
+        indice_registro_original = self._posicao_selecionada()
+        if indice_registro_original is None:
             QMessageBox.warning(self, "Atenção", "Nenhum registro selecionado para aplicar a regra.")
             return
 
@@ -425,29 +1108,62 @@ class MainWindow(QMainWindow):
 
         funcao_regra = regra_data["funcao"]
 
-        # Obter o objeto RegistroEFD que está selecionado na lista principal
-        list_item_selecionado_na_lista_principal = selected_items_registro[0]
-        indice_registro_original = list_item_selecionado_na_lista_principal.data(Qt.ItemDataRole.UserRole)
+        # Obter o registro (RegistroView) que está selecionado na lista principal
         registro_efd_alvo = self.registros_carregados[indice_registro_original]
 
         # Chamar a função da regra
         # Passamos todos_os_registros caso a regra precise deles (opcional para a função da regra)
-        modificado = funcao_regra(registro_efd_alvo, self.registros_carregados) 
+        with self.jornal.agrupar(regra_data['nome_exibicao']), \
+             self.propagador.propagando() as propagacao, \
+             instrumentacao.medir("regra", "regras", regra=regra_data['nome_exibicao']): # Todos os campos alterados (e os recalculados) viram um só passo de desfazer
+            modificado = funcao_regra(registro_efd_alvo, self.registros_carregados)
 
         if modificado:
             self._set_dados_modificados(True)
-            # Reexibir os detalhes do registro para refletir as mudanças
-            # Isso é crucial para que os QLineEdits sejam atualizados.
-            # Guardar a seleção atual da lista de registros para restaurá-la, se necessário,
-            # pois exibir_detalhes_registro pode ser chamado por itemSelectionChanged e limpar a seleção.
-            current_list_row = self.lista_registros_widget.currentRow()
-            self.exibir_detalhes_registro() # Atualiza os QLineEdits
-            if current_list_row != -1: # Restaura a seleção se foi perdida
-                self.lista_registros_widget.setCurrentRow(current_list_row)
-            for idx_campo_alterado in modificado:
-                if idx_campo_alterado in self.mapa_campos_widgets:
-                    self._destacar_campo_temporariamente(self.mapa_campos_widgets[idx_campo_alterado])
+            self.modelo_registros.atualizar_posicao(indice_registro_original)
+            # Só os QLineEdits dos campos alterados recebem o novo valor (o formulário não é remontado)
+            self._atualizar_campos_exibidos(modificado)
+            self._refletir_propagacao(propagacao)
             QMessageBox.information(self, "Regra Aplicada", f"A regra '{regra_data['nome_exibicao']}' foi aplicada com sucesso.")
         else:
             # Se não modificou, pode ser por erro na regra (ver console) ou porque não havia o que mudar
-            QMessageBox.information(self, "Regra Aplicada", f"A regra '{regra_data['nome_exibicao']}' foi processada, mas não resultou em alterações no registro ou encontrou um problema (verifique o console).")
\ No newline at end of file
+            QMessageBox.information(self, "Regra Aplicada", f"A regra '{regra_data['nome_exibicao']}' foi processada, mas não resultou em alterações no registro ou encontrou um problema (verifique o console).")
+
+    def aplicar_regra_em_lote(self):
+        """Aplica a regra selecionada a todos os registros do mesmo tipo, com um único relatório ao final."""
+        regra_data = self.combo_regras_automacao.currentData()
+        if self.combo_regras_automacao.currentIndex() < 0 or not regra_data or "funcao" not in regra_data:
+            QMessageBox.warning(self, "Atenção", "Nenhuma regra de automação selecionada.")
+            return
+
+        from core.efd_record_automations import aplicar_regras_em_lote
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            with self.jornal.agrupar(f"{regra_data['nome_exibicao']} (em lote)"), \
+                 self.propagador.propagando() as propagacao: # Um único passo de desfazer; dependentes recalculados uma vez ao final
+                relatorio = aplicar_regras_em_lote(self.registros_carregados, [regra_data])
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        alterados = relatorio["alterados"]
+        if alterados:
+            self._set_dados_modificados(True)
+            self.modelo_registros.atualizar_todas()
+            self._atualizar_campos_exibidos(alterados.get(self._posicao_selecionada(), [])) # Só os campos alterados do registro exibido
+
+        resumo = (f"Regra '{regra_data['nome_exibicao']}' aplicada em lote.\n\n"
+                  f"Registros processados: {relatorio['processados']}\n"
+                  f"Registros alterados: {len(alterados)}\n"
+                  f"Sem alteração: {relatorio['sem_alteracao']}\n"
+                  f"Erros: {relatorio['total_erros']}\n"
+                  f"Tempo: {relatorio['segundos']:.2f} s")
+        if propagacao["alterados"]:
+            self._refletir_propagacao(propagacao)
+            resumo += (f"\n\nRegistros dependentes recalculados: {len(propagacao['alterados'])} "
+                       f"({propagacao['segundos']:.2f} s)")
+        if relatorio["erros"]:
+            primeiros_erros = "\n".join(f"Registro [{pos}]: {mensagem}" for pos, _, mensagem in relatorio["erros"][:10])
+            resumo += f"\n\nPrimeiros erros:\n{primeiros_erros}"
+            QMessageBox.warning(self, "Regra Aplicada em Lote", resumo)
+        else:
+            QMessageBox.information(self, "Regra Aplicada em Lote", resumo)
@@ -0,0 +1,156 @@
+# formulario_registro.py
+
+from collections import OrderedDict
+from collections.abc import Sequence
+from functools import partial
+
+from PyQt6.QtWidgets import QWidget, QFormLayout, QLabel, QLineEdit, QStackedWidget
+from PyQt6.QtCore import pyqtSignal
+
+LIMITE_FORMULARIOS = 48 # Formulários (tipos de registro) mantidos no cache
+
+
+class FormularioRegistro(QWidget):
+    """
+    Formulário de edição dos campos de um tipo de registro, montado uma única vez e
+    reaproveitado para todos os registros do tipo.
+
+    As linhas (QLabel com nome/índice do campo e QLineEdit) são criadas sob demanda, até a
+    maior quantidade de campos já exibida; a seleção de outro registro só troca os valores
+    (vincular). Cada QLineEdit é conectado uma vez: a edição finalizada é avisada por
+    'campo_editado' com (posição do registro vinculado, índice do campo, QLineEdit).
+    """
+    campo_editado = pyqtSignal(int, int, object)
+
+    def __init__(self, tipo_registro: str, parent=None):
+        super().__init__(parent)
+        self.tipo_registro = tipo_registro
+        self.posicao: int | None = None # Registro vinculado
+        from core.efd_schema import schema_do_tipo # Layout da EFD: carregado ao exibir o primeiro registro, não na inicialização
+        self._schema = schema_do_tipo(tipo_registro) # Descritores pré-compilados do layout
+        self._layout = QFormLayout(self)
+        self._layout.addRow(QLabel(f"<b>Tipo do Registro: {tipo_registro}</b>"))
+        self._edits: list[QLineEdit] = [] # _edits[i - 1] é o campo de índice i
+        self._labels: list[QLabel] = []
+        self._visiveis = 0
+        self._aviso_sem_campos = QLabel("Registro não possui campos de dados adicionais.")
+        self._layout.addRow(self._aviso_sem_campos)
+
+    def _criar_linha(self, indice: int):
+        # Buscar informações do campo no schema compilado do dicionário de dados
+        info_campo = self._schema.campo(indice) if self._schema is not None else None
+        if info_campo:
+            # Usar o nome oficial do campo e o índice para clareza
+            campo_label = QLabel(f"{info_campo.nome} (Índice {indice}):")
+            campo_label.setToolTip(info_campo.descricao)
+        else:
+            campo_label = QLabel(f"Campo {indice} (Nome Desconhecido):") # Fallback
+        campo_edit = QLineEdit()
+        campo_edit.editingFinished.connect(partial(self._edicao_finalizada, indice, campo_edit))
+        # Antes do aviso de "sem campos", que fica sempre por último
+        self._layout.insertRow(self._layout.rowCount() - 1, campo_label, campo_edit)
+        self._labels.append(campo_label)
+        self._edits.append(campo_edit)
+
+    def _edicao_finalizada(self, indice: int, campo_edit: QLineEdit):
+        if self.posicao is not None:
+            self.campo_editado.emit(self.posicao, indice, campo_edit)
+
+    def confirmar_edicao_pendente(self):
+        """Avisa a edição em andamento (campo com foco e texto alterado) antes de trocar o registro vinculado."""
+        for campo_edit in self._edits[:self._visiveis]:
+            if campo_edit.hasFocus() and campo_edit.isModified():
+                campo_edit.setModified(False)
+                self._edicao_finalizada(self._edits.index(campo_edit) + 1, campo_edit)
+
+    def vincular(self, posicao: int, campos: Sequence[str]) -> dict[int, QLineEdit]:
+        """Exibe os valores do registro da 'posicao' e devolve o mapa índice do campo -> QLineEdit."""
+        self.confirmar_edicao_pendente()
+        self.posicao = posicao
+        quantidade = len(campos) - 1 # O campo 0 (tipo do registro) já está no título
+        while len(self._edits) < quantidade:
+            self._criar_linha(len(self._edits) + 1)
+        for indice in range(1, quantidade + 1):
+            campo_edit = self._definir_valor(indice, campos[indice])
+            if campo_edit.styleSheet(): # Destaque temporário de outro registro
+                campo_edit.setStyleSheet("")
+        # Linhas além dos campos deste registro ficam escondidas (QFormLayout ignora linhas ocultas)
+        for i in range(min(quantidade, self._visiveis), max(quantidade, self._visiveis)):
+            self._labels[i].setVisible(i < quantidade)
+            self._edits[i].setVisible(i < quantidade)
+        self._visiveis = quantidade
+        self._aviso_sem_campos.setVisible(quantidade <= 0)
+        return {i + 1: self._edits[i] for i in range(quantidade)}
+
+    def _definir_valor(self, indice: int, valor_campo: str) -> QLineEdit:
+        campo_edit = self._edits[indice - 1]
+        campo_edit.setText(valor_campo) # setText não dispara editingFinished
+        descricao = self._labels[indice - 1].toolTip()
+        campo_edit.setToolTip(f"{descricao}\nValor atual: {valor_campo}" if descricao else "")
+        return campo_edit
+
+    def atualizar_campos(self, campos: Sequence[str], indices) -> list[QLineEdit]:
+        """Troca só os valores dos campos 'indices' (ex: os alterados por uma regra); devolve os widgets atualizados."""
+        return [self._definir_valor(indice, campos[indice]) for indice in indices
+                if 1 <= indice <= self._visiveis and indice < len(campos)]
+
+
+class PainelDetalhes(QStackedWidget):
+    """
+    Painel de detalhes com um FormularioRegistro por tipo de registro (cache LRU de
+    LIMITE_FORMULARIOS) e uma página de mensagem ("Nenhum registro selecionado." etc.).
+    'campo_editado' repassa o sinal de todos os formulários.
+    """
+    campo_editado = pyqtSignal(int, int, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._mensagem = QLabel()
+        self._mensagem.setWordWrap(True)
+        pagina_mensagem = QWidget()
+        QFormLayout(pagina_mensagem).addRow(self._mensagem)
+        self.addWidget(pagina_mensagem)
+        self._pagina_mensagem = pagina_mensagem
+        self._formularios: OrderedDict[str, FormularioRegistro] = OrderedDict()
+        self.currentChanged.connect(lambda _: self.updateGeometry())
+
+    # O QStackedWidget mede pelo maior formulário do cache; na área de rolagem vale só o exibido
+    def sizeHint(self):
+        return self.currentWidget().sizeHint()
+
+    def minimumSizeHint(self):
+        return self.currentWidget().minimumSizeHint()
+
+    def exibir_mensagem(self, texto: str):
+        formulario = self.formulario_atual()
+        if formulario is not None:
+            formulario.confirmar_edicao_pendente()
+            formulario.posicao = None
+        self._mensagem.setText(texto)
+        self.setCurrentWidget(self._pagina_mensagem)
+
+    def formulario_atual(self) -> FormularioRegistro | None:
+        atual = self.currentWidget()
+        return atual if isinstance(atual, FormularioRegistro) else None
+
+    def exibir_registro(self, posicao: int, tipo_registro: str, campos: Sequence[str]) -> dict[int, QLineEdit]:
+        """Vincula o registro ao formulário do seu tipo (criado na primeira vez) e o exibe."""
+        anterior = self.formulario_atual()
+        if anterior is not None and anterior.tipo_registro != tipo_registro:
+            anterior.confirmar_edicao_pendente()
+            anterior.posicao = None
+        formulario = self._formularios.get(tipo_registro)
+        if formulario is None:
+            formulario = FormularioRegistro(tipo_registro)
+            formulario.campo_editado.connect(self.campo_editado)
+            self.addWidget(formulario)
+            self._formularios[tipo_registro] = formulario
+            if len(self._formularios) > LIMITE_FORMULARIOS:
+                _, removido = self._formularios.popitem(last=False)
+                self.removeWidget(removido)
+                removido.deleteLater()
+        else:
+            self._formularios.move_to_end(tipo_registro)
+        mapa = formulario.vincular(posicao, campos)
+        self.setCurrentWidget(formulario)
+        return mapa
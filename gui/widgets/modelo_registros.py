@@ -0,0 +1,90 @@
+# modelo_registros.py
+
+from bisect import bisect_left
+from collections.abc import Sequence
+
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex
+
+class ModeloListaRegistros(QAbstractListModel):
+    """
+    Modelo virtual da lista de registros, para uso com um QListView.
+
+    Não cria um item por registro: guarda apenas o store carregado e a sequência de
+    posições visíveis (o "proxy" do filtro). O texto de cada linha é montado sob demanda
+    em data(), só para as linhas que o QListView realmente desenha.
+    Com a lista vazia, exibe uma única linha não selecionável com 'mensagem_vazia'.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._store = None
+        self._posicoes: Sequence[int] = []
+        self._mensagem_vazia: str = ""
+
+    def definir_registros(self, store, posicoes: Sequence[int], mensagem_vazia: str = ""):
+        """Troca o store e/ou a sequência de posições exibidas (ordenada, em ordem de arquivo)."""
+        self.beginResetModel()
+        self._store = store
+        self._posicoes = posicoes
+        self._mensagem_vazia = mensagem_vazia
+        self.endResetModel()
+
+    def total_registros_visiveis(self) -> int:
+        return len(self._posicoes)
+
+    def posicao_da_linha(self, linha: int) -> int | None:
+        """Posição do registro no store para a linha do modelo (None para a linha de mensagem)."""
+        if 0 <= linha < len(self._posicoes):
+            return self._posicoes[linha]
+        return None
+
+    def linha_da_posicao(self, posicao: int) -> int:
+        """Linha do modelo em que o registro aparece, ou -1 se ele não está visível."""
+        linha = bisect_left(self._posicoes, posicao)
+        if linha < len(self._posicoes) and self._posicoes[linha] == posicao:
+            return linha
+        return -1
+
+    def atualizar_posicao(self, posicao: int):
+        """Avisa a view que o texto do registro mudou (ex: após editar um campo)."""
+        linha = self.linha_da_posicao(posicao)
+        if linha != -1:
+            indice = self.index(linha)
+            self.dataChanged.emit(indice, indice, [Qt.ItemDataRole.DisplayRole])
+
+    def atualizar_todas(self):
+        """Avisa a view que o texto de todas as linhas pode ter mudado (ex: após uma regra em lote)."""
+        if self._posicoes:
+            self.dataChanged.emit(self.index(0), self.index(len(self._posicoes) - 1), [Qt.ItemDataRole.DisplayRole])
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        if not self._posicoes:
+            return 1 if self._mensagem_vazia else 0
+        return len(self._posicoes)
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        if not self._posicoes:
+            return Qt.ItemFlag.ItemIsEnabled # Linha de mensagem: não selecionável
+        return super().flags(index)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        posicao = self.posicao_da_linha(index.row())
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            if posicao is None:
+                return self._mensagem_vazia
+            return self._texto_preview(posicao)
+        if role == Qt.ItemDataRole.UserRole:
+            return posicao
+        return None
+
+    def _texto_preview(self, posicao: int) -> str:
+        reg = self._store[posicao]
+        campos = reg.campos
+        num_campos_dados = len(campos) - 1
+        campos_preview = '|'.join(campos[1:min(4, num_campos_dados + 1)])
+        return f"{reg.tipo_registro} | {campos_preview}..." if campos_preview else reg.tipo_registro
@@ -0,0 +1,54 @@
+# workers.py
+
+"""
+Execução de leitura e gravação de arquivos EFD fora da thread da interface.
+"""
+import threading
+
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+from core.efd_structures import OperacaoCancelada
+from core.efd_instrumentacao import medir, perfilando
+
+class SinaisTarefa(QObject):
+    """Sinais de uma TarefaEFD (QRunnable não é QObject e não pode declarar sinais)."""
+    progresso = pyqtSignal(int, int)  # (bytes processados, linhas processadas)
+    concluido = pyqtSignal(object)    # Resultado da função executada
+    cancelado = pyqtSignal()
+    falhou = pyqtSignal(str)
+
+
+class TarefaEFD(QRunnable):
+    """
+    Executa uma função de core (ex: carregar_registro_store, generate_efd_file) em uma
+    thread do QThreadPool. A função deve aceitar o argumento nomeado 'progresso', que é
+    chamado com (bytes, linhas); cancelar() faz o próximo aviso de progresso levantar
+    OperacaoCancelada, interrompendo a função.
+    """
+
+    def __init__(self, funcao, *args, **kwargs):
+        super().__init__()
+        self.sinais = SinaisTarefa()
+        self._funcao = funcao
+        self._args = args
+        self._kwargs = kwargs
+        self._cancelar = threading.Event()
+
+    def cancelar(self):
+        self._cancelar.set()
+
+    def _progresso(self, bytes_processados: int, linhas_processadas: int):
+        if self._cancelar.is_set():
+            raise OperacaoCancelada()
+        self.sinais.progresso.emit(bytes_processados, linhas_processadas)
+
+    def run(self):
+        try:
+            with perfilando(), medir(f"tarefa: {getattr(self._funcao, '__name__', 'função')}", "tarefa"):
+                resultado = self._funcao(*self._args, progresso=self._progresso, **self._kwargs)
+        except OperacaoCancelada:
+            self.sinais.cancelado.emit()
+        except Exception as e:
+            self.sinais.falhou.emit(str(e))
+        else:
+            self.sinais.concluido.emit(resultado)
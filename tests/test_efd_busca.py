@@ -0,0 +1,109 @@
+# test_efd_busca.py
+
+import pytest
+
+from core import efd_busca
+from core.efd_busca import IndiceBusca
+from core.efd_parser import carregar_registro_store
+from core.efd_schema import SCHEMA_EFD
+
+def _linha(tipo: str, **valores: str) -> str:
+    indices = SCHEMA_EFD[tipo].indices
+    campos = [""] * len(indices)
+    campos[0] = tipo
+    for nome, valor in valores.items():
+        campos[indices[nome]] = valor
+    return "|" + "|".join(campos) + "|"
+
+LINHAS = [
+    "|0000|x|",
+    _linha("0150", COD_PART="P1", NOME="PADARIA CENTRAL"),   # 1
+    _linha("0150", COD_PART="P2", NOME="PAPELARIA"),         # 2
+    _linha("0150", COD_PART="P3", NOME="MERCADO"),           # 3
+    _linha("0200", COD_ITEM="I1", COD_NCM="30049099"),       # 4
+    _linha("0200", COD_ITEM="I2", COD_NCM="22030000"),       # 5
+    _linha("C170", NUM_ITEM="1", COD_ITEM="I1"),             # 6
+    _linha("C170", NUM_ITEM="2", COD_ITEM="I2"),             # 7
+    _linha("C170", NUM_ITEM="3", COD_ITEM="I1"),             # 8
+    _linha("F100", COD_PART="P1", VL_OPER="1000,00"),        # 9
+    _linha("F100", COD_PART="P2", VL_OPER="1500,50"),        # 10
+    _linha("F100", COD_PART="P3", VL_OPER="5000"),           # 11
+    _linha("F100", COD_PART="P1", VL_OPER="999,99"),         # 12
+    "|9999|14|",
+]
+VL_OPER = SCHEMA_EFD["F100"].indices["VL_OPER"]
+
+@pytest.fixture(params=[False, True], ids=["memoria", "mapeado"])
+def store(request, tmp_path):
+    caminho = tmp_path / "efd.txt"
+    caminho.write_text("\n".join(LINHAS) + "\n", encoding="latin-1")
+    store = carregar_registro_store(str(caminho), mapear=request.param)
+    yield store
+    store.fechar()
+
+@pytest.fixture
+def busca(store) -> IndiceBusca:
+    indice = IndiceBusca()
+    indice.anexar(store)
+    return indice
+
+def _posicoes(busca: IndiceBusca, consulta: str) -> list[int]:
+    return list(busca.buscar(consulta)["posicoes"])
+
+@pytest.mark.parametrize("consulta, esperado", [
+    ("F100.VL_OPER=1000", [9]),
+    ("F100.VL_OPER=5000,00", [11]),
+    ("F100.VL_OPER=1000..5000", [9, 10, 11]), # Faixa inclusiva nas duas pontas
+    ("F100.VL_OPER=999,99..1000", [9, 12]),
+    ("F100.VL_OPER>1000", [10, 11]),
+    ("F100.VL_OPER>=1000", [9, 10, 11]),
+    ("F100.VL_OPER<5000", [9, 10, 12]),
+    ("F100.VL_OPER<=999,99", [12]),
+    ("F100.VL_OPER>999,995", [9, 10, 11]), # Limite com mais casas que o índice
+    ("F100.VL_OPER<999,985", []),
+    ("0150.NOME^=PA", [1, 2]),
+    ("0150.NOME^=PAD", [1]),
+    ("0150.NOME^=Z", []),
+    ("C170.COD_NCM=30049099", [6, 8]), # C170.COD_ITEM -> 0200.COD_NCM
+    ("F100.NOME^=PADARIA", [9, 12]), # F100.COD_PART -> 0150.NOME
+    ("F100.VL_OPER>=1000; F100.COD_PART=P1", [9]),
+])
+def test_consultas(busca, consulta, esperado):
+    assert _posicoes(busca, consulta) == esperado
+
+def test_faixa_em_campo_texto_e_recusada(busca):
+    with pytest.raises(ValueError):
+        busca.buscar("0150.NOME=A..B")
+
+def test_edicoes_depois_da_montagem_do_indice(store, busca):
+    assert _posicoes(busca, "F100.VL_OPER>1000") == [10, 11]
+    assert store.definir_campo(12, VL_OPER, "2000,00") # Passa a atender
+    assert store.definir_campo(10, VL_OPER, "10,00") # Deixa de atender
+    assert _posicoes(busca, "F100.VL_OPER>1000") == [11, 12]
+    assert _posicoes(busca, "F100.VL_OPER=10") == [10]
+    assert _posicoes(busca, "F100.VL_OPER=1500,50") == []
+
+    assert _posicoes(busca, "0150.NOME^=PA") == [1, 2]
+    assert store.definir_campo(3, SCHEMA_EFD["0150"].indices["NOME"], "PASTELARIA")
+    assert _posicoes(busca, "0150.NOME^=PA") == [1, 2, 3]
+
+def test_edicoes_no_registro_referenciado_e_no_que_referencia(store, busca):
+    assert _posicoes(busca, "C170.COD_NCM=30049099") == [6, 8]
+    assert store.definir_campo(5, SCHEMA_EFD["0200"].indices["COD_NCM"], "30049099")
+    assert _posicoes(busca, "C170.COD_NCM=30049099") == [6, 7, 8]
+    assert store.definir_campo(8, SCHEMA_EFD["C170"].indices["COD_ITEM"], "SEM_CADASTRO")
+    assert _posicoes(busca, "C170.COD_NCM=30049099") == [6, 7]
+
+def test_indice_reconstruido_acima_do_limite_de_alteracoes(store, busca, monkeypatch):
+    monkeypatch.setattr(efd_busca, "LIMITE_ALTERACOES_PENDENTES", 2)
+    assert _posicoes(busca, "F100.VL_OPER>=1000") == [9, 10, 11]
+    for posicao, valor in ((9, "1,00"), (10, "2,00")):
+        assert store.definir_campo(posicao, VL_OPER, valor)
+    assert ("F100", VL_OPER) in busca.campos_indexados() # Até o limite, só anota as posições
+    assert store.definir_campo(12, VL_OPER, "3000")
+    assert ("F100", VL_OPER) not in busca.campos_indexados()
+
+    resultado = busca.buscar("F100.VL_OPER>=1000")
+    assert list(resultado["posicoes"]) == [11, 12]
+    assert resultado["campos_montados"] == 1 # Remontado com os valores editados
+    assert _posicoes(busca, "F100.VL_OPER<3") == [9, 10]
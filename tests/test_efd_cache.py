@@ -0,0 +1,108 @@
+# test_efd_cache.py
+
+import os
+import time
+
+import pytest
+
+from benchmarks.gerador_efd import gerar_arquivo_efd
+from core import efd_cache
+from core.efd_cache import CacheSessoes, EXTENSAO_ENTRADA
+
+def _gerar(caminho, linhas: int, semente: int) -> str:
+    gerar_arquivo_efd(str(caminho), linhas, semente=semente)
+    _envelhecer(str(caminho))
+    return str(caminho)
+
+def _envelhecer(caminho: str, segundos: int = 60):
+    """Recua o mtime: arquivos modificados agora há pouco não têm a identidade registrada."""
+    antigo = time.time_ns() - segundos * 1_000_000_000
+    os.utime(caminho, ns=(antigo, antigo))
+
+def _campos(store) -> list[list[str]]:
+    return [store.campos(i) for i in range(len(store))]
+
+@pytest.fixture
+def hashes(monkeypatch) -> list[str]:
+    """Arquivos cujo conteúdo foi lido para calcular o hash."""
+    calculados = []
+    original = efd_cache.hash_conteudo
+    def contar(filepath, progresso=None):
+        calculados.append(filepath)
+        return original(filepath, progresso)
+    monkeypatch.setattr(efd_cache, "hash_conteudo", contar)
+    return calculados
+
+def test_reabrir_arquivo_inalterado_nao_recalcula_o_hash(tmp_path, hashes):
+    caminho = _gerar(tmp_path / "efd.txt", 2_000, semente=1)
+    cache = CacheSessoes(str(tmp_path / "cache"))
+    primeiro = cache.carregar_store(caminho)
+    segundo = cache.carregar_store(caminho)
+    assert hashes == [caminho]
+    assert segundo.hash_conteudo == primeiro.hash_conteudo
+    assert _campos(segundo) == _campos(primeiro)
+    assert segundo.indice.posicoes("F100") == primeiro.indice.posicoes("F100")
+    primeiro.fechar()
+    segundo.fechar()
+
+def test_arquivo_recem_modificado_nao_tem_a_identidade_registrada(tmp_path, hashes):
+    caminho = str(tmp_path / "efd.txt")
+    gerar_arquivo_efd(caminho, 500, semente=1)
+    cache = CacheSessoes(str(tmp_path / "cache"))
+    cache.carregar_store(caminho).fechar()
+    cache.carregar_store(caminho).fechar()
+    assert hashes == [caminho, caminho]
+
+def test_entrada_de_arquivo_alterado_e_rejeitada(tmp_path, hashes):
+    caminho = _gerar(tmp_path / "efd.txt", 2_000, semente=1)
+    cache = CacheSessoes(str(tmp_path / "cache"))
+    antigo = cache.carregar_store(caminho)
+    chave_antiga = antigo.hash_conteudo
+    antigo.fechar()
+
+    conteudo = bytearray(open(caminho, 'rb').read())
+    posicao = conteudo.index(b"|F100|") + len(b"|F100|")
+    conteudo[posicao:posicao + 1] = b"9" if conteudo[posicao:posicao + 1] != b"9" else b"8" # Mesmo tamanho
+    with open(caminho + ".novo", 'wb') as file:
+        file.write(conteudo)
+    os.replace(caminho + ".novo", caminho)
+    _envelhecer(caminho)
+
+    novo = cache.carregar_store(caminho)
+    assert novo.hash_conteudo != chave_antiga
+    assert len(hashes) == 2
+    assert _campos(novo) == _campos(efd_cache.carregar_registro_store(caminho))
+    novo.fechar()
+
+def test_entrada_corrompida_e_descartada(tmp_path):
+    caminho = _gerar(tmp_path / "efd.txt", 1_000, semente=1)
+    cache = CacheSessoes(str(tmp_path / "cache"))
+    store = cache.carregar_store(caminho)
+    entrada = os.path.join(cache.diretorio, store.hash_conteudo + EXTENSAO_ENTRADA)
+    esperado = _campos(store)
+    store.fechar()
+    with open(entrada, 'r+b') as file:
+        file.write(b"LIXO")
+    relido = cache.carregar_store(caminho)
+    assert _campos(relido) == esperado
+    relido.fechar()
+
+def test_limite_remove_a_entrada_usada_ha_mais_tempo(tmp_path):
+    caminhos = [_gerar(tmp_path / f"efd_{i}.txt", 1_000, semente=i) for i in range(3)]
+    cache = CacheSessoes(str(tmp_path / "cache"))
+    chaves = []
+    for uso, caminho in enumerate(caminhos[:2]):
+        store = cache.carregar_store(caminho)
+        chaves.append(store.hash_conteudo)
+        store.fechar()
+        _envelhecer(os.path.join(cache.diretorio, chaves[-1] + EXTENSAO_ENTRADA), segundos=100 - uso)
+    tamanho_entrada = max(os.path.getsize(os.path.join(cache.diretorio, chave + EXTENSAO_ENTRADA)) for chave in chaves)
+
+    cache.carregar_store(caminhos[0]).fechar() # Reabrir conta como uso: o efd_1 passa a ser o mais antigo
+    cache.limite_bytes = 2 * tamanho_entrada + tamanho_entrada // 2
+    store = cache.carregar_store(caminhos[2])
+    chaves.append(store.hash_conteudo)
+    store.fechar()
+
+    existentes = [os.path.exists(os.path.join(cache.diretorio, chave + EXTENSAO_ENTRADA)) for chave in chaves]
+    assert existentes == [True, False, True]
@@ -0,0 +1,84 @@
+# test_efd_comparacao.py
+
+import tracemalloc
+
+from benchmarks.gerador_efd import gerar_arquivo_efd
+from core.efd_comparacao import comparar_arquivos_efd, SITUACAO_ALTERADO, SITUACAO_INCLUIDO, SITUACAO_REMOVIDO
+
+ARQUIVO_SIMPLES = ["|0000|x|", "|F001|0|", "|F010|11111111000191|",
+                   "|F100|0|a|1|", "|F111|x|", "|F111|z|",
+                   "|F100|0|b|2|", "|F111|y|",
+                   "|F990|7|", "|9999|9|"]
+
+def _gravar(caminho, linhas: list[bytes]):
+    caminho.write_bytes(b"\n".join(linhas) + b"\n")
+    return str(caminho)
+
+def _comparar(tmp_path, original: list[str], retificado: list[str]) -> dict:
+    return comparar_arquivos_efd(_gravar(tmp_path / "original.txt", [l.encode() for l in original]),
+                                 _gravar(tmp_path / "retificado.txt", [l.encode() for l in retificado]))
+
+def _arquivo_sintetico(tmp_path) -> list[bytes]:
+    caminho = tmp_path / "sintetico.txt"
+    gerar_arquivo_efd(str(caminho), 5_000, semente=7)
+    return caminho.read_bytes().splitlines()
+
+def test_f100_incluido_gera_uma_unica_diferenca(tmp_path):
+    linhas = _arquivo_sintetico(tmp_path)
+    posicoes_f100 = [i for i, linha in enumerate(linhas) if linha.startswith(b"|F100|")]
+    retificado = list(linhas)
+    retificado.insert(posicoes_f100[3], linhas[posicoes_f100[3]].replace(b"|F100|", b"|F100|9", 1))
+    relatorio = comparar_arquivos_efd(_gravar(tmp_path / "original.txt", linhas), _gravar(tmp_path / "retificado.txt", retificado))
+    assert relatorio["total_diferencas"] == 1
+    diferenca = relatorio["diferencas"][0]
+    assert (diferenca.situacao, diferenca.tipo_registro) == (SITUACAO_INCLUIDO, "F100")
+
+def test_f100_removido_gera_uma_unica_diferenca(tmp_path):
+    linhas = _arquivo_sintetico(tmp_path)
+    posicao = [i for i, linha in enumerate(linhas) if linha.startswith(b"|F100|")][3]
+    retificado = linhas[:posicao] + linhas[posicao + 1:]
+    relatorio = comparar_arquivos_efd(_gravar(tmp_path / "original.txt", linhas), _gravar(tmp_path / "retificado.txt", retificado))
+    assert relatorio["total_diferencas"] == 1
+    assert relatorio["diferencas"][0].situacao == SITUACAO_REMOVIDO
+
+def test_registro_sem_chave_alterado_pareado_pela_posicao(tmp_path):
+    retificado = list(ARQUIVO_SIMPLES)
+    retificado[3] = "|F100|0|a|9|"
+    retificado[5] = "|F111|w|" # Filho do F100 alterado: comparado sob o registro pareado
+    relatorio = _comparar(tmp_path, ARQUIVO_SIMPLES, retificado)
+    assert [(d.situacao, d.tipo_registro, d.campos) for d in relatorio["diferencas"]] == [
+        (SITUACAO_ALTERADO, "F100", [(3, "1", "9")]),
+        (SITUACAO_ALTERADO, "F111", [(1, "z", "w")]),
+    ]
+
+def test_registro_sem_chave_incluido_com_filho(tmp_path):
+    retificado = ARQUIVO_SIMPLES[:3] + ["|F100|0|c|3|", "|F111|x|"] + ARQUIVO_SIMPLES[3:]
+    relatorio = _comparar(tmp_path, ARQUIVO_SIMPLES, retificado)
+    assert [(d.situacao, d.tipo_registro) for d in relatorio["diferencas"]] == [
+        (SITUACAO_INCLUIDO, "F100"), (SITUACAO_INCLUIDO, "F111")]
+
+def test_arquivos_iguais_sem_diferencas(tmp_path):
+    assert _comparar(tmp_path, ARQUIVO_SIMPLES, ARQUIVO_SIMPLES)["total_diferencas"] == 0
+
+def _pico_de_memoria(tmp_path, quantidade_f100: int) -> int:
+    linhas = [b"|0000|x|", b"|F001|0|", b"|F010|11111111000191|"]
+    linhas += [b"|F100|0|%d|1,00|" % i for i in range(quantidade_f100)] + [b"|9999|1|"]
+    caminho = _gravar(tmp_path / f"f100_{quantidade_f100}.txt", linhas)
+    tracemalloc.start()
+    try:
+        assert comparar_arquivos_efd(caminho, caminho)["total_diferencas"] == 0
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def test_memoria_nao_cresce_com_os_filhos_sem_chave(tmp_path):
+    pequeno = _pico_de_memoria(tmp_path, 20_000)
+    grande = _pico_de_memoria(tmp_path, 80_000)
+    assert grande < pequeno * 1.5 + 256 * 1024
+
+def test_linhas_repetidas_casadas_em_ordem(tmp_path):
+    repetidas = ARQUIVO_SIMPLES[:3] + ["|F100|0|a|1|"] * 3 + ARQUIVO_SIMPLES[6:]
+    retificado = repetidas[:4] + repetidas[5:]
+    relatorio = _comparar(tmp_path, repetidas, retificado)
+    assert [(d.situacao, d.tipo_registro) for d in relatorio["diferencas"]] == [(SITUACAO_REMOVIDO, "F100")]
+    assert _comparar(tmp_path, repetidas, repetidas)["total_diferencas"] == 0
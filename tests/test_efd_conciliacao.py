@@ -0,0 +1,89 @@
+# test_efd_conciliacao.py
+
+import pytest
+
+from core.efd_conciliacao import conciliar_bloco_m
+from core.efd_parser import carregar_registro_store
+from core.efd_schema import SCHEMA_EFD
+from core.efd_structures import RegistroEFD
+
+def _linha(tipo: str, **valores: str) -> str:
+    indices = SCHEMA_EFD[tipo].indices
+    campos = [""] * len(indices)
+    campos[0] = tipo
+    for nome, valor in valores.items():
+        campos[indices[nome]] = valor
+    return "|" + "|".join(campos) + "|"
+
+def _c170(cst: str, base: str, aliquota_pis: str = "1,65", aliquota_cofins: str = "7,60") -> str:
+    return _linha("C170", CST_PIS=cst, VL_BC_PIS=base, ALIQ_PIS=aliquota_pis,
+                  CST_COFINS=cst, VL_BC_COFINS=base, ALIQ_COFINS=aliquota_cofins)
+
+def _f100(cst: str, base: str, aliquota_pis: str = "1,6500", aliquota_cofins: str = "7,6000") -> str:
+    return _linha("F100", CST_PIS=cst, VL_BC_PIS=base, ALIQ_PIS=aliquota_pis,
+                  CST_COFINS=cst, VL_BC_COFINS=base, ALIQ_COFINS=aliquota_cofins, NAT_BC_CRED="13")
+
+def _m210(base: str, aliquota: str = "1,65") -> str:
+    return _linha("M210", COD_CONT="01", VL_BC_CONT=base, ALIQ_PIS=aliquota)
+
+def _arquivo(*m210: str) -> list[str]:
+    """Receitas de 100,00 (C170) + 50,00 (F100) com CST 01 e crédito de 30,00 com CST 50."""
+    return ["|0000|x|", _c170("01", "100,00"), _f100("01", "50,00"), _c170("50", "30,00"),
+            _linha("M105", NAT_BC_CRED="01", CST_PIS="50", VL_BC_PIS_TOT="30,00"),
+            *(m210 or (_m210("150,00"),)),
+            _linha("M610", COD_CONT="01", VL_BC_CONT="150,00", ALIQ_COFINS="7,6"), "|9999|9|"]
+
+@pytest.fixture(params=["lista", "store"])
+def carregar(request, tmp_path):
+    def carregar(linhas: list[str]):
+        if request.param == "lista":
+            return [RegistroEFD(linha[1:-1].split("|")[0], linha[1:-1].split("|")) for linha in linhas]
+        caminho = tmp_path / "efd.txt"
+        caminho.write_text("\n".join(linhas) + "\n", encoding="latin-1")
+        return carregar_registro_store(str(caminho))
+    return carregar
+
+def _posicao(registros, tipo: str) -> int:
+    return next(i for i in range(len(registros)) if registros[i].tipo_registro == tipo)
+
+def test_arquivo_conciliado_sem_divergencias(carregar):
+    # C170 com "1,65"/"7,60", F100 com "1,6500"/"7,6000" e M610 com "7,6": mesma alíquota
+    relatorio = conciliar_bloco_m(carregar(_arquivo()))
+    assert relatorio["divergencias"] == [] and relatorio["correcoes"] == []
+    assert relatorio["valores_invalidos"] == []
+
+def test_m210_divergente_recebe_correcao(carregar):
+    registros = carregar(_arquivo(_m210("140,00")))
+    posicao = _posicao(registros, "M210")
+    indice = SCHEMA_EFD["M210"].indices["VL_BC_CONT"]
+
+    relatorio = conciliar_bloco_m(registros)
+    assert relatorio["correcoes"] == [(posicao, indice, "150,00")]
+    assert [(p.posicao, p.tipo_registro) for p in relatorio["divergencias"]] == [(posicao, "M210")]
+    assert registros[posicao].obter_campo(indice) == "140,00" # Sem corrigir=True nada é gravado
+
+    relatorio = conciliar_bloco_m(registros, corrigir=True)
+    assert relatorio["corrigidos"] == 1
+    assert registros[posicao].obter_campo(indice) == "150,00"
+    assert conciliar_bloco_m(registros)["divergencias"] == []
+
+def test_dois_m210_da_mesma_aliquota_pedem_correcao_manual(carregar):
+    registros = carregar(_arquivo(_m210("100,00", "1,65"), _m210("40,00", "1,6500")))
+    relatorio = conciliar_bloco_m(registros, corrigir=True)
+    assert relatorio["correcoes"] == [] and relatorio["corrigidos"] == 0
+    (divergencia,) = relatorio["divergencias"]
+    assert divergencia.tipo_registro == "M210"
+    assert "2 registros M210" in divergencia.mensagem and "140,00" in divergencia.mensagem
+    indice = SCHEMA_EFD["M210"].indices["VL_BC_CONT"]
+    assert [registros[i].obter_campo(indice) for i in range(len(registros)) if registros[i].tipo_registro == "M210"] == [
+        "100,00", "40,00"]
+
+def test_valor_nao_numerico_vai_para_valores_invalidos(carregar):
+    linhas = _arquivo()
+    linhas[2] = _f100("01", "abc")
+    registros = carregar(linhas)
+    relatorio = conciliar_bloco_m(registros)
+    assert [(p.posicao, p.tipo_registro, p.indice_campo) for p in relatorio["valores_invalidos"]] == [
+        (2, "F100", SCHEMA_EFD["F100"].indices["VL_BC_PIS"]), (2, "F100", SCHEMA_EFD["F100"].indices["VL_BC_COFINS"])]
+    # Sem o F100, os documentos somam 100,00 nas duas alíquotas
+    assert sorted(valor for _, _, valor in relatorio["correcoes"]) == ["100,00", "100,00"]
@@ -0,0 +1,59 @@
+# test_efd_generator.py
+
+import os
+
+import pytest
+
+from benchmarks.gerador_efd import gerar_arquivo_efd
+from core import efd_generator
+from core.efd_parser import carregar_registro_store, parse_efd_file
+from core.efd_generator import generate_efd_file
+from core.efd_structures import OperacaoCancelada
+
+@pytest.mark.parametrize("mapear", [False, True])
+def test_salvar_sobre_a_origem_recarrega_o_store(tmp_path, mapear):
+    caminho = str(tmp_path / "efd.txt")
+    gerar_arquivo_efd(caminho, 2_000, semente=3)
+    store = carregar_registro_store(caminho, mapear=mapear)
+    posicao = store.indice.posicoes("F100")[0]
+    assert store.definir_campo(posicao, 3, "ITEM ALTERADO")
+
+    assert generate_efd_file(caminho, store)
+    assert store.editados == {}
+    assert store.obter_campo(posicao, 3) == "ITEM ALTERADO"
+    assert os.listdir(tmp_path) == ["efd.txt"] # Sem temporários
+    relido = carregar_registro_store(caminho)
+    assert [store.campos(i) for i in range(len(store))] == [relido.campos(i) for i in range(len(relido))]
+    store.fechar()
+
+def test_arquivo_com_o_nome_do_temporario_antigo_e_preservado(tmp_path):
+    origem = str(tmp_path / "origem.txt")
+    gerar_arquivo_efd(origem, 500, semente=3)
+    destino = tmp_path / "efd.txt"
+    (tmp_path / "efd.txt.tmp").write_text("arquivo do usuário")
+    assert generate_efd_file(str(destino), parse_efd_file(origem))
+    assert (tmp_path / "efd.txt.tmp").read_text() == "arquivo do usuário"
+    assert sorted(os.listdir(tmp_path)) == ["efd.txt", "efd.txt.tmp", "origem.txt"]
+
+def test_gravacao_cancelada_remove_o_temporario(tmp_path, monkeypatch):
+    monkeypatch.setattr(efd_generator, "INTERVALO_PROGRESSO", 100)
+    origem = str(tmp_path / "origem.txt")
+    gerar_arquivo_efd(origem, 500, semente=3)
+    def cancelar(bytes_gravados, linhas):
+        raise OperacaoCancelada()
+    with pytest.raises(OperacaoCancelada):
+        generate_efd_file(str(tmp_path / "efd.txt"), parse_efd_file(origem), progresso=cancelar)
+    assert os.listdir(tmp_path) == ["origem.txt"]
+
+@pytest.mark.skipif(os.name != "posix", reason="permissões POSIX")
+def test_permissoes_do_destino_sao_mantidas(tmp_path):
+    caminho = str(tmp_path / "efd.txt")
+    gerar_arquivo_efd(caminho, 500, semente=3)
+    os.chmod(caminho, 0o640)
+    assert generate_efd_file(caminho, parse_efd_file(caminho))
+    assert os.stat(caminho).st_mode & 0o777 == 0o640
+    novo = str(tmp_path / "novo.txt")
+    assert generate_efd_file(novo, parse_efd_file(caminho))
+    mascara = os.umask(0o022)
+    os.umask(mascara)
+    assert os.stat(novo).st_mode & 0o777 == 0o666 & ~mascara
@@ -0,0 +1,58 @@
+# test_efd_numerico.py
+
+import random
+from decimal import Decimal, InvalidOperation
+
+import pytest
+
+from core.efd_numerico import ForaDoCaminhoRapido, decodificar, aplicar_aliquota_percentual_lote
+from core.efd_record_automations import _aplicar_aliquota
+
+def _aliquota_com_decimal(base_str: str, aliquota_str: str) -> str:
+    """A conta original da regra do M210, só com Decimal."""
+    base = Decimal(base_str.replace(',', '.'))
+    aliquota = Decimal(aliquota_str.replace(',', '.'))
+    return f"{(base * (aliquota / Decimal('100'))).quantize(Decimal('0.01')):.2f}".replace('.', ',')
+
+def _resultado(funcao, *args):
+    try:
+        return funcao(*args)
+    except InvalidOperation:
+        return InvalidOperation
+
+def _numero_aleatorio(sorteio: random.Random, max_digitos: int) -> str:
+    inteiro = str(sorteio.randrange(10 ** sorteio.randint(1, max_digitos)))
+    casas = sorteio.choice([0, 1, 2, 2, 2, 4, 6])
+    texto = inteiro if not casas else f"{inteiro},{sorteio.randrange(10 ** casas):0{casas}d}"
+    return ("-" if sorteio.random() < 0.1 else "") + texto
+
+def test_aliquota_igual_ao_decimal_em_casos_aleatorios():
+    sorteio = random.Random(9)
+    for _ in range(50_000):
+        base, aliquota = _numero_aleatorio(sorteio, 14), _numero_aleatorio(sorteio, 3)
+        assert _aplicar_aliquota(base, aliquota) == _aliquota_com_decimal(base, aliquota), (base, aliquota)
+
+@pytest.mark.parametrize("base, aliquota", [
+    ("-0", "1,65"), ("-0,00", "1,65"), ("0", "-1,65"), ("-0,001", "1,65"), ("0,01", "-0,0001"), # Sinal do zero
+    ("1234567890123456789012345678,9", "1,65"), ("99999999999999999999", "99999999,99999"), # Mais de 28 dígitos
+    ("1234.56", "1.65"), ("1234,56", "1.65"), ("1234.56", "1,65"), # Separadores
+    ("1234,565", "100"), ("0,005", "100"), ("0,015", "100"), ("-0,005", "100"), # Meio para o par
+    (" 10,00", "1,65"), ("1E+3", "1,65"), ("NaN", "1,65"), ("", "1,65"), ("abc", "1,65"), ("1,2,3", "1,65"),
+])
+def test_aliquota_igual_ao_decimal_fora_do_caminho_rapido(base, aliquota):
+    assert _resultado(_aplicar_aliquota, base, aliquota) == _resultado(_aliquota_com_decimal, base, aliquota)
+
+def test_lote_igual_ao_decimal():
+    sorteio = random.Random(11)
+    pares = []
+    while len(pares) < 5_000:
+        base, aliquota = _numero_aleatorio(sorteio, 14), _numero_aleatorio(sorteio, 3)
+        try: # Como em calcular_contribuicao_m210_lote: o que o codec rejeita vai para a regra individual
+            decodificar(base), decodificar(aliquota)
+        except ForaDoCaminhoRapido:
+            continue
+        pares.append((base, aliquota))
+    resultados = aplicar_aliquota_percentual_lote([decodificar(b) for b, _ in pares], [decodificar(a) for _, a in pares])
+    for (base, aliquota), resultado in zip(pares, resultados):
+        if resultado is not None: # None: o chamador usa o caminho com Decimal
+            assert resultado == _aliquota_com_decimal(base, aliquota), (base, aliquota)
@@ -0,0 +1,35 @@
+# test_efd_parser.py
+
+import pytest
+
+from core.efd_parser import parse_efd_file, carregar_registro_store
+from core.efd_structures import ProblemasLeitura
+
+# Quebras e espaços fora do padrão: '\r' sozinho no meio da linha, '\xa0' e '\x85' nas pontas,
+# '\r\n', linha sem pipes e linha sem tipo
+CONTEUDO_IRREGULAR = (b"|0000|x|\r\n"
+                      b"|C170|x\rY|\n"
+                      b"|C170|b|\xa0\n"
+                      b"\x85|C170|c|\n"
+                      b"  |C170|d|\t\r\n"
+                      b"sem pipes\n"
+                      b"||\n"
+                      b"|9999|6|")
+
+@pytest.fixture
+def arquivo_irregular(tmp_path):
+    caminho = tmp_path / "irregular.txt"
+    caminho.write_bytes(CONTEUDO_IRREGULAR)
+    return str(caminho)
+
+def _linhas_problemas(problemas: ProblemasLeitura) -> list[tuple[int, int, int]]:
+    return list(zip(problemas.linhas, problemas.offsets, problemas.tipos))
+
+@pytest.mark.parametrize("mapear", [False, True])
+def test_parse_e_store_leem_os_mesmos_registros(arquivo_irregular, mapear):
+    problemas_parse = ProblemasLeitura()
+    registros = parse_efd_file(arquivo_irregular, problemas_parse)
+    store = carregar_registro_store(arquivo_irregular, mapear=mapear)
+    assert [registro.campos for registro in registros] == [store.campos(posicao) for posicao in range(len(store))]
+    assert [registro.campos for registro in registros] == [["0000", "x"], ["C170", "x\rY"], ["C170", "d"], ["9999", "6"]]
+    assert _linhas_problemas(problemas_parse) == _linhas_problemas(store.problemas_leitura)
@@ -0,0 +1,30 @@
+# test_efd_pipeline.py
+
+from core.cli import main
+from core.efd_pipeline import retificar_efd_em_fluxo
+
+def test_entrada_inexistente_vem_no_resumo(tmp_path):
+    caminho = str(tmp_path / "nao_existe.txt")
+    resumo = retificar_efd_em_fluxo(caminho, str(tmp_path / "saida.txt"), {})
+    assert not resumo["sucesso"]
+    assert caminho in resumo["erro"]
+    assert not (tmp_path / "saida.txt").exists()
+
+def test_cli_mostra_o_motivo_da_falha(tmp_path, capsys):
+    caminho = str(tmp_path / "nao_existe.txt")
+    assert main(["retificar", caminho, "-r", "M100", "-o", str(tmp_path / "saida"), "-j", "1"]) == 1
+    saida = capsys.readouterr().out
+    assert f"FALHA {caminho}: Arquivo não encontrado em '{caminho}'" in saida
+
+def test_cli_recusa_entradas_com_a_mesma_saida(tmp_path, capsys):
+    entradas = []
+    for diretorio in ("a", "b"):
+        (tmp_path / diretorio).mkdir()
+        caminho = tmp_path / diretorio / "x.txt"
+        caminho.write_bytes(b"|0000|x|\n|9999|2|\n")
+        entradas.append(str(caminho))
+    saida = tmp_path / "saida"
+    assert main(["retificar", *entradas, "-r", "M210", "-o", str(saida), "-j", "1"]) == 2
+    erro = capsys.readouterr().err
+    assert entradas[0] in erro and entradas[1] in erro
+    assert not saida.exists()
@@ -0,0 +1,45 @@
+# test_efd_validacao.py
+
+import os
+
+import pytest
+
+from benchmarks.gerador_efd import gerar_arquivo_efd
+from core import efd_validacao
+from core.efd_parser import carregar_registro_store
+from core.efd_generator import generate_efd_file
+from core.efd_validacao import validar_registros
+
+@pytest.fixture
+def em_paralelo(monkeypatch):
+    """Força o caminho com processos trabalhadores mesmo em arquivos pequenos."""
+    monkeypatch.setattr(efd_validacao, "LIMITE_VALIDACAO_SERIAL", 1)
+    monkeypatch.setattr(efd_validacao, "TAMANHO_FATIA", 500)
+    monkeypatch.setattr(os, "cpu_count", lambda: 2)
+
+def _resumo(relatorio: dict) -> list[tuple]:
+    return [(problema.posicao, problema.indice_campo, problema.mensagem) for problema in relatorio["problemas"]]
+
+@pytest.fixture
+def store_mapeado(tmp_path):
+    caminho = str(tmp_path / "efd.txt")
+    gerar_arquivo_efd(caminho, 3_000, semente=5)
+    store = carregar_registro_store(caminho, mapear=True)
+    posicao = store.indice.posicoes("F100")[0]
+    store.definir_campo(posicao, 8, "abc") # Valor numérico inválido: um problema conhecido
+    yield store
+    store.fechar()
+
+def test_validacao_apos_salvar_sobre_a_origem(store_mapeado, em_paralelo):
+    esperado = _resumo(validar_registros(store_mapeado, processos=1))
+    assert generate_efd_file(store_mapeado.caminho_origem, store_mapeado)
+    assert _resumo(validar_registros(store_mapeado, processos=2)) == esperado
+
+def test_origem_substituida_valida_pelo_buffer_do_store(store_mapeado, em_paralelo, tmp_path):
+    esperado = _resumo(validar_registros(store_mapeado, processos=1))
+    assert esperado
+    # Outro programa substitui o arquivo por um de mesmo tamanho: os offsets do store não valem mais para ele
+    outro = tmp_path / "outro.txt"
+    outro.write_bytes(b"x" * os.path.getsize(store_mapeado.caminho_origem))
+    os.replace(outro, store_mapeado.caminho_origem)
+    assert _resumo(validar_registros(store_mapeado, processos=2)) == esperado